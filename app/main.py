@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 from routes.logistics import router as logistics_router
+from routes.warehouses import router as warehouses_router
+from services.warehouse_store import get_warehouse_store
 from utils.logger import setup_logging
 from utils.error_handler import setup_exception_handlers
 
@@ -19,8 +21,14 @@ setup_exception_handlers(app)
 def healthcheck():
     return {"status": "ok"}
 
+@app.on_event("shutdown")
+def save_warehouse_state():
+    # Сохраняем последний снимок состояния складов при остановке сервера
+    get_warehouse_store().snapshot()
+
 # Подключаем роуты
 app.include_router(logistics_router, prefix="/api/v1", tags=["logistics"])
+app.include_router(warehouses_router, prefix="/api/v1", tags=["warehouses"])
 
 if __name__ == "__main__":
     # Запуск: uvicorn main:app --reload
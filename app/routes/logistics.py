@@ -1,6 +1,23 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from starlette.background import BackgroundTask
+from pydantic.error_wrappers import ErrorWrapper
 from schemas.delivery import DeliveryRequest, DeliveryResponse
-from services.optimization import run_optimization
+from schemas.fast_parse import parse_delivery_request, request_body_openapi
+from schemas.ndjson import NDJSONRequestReader
+from services.admission import AdmissionRejected, get_scheduler
+from services.capture import start_capture
+from services.optimization import run_optimization, resolve_vehicles, vehicle_terminals
+from services.qos import FULL_PROFILE, choose_profile, cpu_load, load_profiles
+from services.stream_matrix import IncrementalMatrixBuilder
+from services.warehouse_store import get_warehouse_store
+from utils.cancellation import (DEADLINE, CancellationToken, RequestCancelled, cancel_request, parse_deadline,
+                                register, unregister, watch_disconnect)
+from utils.timing import StageTimer
 import logging
 
 # Инициализация маршрутизатора API
@@ -10,28 +27,175 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-@router.post("/calculate-route", response_model=DeliveryResponse)
-def calculate_route(data: DeliveryRequest):
+
+async def read_json_body(request: Request):
+    """
+    Читает и разбирает JSON-тело запроса через orjson.
+
+    Raises:
+        RequestValidationError: Если тело не является корректным JSON.
+    """
+    body = await request.body()
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise RequestValidationError([ErrorWrapper(e, ("body", e.pos))])
+
+
+@router.post("/calculate-route", response_model=DeliveryResponse,
+             openapi_extra=request_body_openapi(DeliveryRequest))
+async def calculate_route(request: Request):
     """
     Эндпоинт для расчета оптимального маршрута доставки.
 
+    Тело запроса (DeliveryRequest) разбирается быстрым путём parse_delivery_request, ответ собирается
+    один раз и сериализуется orjson без повторной валидации моделью ответа. Длительность этапов
+    (parse, matrix, presolve, solve) возвращается в заголовке Server-Timing. При заданной переменной
+    окружения CAPTURE_DIR запрос вместе с матрицами записывается для воспроизведения (services.capture).
+
+    Расчёт останавливается при отключении клиента, по запросу отмены с X-Request-ID этого запроса
+    и по сроку из заголовка X-Request-Deadline (время Unix в секундах); отменённый во время поиска
+    расчёт возвращает лучший найденный план с полем cancelled.
+
     Args:
-        data (DeliveryRequest): Входные данные для расчета маршрута, включающие информацию о депо, доставках и складах.
+        request (Request): HTTP-запрос с телом DeliveryRequest: информация о депо, доставках и складах.
 
     Returns:
         DeliveryResponse: Ответ с порядком доставки, URL маршрута на OpenStreetMap и сообщением о статусе.
     """
     logger.info("Получен запрос на /calculate-route")
+    timer = StageTimer()
+    with timer.stage("parse"):
+        payload = await read_json_body(request)
+        data = parse_delivery_request(payload)
+    check_stored_warehouses(data.warehouse_ids)
+    return await optimize(data, timer=timer, recorder=start_capture(lambda: payload), request=request)
+
+
+@router.post("/calculate-route/{request_id}/cancel", status_code=202)
+async def cancel_calculation(request_id: str):
+    """
+    Эндпоинт отмены расчёта, запущенного с заголовком X-Request-ID.
+
+    Поиск решателя останавливается, а исходный запрос получает лучший найденный к этому моменту план
+    (или 499, если расчёт отменён до первого найденного решения). Отмена действует в пределах процесса сервера,
+    выполняющего расчёт.
+
+    Args:
+        request_id (str): Значение X-Request-ID отменяемого запроса.
+
+    Raises:
+        HTTPException: 404, если расчёт с таким ID не выполняется.
+    """
+    if not cancel_request(request_id):
+        raise HTTPException(status_code=404, detail=f"Расчёт {request_id} не выполняется")
+    return {"request_id": request_id, "status": "cancelling"}
+
+
+def cancellation_token(request):
+    """
+    Признак отмены расчёта со сроком из заголовка X-Request-Deadline.
+
+    Raises:
+        HTTPException: 400, если заголовок не является временем Unix в секундах.
+    """
+    value = request.headers.get("X-Request-Deadline")
+    if value is None:
+        return CancellationToken()
     try:
-        # Запуск процесса оптимизации маршрута с переданными данными
-        result = run_optimization(data)
-        logger.info("Результат оптимизации успешно сгенерирован")
+        return CancellationToken(parse_deadline(value))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Некорректный заголовок X-Request-Deadline: {value}")
+
+
+def request_tenant(request):
+    """
+    Клиент запроса для честной очереди расчётов: заголовок X-Tenant-ID, иначе адрес клиента.
+    """
+    if request is None:
+        return "anonymous"
+    tenant = request.headers.get("X-Tenant-ID")
+    if tenant:
+        return tenant
+    return request.client.host if request.client is not None else "anonymous"
 
-        # Создание объекта ответа на основе результата оптимизации
-        response = DeliveryResponse(**result)
-        logger.info(f"Ответ отправлен: {response}")
 
-        return response
+def check_stored_warehouses(warehouse_ids):
+    """
+    Проверяет, что склады, переданные по ID, есть в хранилище состояния складов.
+
+    Raises:
+        HTTPException: 404, если какого-то склада нет.
+    """
+    if warehouse_ids:
+        missing = get_warehouse_store().missing(warehouse_ids)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Склады не найдены: {', '.join(missing)}")
+
+
+async def optimize(data, matrix_builder=None, timer=None, recorder=None, request=None, profile=None):
+    """
+    Запускает оптимизацию маршрута в пуле потоков и формирует ответ.
+
+    При перегрузке (очередь расчётов или загрузка CPU выше порогов профилей QOS_PROFILES) запрос решается
+    по удешевлённому профилю качества; имя профиля возвращается в поле qos_profile.
+
+    Args:
+        data (DeliveryRequest): Проверенный запрос.
+        matrix_builder (IncrementalMatrixBuilder, optional): Построитель матриц, уже получивший все точки.
+        timer (StageTimer, optional): Замер этапов для заголовка Server-Timing.
+        recorder (RequestRecorder, optional): Запись запроса; сохраняется после отправки ответа.
+        request (Request, optional): HTTP-запрос: его отключение, X-Request-ID и X-Request-Deadline
+            управляют отменой расчёта, X-Tenant-ID определяет клиента в очереди расчётов.
+        profile (QosProfile, optional): Профиль качества, уже выбранный для запроса (потоковый запрос выбирает
+            его по заголовку); по умолчанию выбирается по текущей нагрузке.
+
+    Returns:
+        ORJSONResponse: Результат run_optimization с заголовком Server-Timing.
+
+    Raises:
+        HTTPException: 499, если расчёт отменён до первого решения или клиент отключился, 504 - если
+            до первого решения наступил срок X-Request-Deadline; 429 или 503 с Retry-After, если расчёт не принят в очередь.
+    """
+    timer = timer or StageTimer()
+    cancel = cancellation_token(request) if request is not None else None
+    request_id = request.headers.get("X-Request-ID") if request is not None else None
+    if request_id:
+        register(request_id, cancel)
+    watcher = asyncio.create_task(watch_disconnect(request, cancel)) if request is not None else None
+    try:
+        scheduler = get_scheduler()
+        if profile is None:
+            profile = choose_profile(load_profiles(), scheduler.queue_depth(), cpu_load())
+        if profile is not FULL_PROFILE:
+            changes = profile.changes(data)
+            data = data.copy(update=changes)
+            if recorder is not None:
+                # Запись воспроизводит удешевлённый расчёт, а не исходный запрос
+                recorder.record_qos(profile, changes)
+
+        async with scheduler.admission(data, request_tenant(request), cancel, timer):
+            matrices = None
+            if matrix_builder is not None:
+                with timer.stage("matrix"):
+                    matrices = await run_in_threadpool(matrix_builder.result)
+
+            # Запуск процесса оптимизации маршрута с переданными данными
+            result = await run_in_threadpool(run_optimization, data, matrices, timer, recorder, cancel, profile)
+            result["qos_profile"] = profile.name
+            logger.info(f"Ответ отправлен: {len(result['route_order'])} доставок в маршруте, "
+                        f"сообщение: {result['message']}")
+
+            background = BackgroundTask(recorder.save, result, timer) if recorder is not None else None
+            return ORJSONResponse(result, headers={"Server-Timing": timer.header()}, background=background)
+
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+    except RequestCancelled as e:
+        # Отменённый расчёт без плана: 504 по сроку запроса, иначе 499 (клиент закрыл запрос)
+        raise HTTPException(status_code=504 if e.reason == DEADLINE else 499, detail=f"Расчёт отменён: {e.reason}",
+                            headers={"Server-Timing": timer.header()})
 
     except HTTPException as http_exc:
         # Обработка исключений HTTPException, возникающих в процессе оптимизации
@@ -41,5 +205,109 @@ def calculate_route(data: DeliveryRequest):
     except Exception as e:
         # Обработка всех остальных исключений
         logger.exception(f"Необработанное исключение при расчете маршрута: {e}")
-        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера",
+                            headers={"Server-Timing": timer.header()})
+
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if request_id:
+            unregister(request_id, cancel)
+
+
+@router.post("/calculate-route/stream", response_model=DeliveryResponse, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/x-ndjson": {"schema": {"type": "string"}}}}
+})
+async def calculate_route_stream(request: Request):
+    """
+    Эндпоинт для расчета маршрута по потоку доставок в формате NDJSON.
+
+    Первая строка тела — заголовок запроса (поля DeliveryRequest без deliveries), далее по одной
+    доставке на строку. Доставки проверяются по мере получения, а матрицы расстояний для уже
+    полученных точек запрашиваются у OSRM, пока остальная часть тела ещё загружается. Допуск в очередь
+    расчётов и профиль качества проверяются сразу по заголовку, до запросов матриц (start_stream).
+
+    Args:
+        request (Request): HTTP-запрос с телом NDJSON.
+
+    Returns:
+        DeliveryResponse: Ответ в том же формате, что и у /calculate-route.
+    """
+    logger.info("Получен запрос на /calculate-route/stream")
+    reader = NDJSONRequestReader()
+    profile = None
+    builder = None
+    try:
+        async for chunk in request.stream():
+            new = reader.feed(chunk)
+            if profile is None and reader.header is not None:
+                profile, builder = start_stream(reader.header, request)
+            if builder is not None:
+                builder.add([d.coord for d in new])
+        new = reader.close()
+        if profile is None:
+            profile, builder = start_stream(reader.header, request)
+        if builder is not None:
+            builder.add([d.coord for d in new])
+            # Депо транспортных средств идут в подзадаче после всех доставок
+            builder.add(vehicle_terminals(reader.header.depot_coord, resolve_vehicles(reader.header))[0])
+        logger.info(f"Получено {len(reader.deliveries)} доставок потоком")
+
+        recorder = start_capture(lambda: dict(reader.header.dict(),
+                                              deliveries=[d.dict() for d in reader.deliveries]))
+        return await optimize(reader.request(), builder, recorder=recorder, request=request, profile=profile)
+    finally:
+        if builder is not None:
+            builder.close()
+
+
+def admission_error(e):
+    """
+    HTTP-ответ на отказ в допуске расчёта: 429 или 503 с Retry-After.
+    """
+    logger.warning(f"Расчёт не принят: {e}")
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def start_stream(header, request):
+    """
+    Проверяет допуск и выбирает профиль качества потокового запроса по его заголовку, до запросов матриц.
+
+    Запрос, который заведомо не будет принят в очередь расчётов, отклоняется до загрузки матриц;
+    при профиле с матрицами по прямой (haversine) матрицы у OSRM не запрашиваются.
+
+    Returns:
+        tuple: (profile, builder) - выбранный QosProfile и построитель матриц или None.
+
+    Raises:
+        HTTPException: 404, если склады, переданные по ID, не найдены; 429 или 503 с Retry-After,
+            если расчёт не будет принят в очередь.
+    """
+    scheduler = get_scheduler()
+    try:
+        scheduler.precheck(request_tenant(request))
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    profile = choose_profile(load_profiles(), scheduler.queue_depth(), cpu_load())
+    if profile.haversine:
+        check_stored_warehouses(header.warehouse_ids)
+        return profile, None
+    return profile, start_matrix_builder(header)
+
+
+def start_matrix_builder(header):
+    """
+    Создаёт построитель матриц и добавляет в него депо и склады из заголовка запроса.
+
+    Raises:
+        HTTPException: 404, если склады, переданные по ID, не найдены.
+    """
+    check_stored_warehouses(header.warehouse_ids)
+    if header.warehouse_ids:
+        coords = [w["coord"] for w in get_warehouse_store().resolve(header.warehouse_ids)]
+    else:
+        coords = [w.coord for w in header.warehouses]
 
+    builder = IncrementalMatrixBuilder()
+    builder.add([header.depot_coord] + coords)
+    return builder
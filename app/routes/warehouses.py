@@ -0,0 +1,47 @@
+from typing import List
+from fastapi import APIRouter, HTTPException
+from schemas.delivery import Warehouse
+from services.warehouse_store import get_warehouse_store
+import logging
+
+# Инициализация маршрутизатора API
+router = APIRouter()
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+@router.put("/warehouses")
+def upsert_warehouses(warehouses: List[Warehouse]):
+    """
+    Эндпоинт для загрузки состояния складов в хранилище сервера.
+
+    Склады с уже известными ID заменяются целиком. После загрузки запросы на расчёт маршрута
+    могут ссылаться на склады через warehouse_ids вместо передачи их запасов.
+
+    Args:
+        warehouses (List[Warehouse]): Склады с координатами, вместимостью, использованием и запасами.
+
+    Returns:
+        dict: Количество загруженных складов.
+    """
+    get_warehouse_store().upsert(warehouses)
+    logger.info(f"Загружено состояние складов: {len(warehouses)}")
+    return {"updated": len(warehouses)}
+
+
+@router.get("/warehouses/{warehouse_id}", response_model=Warehouse)
+def get_warehouse(warehouse_id: str):
+    """
+    Эндпоинт для получения текущего состояния склада из хранилища сервера.
+
+    Args:
+        warehouse_id (str): Идентификатор склада.
+
+    Returns:
+        Warehouse: Координаты, вместимость, использование и запасы склада.
+    """
+    warehouse = get_warehouse_store().get(warehouse_id)
+    if warehouse is None:
+        raise HTTPException(status_code=404, detail=f"Склад {warehouse_id} не найден")
+    return warehouse
@@ -0,0 +1,256 @@
+import numpy as np
+from pydantic.error_wrappers import ErrorWrapper
+from fastapi.exceptions import RequestValidationError
+from schemas.delivery import PRIORITY_RANKING, ItemInfo
+
+# Обратное отображение ранга приоритета в его название
+PRIORITY_NAMES = {rank: name for name, rank in PRIORITY_RANKING.items()}
+
+# Обязательные и необязательные столбцы колоночного формата доставок
+REQUIRED_COLUMNS = ("id", "lat", "lon", "demand", "origin_warehouse", "service_time")
+OPTIONAL_COLUMNS = ("priority", "tw_start", "tw_end", "refused", "items")
+
+
+class DeliveryRow:
+    """
+    Представление одной строки DeliveryTable с полями DeliveryAddress.
+
+    Значения читаются из столбцов таблицы при обращении; запись refused изменяет столбец.
+    """
+    __slots__ = ("_table", "_i")
+
+    def __init__(self, table, i):
+        self._table = table
+        self._i = i
+
+    @property
+    def id(self):
+        return self._table.ids[self._i]
+
+    @property
+    def coord(self):
+        lat, lon = self._table.coords[self._i].tolist()
+        return lat, lon
+
+    @property
+    def priority(self):
+        return PRIORITY_NAMES[int(self._table.priority_rank[self._i])]
+
+    @property
+    def demand(self):
+        return int(self._table.demand[self._i])
+
+    @property
+    def items(self):
+        return self._table.items[self._i]
+
+    @property
+    def refused(self):
+        return bool(self._table.refused[self._i])
+
+    @refused.setter
+    def refused(self, value):
+        self._table.refused[self._i] = value
+
+    @property
+    def origin_warehouse(self):
+        return self._table.origin_warehouse[self._i]
+
+    @property
+    def time_window(self):
+        start, end = self._table.time_windows[self._i].tolist()
+        return start, end
+
+    @property
+    def service_time(self):
+        return int(self._table.service_time[self._i])
+
+
+class DeliveryTable:
+    """
+    Доставки в колоночном виде: каждое поле - массив numpy или список по всем доставкам.
+
+    Таблица ведёт себя как последовательность доставок (строки DeliveryRow создаются по запросу),
+    а build_subproblem берёт координаты, окна, время обслуживания и спрос прямо из столбцов.
+
+    Attributes:
+        ids (list): Идентификаторы доставок.
+        coords (np.ndarray): Координаты, размер n x 2 (широта, долгота).
+        priority_rank (np.ndarray): Ранги приоритетов по PRIORITY_RANKING.
+        demand (np.ndarray): Спрос доставок.
+        time_windows (np.ndarray): Временные окна, размер n x 2.
+        service_time (np.ndarray): Время обслуживания.
+        refused (np.ndarray): Флаги отказа.
+        origin_warehouse (list): Идентификаторы исходных складов.
+        items (list): Списки товаров (ItemInfo) по доставкам.
+    """
+
+    def __init__(self, ids, coords, priority_rank, demand, time_windows, service_time, refused,
+                 origin_warehouse, items):
+        self.ids = ids
+        self.coords = coords
+        self.priority_rank = priority_rank
+        self.demand = demand
+        self.time_windows = time_windows
+        self.service_time = service_time
+        self.refused = refused
+        self.origin_warehouse = origin_warehouse
+        self.items = items
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [DeliveryRow(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return DeliveryRow(self, i)
+
+    def __iter__(self):
+        return (DeliveryRow(self, i) for i in range(len(self)))
+
+    def take(self, positions):
+        """
+        Возвращает новую таблицу из строк с заданными позициями.
+        """
+        idx = np.asarray(positions, dtype=np.int64)
+        return DeliveryTable(
+            ids=[self.ids[i] for i in positions],
+            coords=self.coords[idx],
+            priority_rank=self.priority_rank[idx],
+            demand=self.demand[idx],
+            time_windows=self.time_windows[idx],
+            service_time=self.service_time[idx],
+            refused=self.refused[idx],
+            origin_warehouse=[self.origin_warehouse[i] for i in positions],
+            items=[self.items[i] for i in positions],
+        )
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Строит таблицу доставок из колоночного JSON с векторной проверкой значений.
+
+        Args:
+            columns (dict): Столбцы: id, lat, lon, demand, origin_warehouse, service_time
+                и необязательные priority, tw_start, tw_end, refused, items
+                (items - список пар [guid, count] для каждой доставки).
+
+        Returns:
+            DeliveryTable: Проверенная таблица доставок.
+
+        Raises:
+            RequestValidationError: Если столбцы не проходят проверку.
+        """
+        errors = []
+
+        def fail(column, message):
+            errors.append(ErrorWrapper(ValueError(message), ("body", "deliveries", column)))
+
+        for column in REQUIRED_COLUMNS:
+            if column not in columns:
+                fail(column, "Обязательный столбец отсутствует")
+        unknown = set(columns) - set(REQUIRED_COLUMNS) - set(OPTIONAL_COLUMNS)
+        for column in sorted(unknown):
+            fail(column, "Неизвестный столбец")
+        if errors:
+            raise RequestValidationError(errors)
+
+        n = len(columns["id"]) if type(columns["id"]) is list else -1
+        for column, values in columns.items():
+            if type(values) is not list or len(values) != n:
+                fail(column, "Столбцы должны быть списками одинаковой длины")
+        if errors:
+            raise RequestValidationError(errors)
+        if n == 0:
+            fail("id", "Список доставок должен содержать хотя бы одну доставку")
+            raise RequestValidationError(errors)
+
+        def numeric(column, kinds, default=None):
+            values = columns.get(column)
+            if values is None:
+                return np.full(n, default, dtype=np.int64)
+            array = np.asarray(values)
+            if array.ndim != 1 or array.dtype.kind not in kinds:
+                fail(column, "Недопустимый тип значений")
+                return None
+            return array
+
+        lat = numeric("lat", "if")
+        lon = numeric("lon", "if")
+        demand = numeric("demand", "i")
+        service_time = numeric("service_time", "i")
+        tw_start = numeric("tw_start", "i", 0)
+        tw_end = numeric("tw_end", "i", 1440)
+        if errors:
+            raise RequestValidationError(errors)
+
+        if not np.all(np.abs(lat) <= 90):
+            fail("lat", "Широта должна быть между -90 и 90")
+        if not np.all(np.abs(lon) <= 180):
+            fail("lon", "Долгота должна быть между -180 и 180")
+        if not np.all(demand > 0):
+            fail("demand", "Спрос по доставке должен быть больше 0")
+        if not np.all(service_time > 0):
+            fail("service_time", "Время обслуживания доставки должно быть больше 0")
+
+        ids = columns["id"]
+        if not all(type(x) is str for x in ids):
+            fail("id", "ID доставок должны быть строками")
+        elif len(set(ids)) != n:
+            fail("id", "ID доставок должны быть уникальными")
+
+        origin_warehouse = columns["origin_warehouse"]
+        if not all(type(x) is str and x for x in origin_warehouse):
+            fail("origin_warehouse", "origin_warehouse не должно быть пустым")
+
+        priorities = columns.get("priority")
+        if priorities is None:
+            priority_rank = np.full(n, PRIORITY_RANKING["medium"], dtype=np.int8)
+        else:
+            try:
+                priority_rank = np.array([PRIORITY_RANKING[p.lower()] for p in priorities], dtype=np.int8)
+            except (KeyError, AttributeError):
+                fail("priority", f"Допустимые значения: {', '.join(PRIORITY_RANKING.keys())}")
+
+        refused_values = columns.get("refused")
+        if refused_values is None:
+            refused = np.zeros(n, dtype=bool)
+        elif all(type(x) is bool for x in refused_values):
+            refused = np.array(refused_values, dtype=bool)
+        else:
+            fail("refused", "Флаги отказа должны быть логическими")
+
+        items_values = columns.get("items")
+        items = []
+        if items_values is None:
+            items = [[] for _ in range(n)]
+        else:
+            try:
+                for row in items_values:
+                    row_items = []
+                    for guid, count in row:
+                        if type(guid) is not str or type(count) is not int or count <= 0:
+                            raise ValueError
+                        row_items.append(ItemInfo.construct(guid=guid, count=count))
+                    items.append(row_items)
+            except (TypeError, ValueError):
+                fail("items", "Товары задаются списками пар [guid, count] с count > 0")
+
+        if errors:
+            raise RequestValidationError(errors)
+
+        return cls(
+            ids=ids,
+            coords=np.column_stack([lat, lon]).astype(np.float64),
+            priority_rank=priority_rank,
+            demand=demand.astype(np.int64),
+            time_windows=np.column_stack([tw_start, tw_end]).astype(np.int64),
+            service_time=service_time.astype(np.int64),
+            refused=refused,
+            origin_warehouse=origin_warehouse,
+            items=items,
+        )
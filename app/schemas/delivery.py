@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, validator, root_validator
 from typing import List, Optional, Tuple
 
 # Глобальное определение приоритетов (больше число = выше приоритет)
@@ -114,6 +114,86 @@ class Warehouse(BaseModel):
         return value
 
 
+class DriverRules(BaseModel):
+    """
+    Модель правил труда водителей, общих для всех ТС.
+
+    Attributes:
+        shift_window (Tuple[int, int]): Смена водителя в минутах от полуночи: выезд из депо не раньше начала,
+            возврат не позже конца. По умолчанию (0, 1440).
+        max_route_duration (Optional[int]): Наибольшая продолжительность маршрута от выезда до возврата, минуты.
+        max_driving_time (Optional[int]): Наибольшее суммарное время за рулём за маршрут, минуты.
+        break_after (Optional[int]): Наибольшее время работы без перерыва, минуты; если задано, в маршрут
+            вставляются перерывы длительностью break_duration.
+        break_duration (int): Длительность перерыва, минуты. По умолчанию 30.
+    """
+    shift_window: Tuple[int, int] = Field((0, 1440), description="Смена водителя в минутах от полуночи")
+    max_route_duration: Optional[int] = Field(None, gt=0, description="Наибольшая продолжительность маршрута, минуты")
+    max_driving_time: Optional[int] = Field(None, gt=0, description="Наибольшее время за рулём, минуты")
+    break_after: Optional[int] = Field(None, gt=0, description="Наибольшее время работы без перерыва, минуты")
+    break_duration: int = Field(30, gt=0, description="Длительность перерыва, минуты")
+
+    @validator("shift_window")
+    def validate_shift_window(cls, value):
+        """
+        Валидатор для смены водителя.
+        Проверяет, что смена лежит в пределах суток и начинается раньше, чем заканчивается.
+        """
+        if value is None:
+            return value
+        start, end = value
+        if not (0 <= start < end <= 1440):
+            raise ValueError("Смена водителя должна лежать в пределах суток: 0 <= начало < конец <= 1440")
+        return value
+
+
+class Vehicle(BaseModel):
+    """
+    Модель транспортного средства со своим депо.
+
+    Attributes:
+        id (str): Уникальный идентификатор ТС.
+        start_coord (Tuple[float, float]): Координаты депо, из которого ТС выезжает.
+        end_coord (Optional[Tuple[float, float]]): Координаты депо, в которое ТС возвращается.
+            По умолчанию совпадает с start_coord.
+        capacity (Optional[int]): Вместимость ТС. По умолчанию vehicle_capacity запроса.
+        shift_window (Optional[Tuple[int, int]]): Смена водителя этого ТС. По умолчанию из driver_rules.
+    """
+    id: str
+    start_coord: Tuple[float, float]
+    end_coord: Optional[Tuple[float, float]] = Field(None, description="Депо возврата, по умолчанию start_coord")
+    capacity: Optional[int] = Field(None, gt=0, description="Вместимость ТС, по умолчанию vehicle_capacity")
+    shift_window: Optional[Tuple[int, int]] = Field(None, description="Смена водителя, по умолчанию из driver_rules")
+
+    @validator("shift_window")
+    def validate_shift_window(cls, value):
+        """
+        Валидатор для смены водителя.
+        Проверяет, что смена лежит в пределах суток и начинается раньше, чем заканчивается.
+        """
+        if value is None:
+            return value
+        start, end = value
+        if not (0 <= start < end <= 1440):
+            raise ValueError("Смена водителя должна лежать в пределах суток: 0 <= начало < конец <= 1440")
+        return value
+
+    @validator("start_coord", "end_coord")
+    def validate_coordinates(cls, value):
+        """
+        Валидатор для координат депо ТС.
+        Проверяет, что широта и долгота находятся в допустимых диапазонах.
+        """
+        if value is None:
+            return value
+        lat, lon = value
+        if not (-90 <= lat <= 90):
+            raise ValueError("Широта депо ТС должна быть между -90 и 90")
+        if not (-180 <= lon <= 180):
+            raise ValueError("Долгота депо ТС должна быть между -180 и 180")
+        return value
+
+
 class DeliveryRequest(BaseModel):
     """
     Модель запроса на доставку.
@@ -122,14 +202,59 @@ class DeliveryRequest(BaseModel):
         depot_coord (Tuple[float, float]): Координаты депо (широта, долгота).
         vehicle_capacity (int): Вместимость транспортного средства.
         deliveries (List[DeliveryAddress]): Список доставок.
-        warehouses (List[Warehouse]): Список складов.
+        warehouses (List[Warehouse]): Список складов с полным состоянием.
+        warehouse_ids (List[str]): ID складов, состояние которых хранится на сервере
+            (передаётся вместо warehouses).
+        assign_warehouses (bool): Выбирать склад-источник для каждой доставки в решателе среди складов,
+            где есть её товары (origin_warehouse при этом не используется). По умолчанию False.
+        refusal_ranking (str): Способ выбора склада для возврата отказов: "haversine" (по прямой)
+            или "road" (по дорожному расстоянию из матрицы маршрута). По умолчанию "haversine".
+        traffic_profile (Optional[List[float]]): Множители времени в пути для каждого из 24 часов суток
+            (например, 2.0 в час пик). По умолчанию None — время в пути не зависит от времени суток.
+        vehicles (List[Vehicle]): Транспортные средства со своими депо. Если список пуст, используется одно ТС
+            вместимостью vehicle_capacity с выездом и возвратом в depot_coord.
+        driver_rules (Optional[DriverRules]): Смена, ограничения времени за рулём и перерывы водителей.
+            По умолчанию None — маршрут ограничен только сутками.
+        soft_time_windows (bool): Разрешить опоздание к концу окна доставки со штрафом, зависящим от приоритета,
+            вместо отказа от доставки. По умолчанию False.
+        max_lateness (int): Наибольшее опоздание при мягких окнах, минуты. По умолчанию 120.
+        solver (str): Метод поиска: "ortools" (поиск OR-Tools), "lns" (разрушение и восстановление
+            решения в нескольких процессах, для больших задач) или "heuristic" (быстрая эвристика
+            для интерактивных ответов, без driver_rules, soft_time_windows и assign_warehouses).
+            По умолчанию "ortools".
+        time_limit (int): Ограничение времени поиска, секунды. По умолчанию 10.
+        aggregate_colocated (bool): Объединять доставки в одной точке (координаты, совпадающие после
+            округления) с совместимыми окнами в один узел решателя. Не поддерживается с assign_warehouses.
+            По умолчанию False.
+        nearest_neighbors (Optional[int]): Разреженный режим: из каждой доставки допускаются переезды только
+            в nearest_neighbors ближайших доставок, склады и депо, и у поставщика матриц запрашиваются только
+            эти дуги. Только для solver "ortools", без traffic_profile и assign_warehouses.
+            По умолчанию None — полная матрица.
+        solve_by_priority (bool): Решать уровни приоритета последовательно отдельными подзадачами
+            (сначала все доставки высшего приоритета, затем следующего уровня) вместо одной модели
+            с ограничениями порядка. Быстрее для больших запросов; не поддерживается с driver_rules,
+            assign_warehouses и nearest_neighbors. По умолчанию False.
     """
     depot_coord: Tuple[float, float]
     vehicle_capacity: int = Field(20, gt=0, description="Вместимость транспортного средства, должно быть больше 0")
     deliveries: List[DeliveryAddress] = Field(..., min_items=1,
                                               description="Список доставок, должен содержать хотя бы одну доставку")
-    warehouses: List[Warehouse] = Field(..., min_items=1,
-                                        description="Список складов, должен содержать хотя бы один склад")
+    warehouses: List[Warehouse] = Field(default_factory=list, description="Список складов")
+    warehouse_ids: List[str] = Field(default_factory=list,
+                                     description="ID складов из хранилища состояния складов")
+    assign_warehouses: bool = Field(False, description="Выбирать склад-источник доставки в решателе по наличию товара")
+    refusal_ranking: str = Field("haversine", description="Ранжирование складов для возврата отказов: haversine, road")
+    traffic_profile: Optional[List[float]] = Field(None, description="Множители времени в пути по часам суток (24 значения)")
+    vehicles: List[Vehicle] = Field(default_factory=list, description="Транспортные средства со своими депо")
+    driver_rules: Optional[DriverRules] = Field(None, description="Правила труда водителей")
+    soft_time_windows: bool = Field(False, description="Разрешить опоздание к концу окна доставки со штрафом")
+    max_lateness: int = Field(120, ge=0, description="Наибольшее опоздание при мягких окнах, минуты")
+    solver: str = Field("ortools", description="Метод поиска: ortools, lns, heuristic")
+    time_limit: int = Field(10, gt=0, le=300, description="Ограничение времени поиска, секунды")
+    aggregate_colocated: bool = Field(False, description="Объединять доставки в одной точке в один узел решателя")
+    nearest_neighbors: Optional[int] = Field(None, gt=0,
+                                             description="Число ближайших соседей доставки в разреженном режиме")
+    solve_by_priority: bool = Field(False, description="Решать уровни приоритета последовательно")
 
     @validator("depot_coord")
     def validate_depot_coordinates(cls, value):
@@ -155,6 +280,205 @@ class DeliveryRequest(BaseModel):
             raise ValueError("ID доставок должны быть уникальными")
         return deliveries
 
+    @validator("warehouse_ids")
+    def unique_warehouse_ids(cls, warehouse_ids):
+        """
+        Валидатор для уникальности ID складов из хранилища.
+        """
+        if len(warehouse_ids) != len(set(warehouse_ids)):
+            raise ValueError("ID складов должны быть уникальными")
+        return warehouse_ids
+
+    @validator("refusal_ranking")
+    def validate_refusal_ranking(cls, value):
+        """
+        Валидатор для способа ранжирования складов при возврате отказов.
+        """
+        if value not in ("haversine", "road"):
+            raise ValueError("refusal_ranking должен быть haversine или road")
+        return value
+
+    @validator("solver")
+    def validate_solver(cls, value):
+        """
+        Валидатор метода поиска.
+        """
+        if value not in ("ortools", "lns", "heuristic"):
+            raise ValueError("solver должен быть ortools, lns или heuristic")
+        return value
+
+    @validator("vehicles")
+    def unique_vehicle_ids(cls, vehicles):
+        """
+        Валидатор для уникальности ID транспортных средств.
+        """
+        ids = [vehicle.id for vehicle in vehicles]
+        if len(ids) != len(set(ids)):
+            raise ValueError("ID транспортных средств должны быть уникальными")
+        return vehicles
+
+    @validator("traffic_profile")
+    def validate_traffic_profile(cls, value):
+        """
+        Валидатор профиля загруженности.
+        Проверяет, что заданы 24 положительных множителя.
+        """
+        if value is not None and (len(value) != 24 or min(value) <= 0):
+            raise ValueError("traffic_profile должен содержать 24 положительных множителя")
+        return value
+
+    @root_validator(skip_on_failure=True)
+    def validate_warehouse_source(cls, values):
+        """
+        Валидатор источника складов.
+        Проверяет, что склады переданы либо списком, либо ссылками на хранилище, но не одновременно.
+        """
+        if not values.get("warehouses") and not values.get("warehouse_ids"):
+            raise ValueError("Нужно указать warehouses или warehouse_ids, хотя бы один склад")
+        if values.get("warehouses") and values.get("warehouse_ids"):
+            raise ValueError("warehouses и warehouse_ids нельзя передавать одновременно")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def validate_heuristic_options(cls, values):
+        """
+        Валидатор возможностей эвристического решателя.
+        Эвристика не поддерживает правила труда водителей, мягкие окна и выбор склада решателем.
+        """
+        if values.get("solver") == "heuristic":
+            unsupported = [name for name in ("driver_rules", "soft_time_windows", "assign_warehouses")
+                           if values.get(name)]
+            if unsupported:
+                raise ValueError(f"solver heuristic не поддерживает {', '.join(unsupported)}")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def validate_aggregation(cls, values):
+        """
+        Валидатор объединения доставок в одной точке.
+        При выборе склада решателем у каждой доставки свои узлы забора, поэтому доставки не объединяются.
+        """
+        if values.get("aggregate_colocated") and values.get("assign_warehouses"):
+            raise ValueError("aggregate_colocated не поддерживается вместе с assign_warehouses")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def validate_sparse_options(cls, values):
+        """
+        Валидатор разреженного режима.
+        Пересчёт матрицы по профилю загруженности, процессы LNS, эвристика и узлы забора
+        используют полную матрицу, поэтому вместе с nearest_neighbors не поддерживаются.
+        """
+        if values.get("nearest_neighbors") is None:
+            return values
+        if values.get("solver") != "ortools":
+            raise ValueError("nearest_neighbors поддерживается только с solver ortools")
+        unsupported = [name for name in ("traffic_profile", "assign_warehouses") if values.get(name)]
+        if unsupported:
+            raise ValueError(f"nearest_neighbors не поддерживается вместе с {', '.join(unsupported)}")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def validate_priority_tiers(cls, values):
+        """
+        Валидатор последовательного решения по уровням приоритета.
+        Время за рулём и запасы складов не переносятся между уровнями, а разреженные строки
+        не содержат дуг между доставками разных уровней.
+        """
+        if values.get("solve_by_priority"):
+            unsupported = [name for name in ("driver_rules", "assign_warehouses", "nearest_neighbors")
+                           if values.get(name)]
+            if unsupported:
+                raise ValueError(f"solve_by_priority не поддерживается вместе с {', '.join(unsupported)}")
+        return values
+
+
+class WarehouseInventory(BaseModel):
+    """
+    Модель состояния склада после применения плана маршрута.
+
+    Attributes:
+        usage (int): Использование вместимости склада.
+        capacity (int): Вместимость склада.
+        stock (dict[str, int]): Итоговые остатки по товарам, затронутым планом.
+    """
+    usage: int
+    capacity: int
+    stock: dict[str, int] = Field(default_factory=dict, description="Итоговые остатки по затронутым товарам")
+
+
+class StockShortage(BaseModel):
+    """
+    Модель нехватки товара на складе при применении плана.
+
+    Attributes:
+        warehouse (str): Идентификатор склада.
+        guid (str): Идентификатор товара.
+        required (int): Требуемое по плану количество.
+        available (int): Доступное на складе количество.
+    """
+    warehouse: str
+    guid: str
+    required: int
+    available: int
+
+
+class RejectedDelivery(BaseModel):
+    """
+    Модель доставки, отклонённой предварительной проверкой до запуска решателя.
+
+    Attributes:
+        id (str): Идентификатор доставки.
+        reason (str): Код причины: DEMAND_EXCEEDS_CAPACITY, INVALID_TIME_WINDOW, HORIZON_EXCEEDED,
+            TIME_WINDOW_UNREACHABLE, UNKNOWN_WAREHOUSE, INSUFFICIENT_STOCK, NO_WAREHOUSE_WITH_STOCK.
+        detail (str): Пояснение причины.
+    """
+    id: str
+    reason: str
+    detail: str
+
+
+class LateDelivery(BaseModel):
+    """
+    Модель доставки, выполненной с опозданием при мягких временных окнах.
+
+    Attributes:
+        id (str): Идентификатор доставки.
+        arrival (int): Время прибытия, минуты от полуночи.
+        lateness (int): Опоздание относительно конца окна, минуты.
+    """
+    id: str
+    arrival: int
+    lateness: int
+
+
+class PlanObjective(BaseModel):
+    """
+    Модель показателей качества плана для сравнения решений.
+
+    Attributes:
+        served (int): Число выполненных доставок.
+        distance (int): Суммарное расстояние маршрутов, метры.
+        travel_time (int): Суммарное время в пути по маршрутам без профиля загруженности, минуты.
+    """
+    served: int
+    distance: int
+    travel_time: int
+
+
+class VehicleRoute(BaseModel):
+    """
+    Модель маршрута одного транспортного средства.
+
+    Attributes:
+        vehicle_id (str): Идентификатор ТС.
+        route_order (List[str]): Порядок выполнения доставок этим ТС.
+        osm_url (str): URL маршрута ТС на карте.
+    """
+    vehicle_id: str
+    route_order: List[str]
+    osm_url: str
+
 
 class DeliveryResponse(BaseModel):
     """
@@ -164,7 +488,32 @@ class DeliveryResponse(BaseModel):
         route_order (List[str]): Порядок выполнения доставок.
         osm_url (str): URL для отображения маршрута на OpenStreetMap.
         message (str): Сообщение о статусе оптимизации. По умолчанию "OK".
+        warehouse_assignment (dict[str, str]): Склады, выбранные решателем для доставок (при assign_warehouses).
+        inventory (dict[str, WarehouseInventory]): Состояние затронутых планом складов.
+        stock_shortages (List[StockShortage]): Нехватка товаров, обнаруженная при применении плана.
+        rejected (List[RejectedDelivery]): Доставки, заведомо невыполнимые, с кодами причин.
+        routes (List[VehicleRoute]): Маршруты по транспортным средствам; route_order - их объединение.
+        late_deliveries (List[LateDelivery]): Доставки, выполненные с опозданием (при мягких окнах).
+        objective (PlanObjective, optional): Показатели качества плана; нет, если решение не найдено.
+        cancelled (str, optional): Причина досрочной остановки поиска: "cancel" (эндпоинт отмены) или
+            "deadline" (срок X-Request-Deadline); план - лучший найденный к этому моменту.
+        qos_profile (str, optional): Профиль качества расчёта: "full" или имя удешевлённого профиля,
+            выбранного при перегрузке сервиса (план может быть хуже обычного).
     """
     route_order: List[str] = Field(..., description="Порядок выполнения доставок")
     osm_url: str = Field(..., description="URL для отображения маршрута на OpenStreetMap")
     message: str = Field("OK", description="Сообщение о статусе оптимизации")
+    warehouse_assignment: dict[str, str] = Field(default_factory=dict,
+                                                 description="Склад-источник для каждой выполненной доставки")
+    inventory: dict[str, WarehouseInventory] = Field(default_factory=dict,
+                                                     description="Состояние затронутых планом складов")
+    stock_shortages: List[StockShortage] = Field(default_factory=list,
+                                                 description="Нехватка товаров при применении плана")
+    rejected: List[RejectedDelivery] = Field(default_factory=list,
+                                             description="Доставки, отклонённые предварительной проверкой")
+    routes: List[VehicleRoute] = Field(default_factory=list, description="Маршруты по транспортным средствам")
+    late_deliveries: List[LateDelivery] = Field(default_factory=list,
+                                                description="Доставки, выполненные с опозданием")
+    objective: Optional[PlanObjective] = Field(None, description="Показатели качества плана")
+    cancelled: Optional[str] = Field(None, description="Причина досрочной остановки поиска")
+    qos_profile: Optional[str] = Field(None, description="Профиль качества расчёта")
@@ -0,0 +1,191 @@
+import numpy as np
+from pydantic import Field, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from fastapi.exceptions import RequestValidationError
+from typing import List
+from schemas.delivery import PRIORITY_RANKING, DeliveryAddress, DeliveryRequest, ItemInfo
+from schemas.columnar import DeliveryTable
+
+# Поля доставки, которые понимает быстрый разбор; при любых других полях используется pydantic
+DELIVERY_FIELDS = {"id", "coord", "priority", "demand", "items", "refused", "origin_warehouse",
+                   "time_window", "service_time"}
+
+
+class DeliveryRequestHeader(DeliveryRequest):
+    """
+    Запрос без списка доставок: все поля, кроме deliveries, проверяются обычной валидацией pydantic.
+    """
+    deliveries: List[DeliveryAddress] = Field(default_factory=list)
+
+
+def _is_int(value):
+    return type(value) is int
+
+
+def _is_number(value):
+    return type(value) is int or type(value) is float
+
+
+def _pair(value, check):
+    return type(value) in (list, tuple) and len(value) == 2 and check(value[0]) and check(value[1])
+
+
+def fast_parse_deliveries(raw_deliveries):
+    """
+    Быстрый разбор списка доставок без валидации pydantic.
+
+    Принимаются только доставки в каноническом виде (точные типы JSON, без приведения строк к числам
+    и т.п.). Проверки повторяют ограничения модели DeliveryAddress: координаты всех доставок проверяются
+    одной векторной операцией, модели создаются через construct() без повторной валидации.
+
+    Args:
+        raw_deliveries (list): Список доставок из JSON.
+
+    Returns:
+        list | None: Список объектов DeliveryAddress или None, если нужен полный разбор pydantic
+            (неканонические данные или ошибки, для которых нужен стандартный ответ 422).
+    """
+    if type(raw_deliveries) is not list or not raw_deliveries:
+        return None
+
+    coords = []
+    deliveries = []
+    ids = set()
+    for raw in raw_deliveries:
+        if type(raw) is not dict or not raw.keys() <= DELIVERY_FIELDS:
+            return None
+
+        delivery_id = raw.get("id")
+        coord = raw.get("coord")
+        priority = raw.get("priority", "medium")
+        demand = raw.get("demand")
+        refused = raw.get("refused", False)
+        origin_warehouse = raw.get("origin_warehouse")
+        time_window = raw.get("time_window", (0, 1440))
+        service_time = raw.get("service_time")
+        if (type(delivery_id) is not str or delivery_id in ids
+                or not _pair(coord, _is_number)
+                or type(priority) is not str
+                or not _is_int(demand) or demand <= 0
+                or type(refused) is not bool
+                or type(origin_warehouse) is not str or not origin_warehouse
+                or not _pair(time_window, _is_int)
+                or not _is_int(service_time) or service_time <= 0):
+            return None
+
+        priority = priority.lower()
+        if priority not in PRIORITY_RANKING:
+            return None
+
+        items = []
+        raw_items = raw.get("items", [])
+        if type(raw_items) is not list:
+            return None
+        for it in raw_items:
+            if (type(it) is not dict or len(it) != 2 or type(it.get("guid")) is not str
+                    or not _is_int(it.get("count")) or it["count"] <= 0):
+                return None
+            items.append(ItemInfo.construct(guid=it["guid"], count=it["count"]))
+
+        ids.add(delivery_id)
+        coords.append(coord)
+        deliveries.append(DeliveryAddress.construct(
+            id=delivery_id,
+            coord=(float(coord[0]), float(coord[1])),
+            priority=priority,
+            demand=demand,
+            items=items,
+            refused=refused,
+            origin_warehouse=origin_warehouse,
+            time_window=(time_window[0], time_window[1]),
+            service_time=service_time,
+        ))
+
+    # Проверка диапазонов координат всех доставок одной операцией
+    lat_lon = np.asarray(coords, dtype=np.float64)
+    if not (np.all(np.abs(lat_lon[:, 0]) <= 90) and np.all(np.abs(lat_lon[:, 1]) <= 180)):
+        return None
+
+    return deliveries
+
+
+def parse_delivery_request(payload):
+    """
+    Разбирает тело запроса на расчёт маршрута.
+
+    Доставки разбираются быстрым путём fast_parse_deliveries, остальные поля - моделью
+    DeliveryRequestHeader. Если быстрый путь не применим, выполняется обычная валидация
+    DeliveryRequest, чтобы ошибки были в стандартном формате FastAPI.
+
+    Если deliveries передан объектом столбцов (колоночный формат), доставки разбираются
+    в DeliveryTable без создания объекта на каждую доставку.
+
+    Args:
+        payload: Тело запроса, разобранное из JSON.
+
+    Returns:
+        DeliveryRequest: Проверенный запрос.
+
+    Raises:
+        RequestValidationError: Если запрос не проходит валидацию.
+    """
+    if type(payload) is dict and type(payload.get("deliveries")) is dict:
+        header_data = {k: v for k, v in payload.items() if k != "deliveries"}
+        try:
+            header = DeliveryRequestHeader.parse_obj(header_data)
+        except ValidationError as e:
+            raise RequestValidationError([ErrorWrapper(e, ("body",))])
+        deliveries = DeliveryTable.from_columns(payload["deliveries"])
+        values = dict(header.__dict__, deliveries=deliveries)
+        return DeliveryRequest.construct(_fields_set=header.__fields_set__ | {"deliveries"}, **values)
+
+    if type(payload) is dict:
+        deliveries = fast_parse_deliveries(payload.get("deliveries"))
+        if deliveries is not None:
+            header_data = {k: v for k, v in payload.items() if k != "deliveries"}
+            try:
+                header = DeliveryRequestHeader.parse_obj(header_data)
+            except ValidationError:
+                header = None
+            if header is not None:
+                values = dict(header.__dict__, deliveries=deliveries)
+                return DeliveryRequest.construct(_fields_set=header.__fields_set__ | {"deliveries"}, **values)
+
+    try:
+        return DeliveryRequest.parse_obj(payload)
+    except ValidationError as e:
+        raise RequestValidationError([ErrorWrapper(e, ("body",))])
+
+
+def request_body_openapi(model):
+    """
+    Описание тела запроса для OpenAPI по модели pydantic.
+
+    Используется эндпоинтами, которые читают тело сами (без параметра-модели), чтобы схема запроса
+    оставалась в документации. Ссылки на вложенные модели подставляются на место.
+
+    Args:
+        model: Класс модели pydantic.
+
+    Returns:
+        dict: Значение для openapi_extra эндпоинта.
+    """
+    schema = model.schema()
+    definitions = schema.pop("definitions", {})
+
+    def inline(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref is not None:
+                return inline(definitions[ref.split("/")[-1]])
+            return {k: inline(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": inline(schema)}},
+        }
+    }
@@ -0,0 +1,117 @@
+import orjson
+from pydantic import ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from fastapi.exceptions import RequestValidationError
+from schemas.delivery import DeliveryAddress, DeliveryRequest
+from schemas.fast_parse import DeliveryRequestHeader, fast_parse_deliveries
+
+
+def _error(message, loc):
+    return RequestValidationError([ErrorWrapper(ValueError(message), loc)])
+
+
+class NDJSONRequestReader:
+    """
+    Инкрементальный разбор запроса на расчёт маршрута в формате NDJSON.
+
+    Первая строка — заголовок запроса (все поля DeliveryRequest, кроме deliveries),
+    каждая следующая строка — одна доставка. Тело подаётся частями через feed(), доставки
+    проверяются по мере поступления полных строк. В ошибках валидации loc содержит номер строки.
+
+    Attributes:
+        header (DeliveryRequestHeader | None): Заголовок запроса, когда он прочитан.
+        deliveries (list): Проверенные доставки в порядке поступления.
+    """
+
+    def __init__(self):
+        self.header = None
+        self.deliveries = []
+        self._ids = set()
+        self._buffer = b""
+        self._line_no = 0
+
+    def feed(self, chunk):
+        """
+        Принимает очередную часть тела запроса.
+
+        Args:
+            chunk (bytes): Часть тела.
+
+        Returns:
+            list: Доставки из строк, завершённых в этой части.
+
+        Raises:
+            RequestValidationError: Если строка не проходит валидацию.
+        """
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return self._parse_lines(lines)
+
+    def close(self):
+        """
+        Завершает разбор: обрабатывает последнюю строку без перевода строки и проверяет запрос целиком.
+
+        Returns:
+            list: Доставки из последней строки.
+
+        Raises:
+            RequestValidationError: Если нет заголовка или ни одной доставки.
+        """
+        lines, self._buffer = [self._buffer], b""
+        new = self._parse_lines(lines)
+        if self.header is None:
+            raise _error("Первая строка должна содержать заголовок запроса", ("body", 1))
+        if not self.deliveries:
+            raise _error("Список доставок должен содержать хотя бы одну доставку", ("body", "deliveries"))
+        return new
+
+    def request(self):
+        """
+        Собирает проверенный запрос из заголовка и доставок.
+
+        Returns:
+            DeliveryRequest: Запрос для run_optimization.
+        """
+        values = dict(self.header.__dict__, deliveries=self.deliveries)
+        return DeliveryRequest.construct(_fields_set=self.header.__fields_set__ | {"deliveries"}, **values)
+
+    def _parse_lines(self, lines):
+        raws = []
+        for line in lines:
+            self._line_no += 1
+            if not line.strip():
+                continue
+            try:
+                obj = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                raise RequestValidationError([ErrorWrapper(e, ("body", self._line_no))])
+
+            if self.header is None:
+                if type(obj) is not dict or "deliveries" in obj:
+                    raise _error("Заголовок должен быть объектом без поля deliveries", ("body", self._line_no))
+                try:
+                    self.header = DeliveryRequestHeader.parse_obj(obj)
+                except ValidationError as e:
+                    raise RequestValidationError([ErrorWrapper(e, ("body", self._line_no))])
+                continue
+            raws.append((self._line_no, obj))
+
+        if not raws:
+            return []
+
+        # Строки части проверяются быстрым путём разом; при неудаче - по одной через pydantic
+        new = fast_parse_deliveries([obj for _, obj in raws])
+        if new is None:
+            new = []
+            for line_no, obj in raws:
+                try:
+                    new.append(DeliveryAddress.parse_obj(obj))
+                except ValidationError as e:
+                    raise RequestValidationError([ErrorWrapper(e, ("body", line_no))])
+
+        for d, (line_no, _) in zip(new, raws):
+            if d.id in self._ids:
+                raise _error("ID доставок должны быть уникальными", ("body", line_no))
+            self._ids.add(d.id)
+        self.deliveries.extend(new)
+        return new
@@ -0,0 +1,343 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+import logging
+from contextlib import asynccontextmanager, nullcontext
+from services.solve_time import SolveTimeModel
+from utils.cancellation import DISCONNECT_POLL_INTERVAL, RequestCancelled
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Полосы расчётов: короткие и длинные расчёты не ждут друг друга
+SMALL = "small"
+LARGE = "large"
+
+# Прогноз времени расчёта, секунды, до которого расчёт идёт в полосу коротких
+SMALL_JOB_SECONDS_ENV = "ADMISSION_SMALL_JOB_SECONDS"
+DEFAULT_SMALL_JOB_SECONDS = 15
+
+# Число одновременных расчётов в полосах коротких и длинных расчётов
+SMALL_SLOTS_ENV = "ADMISSION_SMALL_SLOTS"
+LARGE_SLOTS_ENV = "ADMISSION_LARGE_SLOTS"
+DEFAULT_SMALL_SLOTS = max(2, (os.cpu_count() or 1) // 2)
+DEFAULT_LARGE_SLOTS = max(1, (os.cpu_count() or 1) // 2)
+
+# Наибольшее ожидаемое время в очереди полосы, секунды: сверх него запрос отклоняется (503)
+MAX_QUEUE_WAIT_ENV = "ADMISSION_MAX_QUEUE_WAIT"
+DEFAULT_MAX_QUEUE_WAIT = 60
+
+# Наибольшее число ожидающих расчётов одного клиента: сверх него запрос отклоняется (429)
+MAX_TENANT_QUEUED_ENV = "ADMISSION_MAX_TENANT_QUEUED"
+DEFAULT_MAX_TENANT_QUEUED = 16
+
+
+def _env_number(name, default, cast):
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Некорректное значение {name}, используется {default}")
+        return cast(default)
+
+
+class AdmissionRejected(Exception):
+    """
+    Расчёт не принят в очередь.
+
+    Attributes:
+        status_code (int): 429 - превышено число ожидающих расчётов клиента, 503 - очередь полосы переполнена.
+        retry_after (int): Через сколько секунд имеет смысл повторить запрос.
+    """
+
+    def __init__(self, status_code, message, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    Расчёт в очереди полосы или выполняемый расчёт.
+
+    Attributes:
+        tenant (str): Клиент, от которого пришёл запрос.
+        cost (float): Прогноз времени расчёта, секунды.
+        lane (str): Полоса расчёта (SMALL или LARGE).
+        started (float | None): Время получения слота по time.monotonic().
+        granted (asyncio.Future): Завершается, когда расчёт получает слот.
+    """
+
+    def __init__(self, tenant, cost, lane):
+        self.tenant = tenant
+        self.cost = cost
+        self.lane = lane
+        self.started = None
+        self._loop = asyncio.get_running_loop()
+        self.granted = self._loop.create_future()
+
+    def grant(self):
+        self.started = time.monotonic()
+        self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.granted.done():
+            self.granted.set_result(None)
+
+
+class Lane:
+    """
+    Полоса расчётов со своими слотами и честной очередью клиентов.
+
+    У каждого клиента своя очередь, упорядоченная по прогнозу времени (сначала короткие). Слот
+    получает клиент с наименьшим виртуальным временем окончания своего самого короткого расчёта:
+    max(V, конец предыдущего расчёта клиента) + cost (взвешенная честная очередь). Клиент с потоком
+    запросов уходит вперёд по виртуальному времени и не вытесняет остальных, а среди клиентов
+    с равной долей первым идёт более короткий расчёт.
+    """
+
+    def __init__(self, name, slots):
+        self.name = name
+        self.slots = slots
+        self.running = []
+        self.queues = {}
+        self.queued = 0
+        self.virtual_time = 0.0
+        self.tenant_finish = {}
+        self._seq = itertools.count()
+
+    def enqueue(self, tenant, cost):
+        ticket = Ticket(tenant, cost, self.name)
+        heapq.heappush(self.queues.setdefault(tenant, []), (cost, next(self._seq), ticket))
+        self.queued += 1
+        return ticket
+
+    def remove(self, ticket):
+        queue = self.queues[ticket.tenant]
+        queue[:] = [entry for entry in queue if entry[2] is not ticket]
+        heapq.heapify(queue)
+        if not queue:
+            del self.queues[ticket.tenant]
+        self.queued -= 1
+
+    def dispatch(self):
+        """
+        Выдаёт свободные слоты ожидающим расчётам.
+
+        Returns:
+            list: Расчёты, получившие слот.
+        """
+        granted = []
+        while self.queues and len(self.running) < self.slots:
+            def finish(tenant):
+                cost, seq, _ = self.queues[tenant][0]
+                return max(self.virtual_time, self.tenant_finish.get(tenant, 0.0)) + cost, seq
+
+            tenant = min(self.queues, key=finish)
+            start = max(self.virtual_time, self.tenant_finish.get(tenant, 0.0))
+            cost, _, ticket = heapq.heappop(self.queues[tenant])
+            if not self.queues[tenant]:
+                del self.queues[tenant]
+            self.queued -= 1
+            self.tenant_finish[tenant] = start + cost
+            self.virtual_time = start
+            self.running.append(ticket)
+            granted.append(ticket)
+        if not self.queues:
+            # Пустая очередь: доли клиентов считаются заново
+            self.tenant_finish.clear()
+        return granted
+
+    def expected_wait(self, now):
+        """
+        Ожидаемое время до освобождения слота для нового расчёта, секунды.
+        """
+        if len(self.running) < self.slots and not self.queued:
+            return 0.0
+        remaining = sum(max(0.0, t.cost - (now - t.started)) for t in self.running)
+        queued = sum(cost for queue in self.queues.values() for cost, _, _ in queue)
+        return (remaining + queued) / self.slots
+
+
+class AdmissionScheduler:
+    """
+    Планировщик расчётов перед run_optimization: допуск в очередь, полосы и порядок выдачи слотов.
+
+    Прогноз времени расчёта (SolveTimeModel) определяет полосу: короткие расчёты не стоят
+    за длинными, у каждой полосы свои слоты. Внутри полосы слоты выдаются по честной очереди
+    клиентов с приоритетом коротких расчётов (Lane). Запрос отклоняется сразу, если у клиента
+    слишком много ожидающих расчётов (429) или ожидание в полосе превысило бы max_queue_wait (503).
+    Фактическое время завершённых расчётов уточняет модель прогноза.
+    """
+
+    def __init__(self, model=None, small_slots=None, large_slots=None, small_job_seconds=None,
+                 max_queue_wait=None, max_tenant_queued=None):
+        self.model = model or SolveTimeModel()
+        self.small_job_seconds = small_job_seconds if small_job_seconds is not None else _env_number(
+            SMALL_JOB_SECONDS_ENV, DEFAULT_SMALL_JOB_SECONDS, float)
+        self.max_queue_wait = max_queue_wait if max_queue_wait is not None else _env_number(
+            MAX_QUEUE_WAIT_ENV, DEFAULT_MAX_QUEUE_WAIT, float)
+        self.max_tenant_queued = max_tenant_queued if max_tenant_queued is not None else _env_number(
+            MAX_TENANT_QUEUED_ENV, DEFAULT_MAX_TENANT_QUEUED, int)
+        self.lanes = {
+            SMALL: Lane(SMALL, small_slots or _env_number(SMALL_SLOTS_ENV, DEFAULT_SMALL_SLOTS, int)),
+            LARGE: Lane(LARGE, large_slots or _env_number(LARGE_SLOTS_ENV, DEFAULT_LARGE_SLOTS, int)),
+        }
+        self._tenant_queued = {}
+        self._lock = threading.Lock()
+
+    def submit(self, tenant, cost):
+        """
+        Ставит расчёт в очередь полосы и сразу выдаёт слот, если он свободен.
+
+        Args:
+            tenant (str): Клиент, от которого пришёл запрос.
+            cost (float): Прогноз времени расчёта, секунды.
+
+        Returns:
+            Ticket: Расчёт в очереди.
+
+        Raises:
+            AdmissionRejected: Если клиент превысил число ожидающих расчётов или очередь полосы переполнена.
+        """
+        lane = self.lanes[SMALL if cost <= self.small_job_seconds else LARGE]
+        with self._lock:
+            if self._tenant_queued.get(tenant, 0) >= self.max_tenant_queued:
+                raise AdmissionRejected(429, f"Слишком много ожидающих расчётов клиента {tenant}",
+                                        retry_after=max(1, math.ceil(cost)))
+            wait = lane.expected_wait(time.monotonic())
+            if wait > self.max_queue_wait:
+                raise AdmissionRejected(503, f"Очередь расчётов переполнена, ожидание {wait:.0f} с",
+                                        retry_after=max(1, math.ceil(wait - self.max_queue_wait)))
+            ticket = lane.enqueue(tenant, cost)
+            self._tenant_queued[tenant] = self._tenant_queued.get(tenant, 0) + 1
+            self._grant(lane.dispatch())
+        return ticket
+
+    def precheck(self, tenant):
+        """
+        Проверка допуска до прогноза времени расчёта, например по заголовку потокового запроса.
+
+        Отклоняет запрос, который submit не принял бы ни в одну полосу: у клиента слишком много
+        ожидающих расчётов или ожидание в каждой полосе больше max_queue_wait.
+
+        Args:
+            tenant (str): Клиент, от которого пришёл запрос.
+
+        Raises:
+            AdmissionRejected: Если запрос заведомо не будет принят в очередь.
+        """
+        with self._lock:
+            if self._tenant_queued.get(tenant, 0) >= self.max_tenant_queued:
+                raise AdmissionRejected(429, f"Слишком много ожидающих расчётов клиента {tenant}", retry_after=1)
+            now = time.monotonic()
+            wait = min(lane.expected_wait(now) for lane in self.lanes.values())
+            if wait > self.max_queue_wait:
+                raise AdmissionRejected(503, f"Очередь расчётов переполнена, ожидание {wait:.0f} с",
+                                        retry_after=max(1, math.ceil(wait - self.max_queue_wait)))
+
+    def queue_depth(self):
+        """
+        Число расчётов, ожидающих слота во всех полосах.
+        """
+        with self._lock:
+            return sum(lane.queued for lane in self.lanes.values())
+
+    def withdraw(self, ticket):
+        """
+        Убирает из очереди расчёт, который больше не ждёт слота.
+
+        Returns:
+            bool: False, если слот уже выдан и его нужно освободить через release.
+        """
+        with self._lock:
+            if ticket.started is not None:
+                return False
+            self.lanes[ticket.lane].remove(ticket)
+            self._dequeued(ticket.tenant)
+            return True
+
+    def release(self, ticket):
+        """
+        Освобождает слот завершённого расчёта и выдаёт его следующему в очереди.
+        """
+        with self._lock:
+            lane = self.lanes[ticket.lane]
+            lane.running.remove(ticket)
+            self._grant(lane.dispatch())
+
+    def _grant(self, tickets):
+        for ticket in tickets:
+            self._dequeued(ticket.tenant)
+            ticket.grant()
+
+    def _dequeued(self, tenant):
+        left = self._tenant_queued[tenant] - 1
+        if left:
+            self._tenant_queued[tenant] = left
+        else:
+            del self._tenant_queued[tenant]
+
+    @asynccontextmanager
+    async def admission(self, data, tenant, cancel=None, timer=None):
+        """
+        Контекст расчёта запроса: ожидание слота полосы и его освобождение после расчёта.
+
+        Args:
+            data (DeliveryRequest): Проверенный запрос.
+            tenant (str): Клиент, от которого пришёл запрос.
+            cancel (CancellationToken, optional): Признак отмены: отменённый расчёт покидает очередь.
+            timer (StageTimer, optional): Замер этапов: ожидание слота записывается как этап queue.
+
+        Raises:
+            AdmissionRejected: Если расчёт не принят в очередь.
+            RequestCancelled: Если расчёт отменён, пока ждал слота.
+        """
+        cost = self.model.predict(data)
+        ticket = self.submit(tenant, cost)
+        logger.info(f"Расчёт клиента {tenant} в полосе {ticket.lane}, прогноз {cost:.1f} с")
+        try:
+            with timer.stage("queue") if timer is not None else nullcontext():
+                while True:
+                    done, _ = await asyncio.wait({ticket.granted}, timeout=DISCONNECT_POLL_INTERVAL)
+                    if done:
+                        break
+                    if cancel is not None and cancel.cancelled:
+                        raise RequestCancelled(cancel.reason)
+        except BaseException:
+            # Ожидание прервано (отмена расчёта, отмена задачи, остановка сервера): расчёт покидает
+            # очередь, а уже выданный слот возвращается полосе
+            if not self.withdraw(ticket):
+                self.release(ticket)
+            raise
+
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+        # Отменённый расчёт не показывает, сколько занял бы полный
+        if cancel is None or not cancel.cancelled:
+            self.model.observe(data, time.monotonic() - ticket.started)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Возвращает планировщик расчётов процесса, создавая его при первом обращении.
+
+    Слоты полос, порог коротких расчётов и пределы очереди берутся из переменных окружения
+    ADMISSION_* (см. константы модуля).
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = AdmissionScheduler()
+    return _scheduler
@@ -0,0 +1,165 @@
+import logging
+from schemas.delivery import PRIORITY_RANKING
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Точность округления координат при поиске доставок в одной точке (4 знака - около 10 м)
+COLOCATION_PRECISION = 4
+
+
+class ColocatedGroup:
+    """
+    Доставки в одной точке, объединённые в один узел подзадачи.
+
+    Доставки обслуживаются подряд в порядке members (по концу окна), offsets — сдвиг начала
+    обслуживания каждой из них от прибытия в узел. Окно узла — пересечение окон доставок,
+    сдвинутых на offsets, поэтому любое прибытие в окно узла укладывается в окна всех доставок.
+    Спрос и время обслуживания суммируются, приоритет берётся наивысший.
+
+    Attributes:
+        members (list): Объединённые доставки (DeliveryAddress или строки DeliveryTable).
+        offsets (list): Сдвиг начала обслуживания каждой доставки от прибытия в узел, минуты.
+    """
+
+    def __init__(self, members):
+        self.members = members
+        self.offsets = service_offsets(members)
+        self.service_time = self.offsets[-1] + members[-1].service_time
+        self.time_window = shifted_window(members, self.offsets)
+        self.demand = sum(d.demand for d in members)
+        self.priority = max((d.priority for d in members), key=lambda p: PRIORITY_RANKING.get(p.lower(), 1))
+        self.id = members[0].id
+        self.coord = members[0].coord
+        self.origin_warehouse = members[0].origin_warehouse
+        self.items = [it for d in members for it in d.items]
+        self.refused = False
+
+
+def service_offsets(members):
+    """
+    Сдвиг начала обслуживания каждой доставки от прибытия при обслуживании подряд.
+    """
+    offsets = []
+    elapsed = 0
+    for d in members:
+        offsets.append(elapsed)
+        elapsed += d.service_time
+    return offsets
+
+
+def shifted_window(members, offsets):
+    """
+    Пересечение окон доставок, сдвинутых на время обслуживания предыдущих.
+
+    Returns:
+        tuple: (start, end) окна прибытия в узел; start > end, если такого прибытия нет.
+    """
+    start = max(d.time_window[0] - offset for d, offset in zip(members, offsets))
+    end = min(d.time_window[1] - offset for d, offset in zip(members, offsets))
+    return start, end
+
+
+def aggregate_colocated(deliveries, max_demand, precision=COLOCATION_PRECISION):
+    """
+    Объединяет доставки с одинаковыми (после округления) координатами в узлы ColocatedGroup.
+
+    Доставки одной точки упорядочиваются по концу окна и набираются в группу, пока окно прибытия
+    группы не пусто, а суммарный спрос помещается в самое вместительное ТС; остальные начинают
+    следующую группу в той же точке.
+
+    Args:
+        deliveries (list | DeliveryTable): Доставки.
+        max_demand (int): Наибольший допустимый спрос группы (вместимость самого большого ТС).
+        precision (int, optional): Число знаков округления координат.
+
+    Returns:
+        tuple: (aggregated, positions) — список доставок и групп в порядке первой доставки
+            и позиция в deliveries доставки, чьи координаты использует каждый элемент; (deliveries, None),
+            если объединять нечего.
+    """
+    items = list(deliveries)
+    buckets = {}
+    for pos, d in enumerate(items):
+        lat, lon = d.coord
+        buckets.setdefault((round(lat, precision), round(lon, precision)), []).append(pos)
+    if len(buckets) == len(items):
+        return deliveries, None
+
+    entries = []
+    for positions in buckets.values():
+        order = sorted(positions, key=lambda pos: (items[pos].time_window[1], pos))
+        group = []
+        for pos in order:
+            candidate = group + [pos]
+            members = [items[p] for p in candidate]
+            start, end = shifted_window(members, service_offsets(members))
+            if group and (start > end or sum(d.demand for d in members) > max_demand):
+                entries.append(group)
+                group = [pos]
+            else:
+                group = candidate
+        entries.append(group)
+
+    entries.sort(key=min)
+    aggregated = [items[group[0]] if len(group) == 1 else ColocatedGroup([items[p] for p in group])
+                  for group in entries]
+    positions = [group[0] for group in entries]
+    logger.info(f"Доставки в одной точке объединены: {len(items)} -> {len(aggregated)} узлов")
+    return aggregated, positions
+
+
+def members(delivery):
+    """
+    Исходные доставки элемента результата aggregate_colocated.
+    """
+    return delivery.members if isinstance(delivery, ColocatedGroup) else [delivery]
+
+
+def expand_deliveries(deliveries):
+    """
+    Список исходных доставок по списку доставок и групп.
+    """
+    return [d for entry in deliveries for d in members(entry)]
+
+
+def expand_rejected(rejected, deliveries):
+    """
+    Заменяет отклонённые группы записями для каждой их доставки с той же причиной.
+
+    Args:
+        rejected (list): Отклонённые доставки ({"id", "reason", "detail"}).
+        deliveries (list): Доставки и группы, среди которых искались отклонённые.
+    """
+    groups = {d.id: d for d in deliveries if isinstance(d, ColocatedGroup)}
+    if not groups:
+        return rejected
+    result = []
+    for r in rejected:
+        group = groups.get(r["id"])
+        if group is None:
+            result.append(r)
+        else:
+            result.extend(dict(r, id=d.id) for d in group.members)
+    return result
+
+
+def expand_plan(route_plan, deliveries, n_warehouses):
+    """
+    Заменяет в плане маршрута шаг группы шагами её доставок с тем же узлом.
+
+    Args:
+        route_plan (list): Шаги маршрута (route_step).
+        deliveries (list): Доставки и группы подзадачи.
+        n_warehouses (int): Число складов (узлы доставок идут после них).
+    """
+    result = []
+    for step in route_plan:
+        entry = None
+        if step["type"] == "delivery":
+            entry = deliveries[step["node_index"] - 1 - n_warehouses]
+        if isinstance(entry, ColocatedGroup):
+            result.extend(dict(step, id=d.id, refused=d.refused) for d in entry.members)
+        else:
+            result.append(step)
+    return result
@@ -0,0 +1,232 @@
+import os
+import random
+import time
+import uuid
+import logging
+import numpy as np
+import orjson
+from services.sparse_arcs import is_sparse
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с каталогом записанных запросов; без неё запись выключена
+CAPTURE_DIR_ENV = "CAPTURE_DIR"
+
+# Доля записываемых запросов (0..1)
+CAPTURE_SAMPLE_RATE_ENV = "CAPTURE_SAMPLE_RATE"
+
+# Записываются только запросы, обработанные не быстрее заданного числа секунд
+CAPTURE_MIN_SECONDS_ENV = "CAPTURE_MIN_SECONDS"
+
+# Наибольший размер одной записи и всего каталога, МБ
+CAPTURE_MAX_FILE_MB_ENV = "CAPTURE_MAX_FILE_MB"
+CAPTURE_MAX_TOTAL_MB_ENV = "CAPTURE_MAX_TOTAL_MB"
+DEFAULT_MAX_FILE_MB = 50
+DEFAULT_MAX_TOTAL_MB = 2048
+
+CAPTURE_SUFFIX = ".npz"
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Некорректное значение {name}, используется {default}")
+        return float(default)
+
+
+class RequestRecorder:
+    """
+    Запись одного запроса для воспроизведения: тело запроса, снимок складов и матрицы подзадачи.
+
+    run_optimization заполняет recorder по ходу расчёта (record_warehouses, record_matrices), после
+    ответа save сохраняет всё в один сжатый файл .npz в каталоге CAPTURE_DIR. Матрицы хранятся
+    только по узлам, прошедшим предварительную проверку, вместе с номерами этих узлов в полной
+    подзадаче (депо, склады, все доставки, депо ТС), чтобы при воспроизведении заново не обращаться к OSRM.
+
+    Attributes:
+        payload (dict): Тело запроса в формате DeliveryRequest с полями, изменёнными профилем качества.
+        qos (dict | None): Профиль качества (QosProfile), по которому решён запрос, или None для полного профиля.
+        nodes (np.ndarray | None): Номера узлов полной подзадачи, для которых записаны матрицы.
+        size (int | None): Число узлов полной подзадачи.
+        distances (np.ndarray | None): Матрица расстояний по nodes, м.
+        time_minutes (np.ndarray | None): Матрица времени в пути по nodes, минуты.
+    """
+
+    def __init__(self, directory, payload, min_seconds=0.0, max_file_bytes=None, max_total_bytes=None):
+        self.directory = directory
+        self.payload = payload
+        self.min_seconds = min_seconds
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.nodes = None
+        self.size = None
+        self.distances = None
+        self.time_minutes = None
+        self.qos = None
+        self.started = time.perf_counter()
+
+    def record_warehouses(self, warehouses):
+        """
+        Заменяет склады, переданные по ID, их состоянием на момент расчёта (id, coord, capacity, usage, stock).
+        """
+        self.payload = dict(self.payload, warehouses=warehouses, warehouse_ids=[])
+
+    def record_qos(self, profile, changes):
+        """
+        Запоминает профиль качества, по которому решается запрос, и изменённые им поля запроса.
+
+        Args:
+            profile (QosProfile): Выбранный профиль качества.
+            changes (dict): Результат QosProfile.changes().
+        """
+        self.payload = dict(self.payload, **changes)
+        self.qos = profile.dict()
+
+    def record_matrices(self, sub_data, nodes, size):
+        """
+        Запоминает матрицы подзадачи.
+
+        Args:
+            sub_data (dict): Результат build_subproblem.
+            nodes (list): Номера узлов подзадачи в полной подзадаче запроса; узлы забора товара,
+                идущие после них, не записываются.
+            size (int): Число узлов полной подзадачи.
+        """
+        if is_sparse(sub_data["time_matrix"]):
+            # Разреженные матрицы (nearest_neighbors) содержат не все дуги и не записываются
+            logger.info("Запрос с разреженными матрицами не записывается")
+            return
+        n = len(nodes)
+        self.size = size
+        self.nodes = np.asarray(nodes, dtype=np.int32)
+        self.distances = np.asarray(sub_data["distance_matrix"], dtype=np.float64)[:n, :n]
+        self.time_minutes = np.asarray(sub_data["time_matrix"], dtype=np.int32)[:n, :n]
+
+    def save(self, result, timer=None):
+        """
+        Сохраняет запись, если запрос обработан достаточно долго и укладывается в ограничения размера.
+
+        Args:
+            result (dict): Ответ run_optimization.
+            timer (StageTimer, optional): Длительность этапов обработки запроса.
+
+        Returns:
+            str | None: Путь сохранённой записи или None.
+        """
+        elapsed = time.perf_counter() - self.started
+        if elapsed < self.min_seconds or self.nodes is None:
+            return None
+
+        meta = {
+            "captured_at": time.time(),
+            "elapsed": elapsed,
+            "stages": timer.stages if timer is not None else {},
+            "objective": result.get("objective"),
+            "route_order": result["route_order"],
+            "message": result["message"],
+            "qos_profile": result.get("qos_profile"),
+            "qos": self.qos,
+        }
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{CAPTURE_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    request=np.frombuffer(orjson.dumps(self.payload), dtype=np.uint8),
+                    meta=np.frombuffer(orjson.dumps(meta), dtype=np.uint8),
+                    nodes=self.nodes,
+                    size=np.int32(self.size),
+                    distances=self.distances,
+                    time_minutes=self.time_minutes,
+                )
+            size = os.path.getsize(tmp_path)
+            if self.max_file_bytes is not None and size > self.max_file_bytes:
+                os.remove(tmp_path)
+                logger.warning(f"Запись запроса не сохранена: {size} байт больше ограничения {self.max_file_bytes}")
+                return None
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить запись запроса {path}: {e}")
+            return None
+
+        if self.max_total_bytes is not None:
+            prune_captures(self.directory, self.max_total_bytes)
+        logger.info(f"Запрос записан: {path} ({size} байт, {elapsed:.2f} с)")
+        return path
+
+
+def start_capture(payload_factory):
+    """
+    Создаёт запись запроса, если она включена переменной окружения CAPTURE_DIR и запрос попал в выборку.
+
+    Args:
+        payload_factory (callable): Возвращает тело запроса в формате DeliveryRequest; вызывается,
+            только если запрос записывается, и до расчёта, который помечает отказы в доставках.
+
+    Returns:
+        RequestRecorder | None: Запись или None, если запрос не записывается.
+    """
+    directory = os.getenv(CAPTURE_DIR_ENV)
+    if not directory:
+        return None
+    if random.random() >= _env_float(CAPTURE_SAMPLE_RATE_ENV, 1.0):
+        return None
+    return RequestRecorder(
+        directory,
+        payload_factory(),
+        min_seconds=_env_float(CAPTURE_MIN_SECONDS_ENV, 0.0),
+        max_file_bytes=int(_env_float(CAPTURE_MAX_FILE_MB_ENV, DEFAULT_MAX_FILE_MB) * 2 ** 20),
+        max_total_bytes=int(_env_float(CAPTURE_MAX_TOTAL_MB_ENV, DEFAULT_MAX_TOTAL_MB) * 2 ** 20),
+    )
+
+
+def prune_captures(directory, max_total_bytes):
+    """
+    Удаляет самые старые записи, пока общий размер каталога больше max_total_bytes.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(CAPTURE_SUFFIX):
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+    total = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total <= max_total_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            logger.info(f"Удалена старая запись запроса {path}")
+        except OSError:
+            pass
+
+
+def load_capture(path):
+    """
+    Загружает запись запроса.
+
+    Returns:
+        tuple: (payload, matrices, meta) — тело запроса, матрицы (distances, durations) по всем узлам
+            полной подзадачи в метрах и секундах для run_optimization и сведения о записанном расчёте.
+            Строки доставок, отклонённых предварительной проверкой, заполнены нулями: при воспроизведении
+            эти доставки снова отклоняются до построения подзадачи.
+    """
+    with np.load(path) as data:
+        payload = orjson.loads(data["request"].tobytes())
+        meta = orjson.loads(data["meta"].tobytes())
+        nodes = data["nodes"]
+        size = int(data["size"])
+        distances = data["distances"]
+        time_minutes = data["time_minutes"]
+
+    sel = np.ix_(nodes, nodes)
+    full_distances = np.zeros((size, size), dtype=np.float64)
+    full_durations = np.zeros((size, size), dtype=np.float64)
+    full_distances[sel] = distances
+    full_durations[sel] = time_minutes * 60.0
+    return payload, (full_distances, full_durations), meta
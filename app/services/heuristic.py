@@ -0,0 +1,398 @@
+import logging
+import time
+import numpy as np
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Горизонт планирования, минуты
+HORIZON = 1440
+
+# Наибольшее время вставки пропущенных доставок и локального поиска, секунды:
+# эвристика предназначена для интерактивных ответов
+LOCAL_SEARCH_LIMIT = 0.08
+
+# Наибольшая длина сегмента, переносимого Or-opt
+OR_OPT_SEGMENT = 3
+
+# Число улучшающих ходов, проверяемых на допустимость за один проход
+MOVE_CANDIDATES = 32
+
+# Уровень складов: склады стоят в начале маршрута, до доставок любого приоритета
+WAREHOUSE_TIER = np.iinfo(np.int64).max
+
+
+class HeuristicRoute:
+    """
+    Маршрут одного ТС: последовательность узлов и допустимый интервал времени выезда.
+
+    Ожидание в узлах не допускается (как в модели OR-Tools), поэтому время прибытия в каждый узел
+    равно времени выезда из депо плюс смещение узла на маршруте, а окна узлов сужают
+    интервал [earliest, latest] времени выезда.
+
+    Attributes:
+        nodes (list): Узлы маршрута без депо выезда и возврата.
+        elapsed (int): Смещение выезда из последнего узла (с обслуживанием) от времени выезда из депо.
+        earliest (int): Наименьшее допустимое время выезда.
+        latest (int): Наибольшее допустимое время выезда.
+        load (int): Суммарный спрос доставок маршрута.
+        spans (dict): Для каждого уровня приоритета доставок маршрута - наименьшее и наибольшее смещение прибытия.
+    """
+
+    def __init__(self, start, end, capacity, shift):
+        self.start = start
+        self.end = end
+        self.capacity = capacity
+        self.shift_start = shift[0]
+        self.shift_end = min(shift[1], HORIZON)
+        self.nodes = []
+        self.elapsed = 0
+        self.earliest = shift[0]
+        self.latest = HORIZON
+        self.load = 0
+        self.spans = {}
+
+    @property
+    def last(self):
+        return self.nodes[-1] if self.nodes else self.start
+
+
+def earliest_departures(intervals, spans):
+    """
+    Наименьшие времена выезда ТС, при которых соблюдается порядок приоритетов между маршрутами.
+
+    Как и в модели OR-Tools, между соседними уровнями приоритета стоит граница: прибытие в доставки
+    уровня <= границы <= прибытия в доставки следующего уровня. Выезды ТС и границы связаны
+    разностными ограничениями x_j - x_i <= w, наименьшее решение находится алгоритмом Беллмана-Форда.
+
+    Args:
+        intervals (list): Для каждого ТС допустимый интервал (earliest, latest) времени выезда.
+        spans (list): Для каждого ТС словарь {уровень: (наименьшее, наибольшее смещение прибытия)}.
+
+    Returns:
+        list | None: Время выезда каждого ТС или None, если ограничения несовместны.
+    """
+    tiers = sorted({tier for route_spans in spans for tier in route_spans}, reverse=True)
+    level = {tier: k for k, tier in enumerate(tiers)}
+    n_vehicles = len(intervals)
+    # Переменные: выезды ТС, границы между уровнями, последняя - начало отсчёта
+    zero = n_vehicles + max(len(tiers) - 1, 0)
+    edges = []
+    for v, (earliest, latest) in enumerate(intervals):
+        edges.append((v, zero, -earliest))
+        edges.append((zero, v, latest))
+        for tier, (first, last) in spans[v].items():
+            k = level[tier]
+            if k < len(tiers) - 1:
+                edges.append((n_vehicles + k, v, -last))
+            if k > 0:
+                edges.append((v, n_vehicles + k - 1, first))
+    for k in range(len(tiers) - 1):
+        edges.append((n_vehicles + k, zero, 0))
+        if k + 1 < len(tiers) - 1:
+            edges.append((n_vehicles + k + 1, n_vehicles + k, 0))
+
+    # Кратчайшие пути для y = -x (ребро j -> i с весом w) дают наименьшее решение x
+    dist = [0 if node == zero else np.inf for node in range(zero + 1)]
+    for _ in range(zero + 1):
+        changed = False
+        for i, j, w in edges:
+            if dist[j] + w < dist[i]:
+                dist[i] = dist[j] + w
+                changed = True
+        if not changed:
+            return [-int(dist[v]) for v in range(n_vehicles)]
+    return None
+
+
+class HeuristicSolver:
+    """
+    Быстрый решатель без OR-Tools: построение маршрутов ближайшим соседом по уровням приоритета,
+    вставка пропущенных доставок и улучшение каждого маршрута ходами 2-opt и Or-opt, оцениваемыми
+    векторно по массивам NumPy.
+
+    Соблюдаются те же ограничения, что и в модели build_routing_model без правил труда водителей
+    и мягких окон: временные окна без ожидания в узлах, смены и вместимости ТС, порядок приоритетов
+    (все доставки уровня приоритета выполняются не позже любой доставки следующего уровня, в том
+    числе на разных ТС). Склады с обязательным посещением ставятся в начало маршрутов. Доставки,
+    которые не удалось вставить, считаются пропущенными. Качество ниже, чем у поиска OR-Tools,
+    зато ответ для задач в десятки доставок получается за миллисекунды.
+    """
+
+    def __init__(self, sub_data, time_m, vehicle_capacity):
+        """
+        Args:
+            sub_data (dict): Данные подзадачи, подготовленные функцией build_subproblem.
+            time_m (list): Матрица времени в пути в минутах.
+            vehicle_capacity (int): Вместимость ТС, если в sub_data не заданы вместимости ТС.
+        """
+        self.time_m = np.asarray(time_m, dtype=np.int64)
+        self.service = np.asarray(sub_data["service_times"], dtype=np.int64)
+        self.demands = np.asarray(sub_data["demands"], dtype=np.int64)
+        windows = np.asarray(sub_data["time_windows"], dtype=np.int64).reshape(-1, 2)
+        self.window_start = windows[:, 0]
+        self.window_end = np.minimum(windows[:, 1], HORIZON)
+
+        self.n_wh = len(sub_data["wh_list"])
+        n_del = len(sub_data["del_list"])
+        self.warehouse_nodes = np.arange(1, 1 + self.n_wh)
+        self.delivery_nodes = np.arange(1 + self.n_wh, 1 + self.n_wh + n_del)
+        # Уровень узла: ранг приоритета доставки, склады - выше любого приоритета
+        self.tier = np.zeros(len(self.service), dtype=np.int64)
+        self.tier[self.warehouse_nodes] = WAREHOUSE_TIER
+        self.tier[self.delivery_nodes] = sub_data["priorities"]
+
+        starts = sub_data.get("vehicle_starts", [0])
+        ends = sub_data.get("vehicle_ends", [0])
+        capacities = sub_data.get("vehicle_capacities") or [vehicle_capacity] * len(starts)
+        shifts = sub_data.get("vehicle_shifts") or [(0, HORIZON)] * len(starts)
+        self.routes = [HeuristicRoute(*vehicle) for vehicle in zip(starts, ends, capacities, shifts)]
+
+    def profile(self, r, nodes):
+        """
+        Расписание последовательности узлов на маршруте ТС.
+
+        Returns:
+            tuple | None: (стоимость, earliest, latest, смещения прибытия, spans) или None,
+                если окна узлов и смена ТС несовместны.
+        """
+        path = np.concatenate(([r.start], nodes, [r.end])).astype(np.int64)
+        arcs = self.time_m[path[:-1], path[1:]] + self.service[path[:-1]]
+        offsets = np.concatenate(([0], np.cumsum(arcs)))
+        inner = offsets[1:-1]
+        earliest = max(r.shift_start, int(np.max(self.window_start[nodes] - inner, initial=0)))
+        latest = min(HORIZON, r.shift_end - int(offsets[-1]),
+                     int(np.min(self.window_end[nodes] - inner, initial=HORIZON)))
+        if earliest > latest:
+            return None
+        spans = {}
+        for node, offset in zip(np.asarray(nodes).tolist(), inner.tolist()):
+            tier = int(self.tier[node])
+            if tier != WAREHOUSE_TIER:
+                first, _ = spans.get(tier, (offset, offset))
+                spans[tier] = (first, offset)
+        return int(offsets[-1]), earliest, latest, offsets, spans
+
+    def compatible(self, r, earliest, latest, spans):
+        """
+        Проверяет порядок приоритетов между маршрутами, если маршрут r получит новые интервал и spans.
+        """
+        intervals = [(earliest, latest) if other is r else (other.earliest, other.latest) for other in self.routes]
+        all_spans = [spans if other is r else other.spans for other in self.routes]
+        return earliest_departures(intervals, all_spans) is not None
+
+    def accept(self, r, nodes, profile):
+        r.nodes = [int(node) for node in nodes]
+        _, r.earliest, r.latest, offsets, r.spans = profile
+        r.elapsed = int(offsets[-2] + self.service[r.nodes[-1]]) if r.nodes else 0
+
+    def construct(self):
+        """
+        Строит маршруты ближайшим соседом: сначала склады, затем уровни приоритета по убыванию;
+        на каждом шаге к маршруту добавляется допустимая доставка уровня с наименьшим временем
+        переезда от конца маршрута.
+        """
+        T = self.time_m
+        tiers = [(WAREHOUSE_TIER, self.warehouse_nodes)]
+        for priority in sorted(set(self.tier[self.delivery_nodes].tolist()), reverse=True):
+            tiers.append((priority, self.delivery_nodes[self.tier[self.delivery_nodes] == priority]))
+
+        for tier, pending in tiers:
+            # Пары (ТС, узел), отклонённые из-за порядка приоритетов на других маршрутах
+            banned = set()
+            while len(pending):
+                candidates = []
+                for ri, r in enumerate(self.routes):
+                    offset = r.elapsed + T[r.last, pending]
+                    earliest = np.maximum(r.earliest, self.window_start[pending] - offset)
+                    latest = np.minimum(r.latest, self.window_end[pending] - offset)
+                    latest = np.minimum(latest, r.shift_end - offset - self.service[pending] - T[pending, r.end])
+                    feasible = (earliest <= latest) & (r.load + self.demands[pending] <= r.capacity)
+                    if banned:
+                        feasible &= np.array([(ri, int(node)) not in banned for node in pending], dtype=bool)
+                    if not feasible.any():
+                        continue
+                    travel = np.where(feasible, T[r.last, pending], np.iinfo(np.int64).max)
+                    k = int(np.argmin(travel))
+                    candidates.append((int(travel[k]), ri, k, int(offset[k]), int(earliest[k]), int(latest[k])))
+                if not candidates:
+                    break
+                for _, ri, k, offset, earliest, latest in sorted(candidates):
+                    r = self.routes[ri]
+                    node = int(pending[k])
+                    spans = r.spans
+                    if tier != WAREHOUSE_TIER:
+                        first, _ = r.spans.get(tier, (offset, offset))
+                        spans = dict(r.spans)
+                        spans[tier] = (first, offset)
+                        if not self.compatible(r, earliest, latest, spans):
+                            banned.add((ri, node))
+                            continue
+                    r.nodes.append(node)
+                    r.elapsed = offset + int(self.service[node])
+                    r.earliest, r.latest, r.spans = earliest, latest, spans
+                    r.load += int(self.demands[node])
+                    pending = np.delete(pending, k)
+                    break
+
+    def insert_skipped(self, deadline):
+        """
+        Вставляет доставки, не попавшие в маршруты при построении, на место с наименьшим удлинением
+        среди допустимых (с сохранением порядка уровней).
+        """
+        T = self.time_m
+        routed = {node for r in self.routes for node in r.nodes}
+        skipped = [int(node) for node in self.delivery_nodes if node not in routed]
+        skipped.sort(key=lambda node: -self.tier[node])
+        for node in skipped:
+            if time.monotonic() >= deadline:
+                break
+            tier = self.tier[node]
+            best = None
+            for r in self.routes:
+                if r.load + self.demands[node] > r.capacity:
+                    continue
+                path = np.asarray([r.start] + r.nodes + [r.end], dtype=np.int64)
+                cost = T[path[:-1], node] + self.service[node] + T[node, path[1:]] - T[path[:-1], path[1:]]
+                prev_tier = np.concatenate(([WAREHOUSE_TIER], self.tier[path[1:-1]]))
+                next_tier = np.concatenate((self.tier[path[1:-1]], [np.iinfo(np.int64).min]))
+                positions = np.flatnonzero((prev_tier >= tier) & (next_tier <= tier))
+                positions = positions[np.argsort(cost[positions], kind="stable")][:MOVE_CANDIDATES]
+                for q in positions:
+                    if best is not None and cost[q] >= best[0]:
+                        break
+                    candidate = np.asarray(r.nodes[:q] + [node] + r.nodes[q:], dtype=np.int64)
+                    profile = self.profile(r, candidate)
+                    if profile is not None and self.compatible(r, profile[1], profile[2], profile[4]):
+                        best = (cost[q], r, candidate, profile)
+                        break
+            if best is not None:
+                _, r, candidate, profile = best
+                self.accept(r, candidate, profile)
+                r.load += int(self.demands[node])
+
+    def two_opt_moves(self, path):
+        """
+        Обращения сегментов path[i..j] в пределах одного уровня с выигрышем, по возрастанию изменения стоимости.
+        """
+        T = self.time_m
+        forward = np.concatenate(([0], np.cumsum(T[path[:-1], path[1:]])))
+        backward = np.concatenate(([0], np.cumsum(T[path[1:], path[:-1]])))
+        inner = np.arange(1, len(path) - 1)
+        i, j = inner[:, None], inner[None, :]
+        delta = (T[path[i - 1], path[j]] + T[path[i], path[j + 1]] - T[path[i - 1], path[i]] - T[path[j], path[j + 1]]
+                 + (backward[j] - backward[i]) - (forward[j] - forward[i]))
+        tiers = self.tier[path]
+        allowed = (i < j) & (tiers[i] == tiers[j]) & (delta < 0)
+        rows, cols = np.nonzero(allowed)
+        order = np.argsort(delta[rows, cols], kind="stable")[:MOVE_CANDIDATES]
+        return [(int(inner[rows[k]]), int(inner[cols[k]])) for k in order]
+
+    def or_opt_moves(self, path):
+        """
+        Переносы сегментов до OR_OPT_SEGMENT узлов на другое место маршрута с сохранением порядка уровней,
+        с выигрышем, по возрастанию изменения стоимости. Ход - (начало, длина, позиция вставки в остатке).
+        """
+        T = self.time_m
+        moves = []
+        n = len(path) - 2
+        for length in range(1, min(OR_OPT_SEGMENT, n) + 1):
+            for i in range(1, n - length + 2):
+                first, last = path[i], path[i + length - 1]
+                tier = self.tier[first]
+                if self.tier[last] != tier:
+                    continue
+                before, after = path[i - 1], path[i + length]
+                gain = T[before, first] + T[last, after] - T[before, after]
+                rest = np.concatenate((path[:i], path[i + length:]))
+                cost = T[rest[:-1], first] + T[last, rest[1:]] - T[rest[:-1], rest[1:]] - gain
+                # Соседи вставки: уровень предыдущего узла не ниже уровня сегмента, следующего - не выше
+                prev_tier = np.concatenate(([WAREHOUSE_TIER], self.tier[rest[1:-1]]))
+                next_tier = np.concatenate((self.tier[rest[1:-1]], [np.iinfo(np.int64).min]))
+                allowed = (cost < 0) & (prev_tier >= tier) & (next_tier <= tier)
+                for q in np.flatnonzero(allowed):
+                    moves.append((int(cost[q]), i, length, int(q) + 1))
+        moves.sort()
+        return [move[1:] for move in moves[:MOVE_CANDIDATES]]
+
+    def try_move(self, r, candidate):
+        """
+        Применяет новую последовательность узлов маршрута, если она допустима.
+        """
+        profile = self.profile(r, candidate)
+        if profile is None or not self.compatible(r, profile[1], profile[2], profile[4]):
+            return False
+        self.accept(r, candidate, profile)
+        return True
+
+    def improve_route(self, r, deadline):
+        """
+        Улучшает маршрут ходами 2-opt и Or-opt, пока есть допустимый улучшающий ход и не истекло время.
+        """
+        improved = True
+        while improved and len(r.nodes) > 1 and time.monotonic() < deadline:
+            improved = False
+            nodes = np.asarray(r.nodes, dtype=np.int64)
+            path = np.concatenate(([r.start], nodes, [r.end]))
+            for i, j in self.two_opt_moves(path):
+                candidate = np.concatenate((nodes[:i - 1], nodes[i - 1:j][::-1], nodes[j:]))
+                if self.try_move(r, candidate):
+                    improved = True
+                    break
+            if improved:
+                continue
+            for i, length, position in self.or_opt_moves(path):
+                segment = nodes[i - 1:i - 1 + length]
+                rest = np.concatenate((nodes[:i - 1], nodes[i - 1 + length:]))
+                candidate = np.concatenate((rest[:position - 1], segment, rest[position - 1:]))
+                if self.try_move(r, candidate):
+                    improved = True
+                    break
+
+    def solve(self, time_limit=LOCAL_SEARCH_LIMIT):
+        """
+        Строит и улучшает маршруты.
+
+        Args:
+            time_limit (float, optional): Ограничение времени вставки пропущенных доставок
+                и локального поиска, секунды (не более LOCAL_SEARCH_LIMIT).
+
+        Returns:
+            tuple: (routes, skipped_nodes, arrival_times) в формате solve_vrp_multy_warehouse.
+        """
+        started = time.monotonic()
+        self.construct()
+        deadline = time.monotonic() + min(time_limit, LOCAL_SEARCH_LIMIT)
+        self.insert_skipped(deadline)
+        for r in self.routes:
+            self.improve_route(r, deadline)
+
+        departures = earliest_departures([(r.earliest, r.latest) for r in self.routes], [r.spans for r in self.routes])
+        routes = []
+        arrival_times = []
+        for r, departure in zip(self.routes, departures):
+            offsets = self.profile(r, np.asarray(r.nodes, dtype=np.int64))[3]
+            routes.append([r.start] + r.nodes + [r.end])
+            arrival_times.append((departure + offsets).tolist())
+        routed = {node for r in self.routes for node in r.nodes}
+        skipped = [node for node in range(1, 1 + self.n_wh + len(self.delivery_nodes)) if node not in routed]
+        logger.info(f"Эвристика: {len(routed)} узлов в маршрутах, пропущено {len(skipped)}, "
+                    f"{(time.monotonic() - started) * 1000:.1f} мс")
+        return routes, skipped, arrival_times
+
+
+def solve_heuristic(sub_data, time_m, vehicle_capacity, time_limit=LOCAL_SEARCH_LIMIT):
+    """
+    Решает подзадачу эвристикой HeuristicSolver.
+
+    Args:
+        sub_data (dict): Данные подзадачи, подготовленные функцией build_subproblem.
+        time_m (list): Матрица времени в пути в минутах.
+        vehicle_capacity (int): Вместимость ТС, если в sub_data не заданы вместимости ТС.
+        time_limit (float, optional): Ограничение времени вставки пропущенных доставок
+            и локального поиска, секунды.
+
+    Returns:
+        tuple: (routes, skipped_nodes, arrival_times) в формате solve_vrp_multy_warehouse.
+    """
+    return HeuristicSolver(sub_data, time_m, vehicle_capacity).solve(time_limit)
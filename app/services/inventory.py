@@ -0,0 +1,313 @@
+import logging
+import threading
+import numpy as np
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class InventoryLedger:
+    """
+    Складской учёт в виде массивов склад x товар.
+
+    Запасы хранятся в матрице int64 (строка — склад, столбец — товар), использование
+    и вместимость складов — в векторах. Изменения по плану маршрута накапливаются
+    в транзакции (InventoryTransaction) и применяются одной векторной операцией.
+    Регистрация товаров, добавление складов и фиксация транзакций выполняются под блокировкой,
+    поэтому один журнал можно разделять между параллельными запросами.
+
+    Attributes:
+        warehouse_ids (list): Идентификаторы складов в порядке строк матрицы.
+        sku_ids (list): Идентификаторы товаров в порядке столбцов матрицы.
+        stock (np.ndarray): Запасы, размер len(warehouse_ids) x len(sku_ids).
+        capacity (np.ndarray): Вместимость складов.
+        usage (np.ndarray): Текущее использование вместимости складов.
+    """
+
+    def __init__(self, warehouse_ids, capacity, usage, stock=None, sku_ids=None):
+        self.warehouse_ids = list(warehouse_ids)
+        self._wh_index = {wh_id: i for i, wh_id in enumerate(self.warehouse_ids)}
+        self.sku_ids = list(sku_ids or [])
+        self._sku_index = {guid: j for j, guid in enumerate(self.sku_ids)}
+        self.capacity = np.asarray(capacity, dtype=np.int64)
+        self.usage = np.asarray(usage, dtype=np.int64)
+        if stock is None:
+            stock = np.zeros((len(self.warehouse_ids), len(self.sku_ids)), dtype=np.int64)
+        self.stock = np.ascontiguousarray(stock, dtype=np.int64)
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_warehouses(cls, warehouses):
+        """
+        Строит журнал по списку складов из запроса.
+
+        Args:
+            warehouses (list): Список объектов Warehouse.
+
+        Returns:
+            InventoryLedger: Журнал с запасами, вместимостью и использованием складов.
+        """
+        sku_index = {}
+        rows, cols, counts = [], [], []
+        for i, w in enumerate(warehouses):
+            for guid, count in w.stock.items():
+                rows.append(i)
+                cols.append(sku_index.setdefault(guid, len(sku_index)))
+                counts.append(count)
+
+        stock = np.zeros((len(warehouses), len(sku_index)), dtype=np.int64)
+        stock[rows, cols] = counts
+        return cls(
+            [w.id for w in warehouses],
+            [w.capacity for w in warehouses],
+            [w.usage for w in warehouses],
+            stock,
+            list(sku_index),
+        )
+
+    def has_warehouse(self, wh_id):
+        return wh_id in self._wh_index
+
+    def warehouse_index(self, wh_id):
+        return self._wh_index[wh_id]
+
+    def sku_index(self, guid):
+        """
+        Возвращает номер столбца товара, регистрируя новый товар при необходимости.
+
+        Матрица запасов расширяется под новые товары при применении транзакции.
+        """
+        j = self._sku_index.get(guid)
+        if j is None:
+            with self.lock:
+                j = self._sku_index.get(guid)
+                if j is None:
+                    j = len(self.sku_ids)
+                    self._sku_index[guid] = j
+                    self.sku_ids.append(guid)
+        return j
+
+    def upsert_warehouses(self, warehouses):
+        """
+        Добавляет склады или полностью заменяет их вместимость, использование и запасы.
+
+        Номера строк существующих складов не меняются, поэтому уже начатые транзакции остаются корректными.
+        Строки новых складов добавляются в матрицу запасов одним копированием на весь пакет.
+
+        Args:
+            warehouses (list): Список объектов Warehouse; при повторе ID действует последний.
+        """
+        with self.lock:
+            rows = []
+            for w in warehouses:
+                i = self._wh_index.get(w.id)
+                if i is None:
+                    i = len(self.warehouse_ids)
+                    self._wh_index[w.id] = i
+                    self.warehouse_ids.append(w.id)
+                rows.append((i, [self.sku_index(guid) for guid in w.stock]))
+
+            added = len(self.warehouse_ids) - self.stock.shape[0]
+            if added > 0:
+                stock = np.zeros((len(self.warehouse_ids), len(self.sku_ids)), dtype=np.int64)
+                stock[:self.stock.shape[0], :self.stock.shape[1]] = self.stock
+                self.stock = stock
+                self.capacity = np.concatenate([self.capacity, np.zeros(added, dtype=np.int64)])
+                self.usage = np.concatenate([self.usage, np.zeros(added, dtype=np.int64)])
+            else:
+                self._grow_columns()
+
+            for (i, cols), w in zip(rows, warehouses):
+                self.stock[i, :] = 0
+                self.capacity[i] = w.capacity
+                self.usage[i] = w.usage
+                self.stock[i, cols] = list(w.stock.values())
+
+    def warehouse_stock(self, wh_id):
+        """
+        Возвращает ненулевые запасы склада в виде словаря товар -> количество.
+        """
+        with self.lock:
+            row = self.stock[self._wh_index[wh_id]]
+            return {self.sku_ids[j]: int(row[j]) for j in np.flatnonzero(row)}
+
+    def stock_of(self, wh_id, guid):
+        j = self._sku_index.get(guid)
+        if j is None or j >= self.stock.shape[1]:
+            return 0
+        return int(self.stock[self._wh_index[wh_id], j])
+
+    def warehouses_with_stock(self, items, wh_ids):
+        """
+        Определяет склады, на которых есть все товары в нужном количестве.
+
+        Args:
+            items (dict[str, int]): Требуемые товары: товар -> количество.
+            wh_ids (list): Идентификаторы проверяемых складов.
+
+        Returns:
+            list: Позиции в wh_ids складов, покрывающих все товары.
+        """
+        with self.lock:
+            rows = [self._wh_index[wh_id] for wh_id in wh_ids]
+            cols, counts = [], []
+            for guid, count in items.items():
+                j = self._sku_index.get(guid)
+                if j is None or j >= self.stock.shape[1]:
+                    return []
+                cols.append(j)
+                counts.append(count)
+            enough = np.all(self.stock[np.ix_(rows, cols)] >= np.asarray(counts, dtype=np.int64), axis=1)
+            return np.flatnonzero(enough).tolist()
+
+    def begin(self):
+        """
+        Начинает транзакцию изменения запасов.
+
+        Returns:
+            InventoryTransaction: Новая пустая транзакция.
+        """
+        return InventoryTransaction(self)
+
+    def _grow_columns(self):
+        missing = len(self.sku_ids) - self.stock.shape[1]
+        if missing > 0:
+            self.stock = np.pad(self.stock, ((0, 0), (0, missing)))
+
+
+class InventoryTransaction:
+    """
+    Набор изменений запасов по плану маршрута.
+
+    Отгрузки выполненных доставок и возвраты отказов копятся в плоских массивах
+    (склад, товар, количество) и применяются к журналу одним вызовом commit().
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self._wh = []
+        self._sku = []
+        self._qty = []
+        self._usage_delta = np.zeros(len(ledger.warehouse_ids), dtype=np.int64)
+
+    def _delta(self, i):
+        return self._usage_delta[i] if i < len(self._usage_delta) else 0
+
+    def _stage(self, wh_id, items, sign):
+        i = self.ledger.warehouse_index(wh_id)
+        if i >= len(self._usage_delta):
+            self._usage_delta = np.pad(self._usage_delta, (0, i + 1 - len(self._usage_delta)))
+        total = 0
+        for it in items:
+            self._wh.append(i)
+            self._sku.append(self.ledger.sku_index(it.guid))
+            self._qty.append(sign * it.count)
+            total += it.count
+        self._usage_delta[i] += sign * total
+        return total
+
+    def ship(self, wh_id, items):
+        """
+        Отгрузка товаров со склада: уменьшает запасы и использование склада.
+        """
+        return self._stage(wh_id, items, -1)
+
+    def receive(self, wh_id, items):
+        """
+        Приём товаров на склад (например, возврат отказа): увеличивает запасы и использование склада.
+        """
+        return self._stage(wh_id, items, 1)
+
+    def usage(self, wh_id):
+        """
+        Использование склада с учётом уже добавленных в транзакцию изменений.
+        """
+        i = self.ledger.warehouse_index(wh_id)
+        return int(self.ledger.usage[i] + self._delta(i))
+
+    def free_capacity(self, wh_id):
+        """
+        Свободная вместимость склада с учётом уже добавленных в транзакцию изменений.
+        """
+        i = self.ledger.warehouse_index(wh_id)
+        return int(self.ledger.capacity[i] - self.ledger.usage[i] - self._delta(i))
+
+    def commit(self):
+        """
+        Проверяет и применяет все изменения транзакции одной операцией.
+
+        Изменения применяются в порядке добавления: отгрузка товара, которого на складе к этому
+        моменту не хватает, пропускается и попадает в список нехватки, а её количество не уменьшает
+        использование склада. Пары склад/товар, где нехватки нет ни на одном шаге, применяются
+        одной векторной операцией; отрицательное использование логируется.
+
+        Returns:
+            dict: {"inventory": {склад: {"usage", "capacity", "stock"}}, "shortages": [...]},
+                где "stock" содержит итоговые остатки только по затронутым планом товарам.
+        """
+        with self.ledger.lock:
+            return self._commit()
+
+    def _commit(self):
+        ledger = self.ledger
+        ledger._grow_columns()
+        n_sku = ledger.stock.shape[1]
+        # Склады, добавленные в журнал после начала транзакции, не затронуты ею
+        usage_delta = np.zeros(len(ledger.usage), dtype=np.int64)
+        usage_delta[:len(self._usage_delta)] = self._usage_delta
+
+        shortages = []
+        touched = {}
+        if self._qty:
+            flat_cells = np.asarray(self._wh, dtype=np.int64) * n_sku + np.asarray(self._sku, dtype=np.int64)
+            qty = np.asarray(self._qty, dtype=np.int64)
+            # Изменения группируются по паре склад/товар с сохранением порядка добавления внутри пары
+            order = np.argsort(flat_cells, kind="stable")
+            sorted_cells, sorted_qty = flat_cells[order], qty[order]
+            cells, starts = np.unique(sorted_cells, return_index=True)
+            group = np.repeat(np.arange(len(cells)), np.diff(np.append(starts, len(sorted_qty))))
+
+            flat_stock = ledger.stock.reshape(-1)
+            current = flat_stock[cells]
+            # Запас пары после каждого шага: нехватка есть, если он хоть раз уходит в минус
+            running = np.cumsum(sorted_qty)
+            running = running - (running[starts] - sorted_qty[starts])[group] + current[group]
+            ok = np.minimum.reduceat(running, starts) >= 0
+            flat_stock[cells[ok]] = running[np.append(starts[1:], len(running)) - 1][ok]
+
+            for k in np.flatnonzero(~ok):
+                cell = int(cells[k])
+                wh_idx, sku_idx = divmod(cell, n_sku)
+                have = int(current[k])
+                for change in sorted_qty[group == k].tolist():
+                    if have + change < 0:
+                        wh_id, guid = ledger.warehouse_ids[wh_idx], ledger.sku_ids[sku_idx]
+                        logger.error(f"Недостаточно товара {guid} на складе {wh_id}. "
+                                     f"Требуется: {-change}, доступно: {have}")
+                        shortages.append({"warehouse": wh_id, "guid": guid, "required": -change,
+                                          "available": have})
+                        # Пропущенная отгрузка не освобождает вместимость склада
+                        usage_delta[wh_idx] -= change
+                    else:
+                        have += change
+                flat_stock[cell] = have
+
+            for cell in cells:
+                wh_idx, sku_idx = divmod(int(cell), n_sku)
+                touched.setdefault(wh_idx, {})[ledger.sku_ids[sku_idx]] = int(flat_stock[cell])
+
+        ledger.usage += usage_delta
+        for i in np.flatnonzero(ledger.usage < 0):
+            logger.error(f"Использование склада {ledger.warehouse_ids[i]} ушло в минус!")
+
+        inventory = {}
+        for i in sorted(set(touched) | set(np.flatnonzero(usage_delta).tolist())):
+            inventory[ledger.warehouse_ids[i]] = {
+                "usage": int(ledger.usage[i]),
+                "capacity": int(ledger.capacity[i]),
+                "stock": touched.get(i, {}),
+            }
+
+        self._wh, self._sku, self._qty = [], [], []
+        self._usage_delta = np.zeros(len(ledger.warehouse_ids), dtype=np.int64)
+        return {"inventory": inventory, "shortages": shortages}
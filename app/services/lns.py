@@ -0,0 +1,244 @@
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from ortools.constraint_solver import routing_enums_pb2, pywrapcp
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Число процессов LNS по умолчанию
+LNS_WORKERS = int(os.getenv("LNS_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Время на одно восстановление маршрута после разрушения, секунды
+ROUND_LIMIT = 1.0
+
+# Доля доставок, удаляемых из маршрута за одно разрушение, и границы их числа
+RUIN_SHARE = 0.1
+MIN_RUIN = 3
+MAX_RUIN = 40
+
+# Модель маршрутизации процесса-исполнителя: строится один раз при запуске процесса
+_worker_model = None
+
+
+def ruin_size(n_deliveries):
+    """
+    Число доставок, удаляемых за одно разрушение.
+    """
+    return min(n_deliveries, MAX_RUIN, max(MIN_RUIN, int(n_deliveries * RUIN_SHARE)))
+
+
+def geographic_cluster(seed, candidates, time_m, size):
+    """
+    Доставки, ближайшие к seed по времени в пути (в обе стороны), включая саму seed.
+    """
+    row = time_m[seed][candidates] + time_m[candidates, seed]
+    return [candidates[i] for i in np.argsort(row, kind="stable")[:size]]
+
+
+def time_window_cluster(seed, candidates, time_windows, size):
+    """
+    Доставки с серединой окна, ближайшей к середине окна seed, включая саму seed.
+    """
+    middle = time_windows[:, 0] + time_windows[:, 1]
+    row = np.abs(middle[candidates] - middle[seed])
+    return [candidates[i] for i in np.argsort(row, kind="stable")[:size]]
+
+
+def recreate_parameters(time_limit):
+    """
+    Параметры поиска для восстановления маршрута: локальный поиск от частичного решения
+    со вставкой удалённых узлов, без метаэвристики.
+    """
+    params = pywrapcp.DefaultRoutingSearchParameters()
+    params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GREEDY_DESCENT
+    params.time_limit.FromMilliseconds(int(time_limit * 1000))
+    return params
+
+
+def read_routes(manager, routing, sol):
+    """
+    Маршруты решения без депо выезда и возврата (узлы подзадачи).
+    """
+    routes = []
+    for vehicle in range(routing.vehicles()):
+        route = []
+        idx = sol.Value(routing.NextVar(routing.Start(vehicle)))
+        while not routing.IsEnd(idx):
+            route.append(manager.IndexToNode(idx))
+            idx = sol.Value(routing.NextVar(idx))
+        routes.append(route)
+    return routes
+
+
+def recreate(manager, routing, routes, removed, time_limit):
+    """
+    Удаляет узлы из маршрутов и восстанавливает решение поиском от оставшихся маршрутов.
+
+    Args:
+        manager (RoutingIndexManager): Менеджер индексов модели.
+        routing (RoutingModel): Модель маршрутизации.
+        routes (list): Маршруты (узлы без депо) для каждого ТС.
+        removed (list): Удаляемые узлы.
+        time_limit (float): Ограничение времени поиска, секунды.
+
+    Returns:
+        tuple | None: (routes, objective) найденного решения или None, если решения нет.
+    """
+    # Без ожидания в узлах удаление узлов сдвигает прибытие в следующие и может нарушить их окна:
+    # тогда кластер сокращается вдвое (в начале кластера - узлы, ближайшие к его центру)
+    initial = None
+    while removed and initial is None:
+        dropped = set(removed)
+        kept = [[manager.NodeToIndex(node) for node in route if node not in dropped] for route in routes]
+        initial = routing.ReadAssignmentFromRoutes(kept, True)
+        removed = removed[:len(removed) // 2]
+    if initial is None:
+        return None
+    sol = routing.SolveFromAssignmentWithParameters(initial, recreate_parameters(time_limit))
+    if not sol:
+        return None
+    return read_routes(manager, routing, sol), sol.ObjectiveValue()
+
+
+def _init_worker(model_factory):
+    global _worker_model
+    _worker_model = model_factory()
+
+
+def _recreate_in_worker(routes, removed, time_limit):
+    manager, routing, _ = _worker_model
+    return recreate(manager, routing, routes, removed, time_limit)
+
+
+class RuinAndRecreate:
+    """
+    Large Neighbourhood Search вокруг модели OR-Tools: из лучшего решения удаляется кластер
+    доставок (близких географически или по временному окну), после чего решатель вставляет их
+    обратно поиском от оставшихся маршрутов. Разрушения одного раунда восстанавливаются
+    параллельно в пуле процессов, каждый процесс строит свою копию модели один раз при запуске;
+    лучшее улучшение раунда становится новым решением.
+
+    Attributes:
+        history (list): Пары (секунды от начала, значение целевой функции) для каждого улучшения.
+    """
+
+    def __init__(self, model_factory, sub_data, time_m, workers=LNS_WORKERS, seed=0):
+        """
+        Args:
+            model_factory (callable): Функция без аргументов, возвращающая (manager, routing, time_dim);
+                должна сериализоваться pickle (например, functools.partial от функции модуля).
+            sub_data (dict): Данные подзадачи (узлы доставок, временные окна, узлы забора).
+            time_m (list): Матрица времени, по которой выбираются географические кластеры.
+            workers (int, optional): Число процессов. При 1 поиск идёт в текущем процессе.
+            seed (int, optional): Начальное значение генератора случайных чисел.
+        """
+        n_wh = len(sub_data["wh_list"])
+        self.delivery_nodes = list(range(1 + n_wh, 1 + n_wh + len(sub_data["del_list"])))
+        self.time_m = np.asarray(time_m, dtype=np.int64)
+        self.time_windows = np.asarray(sub_data["time_windows"], dtype=np.int64).reshape(-1, 2)
+        # Вместе с доставкой из маршрута удаляются её узлы забора
+        self.pickups = {}
+        for p in sub_data.get("pickups", []):
+            self.pickups.setdefault(p["delivery_node"], []).append(p["node"])
+        self.model_factory = model_factory
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.history = []
+
+    def ruin(self, strategy, routes):
+        """
+        Выбирает кластер удаляемых узлов вокруг случайной доставки.
+
+        Центр кластера с равной вероятностью берётся среди выполненных или невыполненных доставок:
+        удаление выполненных доставок рядом с невыполненной освобождает место для её вставки.
+
+        Args:
+            strategy (str): "geographic" или "time_window".
+            routes (list): Текущие маршруты (узлы без депо).
+
+        Returns:
+            list: Удаляемые узлы (доставки и их узлы забора), ближайшие к центру - первыми.
+        """
+        served = {node for route in routes for node in route}
+        candidates = np.asarray([node for node in self.delivery_nodes if node in served])
+        if not len(candidates):
+            return []
+        unserved = [node for node in self.delivery_nodes if node not in served]
+        seed = self.rng.choice(unserved if unserved and self.rng.random() < 0.5 else candidates.tolist())
+        size = ruin_size(len(candidates))
+        if strategy == "geographic":
+            cluster = geographic_cluster(seed, candidates, self.time_m, size)
+        else:
+            cluster = time_window_cluster(seed, candidates, self.time_windows, size)
+        removed = []
+        for node in cluster:
+            removed.append(int(node))
+            removed.extend(self.pickups.get(int(node), []))
+        return removed
+
+    def improve(self, routes, objective, time_limit, cancel=None):
+        """
+        Улучшает решение разрушением и восстановлением, пока не истечёт время или не будет отменён расчёт.
+
+        Args:
+            routes (list): Начальные маршруты (узлы без депо) для каждого ТС.
+            objective (int): Значение целевой функции начального решения.
+            time_limit (float): Ограничение времени, секунды.
+            cancel (CancellationToken, optional): Признак отмены; проверяется перед каждым раундом.
+
+        Returns:
+            tuple: (routes, objective) лучшего найденного решения.
+        """
+        started = time.monotonic()
+        deadline = started + time_limit
+        self.history = [(0.0, objective)]
+        if not self.delivery_nodes or time_limit <= 0:
+            return routes, objective
+
+        if self.workers > 1:
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                       initargs=(self.model_factory,))
+        else:
+            pool = None
+            manager, routing, _ = self.model_factory()
+
+        strategies = ("geographic", "time_window")
+        rounds = 0
+        try:
+            while (remaining := deadline - time.monotonic()) > 0.05:
+                if cancel is not None and cancel.cancelled:
+                    logger.info("LNS: расчёт отменён, возвращается лучшее решение")
+                    break
+                round_limit = min(ROUND_LIMIT, remaining)
+                ruins = [self.ruin(strategies[(rounds + i) % 2], routes) for i in range(max(1, self.workers))]
+                if pool is not None:
+                    futures = [pool.submit(_recreate_in_worker, routes, removed, round_limit) for removed in ruins]
+                    # Запуск процессов входит в лимит времени: незавершённые к сроку восстановления не ждём
+                    done, _ = wait(futures, timeout=max(0.0, deadline - time.monotonic()) + round_limit)
+                    try:
+                        results = [f.result() for f in done]
+                    except BrokenProcessPool:
+                        # Аварийное завершение процесса не должно терять уже найденное решение
+                        logger.warning("LNS: пул процессов завершился аварийно, возвращается лучшее решение")
+                        break
+                else:
+                    results = [recreate(manager, routing, routes, removed, round_limit) for removed in ruins]
+                rounds += 1
+
+                for result in results:
+                    if result is not None and result[1] < objective:
+                        routes, objective = result
+                        self.history.append((time.monotonic() - started, objective))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        logger.info(f"LNS: {rounds} раундов, целевая функция {self.history[0][1]} -> {objective}")
+        return routes, objective
@@ -0,0 +1,253 @@
+import json
+import os
+import logging
+import numpy as np
+from services.osrm import fetch_table
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с путём к каталогу хранилища матриц
+MATRIX_STORE_ENV = "MATRIX_STORE_PATH"
+
+# Точность округления координат при построении идентификатора локации (~0.1 м)
+COORD_PRECISION = 6
+
+META_FILE = "meta.json"
+
+# Попытки открыть хранилище, если файлы прочитанной версии уже удалены следующим расширением
+OPEN_ATTEMPTS = 3
+
+# Кэш открытых хранилищ: путь -> (mtime meta.json, MatrixStore)
+_open_stores = {}
+
+
+def location_key(coord):
+    """
+    Строит ключ локации по координатам.
+
+    Args:
+        coord (tuple): Координаты точки (широта, долгота).
+
+    Returns:
+        tuple: Округлённые координаты, используемые как ключ в таблице локаций.
+    """
+    lat, lon = coord
+    return round(float(lat), COORD_PRECISION), round(float(lon), COORD_PRECISION)
+
+
+class MatrixStore:
+    """
+    Предрассчитанные матрицы расстояний и продолжительности, отображённые в память только для чтения.
+
+    Хранилище — каталог с файлом meta.json (таблица локаций, порядковый номер локации = её ID)
+    и двумя файлами float32 размера N x N. Страницы файлов разделяются между всеми процессами
+    через страничный кэш ОС, поэтому воркеры не держат собственных копий матриц.
+
+    Attributes:
+        path (str): Путь к каталогу хранилища.
+        locations (list): Таблица локаций (широта, долгота), индекс = ID локации.
+        distances (np.memmap): Матрица расстояний в метрах.
+        durations (np.memmap): Матрица продолжительности в секундах.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        for attempt in range(OPEN_ATTEMPTS):
+            with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            size = len(meta["locations"])
+            try:
+                self.distances = np.memmap(os.path.join(path, meta["distances"]), dtype=np.float32, mode="r",
+                                           shape=(size, size))
+                self.durations = np.memmap(os.path.join(path, meta["durations"]), dtype=np.float32, mode="r",
+                                           shape=(size, size))
+                break
+            except FileNotFoundError:
+                # meta.json успел смениться дважды: файлы прочитанной версии удалены, читается новая
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+                logger.info(f"Версия {meta['version']} хранилища матриц {path} удалена, meta.json читается заново")
+
+        self.version = meta["version"]
+        self.locations = [tuple(c) for c in meta["locations"]]
+        self._ids = {location_key(c): i for i, c in enumerate(self.locations)}
+
+    def __len__(self):
+        return len(self.locations)
+
+    def lookup(self, points):
+        """
+        Возвращает ID локаций для списка точек.
+
+        Args:
+            points (list): Список координат (широта, долгота).
+
+        Returns:
+            list | None: Список ID или None, если хотя бы одной точки нет в хранилище.
+        """
+        ids = []
+        for p in points:
+            loc_id = self._ids.get(location_key(p))
+            if loc_id is None:
+                return None
+            ids.append(loc_id)
+        return ids
+
+    def submatrices(self, ids):
+        """
+        Вырезает подматрицы для заданных ID локаций.
+
+        Читаются только нужные строки отображённых файлов, без сетевых запросов.
+
+        Args:
+            ids (list): Список ID локаций.
+
+        Returns:
+            tuple: (distances, durations) — массивы numpy размера len(ids) x len(ids).
+        """
+        idx = np.asarray(ids, dtype=np.intp)
+        sel = np.ix_(idx, idx)
+        return self.distances[sel], self.durations[sel]
+
+
+def get_matrix_store():
+    """
+    Возвращает хранилище матриц, указанное в переменной окружения MATRIX_STORE_PATH.
+
+    Хранилище открывается один раз на процесс и переоткрывается, если meta.json был обновлён
+    (например, после расширения хранилища утилитой tools.build_matrix_store).
+
+    Returns:
+        MatrixStore | None: Открытое хранилище или None, если оно не настроено.
+    """
+    path = os.getenv(MATRIX_STORE_ENV)
+    if not path:
+        return None
+
+    try:
+        mtime = os.stat(os.path.join(path, META_FILE)).st_mtime_ns
+    except OSError:
+        logger.warning(f"Хранилище матриц {path} не найдено")
+        return None
+
+    cached = _open_stores.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, MatrixStore(path))
+        _open_stores[path] = cached
+        logger.info(f"Открыто хранилище матриц {path}: {len(cached[1])} локаций")
+    return cached[1]
+
+
+def _fill_block(distances, durations, points, src_ids, dst_ids):
+    """
+    Запрашивает у OSRM блок src_ids x dst_ids и записывает его в матрицы.
+    """
+    block_ids = list(dict.fromkeys(src_ids + dst_ids))
+    pos = {loc_id: i for i, loc_id in enumerate(block_ids)}
+    dist, dur = fetch_table(
+        [points[i] for i in block_ids],
+        sources=[pos[i] for i in src_ids],
+        destinations=[pos[i] for i in dst_ids],
+    )
+    sel = np.ix_(src_ids, dst_ids)
+    distances[sel] = np.array(dist, dtype=np.float64)
+    durations[sel] = np.array(dur, dtype=np.float64)
+
+
+def _chunks(ids, size):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def _remove_versions_before(path, version):
+    """
+    Удаляет файлы данных хранилища с версией меньше version.
+    """
+    for name in os.listdir(path):
+        kind, _, rest = name.partition(".")
+        number, _, ext = rest.partition(".")
+        if kind in ("distances", "durations") and ext == "f32" and number.isdigit() and int(number) < version:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                logger.warning(f"Не удалось удалить устаревший файл {name}")
+
+
+def extend_store(path, points, chunk_size=50):
+    """
+    Создаёт хранилище матриц или дополняет его новыми локациями.
+
+    ID уже существующих локаций не меняются. Для новых локаций у OSRM запрашиваются только
+    недостающие блоки (новые x все и старые x новые) порциями не более chunk_size точек
+    на источники и назначения. Новые файлы данных пишутся под новой версией, после чего
+    meta.json атомарно заменяется — уже открытые читатели продолжают работать со старой версией.
+    Файлы предыдущей версии сохраняются до следующего расширения: читатель, успевший прочитать
+    старый meta.json, ещё может их открыть. Удаляются только версии старше предыдущей.
+
+    Args:
+        path (str): Путь к каталогу хранилища.
+        points (list): Координаты локаций, которые должны присутствовать в хранилище.
+        chunk_size (int, optional): Максимальное число источников/назначений в одном запросе.
+
+    Returns:
+        int: Количество добавленных локаций.
+    """
+    os.makedirs(path, exist_ok=True)
+    old = MatrixStore(path) if os.path.exists(os.path.join(path, META_FILE)) else None
+
+    locations = list(old.locations) if old is not None else []
+    known = {location_key(c) for c in locations}
+    for p in points:
+        key = location_key(p)
+        if key not in known:
+            known.add(key)
+            locations.append(key)
+
+    n_old = len(old) if old is not None else 0
+    size = len(locations)
+    if size == n_old:
+        logger.info("Хранилище матриц уже содержит все локации")
+        return 0
+
+    version = old.version + 1 if old is not None else 1
+    dist_name = f"distances.{version}.f32"
+    dur_name = f"durations.{version}.f32"
+    distances = np.memmap(os.path.join(path, dist_name), dtype=np.float32, mode="w+", shape=(size, size))
+    durations = np.memmap(os.path.join(path, dur_name), dtype=np.float32, mode="w+", shape=(size, size))
+
+    if old is not None:
+        distances[:n_old, :n_old] = old.distances
+        durations[:n_old, :n_old] = old.durations
+
+    old_ids = list(range(n_old))
+    new_ids = list(range(n_old, size))
+    all_ids = old_ids + new_ids
+    for src in _chunks(all_ids, chunk_size):
+        for dst in _chunks(new_ids, chunk_size):
+            _fill_block(distances, durations, locations, src, dst)
+    for src in _chunks(new_ids, chunk_size):
+        for dst in _chunks(old_ids, chunk_size):
+            _fill_block(distances, durations, locations, src, dst)
+
+    distances.flush()
+    durations.flush()
+    del distances, durations
+
+    meta = {
+        "version": version,
+        "locations": [list(c) for c in locations],
+        "distances": dist_name,
+        "durations": dur_name,
+    }
+    tmp_meta = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(path, META_FILE))
+
+    # Предыдущая версия остаётся на диске до следующего расширения; более старые удаляются
+    # (уже открытым отображениям удалённые файлы доступны до их закрытия)
+    if old is not None:
+        _remove_versions_before(path, old.version)
+
+    logger.info(f"Хранилище матриц {path}: добавлено {size - n_old} локаций, всего {size}")
+    return size - n_old
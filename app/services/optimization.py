@@ -1,12 +1,43 @@
 import math
-import requests
+import time
+import numpy as np
 from ortools.constraint_solver import routing_enums_pb2, pywrapcp
 import logging
+from functools import partial
+from services.osrm import fetch_table
+from services.matrix_store import get_matrix_store, location_key
+from services.spatial_index import GeoKDTree
+from services.inventory import InventoryLedger
+from services.warehouse_store import get_warehouse_store
+from services.traffic import TrafficSlices, initial_departures
+from services.lns import RuinAndRecreate, read_routes
+from services.heuristic import solve_heuristic
+from services.shared_matrix import SharedMatrices
+from services.sparse_arcs import fetch_arcs, is_sparse, restrict_successors, sparse_from_dense, successor_lists
+from services.presolve import screen_deliveries, screen_subproblem, take
+from services.tiers import MIN_TIER_TIME, VehicleState, priority_tiers, tier_subproblem
+from services.qos import haversine_matrices
+from services.aggregation import aggregate_colocated, expand_deliveries, expand_plan, expand_rejected, members
+from schemas.columnar import DeliveryTable
+from utils.cancellation import DISCONNECT, RequestCancelled
+from utils.timing import StageTimer
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Идентификатор ТС по умолчанию, когда в запросе не переданы vehicles
+DEFAULT_VEHICLE_ID = "default"
+
+# Доля времени поиска на первый проход при профиле загруженности; остальное - на уточнение
+REFINE_SHARE = 0.7
+
+# Доля времени поиска на начальное решение при LNS; остальное - на разрушение и восстановление
+LNS_INITIAL_SHARE = 0.2
+
+# Штраф за минуту опоздания при мягких окнах на единицу ранга приоритета (PRIORITY_RANKING)
+LATENESS_COST = 50
+
 # Глобальное определение приоритетов (больше число = выше приоритет)
 PRIORITY_RANKING = {
     "critical": 5,
@@ -40,18 +71,24 @@ def haversine_distance(coord1, coord2):
     return R * c
 
 
-def handle_refusal(route, deliveries, warehouses, warehouse_stock):
+def handle_refusal(route, deliveries, warehouses, inventory, distance_matrix=None):
     """
     Обрабатывает доставки, которые были отказаны (не смогли быть выполнены), возвращая товары на ближайший склад.
 
+    Ближайший склад со свободной вместимостью ищется по пространственному индексу складов
+    (расстояние по прямой) либо, если передана матрица расстояний подзадачи, по дорожному
+    расстоянию из неё.
+
     Args:
         route (list): Текущий маршрут с шагами.
         deliveries (list): Список объектов DeliveryAddress.
-        warehouses (list): Список словарей складов.
-        warehouse_stock (dict): Текущий уровень запасов на каждом складе.
+        warehouses (list): Список словарей складов (в порядке узлов 1..k подзадачи).
+        inventory (InventoryTransaction): Транзакция складского учёта, в которую добавляются возвраты.
+        distance_matrix (list, optional): Матрица расстояний подзадачи для ранжирования по дорожному расстоянию.
     """
     # Создаем отображение от ID доставки к объекту DeliveryAddress
     delivery_map = {d.id: d for d in deliveries}
+    warehouse_index = GeoKDTree([w["coord"] for w in warehouses]) if distance_matrix is None else None
 
     for step in route:
         if step["type"] == "delivery" and step.get("refused", False):
@@ -66,19 +103,24 @@ def handle_refusal(route, deliveries, warehouses, warehouse_stock):
 
             delivery = delivery_map[delivery_id]
             refused_items = delivery.items
-            delivery_coord = delivery.coord
+            total_demand = sum(it.count for it in refused_items)
+
+            def has_room(i):
+                return inventory.free_capacity(warehouses[i]["id"]) >= total_demand
 
             # Поиск ближайшего склада с достаточной вместимостью
             best_wh = None
-            best_dist = float("inf")
-            total_demand = sum(it.count for it in refused_items)
-
-            for wh in warehouses:
-                dist = haversine_distance(delivery_coord, wh["coord"])
-                if wh["usage"] + total_demand <= wh["capacity"]:
-                    if dist < best_dist:
-                        best_dist = dist
-                        best_wh = wh["id"]
+            if warehouse_index is not None:
+                wh_idx, _ = warehouse_index.nearest(delivery.coord, predicate=has_room)
+                if wh_idx is not None:
+                    best_wh = warehouses[wh_idx]["id"]
+            else:
+                # Склады - узлы 1..k подзадачи, доставка - узел шага маршрута
+                road = distance_matrix[step["node_index"]]
+                for wh_idx in sorted(range(len(warehouses)), key=lambda i: road[i + 1]):
+                    if has_room(wh_idx):
+                        best_wh = warehouses[wh_idx]["id"]
+                        break
 
             if not best_wh:
                 logger.error(f"Все склады переполнены! Не можем вернуть доставку {delivery_id}")
@@ -86,16 +128,7 @@ def handle_refusal(route, deliveries, warehouses, warehouse_stock):
 
             # Добавление товаров обратно на склад и обновление использования
             wh_id = best_wh
-            for item in refused_items:
-                guid = item.guid
-                cnt = item.count
-                warehouse_stock[wh_id][guid] = warehouse_stock[wh_id].get(guid, 0) + cnt
-
-            # Обновление использования склада
-            for wh in warehouses:
-                if wh["id"] == wh_id:
-                    wh["usage"] += total_demand
-                    break
+            inventory.receive(wh_id, refused_items)
 
             # Отметка доставки как отказанной в маршруте
             step["id"] = None
@@ -112,60 +145,146 @@ def handle_refusal(route, deliveries, warehouses, warehouse_stock):
             })
             logger.info(f"Товары доставки {delivery_id} возвращены на склад {wh_id}.\n")
 
-    # Логирование текущих запасов на складах
-    logger.info("[handle_refusal] Текущие остатки по складам:")
+    # Логирование использования складов (остатки по товарам возвращаются в ответе)
+    logger.info("[handle_refusal] Использование складов:")
     for wh in warehouses:
         wh_id = wh["id"]
-        logger.info(f"  Склад {wh_id} usage={wh['usage']}/{wh['capacity']}, stock={warehouse_stock[wh_id]}")
+        logger.info(f"  Склад {wh_id} usage={inventory.usage(wh_id)}/{wh['capacity']}")
     logger.info("-- Конец обработки отказов --\n")
 
 
-def update_warehouse_after_delivery(served_orders, warehouse_stock, warehouses):
+def update_warehouse_after_delivery(served_orders, inventory, sources=None):
     """
-    Обновляет запасы и использование на складе после выполнения доставок.
+    Добавляет в транзакцию складского учёта отгрузки выполненных доставок.
+
+    Запасы и использование складов изменяются при фиксации транзакции одной операцией.
 
     Args:
         served_orders (list): Список выполненных доставок (DeliveryAddress).
-        warehouse_stock (dict): Текущий уровень запасов на каждом складе.
-        warehouses (list): Список словарей складов.
+        inventory (InventoryTransaction): Транзакция складского учёта.
+        sources (dict, optional): Склады, выбранные решателем: ID доставки -> ID склада.
+            Для остальных доставок используется origin_warehouse.
     """
-    # Создаем отображение от ID склада к словарю склада
-    warehouse_dict = {w["id"]: w for w in warehouses}
-
+    sources = sources or {}
     for order in served_orders:
-        wh_id = order.origin_warehouse
-        if not wh_id or wh_id not in warehouse_dict:
+        wh_id = sources.get(order.id, order.origin_warehouse)
+        if not wh_id or not inventory.ledger.has_warehouse(wh_id):
             logger.warning(f"У заказа {order.id} неверный origin_warehouse: {wh_id}")
             continue
 
-        # Расчет общего спроса для заказа
-        total_demand = sum(it.count for it in order.items)
-
-        # Уменьшение использования склада
-        warehouse_dict[wh_id]["usage"] -= total_demand
-        if warehouse_dict[wh_id]["usage"] < 0:
-            logger.error(f"Использование склада {wh_id} ушло в минус!")
-
-        # Уменьшение запасов по каждому товару
-        for it in order.items:
-            guid = it.guid
-            cnt = it.count
-            current_stock = warehouse_stock[wh_id].get(guid, 0)
-            if current_stock < cnt:
-                logger.error(
-                    f"Недостаточно товара {guid} на складе {wh_id}. Требуется: {cnt}, доступно: {current_stock}")
-            else:
-                warehouse_stock[wh_id][guid] -= cnt
+        inventory.ship(wh_id, order.items)
+
+
+def find_source_warehouses(deliveries, warehouses, ledger):
+    """
+    Подбирает для каждой доставки склады, на которых есть все её товары.
+
+    Args:
+        deliveries (list): Список объектов DeliveryAddress.
+        warehouses (list): Список словарей складов.
+        ledger (InventoryLedger): Журнал запасов складов.
+
+    Returns:
+        dict: {"candidates": позиции складов-кандидатов для каждой доставки,
+               "stock_limits": ограничения запасов вида {"warehouse", "orders", "available"},
+               где orders - пары (позиция доставки, количество) для товара, которого не хватит
+               на всех кандидатов одновременно}.
+    """
+    wh_ids = [w["id"] for w in warehouses]
+    candidates = []
+    requested = {}
+    for d_pos, d in enumerate(deliveries):
+        items = {}
+        for it in d.items:
+            items[it.guid] = items.get(it.guid, 0) + it.count
+        options = ledger.warehouses_with_stock(items, wh_ids)
+        candidates.append(options)
+        for wh_pos in options:
+            for guid, count in items.items():
+                requested.setdefault((wh_pos, guid), []).append((d_pos, count))
+
+    # Ограничения нужны только там, где суммарный спрос кандидатов превышает запас
+    stock_limits = []
+    for (wh_pos, guid), orders in requested.items():
+        available = ledger.stock_of(wh_ids[wh_pos], guid)
+        if sum(count for _, count in orders) > available:
+            stock_limits.append({"warehouse": wh_pos, "orders": orders, "available": available})
+
+    return {"candidates": candidates, "stock_limits": stock_limits}
+
+
+def resolve_vehicles(data):
+    """
+    Транспортные средства запроса в виде словарей {"id", "start", "end", "capacity", "shift"}.
+
+    Если ТС не переданы, используется одно ТС вместимостью vehicle_capacity с депо depot_coord.
+    Смена ТС берётся из самого ТС, иначе из driver_rules, иначе это сутки целиком.
+    """
+    shift = tuple(data.driver_rules.shift_window) if data.driver_rules else (0, 1440)
+    if not data.vehicles:
+        return [{"id": DEFAULT_VEHICLE_ID, "start": tuple(data.depot_coord), "end": tuple(data.depot_coord),
+                 "capacity": data.vehicle_capacity, "shift": shift}]
+    return [
+        {
+            "id": v.id,
+            "start": tuple(v.start_coord),
+            "end": tuple(v.end_coord or v.start_coord),
+            "capacity": v.capacity or data.vehicle_capacity,
+            "shift": tuple(v.shift_window) if v.shift_window else shift,
+        }
+        for v in data.vehicles
+    ]
 
 
-def build_subproblem(remaining_deliveries, depot_coord, warehouses):
+def vehicle_terminals(depot_coord, vehicles):
+    """
+    Депо транспортных средств как точки подзадачи.
+
+    Args:
+        depot_coord (list): Координаты основного депо (узел 0).
+        vehicles (list): Результат resolve_vehicles.
+
+    Returns:
+        tuple: (terminal_coords, starts, ends) — координаты дополнительных депо (без повторов
+            и без depot_coord) и номера депо выезда/возврата каждого ТС: 0 — depot_coord,
+            t > 0 — terminal_coords[t - 1].
+    """
+    terminals = {location_key(depot_coord): 0}
+    terminal_coords = []
+
+    def terminal(coord):
+        key = location_key(coord)
+        if key not in terminals:
+            terminal_coords.append(tuple(coord))
+            terminals[key] = len(terminal_coords)
+        return terminals[key]
+
+    starts = [terminal(v["start"]) for v in vehicles]
+    ends = [terminal(v["end"]) for v in vehicles]
+    return terminal_coords, starts, ends
+
+
+def build_subproblem(remaining_deliveries, depot_coord, warehouses, pickup_options=None, matrices=None,
+                     vehicles=None, neighbors=None):
     """
     Строит данные подзадачи для решателя VRP.
 
+    Узлы подзадачи: 0 - депо, 1..k - склады, k+1..k+m - доставки, затем депо транспортных средств,
+    не совпадающие с depot_coord. Если передан pickup_options, после них добавляются узлы забора
+    товара: по одному на каждую пару доставка/склад-кандидат.
+
     Args:
-        remaining_deliveries (list): Список объектов DeliveryAddress.
+        remaining_deliveries (list | DeliveryTable): Список объектов DeliveryAddress или таблица доставок;
+            для таблицы точки, окна, время обслуживания, спрос и приоритеты берутся прямо из столбцов.
         depot_coord (list): Координаты депо [широта, долгота].
         warehouses (list): Список словарей складов.
+        pickup_options (dict, optional): Результат find_source_warehouses для выбора склада решателем.
+        matrices (tuple, optional): Готовые матрицы (distances, durations) в метрах и секундах по точкам
+            депо, складов, доставок и депо ТС в этом порядке; если заданы, хранилище и OSRM не используются.
+        vehicles (list, optional): Транспортные средства (resolve_vehicles). По умолчанию одно ТС из узла 0.
+        neighbors (int, optional): Разреженный режим: матрицы содержат только дуги из доставки в neighbors
+            ближайших доставок, склады и депо (строки ArcRow, services.sparse_arcs), а у поставщика
+            матриц запрашиваются только эти дуги. Не сочетается с pickup_options.
 
     Returns:
         dict: Данные подзадачи, включая точки, временные окна, время обслуживания и спрос.
@@ -177,38 +296,52 @@ def build_subproblem(remaining_deliveries, depot_coord, warehouses):
         sub_points.append(w["coord"])
         sub_wh_list.append(w)
 
-    sub_del_list = []
-    for d in remaining_deliveries:
-        sub_points.append(d.coord)
-        sub_del_list.append(d)
-
-    # 2. Запрос матриц расстояний и продолжительности из OSRM
-    coords_str = ";".join([f"{lon},{lat}" for lat, lon in sub_points])
-    base_url = "http://router.project-osrm.org"
-    url = f"{base_url}/table/v1/driving/{coords_str}?annotations=distance,duration"
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-    except requests.RequestException as e:
-        logger.exception(f"Запрос к OSRM не удался: {e}")
-        raise
-
-    if "distances" not in data or "durations" not in data:
-        logger.error("Недопустимая подматрица OSRM")
-        raise Exception("Недопустимая подматрица OSRM")
-
-    sub_distance_matrix = data["distances"]
-    sub_duration_matrix = data["durations"]
-    sub_time_matrix = [
-        [math.ceil(x / 60) for x in row] for row in sub_duration_matrix
-    ]
+    columnar = isinstance(remaining_deliveries, DeliveryTable)
+    if columnar:
+        sub_del_list = remaining_deliveries
+        sub_points.extend(map(tuple, remaining_deliveries.coords.tolist()))
+    else:
+        sub_del_list = []
+        for d in remaining_deliveries:
+            sub_points.append(d.coord)
+            sub_del_list.append(d)
+
+    # Депо транспортных средств
+    terminal_coords, starts, ends = vehicle_terminals(depot_coord, vehicles) if vehicles else ([], [0], [0])
+    first_terminal = len(sub_points)
+    sub_points.extend(terminal_coords)
+    depot_nodes = [0] + [first_terminal + t for t in range(len(terminal_coords))]
+
+    # 2. Матрицы расстояний и продолжительности: переданные готовыми, из хранилища матриц,
+    # если все точки в нём есть, иначе запрос к поставщику матриц (граф дорог или OSRM)
+    if matrices is None:
+        store = get_matrix_store()
+        store_ids = store.lookup(sub_points) if store is not None else None
+        if store_ids is not None:
+            matrices = store.submatrices(store_ids)
+    if neighbors is not None:
+        successors = successor_lists(sub_points, list(range(1 + len(sub_wh_list))) + depot_nodes[1:], neighbors)
+        if matrices is not None:
+            sub_distance_matrix, sub_time_matrix = sparse_from_dense(*matrices, successors)
+        else:
+            sub_distance_matrix, sub_time_matrix = fetch_arcs(sub_points, successors)
+    elif matrices is not None:
+        distances, durations = matrices
+        sub_distance_matrix = np.asarray(distances).tolist()
+        sub_time_matrix = np.ceil(np.asarray(durations) / 60).astype(int).tolist()
+    else:
+        sub_distance_matrix, sub_duration_matrix = fetch_table(sub_points)
+        sub_time_matrix = [
+            [math.ceil(x / 60) for x in row] for row in sub_duration_matrix
+        ]
 
     # 3. Определение временных окон, времени обслуживания и спроса для каждой точки
     sub_time_windows = []
     sub_service_times = []
     sub_demands = []
     total_nodes = len(sub_points)
+    # При выборе склада решателем груз забирается на складе (+спрос) и отдаётся на доставке (-спрос)
+    delivery_sign = -1 if pickup_options is not None else 1
 
     # Узел 0: Депо
     sub_time_windows.append((0, 1440))  # Депо имеет окно на весь день
@@ -222,13 +355,59 @@ def build_subproblem(remaining_deliveries, depot_coord, warehouses):
         sub_demands.append(0)  # Спрос для пополнения = 0
 
     # Узлы k+1..k+m: Доставки
-    for d in sub_del_list:
-        tw = getattr(d, "time_window", (0, 1440))  # Временное окно доставки
-        service_time = getattr(d, "service_time", 10)  # Время обслуживания доставки
-        demand = d.demand  # Спрос доставки
-        sub_time_windows.append(tw)
-        sub_service_times.append(service_time)
-        sub_demands.append(demand)
+    if columnar:
+        sub_time_windows.extend(map(tuple, sub_del_list.time_windows.tolist()))
+        sub_service_times.extend(sub_del_list.service_time.tolist())
+        sub_demands.extend((delivery_sign * sub_del_list.demand).tolist())
+        sub_priorities = sub_del_list.priority_rank.tolist()
+    else:
+        sub_priorities = []
+        for d in sub_del_list:
+            tw = getattr(d, "time_window", (0, 1440))  # Временное окно доставки
+            service_time = getattr(d, "service_time", 10)  # Время обслуживания доставки
+            demand = d.demand  # Спрос доставки
+            sub_time_windows.append(tw)
+            sub_service_times.append(service_time)
+            sub_demands.append(delivery_sign * demand)
+            sub_priorities.append(PRIORITY_RANKING.get(getattr(d, "priority", "medium").lower(), 1))
+
+    # Депо транспортных средств
+    for _ in terminal_coords:
+        sub_time_windows.append((0, 1440))
+        sub_service_times.append(0)
+        sub_demands.append(0)
+
+    # Узлы после депо ТС: Забор товара на складах-кандидатах (копии узлов складов)
+    pickups = []
+    stock_limits = []
+    if pickup_options is not None:
+        node_locations = list(range(total_nodes))
+        pickup_node = {}
+        for d_pos, options in enumerate(pickup_options["candidates"]):
+            for wh_pos in options:
+                node = len(node_locations)
+                node_locations.append(1 + wh_pos)
+                pickup_node[(d_pos, wh_pos)] = node
+                pickups.append({
+                    "node": node,
+                    "delivery_node": 1 + len(sub_wh_list) + d_pos,
+                    "delivery": d_pos,
+                    "warehouse": wh_pos,
+                })
+                sub_points.append(sub_wh_list[wh_pos]["coord"])
+                sub_time_windows.append((0, 1440))
+                sub_service_times.append(5)
+                sub_demands.append(-sub_demands[1 + len(sub_wh_list) + d_pos])
+
+        for limit in pickup_options["stock_limits"]:
+            stock_limits.append({
+                "pickups": [(pickup_node[(d_pos, limit["warehouse"])], count) for d_pos, count in limit["orders"]],
+                "available": limit["available"],
+            })
+
+        if len(node_locations) > total_nodes:
+            sub_distance_matrix = [[sub_distance_matrix[a][b] for b in node_locations] for a in node_locations]
+            sub_time_matrix = [[sub_time_matrix[a][b] for b in node_locations] for a in node_locations]
 
     return {
         "sub_points": sub_points,
@@ -238,34 +417,81 @@ def build_subproblem(remaining_deliveries, depot_coord, warehouses):
         "time_matrix": sub_time_matrix,
         "time_windows": sub_time_windows,
         "service_times": sub_service_times,
-        "demands": sub_demands
+        "demands": sub_demands,
+        "priorities": sub_priorities,
+        "pickups": pickups,
+        "stock_limits": stock_limits,
+        "assign_warehouses": pickup_options is not None,
+        "depot_nodes": depot_nodes,
+        "vehicle_starts": [depot_nodes[t] for t in starts],
+        "vehicle_ends": [depot_nodes[t] for t in ends],
+        "vehicle_capacities": [v["capacity"] for v in vehicles] if vehicles else None,
+        "vehicle_shifts": [v.get("shift", (0, 1440)) for v in vehicles] if vehicles else None
     }
 
 
-def solve_vrp_multy_warehouse(sub_data, deliveries, vehicle_capacity=20, big_penalty=100000):
+def model_data(sub_data):
     """
-    Решает задачу маршрутизации с несколькими складами, временными окнами и приоритетами доставок.
-    Более высокие приоритеты доставок обрабатываются раньше.
+    Данные подзадачи, достаточные для build_routing_model, без объектов доставок и складов
+    и без матриц: используются для передачи подзадачи в процессы, матрица времени передаётся отдельно.
+    """
+    return dict(
+        sub_data,
+        sub_points=[],
+        wh_list=[None] * len(sub_data["wh_list"]),
+        del_list=[None] * len(sub_data["del_list"]),
+        distance_matrix=None,
+        time_matrix=None,
+    )
+
+
+def build_shared_routing_model(sub_data, time_matrix, *args):
+    """
+    build_routing_model по матрице времени из разделяемой памяти (services.shared_matrix).
+
+    Процессу передаётся только описатель матрицы; колбэк OR-Tools быстрее читает вложенные списки,
+    поэтому матрица один раз копируется в список в самом процессе.
+
+    Args:
+        sub_data (dict): Результат model_data.
+        time_matrix (SharedMatrix): Описатель матрицы времени в минутах.
+        *args: Остальные аргументы build_routing_model.
+    """
+    return build_routing_model(sub_data, time_matrix.attach().tolist(), *args)
+
+
+def build_routing_model(sub_data, time_m, vehicle_capacity, big_penalty, driver_rules=None, max_lateness=None):
+    """
+    Строит модель OR-Tools для подзадачи: измерения времени и вместимости, дизъюнкции
+    с штрафами за пропуск, выбор склада-источника, ограничения приоритетов и правила труда водителей.
 
     Args:
         sub_data (dict): Данные подзадачи, подготовленные функцией build_subproblem.
-        deliveries (list): Список объектов DeliveryAddress.
-        vehicle_capacity (int, optional): Вместимость транспортного средства. По умолчанию 20.
-        big_penalty (int, optional): Штраф за пропуск доставки. По умолчанию 100000.
+        time_m (list): Матрица времени в пути в минутах, используемая измерением времени; для строк ArcRow
+            (разреженный режим) домены NextVar ограничиваются дугами графа соседей.
+        vehicle_capacity (int): Вместимость транспортного средства, если в sub_data не заданы
+            вместимости ТС.
+        big_penalty (int): Штраф за пропуск склада.
+        driver_rules (DriverRules, optional): Ограничения продолжительности маршрута, времени за рулём
+            и перерывы водителей.
+        max_lateness (int, optional): Если задано, окна доставок мягкие: прибытие позже конца окна
+            допускается не более чем на max_lateness минут со штрафом LATENESS_COST за минуту на единицу
+            ранга приоритета.
 
     Returns:
-        tuple: (route_nodes, skipped_nodes)
-            - route_nodes (list): Упорядоченный список индексов узлов в маршруте.
-            - skipped_nodes (list): Список индексов узлов, которые были пропущены.
+        tuple: (manager, routing, time_dim).
     """
-    dist_m = sub_data["distance_matrix"]
-    time_m = sub_data["time_matrix"]
     tw = sub_data["time_windows"]
     svc = sub_data["service_times"]
     dm = sub_data["demands"]
-
-    n = len(dist_m)
-    manager = pywrapcp.RoutingIndexManager(n, 1, 0)  # 1 транспорт, депо на индексе 0
+    starts = sub_data.get("vehicle_starts", [0])
+    ends = sub_data.get("vehicle_ends", [0])
+    capacities = sub_data.get("vehicle_capacities") or [vehicle_capacity] * len(starts)
+    depot_nodes = set(sub_data.get("depot_nodes", [0]))
+
+    n = len(tw)
+    # Каждое ТС выезжает из своего депо и возвращается в своё депо
+    manager = pywrapcp.RoutingIndexManager(n, len(starts), starts, ends)
     routing = pywrapcp.RoutingModel(manager)
 
     # Колбэк для расчета времени перемещения и обслуживания между узлами
@@ -279,21 +505,54 @@ def solve_vrp_multy_warehouse(sub_data, deliveries, vehicle_capacity=20, big_pen
     transit_callback_index = routing.RegisterTransitCallback(time_callback)
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
+    # Перерывы берутся из ожидания в узлах, поэтому при перерывах допускается ожидание до длины перерыва
+    breaks_enabled = driver_rules is not None and driver_rules.break_after is not None
+    slack = driver_rules.break_duration if breaks_enabled else 0
+
     # Добавление временного измерения с временными окнами
     time_dimension = routing.AddDimension(
         transit_callback_index,
-        0,  # Нет допуска времени
+        slack,  # Допуск времени (ожидание)
         1440,  # Максимальное время маршрута (24 часа)
         False,  # Не фиксировать начало маршрута
         "Time"
     )
     time_dim = routing.GetDimensionOrDie("Time")
 
-    # Установка временных окон для каждого узла
+    # Установка временных окон для каждого узла (депо открыты весь день - это ограничено измерением)
+    n_wh = len(sub_data["wh_list"])
+    n_del = len(sub_data["del_list"])
     for i in range(n):
+        if i in depot_nodes:
+            continue
         start, end = tw[i]
         index = manager.NodeToIndex(i)
-        time_dim.CumulVar(index).SetRange(start, end)
+        if max_lateness is not None and n_wh < i <= n_wh + n_del:
+            # Мягкое окно доставки: опоздание штрафуется тем сильнее, чем выше приоритет
+            time_dim.CumulVar(index).SetRange(start, min(end + max_lateness, 1440))
+            priority = sub_data["priorities"][i - 1 - n_wh]
+            time_dim.SetCumulVarSoftUpperBound(index, end, LATENESS_COST * priority)
+        else:
+            time_dim.CumulVar(index).SetRange(start, end)
+
+    # Смены водителей: выезд не раньше начала смены, возврат не позже её конца
+    shifts = sub_data.get("vehicle_shifts") or [(0, 1440)] * len(starts)
+    for vehicle, (shift_start, shift_end) in enumerate(shifts):
+        time_dim.CumulVar(routing.Start(vehicle)).SetMin(shift_start)
+        time_dim.CumulVar(routing.End(vehicle)).SetMax(shift_end)
+
+    if driver_rules is not None:
+        add_driver_rules(routing, manager, time_dim, time_m, svc, shifts, driver_rules)
+
+    # Разреженный режим: переезды только по дугам графа соседей
+    if is_sparse(time_m):
+        restrict_successors(routing, manager, time_m, depot_nodes)
+
+    # Депо, из которого не выезжает ни одно ТС, не посещается
+    for node in depot_nodes - set(starts) - set(ends):
+        index = manager.NodeToIndex(node)
+        routing.AddDisjunction([index], 0)
+        routing.ActiveVar(index).SetValue(0)
 
     # Добавление измерения вместимости
     def demand_callback(from_index):
@@ -303,96 +562,410 @@ def solve_vrp_multy_warehouse(sub_data, deliveries, vehicle_capacity=20, big_pen
     routing.AddDimensionWithVehicleCapacity(
         demand_callback_index,
         0,  # Нет допуска
-        [vehicle_capacity],  # Вместимость транспортного средства
+        capacities,  # Вместимость каждого транспортного средства
         True,  # Начальные запасы равны нулю
         "Capacity"
     )
     capacity_dim = routing.GetDimensionOrDie("Capacity")
 
+    pickups = sub_data.get("pickups", [])
+
     # Добавление дизъюнкций с штрафами за пропуск доставок
-    for node in range(1, n):
+    disjunctions = {}
+    for node in range(1, 1 + n_wh + n_del):
         # Определение, является ли узел доставкой (не складом)
-        if node > len(sub_data["wh_list"]):
-            delivery_idx = node - 1 - len(sub_data["wh_list"])
-            if 0 <= delivery_idx < len(sub_data["del_list"]):
-                delivery = sub_data["del_list"][delivery_idx]
-                priority = delivery.priority.lower()
-                penalty = PRIORITY_RANKING.get(priority, 1) * 20000  # Более высокий приоритет - больший штраф
-            else:
-                penalty = big_penalty
+        if node > n_wh:
+            priority = sub_data["priorities"][node - 1 - n_wh]
+            penalty = priority * 20000  # Более высокий приоритет - больший штраф
+        elif pickups:
+            # Товар забирается в узлах забора, заезд на склад для пополнения не обязателен
+            penalty = 0
         else:
             # Присвоение штрафа за пропуск склада, чтобы предотвратить его пропуск
             penalty = big_penalty
 
-        routing.AddDisjunction([manager.NodeToIndex(node)], penalty)
-
-    # Добавление ограничений предшествования на основе приоритетов
-    delivery_nodes = []
-    delivery_priorities = []
-    for node in range(1, n):
-        if node > len(sub_data["wh_list"]):
-            delivery_idx = node - 1 - len(sub_data["wh_list"])
-            if 0 <= delivery_idx < len(sub_data["del_list"]):
-                delivery = sub_data["del_list"][delivery_idx]
-                priority = PRIORITY_RANKING.get(delivery.priority.lower(), 1)
-                delivery_nodes.append(manager.NodeToIndex(node))
-                delivery_priorities.append(priority)
-
-    # Обеспечение, чтобы более высокие приоритеты были посещены раньше
-    for i in range(len(delivery_nodes)):
-        for j in range(len(delivery_nodes)):
-            if delivery_priorities[i] > delivery_priorities[j]:
-                # Обеспечить, чтобы время прибытия в узел с более высоким приоритетом <= времени прибытия в узел с более низким
-                routing.solver().Add(time_dim.CumulVar(delivery_nodes[i]) <= time_dim.CumulVar(delivery_nodes[j]))
-
-    # Настройка параметров поиска
+        disjunctions[node] = routing.AddDisjunction([manager.NodeToIndex(node)], penalty)
+
+    # Выбор склада-источника: для каждой доставки ровно один узел забора из её кандидатов
+    if pickups:
+        pickup_indices = {}
+        for p in pickups:
+            pickup_indices.setdefault(p["delivery_node"], []).append(manager.NodeToIndex(p["node"]))
+
+        for node in range(1 + n_wh, 1 + n_wh + n_del):
+            options = pickup_indices.get(node)
+            if not options:
+                # Ни на одном складе нет нужных товаров - доставку выполнить нельзя
+                routing.ActiveVar(manager.NodeToIndex(node)).SetValue(0)
+                continue
+            pickup_disjunction = routing.AddDisjunction(options, 0)
+            routing.AddPickupAndDeliverySets(pickup_disjunction, disjunctions[node])
+
+        # Суммарный забор товара со склада не превышает его запас
+        solver = routing.solver()
+        for limit in sub_data["stock_limits"]:
+            taken = [routing.ActiveVar(manager.NodeToIndex(node)) * count for node, count in limit["pickups"]]
+            solver.Add(solver.Sum(taken) <= limit["available"])
+
+    # Добавление ограничений предшествования на основе приоритетов: более высокие приоритеты
+    # посещаются раньше. Вместо ограничения на каждую пару доставок между соседними уровнями
+    # приоритета ставится граница: прибытие в доставки уровня <= границы <= прибытия в доставки
+    # следующего (более низкого) уровня. Это те же ограничения за O(n) вместо O(n^2)
+    tiers = {}
+    for pos, priority in enumerate(sub_data["priorities"]):
+        tiers.setdefault(priority, []).append(manager.NodeToIndex(1 + n_wh + pos))
+
+    solver = routing.solver()
+    previous_barrier = None
+    ordered = sorted(tiers, reverse=True)
+    for level, priority in enumerate(ordered):
+        cumuls = [time_dim.CumulVar(index) for index in tiers[priority]]
+        if previous_barrier is not None:
+            for cumul in cumuls:
+                solver.Add(previous_barrier <= cumul)
+        if level + 1 < len(ordered):
+            barrier = solver.IntVar(0, 1440, f"priority_barrier_{priority}")
+            for cumul in cumuls:
+                solver.Add(cumul <= barrier)
+            previous_barrier = barrier
+
+    return manager, routing, time_dim
+
+
+def add_driver_rules(routing, manager, time_dim, time_m, svc, shifts, driver_rules):
+    """
+    Добавляет в модель правила труда водителей.
+
+    Продолжительность маршрута ограничивается через span измерения времени, время за рулём —
+    отдельным измерением только из времени в пути, перерывы — интервалами перерывов OR-Tools:
+    на каждое ТС заводятся обязательные перерывы длительностью break_duration, следующие друг
+    за другом через не более чем break_after минут от начала до конца смены.
+
+    Args:
+        routing (RoutingModel): Модель маршрутизации.
+        manager (RoutingIndexManager): Менеджер индексов модели.
+        time_dim (RoutingDimension): Измерение времени.
+        time_m (list): Матрица времени в пути в минутах.
+        svc (list): Время обслуживания узлов.
+        shifts (list): Смены (начало, конец) каждого ТС.
+        driver_rules (DriverRules): Правила труда водителей.
+    """
+    if driver_rules.max_route_duration is not None:
+        for vehicle in range(routing.vehicles()):
+            time_dim.SetSpanUpperBoundForVehicle(driver_rules.max_route_duration, vehicle)
+
+    if driver_rules.max_driving_time is not None:
+        def driving_callback(from_index, to_index):
+            return time_m[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+        driving_callback_index = routing.RegisterTransitCallback(driving_callback)
+        routing.AddDimension(driving_callback_index, 0, driver_rules.max_driving_time, True, "Driving")
+
+    if driver_rules.break_after is not None:
+        solver = routing.solver()
+        work, pause = driver_rules.break_after, driver_rules.break_duration
+        # Время обслуживания в узле - часть перехода, во время которой перерыв невозможен
+        node_visit_transits = [svc[manager.IndexToNode(index)] for index in range(routing.Size())]
+        for vehicle, (shift_start, shift_end) in enumerate(shifts):
+            # Перерывы идут по всей смене так, что между началом смены, перерывами и концом смены
+            # не больше break_after минут; перерывы вне маршрута не влияют на него
+            count = max(0, -(-(shift_end - shift_start - work) // (work + pause)))
+            breaks = [
+                solver.FixedDurationIntervalVar(shift_start, shift_end - pause, pause, False,
+                                                f"break_{vehicle}_{i}")
+                for i in range(count)
+            ]
+            previous_end = shift_start
+            for brk in breaks:
+                solver.Add(brk.StartExpr() >= previous_end)
+                solver.Add(brk.StartExpr() <= previous_end + work)
+                previous_end = brk.EndExpr()
+            if breaks:
+                solver.Add(previous_end >= shift_end - work)
+            time_dim.SetBreakIntervalsOfVehicle(breaks, vehicle, node_visit_transits)
+
+
+def search_parameters(time_limit, solution_limit=None):
+    """
+    Параметры поиска решателя.
+
+    Args:
+        time_limit (float): Ограничение времени поиска в секундах.
+        solution_limit (int, optional): Наибольшее число найденных решений; 1 - только начальное решение
+            без локального поиска. По умолчанию None - поиск ограничен только временем.
+    """
     search_params = pywrapcp.DefaultRoutingSearchParameters()
     search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
     search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-    search_params.time_limit.seconds = 10  # Ограничение времени поиска
+    search_params.time_limit.FromMilliseconds(int(time_limit * 1000))  # Ограничение времени поиска
+    if solution_limit is not None:
+        search_params.solution_limit = solution_limit
+    return search_params
 
-    # Решение задачи
-    sol = routing.SolveWithParameters(search_params)
-    if not sol:
-        logger.error("[solve_vrp_multy_warehouse] Решение не найдено!")
-        return None, None
 
-    # Извлечение маршрута и времени прибытия из решения
-    route_nodes = []
-    arrival_times = []
-    idx = routing.Start(0)
-    while not routing.IsEnd(idx):
-        node = manager.IndexToNode(idx)
-        time_var = time_dim.CumulVar(idx)
-        arrival_time = sol.Value(time_var)
-        route_nodes.append(node)
-        arrival_times.append(arrival_time)
-        idx = sol.Value(routing.NextVar(idx))
-    # Добавление конечного узла
-    node = manager.IndexToNode(idx)
-    time_var = time_dim.CumulVar(idx)
-    arrival_time = sol.Value(time_var)
-    route_nodes.append(node)
-    arrival_times.append(arrival_time)
+def add_cancellation(routing, cancel):
+    """
+    Останавливает поиск OR-Tools при отмене расчёта: решатель опрашивает признак отмены
+    во время поиска и завершает его с лучшим найденным решением.
 
-    # Логирование подробной информации для отладки
-    logger.info(f"Временные окна: {tw}")
-    logger.info(f"Время обслуживания: {svc}")
-    logger.info(f"Спрос: {dm}")
-    logger.info(f"Маршрутные узлы: {route_nodes}")
-    logger.info(f"Времена прибытия: {arrival_times}")
+    Args:
+        routing (RoutingModel): Модель маршрутизации (до решения).
+        cancel (CancellationToken | None): Признак отмены; None - поиск ограничен только временем.
+    """
+    if cancel is not None:
+        routing.AddSearchMonitor(routing.solver().CustomLimit(lambda: cancel.cancelled))
+
+
+def extract_route(manager, routing, time_dim, sol):
+    """
+    Извлекает из решения маршруты транспортных средств, времена прибытия и пропущенные узлы.
+
+    Returns:
+        tuple: (routes, arrival_times, skipped) — для каждого ТС список узлов маршрута от депо выезда
+            до депо возврата и времена прибытия в них, а также пропущенные узлы.
+    """
+    routes = []
+    arrival_times = []
+    for vehicle in range(routing.vehicles()):
+        # Извлечение маршрута и времени прибытия из решения
+        route_nodes = []
+        route_times = []
+        idx = routing.Start(vehicle)
+        while not routing.IsEnd(idx):
+            route_nodes.append(manager.IndexToNode(idx))
+            route_times.append(sol.Value(time_dim.CumulVar(idx)))
+            idx = sol.Value(routing.NextVar(idx))
+        # Добавление конечного узла
+        route_nodes.append(manager.IndexToNode(idx))
+        route_times.append(sol.Value(time_dim.CumulVar(idx)))
+        routes.append(route_nodes)
+        arrival_times.append(route_times)
 
     # Определение пропущенных узлов на основе того, были ли они посещены
     skipped = []
-    for node in range(1, n):
-        node_index = manager.NodeToIndex(node)
+    for node_index in range(routing.Size()):
         # Если следующий узел после текущего - это сам узел, значит он был пропущен
-        if sol.Value(routing.NextVar(node_index)) == node_index:
-            skipped.append(node)
+        if not routing.IsStart(node_index) and sol.Value(routing.NextVar(node_index)) == node_index:
+            skipped.append(manager.IndexToNode(node_index))
+
+    return routes, arrival_times, skipped
+
+
+def solve_vrp_multy_warehouse(sub_data, deliveries, vehicle_capacity=20, big_penalty=100000, time_limit=10,
+                              traffic_profile=None, driver_rules=None, max_lateness=None, solver="ortools",
+                              cancel=None, solution_limit=None):
+    """
+    Решает задачу маршрутизации с несколькими складами, временными окнами и приоритетами доставок.
+    Более высокие приоритеты доставок обрабатываются раньше.
+
+    Если задан профиль загруженности, время в пути зависит от времени выезда: сначала задача
+    решается по оценкам времени выезда из узлов, затем матрица уточняется по найденному маршруту
+    и поиск продолжается от этого маршрута. Оба прохода укладываются в общий time_limit.
+    Возвращаемое время прибытия рассчитано моделью второго прохода, где строки матрицы взяты
+    по времени выезда из первого прохода; если второй проход меняет маршрут и время выезда
+    из узла попадает в другой час, время прибытия приближённое и повторно не проверяется.
+
+    При solver="lns" решатель OR-Tools строит только начальное решение, а остальное время первого
+    прохода решение улучшается разрушением и восстановлением (RuinAndRecreate) в пуле процессов.
+    При solver="heuristic" модель OR-Tools не строится: маршруты строит эвристика (solve_heuristic)
+    по первой оценке матрицы, без уточнения по профилю загруженности.
+
+    Args:
+        sub_data (dict): Данные подзадачи, подготовленные функцией build_subproblem.
+        deliveries (list): Список объектов DeliveryAddress.
+        vehicle_capacity (int, optional): Вместимость транспортного средства. По умолчанию 20.
+        big_penalty (int, optional): Штраф за пропуск доставки. По умолчанию 100000.
+        time_limit (int, optional): Ограничение времени поиска в секундах. По умолчанию 10.
+        traffic_profile (list, optional): Множители времени в пути по часам суток.
+        driver_rules (DriverRules, optional): Смена, ограничения времени за рулём и перерывы водителей.
+        max_lateness (int, optional): Наибольшее опоздание при мягких окнах доставок; None - окна жёсткие.
+        solver (str, optional): "ortools" (поиск OR-Tools), "lns" или "heuristic". По умолчанию "ortools".
+        cancel (CancellationToken, optional): Признак отмены: поиск OR-Tools и LNS останавливаются,
+            как только расчёт отменён, и возвращают лучшее найденное решение; уточнение по профилю
+            загруженности после отмены не выполняется.
+        solution_limit (int, optional): Наибольшее число решений каждого прохода поиска OR-Tools
+            (search_parameters); улучшение LNS, ограниченное только временем, при нём не выполняется.
+
+    Returns:
+        tuple: (routes, skipped_nodes, arrival_times)
+            - routes (list): Для каждого ТС упорядоченный список индексов узлов его маршрута.
+            - skipped_nodes (list): Список индексов узлов, которые были пропущены.
+            - arrival_times (list): Для каждого ТС времена прибытия в узлы его маршрута.
 
-    logger.info(f"Пропущенные узлы: {skipped}")
+    Raises:
+        RequestCancelled: Если расчёт отменён до того, как найдено первое решение.
+    """
+    if traffic_profile is None:
+        time_m = sub_data["time_matrix"]
+        first_limit = time_limit
+    else:
+        traffic = TrafficSlices(sub_data["time_matrix"], traffic_profile)
+        departures = initial_departures(sub_data["time_matrix"], sub_data["time_windows"],
+                                        sub_data["service_times"], sub_data.get("vehicle_starts", [0]))
+        time_m = traffic.matrix_for(departures)
+        first_limit = time_limit * REFINE_SHARE
+
+    if solver == "heuristic":
+        return solve_heuristic(sub_data, time_m, vehicle_capacity, time_limit)
 
-    return route_nodes, skipped
+    # Решение задачи
+    manager, routing, time_dim = build_routing_model(sub_data, time_m, vehicle_capacity, big_penalty, driver_rules,
+                                                     max_lateness)
+    add_cancellation(routing, cancel)
+    use_lns = solver == "lns" and solution_limit is None
+    initial_limit = first_limit * LNS_INITIAL_SHARE if use_lns else first_limit
+    sol = routing.SolveWithParameters(search_parameters(initial_limit, solution_limit))
+    if not sol:
+        # Поиск остановлен отменой до первого решения: задача не обязательно невыполнима
+        if cancel is not None and cancel.cancelled:
+            raise RequestCancelled(cancel.reason)
+        logger.error("[solve_vrp_multy_warehouse] Решение не найдено!")
+        return None, None, None
+
+    if use_lns:
+        # Процессы LNS строят свою копию модели по тем же данным; матрица времени передаётся
+        # через разделяемую память, сегмент удаляется после остановки процессов
+        with SharedMatrices() as shared:
+            model_factory = partial(build_shared_routing_model, model_data(sub_data),
+                                    shared.share(time_m, dtype=np.int32), vehicle_capacity, big_penalty,
+                                    driver_rules, max_lateness)
+            lns = RuinAndRecreate(model_factory, sub_data, time_m)
+            best, _ = lns.improve(read_routes(manager, routing, sol), sol.ObjectiveValue(),
+                                  first_limit - initial_limit, cancel)
+        improved = routing.ReadAssignmentFromRoutes(
+            [[manager.NodeToIndex(node) for node in route] for route in best], True)
+        if improved is not None:
+            sol = improved
+    routes, arrival_times, skipped = extract_route(manager, routing, time_dim, sol)
+
+    if traffic_profile is not None and not (cancel is not None and cancel.cancelled):
+        # Уточнение: строки матрицы берутся из срезов фактического времени выезда по найденным маршрутам
+        svc = sub_data["service_times"]
+        for route_nodes, route_times in zip(routes, arrival_times):
+            for node, arrival in zip(route_nodes[:-1], route_times[:-1]):
+                departures[node] = arrival + svc[node]
+        time_m = traffic.matrix_for(departures)
+        manager, routing, time_dim = build_routing_model(sub_data, time_m, vehicle_capacity, big_penalty,
+                                                         driver_rules, max_lateness)
+        add_cancellation(routing, cancel)
+        params = search_parameters(time_limit - first_limit, solution_limit)
+        initial = routing.ReadAssignmentFromRoutes(
+            [[manager.NodeToIndex(node) for node in route_nodes[1:-1]] for route_nodes in routes], True)
+        if initial is not None:
+            refined = routing.SolveFromAssignmentWithParameters(initial, params)
+        else:
+            refined = routing.SolveWithParameters(params)
+        if refined:
+            routes, arrival_times, skipped = extract_route(manager, routing, time_dim, refined)
+        else:
+            logger.warning("Уточнение по профилю загруженности не нашло решения, используется первый проход")
+
+    # Логирование подробной информации для отладки
+    if logger.isEnabledFor(logging.DEBUG):
+        tw = sub_data["time_windows"]
+        svc = sub_data["service_times"]
+        dm = sub_data["demands"]
+        logger.debug(f"Временные окна: {tw}")
+        logger.debug(f"Время обслуживания: {svc}")
+        logger.debug(f"Спрос: {dm}")
+        logger.debug(f"Маршрутные узлы: {routes}")
+        logger.debug(f"Времена прибытия: {arrival_times}")
+
+    # Неиспользуемые депо не считаются пропущенными
+    depot_nodes = set(sub_data.get("depot_nodes", [0]))
+    skipped = [node for node in skipped if node not in depot_nodes]
+    logger.info(f"Узлов в маршрутах: {sum(len(r) for r in routes)}, пропущено: {len(skipped)}")
+
+    return routes, skipped, arrival_times
+
+
+def solve_by_priority_tiers(sub_data, deliveries, vehicle_capacity=20, big_penalty=100000, time_limit=10,
+                            traffic_profile=None, max_lateness=None, solver="ortools", cancel=None,
+                            solution_limit=None):
+    """
+    Решает подзадачу по уровням приоритета: сначала все доставки высшего приоритета, затем
+    следующего уровня и так далее.
+
+    Каждый уровень - отдельная подзадача solve_vrp_multy_warehouse из депо, складов и доставок уровня
+    (срез матриц полной подзадачи); ТС продолжают с того места и времени, где закончили предыдущий
+    уровень, с оставшейся вместимостью. Порядок приоритетов поэтому соблюдается без ограничений
+    предшествования, а каждая модель намного меньше общей. Склады обязательны для посещения, пока
+    хотя бы один из них не посещён ни на одном уровне. time_limit делится между уровнями
+    пропорционально числу доставок с запасом MIN_TIER_TIME для каждого следующего уровня; каждый уровень
+    получает не меньше MIN_TIER_TIME, поэтому при большом числе уровней поиск может длиться дольше time_limit.
+
+    Args:
+        sub_data (dict): Данные подзадачи, подготовленные функцией build_subproblem, без узлов забора.
+        deliveries (list): Доставки подзадачи.
+        vehicle_capacity (int, optional): Вместимость ТС, если в sub_data не заданы вместимости ТС.
+        big_penalty (int, optional): Штраф за пропуск склада.
+        time_limit (int, optional): Общее ограничение времени поиска в секундах.
+        traffic_profile (list, optional): Множители времени в пути по часам суток.
+        max_lateness (int, optional): Наибольшее опоздание при мягких окнах доставок; None - окна жёсткие.
+        solver (str, optional): Решатель каждого уровня: "ortools", "lns" или "heuristic".
+        cancel (CancellationToken, optional): Признак отмены: текущий уровень возвращает лучшее найденное
+            решение, следующие уровни не решаются (их доставки пропускаются).
+        solution_limit (int, optional): Наибольшее число решений поиска OR-Tools на каждом уровне.
+
+    Returns:
+        tuple: (routes, skipped_nodes, arrival_times) в формате solve_vrp_multy_warehouse,
+            с номерами узлов полной подзадачи.
+
+    Raises:
+        RequestCancelled: Если расчёт отменён до того, как решён хотя бы один уровень.
+    """
+    starts = sub_data.get("vehicle_starts", [0])
+    ends = sub_data.get("vehicle_ends", [0])
+    capacities = sub_data.get("vehicle_capacities") or [vehicle_capacity] * len(starts)
+    shifts = sub_data.get("vehicle_shifts") or [(0, 1440)] * len(starts)
+    states = [VehicleState(start, shift[0], capacity) for start, shift, capacity in zip(starts, shifts, capacities)]
+
+    n_wh = len(sub_data["wh_list"])
+    n_del = len(sub_data["del_list"])
+    visited = set()
+    solved = False
+    tiers = priority_tiers(sub_data)
+    deadline = time.monotonic() + time_limit
+    for k, (priority, keep) in enumerate(tiers):
+        if cancel is not None and cancel.cancelled:
+            break
+        # Каждому следующему уровню оставляется MIN_TIER_TIME, поэтому уровень не пропускается из-за нехватки
+        # времени; если минимумов больше, чем time_limit, поиск в целом длится дольше time_limit
+        reserve = MIN_TIER_TIME * (len(tiers) - k - 1)
+        tier_limit = max(MIN_TIER_TIME, min(time_limit * len(keep) / n_del, deadline - time.monotonic() - reserve))
+        tier_data, nodes = tier_subproblem(sub_data, keep, states)
+        penalty = big_penalty if len(visited & set(range(1, 1 + n_wh))) < n_wh else 0
+        try:
+            routes, _, arrival_times = solve_vrp_multy_warehouse(
+                tier_data, tier_data["del_list"], vehicle_capacity, penalty,
+                time_limit=tier_limit,
+                traffic_profile=traffic_profile, max_lateness=max_lateness, solver=solver, cancel=cancel,
+                solution_limit=solution_limit)
+        except RequestCancelled:
+            # План уже решённых уровней возвращается, доставки остальных пропускаются
+            if not solved:
+                raise
+            break
+        if routes is None:
+            logger.warning(f"Уровень приоритета {priority}: решение не найдено, {len(keep)} доставок пропущено")
+            continue
+        solved = True
+        for state, route, arrivals in zip(states, routes, arrival_times):
+            state.advance(tier_data, nodes, route, arrivals)
+            visited.update(state.route)
+        logger.info(f"Уровень приоритета {priority}: {len(keep)} доставок")
+
+    if not solved:
+        if cancel is not None and cancel.cancelled:
+            raise RequestCancelled(cancel.reason)
+        logger.error("[solve_by_priority_tiers] Решение не найдено ни для одного уровня!")
+        return None, None, None
+
+    routes = [state.route + [end] for state, end in zip(states, ends)]
+    arrival_times = [state.arrivals + [state.end_arrival if state.end_arrival is not None else state.ready]
+                     for state in states]
+    skipped = [node for node in range(1, 1 + n_wh + n_del) if node not in visited]
+    return routes, skipped, arrival_times
 
 
 def build_osm_route_url(route_plan, all_points):
@@ -434,56 +1007,270 @@ def build_osm_route_url(route_plan, all_points):
     logger.info(f"Сгенерированный URL для Яндекс.Карт: {osm_url}")
     return osm_url
 
-def run_optimization(data):
+def route_step(node, depot_nodes, pickup_by_node, warehouses, deliveries):
+    """
+    Шаг плана маршрута для узла подзадачи.
+
+    Args:
+        node (int): Узел подзадачи.
+        depot_nodes (set): Узлы депо транспортных средств.
+        pickup_by_node (dict): Узлы забора товара подзадачи по номеру узла.
+        warehouses (list): Список словарей складов.
+        deliveries (list): Доставки подзадачи.
+
+    Returns:
+        dict | None: Шаг маршрута или None, если узел не соответствует ни одной точке.
+    """
+    total_warehouses = len(warehouses)
+    if node in depot_nodes:
+        # Депо
+        return {
+            "node_index": node,
+            "type": "depot",
+            "id": None,
+            "refused": False
+        }
+    if 1 <= node <= total_warehouses:
+        # Склад
+        return {
+            "node_index": node,
+            "type": "warehouse",
+            "id": warehouses[node - 1]["id"],
+            "refused": False
+        }
+    if node in pickup_by_node:
+        # Забор товара на складе для доставки
+        p = pickup_by_node[node]
+        return {
+            "node_index": node,
+            "type": "pickup",
+            "id": warehouses[p["warehouse"]]["id"],
+            "delivery_id": deliveries[p["delivery"]].id,
+            "refused": False
+        }
+    # Доставка
+    d_idx = node - 1 - total_warehouses
+    if 0 <= d_idx < len(deliveries):
+        d = deliveries[d_idx]
+        return {
+            "node_index": node,
+            "type": "delivery",
+            "id": d.id,
+            "refused": d.refused
+        }
+    return None
+
+
+def delivery_order(route_plan):
+    """
+    Порядок выполненных доставок по плану маршрута.
+    """
+    return [
+        step["id"] for step in route_plan
+        if step["type"] == "delivery" and step["id"] is not None and not step.get("refused", False)
+    ]
+
+
+def no_solution_result(rejected):
+    """
+    Ответ для случая, когда ни одну доставку выполнить нельзя.
+
+    Args:
+        rejected (list): Доставки, отклонённые предварительной проверкой.
+    """
+    logger.warning("Решение не найдено (все доставки пропущены)")
+    return {
+        "route_order": [],
+        "osm_url": "",
+        "message": "Решение не найдено (все доставки пропущены)",
+        "rejected": rejected
+    }
+
+
+def plan_objective(sub_data, routes, served):
+    """
+    Показатели качества плана для сравнения решений: число выполненных доставок, суммарные
+    расстояние и время в пути по маршрутам.
+
+    Args:
+        sub_data (dict): Данные подзадачи.
+        routes (list): Маршруты ТС (списки узлов от депо начала до депо окончания).
+        served (int): Число выполненных доставок.
+
+    Returns:
+        dict: served, distance (м) и travel_time (минуты, по матрице без профиля загруженности).
+    """
+    dm = sub_data["distance_matrix"]
+    tm = sub_data["time_matrix"]
+    distance = 0.0
+    travel_time = 0
+    for route_nodes in routes:
+        for a, b in zip(route_nodes, route_nodes[1:]):
+            distance += dm[a][b]
+            travel_time += tm[a][b]
+    return {"served": served, "distance": round(distance), "travel_time": int(travel_time)}
+
+
+def run_optimization(data, matrices=None, timer=None, recorder=None, cancel=None, qos=None, solution_limit=None):
     """
     Основная функция для запуска оптимизации маршрута доставки.
 
     Args:
         data (object): Объект DeliveryRequest, содержащий депо, доставки и склады.
+        matrices (tuple, optional): Готовые матрицы расстояний и продолжительности для build_subproblem.
+        timer (StageTimer, optional): Замер этапов matrix (матрицы), presolve (проверка окон) и solve (решатель).
+        recorder (RequestRecorder, optional): Запись запроса для воспроизведения (services.capture):
+            получает снимок складов, переданных по ID, и матрицы подзадачи.
+        cancel (CancellationToken, optional): Признак отмены расчёта. Отмена до решателя или до первого
+            решения прерывает расчёт, во время поиска - останавливает поиск с лучшим найденным решением
+            (причина отмены возвращается в поле cancelled). При отключении клиента план не применяется к складам.
+        qos (QosProfile, optional): Профиль качества при перегрузке (services.qos); при haversine матрицы
+            без готовых matrices оцениваются по прямой вместо OSRM, при first_solution поиск OR-Tools
+            останавливается на начальном решении. Остальные опции профиля уже применены к data.
+        solution_limit (int, optional): Наибольшее число решений поиска OR-Tools (search_parameters), например
+            для воспроизведения с результатом, не зависящим от скорости машины.
 
     Returns:
         dict: Содержит 'route_order', 'osm_url' и 'message'.
+
+    Raises:
+        RequestCancelled: Если расчёт отменён до решателя или до первого решения либо клиент отключился.
     """
+    timer = timer or StageTimer()
     try:
         # 1. Подготовка: Извлечение доставок и складов из входных данных
         deliveries_input = data.deliveries
-        logger.info(f"Получены данные: {data}")
-        for delivery in data.deliveries:
-            logger.info(f"Доставка ID: {delivery.id}, Координаты: {delivery.coord}, Приоритет: {delivery.priority}")
-
-        # Обработка складов и создание копии запасов
-        warehouses = []
-        warehouse_stock = {}
-        for w in data.warehouses:
-            warehouses.append({
-                "id": w.id,
-                "coord": w.coord,
-                "capacity": w.capacity,
-                "usage": w.usage,
-            })
-            warehouse_stock[w.id] = w.stock.copy()
+        logger.info(f"Получены данные: {len(deliveries_input)} доставок, "
+                    f"{len(data.warehouses) or len(data.warehouse_ids)} складов")
+        if logger.isEnabledFor(logging.DEBUG):
+            for delivery in data.deliveries:
+                logger.debug(f"Доставка ID: {delivery.id}, Координаты: {delivery.coord}, Приоритет: {delivery.priority}")
+
+        # Обработка складов: точки для подзадачи и журнал запасов склад x товар.
+        # Склады, переданные по ID, берутся из хранилища состояния складов
+        warehouse_store = get_warehouse_store() if data.warehouse_ids else None
+        if warehouse_store is not None:
+            warehouses = warehouse_store.resolve(data.warehouse_ids)
+            inventory = warehouse_store.begin()
+            if recorder is not None:
+                recorder.record_warehouses([warehouse_store.get(wh_id) for wh_id in data.warehouse_ids])
+        else:
+            warehouses = []
+            for w in data.warehouses:
+                warehouses.append({
+                    "id": w.id,
+                    "coord": w.coord,
+                    "capacity": w.capacity,
+                    "usage": w.usage,
+                })
+            inventory = InventoryLedger.from_warehouses(data.warehouses).begin()
+
+        # Транспортные средства и их депо
+        vehicles = resolve_vehicles(data)
+        max_capacity = max(v["capacity"] for v in vehicles)
+
+        # Профиль качества при перегрузке: матрицы по прямой по всем точкам запроса вместо OSRM
+        if matrices is None and qos is not None and qos.haversine:
+            coords = (deliveries_input.coords.tolist() if isinstance(deliveries_input, DeliveryTable)
+                      else [d.coord for d in deliveries_input])
+            points = ([data.depot_coord] + [w["coord"] for w in warehouses] + coords
+                      + vehicle_terminals(data.depot_coord, vehicles)[0])
+            matrices = haversine_matrices(points)
+
+        # Предварительная проверка: заведомо невыполнимые доставки не попадают в модель
+        keep, rejected = screen_deliveries(deliveries_input, max_capacity, inventory,
+                                           check_origin=not data.assign_warehouses)
+        first_terminal = 1 + len(warehouses) + len(deliveries_input)
+        if rejected:
+            deliveries_input = take(deliveries_input, keep)
+        if not keep:
+            return no_solution_result(rejected)
+
+        # Доставки в одной точке объединяются в один узел подзадачи
+        merged = None
+        if data.aggregate_colocated:
+            deliveries_input, merged = aggregate_colocated(deliveries_input, max_capacity)
+            if merged is not None:
+                keep = [keep[pos] for pos in merged]
+
+        # Узлы подзадачи в полной подзадаче запроса: склады, оставшиеся доставки (для групп - доставка,
+        # чьи координаты использует группа) и депо ТС (они идут после всех доставок)
+        n_terminals = len(vehicle_terminals(data.depot_coord, vehicles)[0])
+        nodes = (list(range(1 + len(warehouses))) + [1 + len(warehouses) + pos for pos in keep]
+                 + list(range(first_terminal, first_terminal + n_terminals)))
+        if matrices is not None and (rejected or merged is not None):
+            matrices = tuple(np.asarray(m)[np.ix_(nodes, nodes)] for m in matrices)
+
+        # Склады-кандидаты для каждой доставки, если склад-источник выбирает решатель
+        pickup_options = None
+        if data.assign_warehouses:
+            pickup_options = find_source_warehouses(deliveries_input, warehouses, inventory.ledger)
 
         # Построение подзадачи для решателя VRP
-        sub_data = build_subproblem(deliveries_input, data.depot_coord, warehouses)
-
-        # Решение VRP
-        route_nodes, skipped_nodes = solve_vrp_multy_warehouse(sub_data, deliveries_input, data.vehicle_capacity,
-                                                               big_penalty=100000)
-
-        if route_nodes is None:
-            logger.warning("Решение не найдено (все доставки пропущены)")
-            return {
-                "route_order": [],
-                "osm_url": "",
-                "message": "Решение не найдено (все доставки пропущены)"
-            }
+        with timer.stage("matrix"):
+            sub_data = build_subproblem(deliveries_input, data.depot_coord, warehouses, pickup_options, matrices,
+                                        vehicles, data.nearest_neighbors)
+        if recorder is not None:
+            recorder.record_matrices(sub_data, nodes, first_terminal + n_terminals)
+
+        # Проверка достижимости окон по матрице времени и сокращение подзадачи
+        time_factor = min(1.0, min(data.traffic_profile)) if data.traffic_profile else 1.0
+        max_lateness = data.max_lateness if data.soft_time_windows else None
+        with timer.stage("presolve"):
+            sub_data, unreachable = screen_subproblem(sub_data, time_factor, max_lateness or 0)
+        if unreachable:
+            rejected += expand_rejected(unreachable, deliveries_input)
+            deliveries_input = sub_data["del_list"]
+            if not len(deliveries_input):
+                return no_solution_result(rejected)
+
+        # Отменённый до решателя расчёт не запускает поиск
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+
+        # Решение VRP: одной моделью или последовательно по уровням приоритета
+        if qos is not None and qos.first_solution:
+            solution_limit = 1
+        with timer.stage("solve"):
+            if data.solve_by_priority:
+                routes, skipped_nodes, arrival_times = solve_by_priority_tiers(
+                    sub_data, deliveries_input, data.vehicle_capacity,
+                    big_penalty=100000,
+                    time_limit=data.time_limit,
+                    traffic_profile=data.traffic_profile,
+                    max_lateness=max_lateness,
+                    solver=data.solver,
+                    cancel=cancel,
+                    solution_limit=solution_limit
+                )
+            else:
+                routes, skipped_nodes, arrival_times = solve_vrp_multy_warehouse(
+                    sub_data, deliveries_input, data.vehicle_capacity,
+                    big_penalty=100000,
+                    time_limit=data.time_limit,
+                    traffic_profile=data.traffic_profile,
+                    driver_rules=data.driver_rules,
+                    max_lateness=max_lateness,
+                    solver=data.solver,
+                    cancel=cancel,
+                    solution_limit=solution_limit
+                )
+
+        # Ответ отключившемуся клиенту не нужен, а план не применяется к складам
+        if cancel is not None and cancel.reason == DISCONNECT:
+            raise RequestCancelled(DISCONNECT)
+
+        if routes is None:
+            return no_solution_result(rejected)
+        route_nodes = [node for vehicle_nodes in routes for node in vehicle_nodes]
 
         # Обработка пропущенных узлов путем отметки доставок как отказанных
         for node in skipped_nodes:
             if node > len(warehouses):
                 d_idx = node - 1 - len(warehouses)
                 if 0 <= d_idx < len(deliveries_input):
-                    deliveries_input[d_idx].refused = True
+                    for d in members(deliveries_input[d_idx]):
+                        d.refused = True
 
         served_orders = []
         total_warehouses = len(warehouses)
@@ -493,54 +1280,76 @@ def run_optimization(data):
             if node > total_warehouses:  # Это "доставка"
                 d_idx = node - 1 - total_warehouses
                 if 0 <= d_idx < len(deliveries_input):
-                    served_orders.append(deliveries_input[d_idx])
+                    served_orders.extend(members(deliveries_input[d_idx]))
 
-        # Обновление запасов и использования на складах после выполнения доставок
-        update_warehouse_after_delivery(served_orders, warehouse_stock, warehouses)
-
-        # Построение плана маршрута с подробными шагами
-        route_plan = []
+        # Склады, выбранные решателем для доставок (по посещённым узлам забора)
+        pickup_by_node = {p["node"]: p for p in sub_data["pickups"]}
+        warehouse_assignment = {}
         for node in route_nodes:
-            if node == 0:
-                # Депо
-                route_plan.append({
-                    "node_index": 0,
-                    "type": "depot",
-                    "id": None,
-                    "refused": False
-                })
-            elif 1 <= node <= total_warehouses:
-                # Склад
-                wh = warehouses[node - 1]
-                route_plan.append({
-                    "node_index": node,
-                    "type": "warehouse",
-                    "id": wh["id"],
-                    "refused": False
-                })
-            else:
-                # Доставка
+            if node in pickup_by_node:
+                p = pickup_by_node[node]
+                warehouse_assignment[deliveries_input[p["delivery"]].id] = warehouses[p["warehouse"]]["id"]
+
+        # Обновление запасов и использования на складах после выполнения доставок
+        update_warehouse_after_delivery(served_orders, inventory, warehouse_assignment)
+
+        # Построение плана маршрута с подробными шагами для каждого ТС
+        depot_nodes = set(sub_data["depot_nodes"])
+        vehicle_plans = [[] for _ in routes]
+        for vehicle_plan, vehicle_nodes in zip(vehicle_plans, routes):
+            for node in vehicle_nodes:
+                step = route_step(node, depot_nodes, pickup_by_node, warehouses, deliveries_input)
+                if step is not None:
+                    vehicle_plan.append(step)
+        if merged is not None:
+            # Шаг объединённого узла заменяется шагами его доставок
+            vehicle_plans = [expand_plan(vehicle_plan, deliveries_input, len(warehouses))
+                             for vehicle_plan in vehicle_plans]
+        route_plan = [step for vehicle_plan in vehicle_plans for step in vehicle_plan]
+
+        # Опоздания к концу окна (возможны только при мягких окнах)
+        late_deliveries = []
+        tw = sub_data["time_windows"]
+        for vehicle_nodes, vehicle_times in zip(routes, arrival_times):
+            for node, arrival in zip(vehicle_nodes, vehicle_times):
                 d_idx = node - 1 - total_warehouses
-                if 0 <= d_idx < len(deliveries_input):
-                    d = deliveries_input[d_idx]
-                    route_plan.append({
-                        "node_index": node,
-                        "type": "delivery",
-                        "id": d.id,
-                        "refused": d.refused
-                    })
+                if not 0 <= d_idx < len(deliveries_input) or arrival <= tw[node][1]:
+                    continue
+                # Доставки объединённого узла обслуживаются подряд со сдвигом от прибытия;
+                # окно узла не позже окна каждой из них, поэтому опоздать могут только при опоздании в узел
+                entry = deliveries_input[d_idx]
+                for d, offset in zip(members(entry), getattr(entry, "offsets", [0])):
+                    start = arrival + offset
+                    if start > d.time_window[1]:
+                        late_deliveries.append({"id": d.id, "arrival": start, "lateness": start - d.time_window[1]})
 
         # Обработка отказов путем возврата товаров на склады
-        handle_refusal(route_plan, deliveries_input, warehouses, warehouse_stock)
+        road_matrix = sub_data["distance_matrix"] if data.refusal_ranking == "road" else None
+        if merged is not None:
+            deliveries_input = expand_deliveries(deliveries_input)
+        handle_refusal(route_plan, deliveries_input, warehouses, inventory, road_matrix)
+
+        # Применение всех изменений запасов по плану одной транзакцией
+        if warehouse_store is not None:
+            inventory_result = warehouse_store.commit(inventory)
+        else:
+            inventory_result = inventory.commit()
 
         # Генерация URL для отображения маршрута на OpenStreetMap
         osm_url = build_osm_route_url(route_plan, sub_data["sub_points"])
 
         # Извлечение окончательного порядка доставок для ответа
-        route_order = [
-            step["id"] for step in route_plan
-            if step["type"] == "delivery" and step["id"] is not None and not step.get("refused", False)
-        ]
+        route_order = delivery_order(route_plan)
+
+        # Маршруты по транспортным средствам
+        vehicle_routes = []
+        for vehicle, vehicle_plan in zip(vehicles, vehicle_plans):
+            order = delivery_order(vehicle_plan)
+            vehicle_routes.append({
+                "vehicle_id": vehicle["id"],
+                "route_order": order,
+                "osm_url": build_osm_route_url(vehicle_plan, sub_data["sub_points"]) if order else ""
+            })
 
         # Проверка, были ли выполнены какие-либо доставки
         if not route_order:
@@ -550,23 +1359,35 @@ def run_optimization(data):
             message = "OK"
 
         # Логирование фактического и ожидаемого порядка доставки для отладки
-        logger.info(f"Фактический порядок доставки: {route_order}")
-        sorted_by_priority = sorted(
-            [d.id for d in deliveries_input if not d.refused],
-            key=lambda x: PRIORITY_RANKING.get(next((d.priority for d in deliveries_input if d.id == x), "low").lower(),
-                                               1),
-            reverse=True
-        )
-        logger.info(f"Ожидаемый порядок доставки: {sorted_by_priority}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Фактический порядок доставки: {route_order}")
+            sorted_by_priority = sorted(
+                [d for d in deliveries_input if not d.refused],
+                key=lambda d: PRIORITY_RANKING.get(d.priority.lower(), 1),
+                reverse=True
+            )
+            logger.debug(f"Ожидаемый порядок доставки: {[d.id for d in sorted_by_priority]}")
 
         # Возврат результата оптимизации
         logger.info("Оптимизация успешно завершена.")
         return {
             "route_order": route_order,
             "osm_url": osm_url,
-            "message": message
+            "message": message,
+            "warehouse_assignment": warehouse_assignment,
+            "inventory": inventory_result["inventory"],
+            "stock_shortages": inventory_result["shortages"],
+            "rejected": rejected,
+            "routes": vehicle_routes,
+            "late_deliveries": late_deliveries,
+            "objective": plan_objective(sub_data, routes, len(route_order)),
+            "cancelled": cancel.reason if cancel is not None else None
         }
 
+    except RequestCancelled as e:
+        logger.info(f"Расчёт прерван: {e.reason}")
+        raise
+
     except Exception as e:
         logger.exception(f"Ошибка в run_optimization: {e}")
         raise
@@ -0,0 +1,66 @@
+import os
+import requests
+import logging
+from services.road_graph import get_road_graph
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Базовый адрес сервера OSRM (переменная окружения OSRM_BASE_URL, например локальный сервер или заглушка)
+OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org")
+
+
+def fetch_osrm_table(points, sources=None, destinations=None, timeout=10):
+    """
+    Запрашивает у OSRM матрицы расстояний и продолжительности между точками.
+
+    Args:
+        points (list): Список координат точек (широта, долгота).
+        sources (list, optional): Индексы точек-источников. По умолчанию все точки.
+        destinations (list, optional): Индексы точек-назначений. По умолчанию все точки.
+        timeout (int, optional): Таймаут запроса в секундах. По умолчанию 10.
+
+    Returns:
+        tuple: (distances, durations) — матрицы размера len(sources) x len(destinations)
+            в метрах и секундах соответственно.
+    """
+    coords_str = ";".join([f"{lon},{lat}" for lat, lon in points])
+    url = f"{OSRM_BASE_URL}/table/v1/driving/{coords_str}?annotations=distance,duration"
+    if sources is not None:
+        url += "&sources=" + ";".join(str(i) for i in sources)
+    if destinations is not None:
+        url += "&destinations=" + ";".join(str(i) for i in destinations)
+
+    try:
+        resp = requests.get(url, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json()
+    except requests.RequestException as e:
+        logger.exception(f"Запрос к OSRM не удался: {e}")
+        raise
+
+    if "distances" not in data or "durations" not in data:
+        logger.error("Недопустимая подматрица OSRM")
+        raise Exception("Недопустимая подматрица OSRM")
+
+    return data["distances"], data["durations"]
+
+
+def fetch_table(points, sources=None, destinations=None):
+    """
+    Матрицы расстояний и продолжительности от настроенного поставщика: встроенный маршрутизатор
+    по локальному графу дорог (переменная окружения ROAD_GRAPH_PATH) или сервер OSRM.
+
+    Args:
+        points (list): Список координат точек (широта, долгота).
+        sources (list, optional): Индексы точек-источников. По умолчанию все точки.
+        destinations (list, optional): Индексы точек-назначений. По умолчанию все точки.
+
+    Returns:
+        tuple: (distances, durations) — матрицы размера len(sources) x len(destinations)
+            в метрах и секундах соответственно.
+    """
+    graph = get_road_graph()
+    if graph is not None:
+        return graph.table(points, sources, destinations)
+    return fetch_osrm_table(points, sources, destinations)
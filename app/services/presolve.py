@@ -0,0 +1,220 @@
+import logging
+import numpy as np
+from services.sparse_arcs import is_sparse, restrict_rows
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Горизонт планирования, минуты от полуночи (совпадает с вместимостью измерения времени решателя)
+HORIZON = 1440
+
+# Коды причин отклонения доставок
+DEMAND_EXCEEDS_CAPACITY = "DEMAND_EXCEEDS_CAPACITY"
+INVALID_TIME_WINDOW = "INVALID_TIME_WINDOW"
+HORIZON_EXCEEDED = "HORIZON_EXCEEDED"
+TIME_WINDOW_UNREACHABLE = "TIME_WINDOW_UNREACHABLE"
+UNKNOWN_WAREHOUSE = "UNKNOWN_WAREHOUSE"
+INSUFFICIENT_STOCK = "INSUFFICIENT_STOCK"
+NO_WAREHOUSE_WITH_STOCK = "NO_WAREHOUSE_WITH_STOCK"
+
+
+def take(deliveries, positions):
+    """
+    Выбирает доставки по позициям, сохраняя тип контейнера (список или DeliveryTable).
+    """
+    if hasattr(deliveries, "take"):
+        return deliveries.take(positions)
+    return [deliveries[i] for i in positions]
+
+
+def screen_deliveries(deliveries, vehicle_capacity, inventory, check_origin=True):
+    """
+    Отбрасывает доставки, которые заведомо нельзя выполнить, до построения подзадачи.
+
+    Проверки не требуют матриц и выполняются за один проход: спрос больше вместимости ТС,
+    некорректное временное окно, окно за пределами горизонта, а при работе от origin_warehouse —
+    неизвестный склад и нехватка на нём товаров доставки (для доставок без отказа).
+
+    Args:
+        deliveries (list | DeliveryTable): Доставки запроса.
+        vehicle_capacity (int): Вместимость транспортного средства.
+        inventory (InventoryTransaction): Транзакция складского учёта (для запасов складов).
+        check_origin (bool, optional): Проверять origin_warehouse. False, если склад выбирает решатель.
+
+    Returns:
+        tuple: (keep, rejected) — позиции оставшихся доставок и список отклонённых
+            вида {"id", "reason", "detail"}.
+    """
+    ledger = inventory.ledger
+    keep = []
+    rejected = []
+    for pos, d in enumerate(deliveries):
+        start, end = d.time_window
+        if d.demand > vehicle_capacity:
+            reason, detail = DEMAND_EXCEEDS_CAPACITY, f"Спрос {d.demand} больше вместимости ТС {vehicle_capacity}"
+        elif start > end or start < 0:
+            reason, detail = INVALID_TIME_WINDOW, f"Некорректное временное окно [{start}, {end}]"
+        elif start > HORIZON:
+            reason, detail = HORIZON_EXCEEDED, f"Окно начинается после конца горизонта {HORIZON}"
+        elif check_origin and not ledger.has_warehouse(d.origin_warehouse):
+            reason, detail = UNKNOWN_WAREHOUSE, f"Склад {d.origin_warehouse} не передан в запросе"
+        elif check_origin and not d.refused and (missing := _missing_item(d, ledger)) is not None:
+            guid, required, available = missing
+            reason = INSUFFICIENT_STOCK
+            detail = f"На складе {d.origin_warehouse} товара {guid}: {available}, требуется {required}"
+        else:
+            keep.append(pos)
+            continue
+        rejected.append({"id": d.id, "reason": reason, "detail": detail})
+
+    if rejected:
+        logger.info(f"Предварительная проверка отклонила {len(rejected)} доставок")
+    return keep, rejected
+
+
+def _missing_item(delivery, ledger):
+    items = {}
+    for it in delivery.items:
+        items[it.guid] = items.get(it.guid, 0) + it.count
+    for guid, count in items.items():
+        available = ledger.stock_of(delivery.origin_warehouse, guid)
+        if available < count:
+            return guid, count, available
+    return None
+
+
+def screen_subproblem(sub_data, time_factor=1.0, max_lateness=0):
+    """
+    Отбрасывает из подзадачи доставки, недостижимые по матрице времени.
+
+    Нижняя оценка прибытия в доставку — выезд из ближайшего депо ТС в момент 0 и прямой переезд
+    (или переезд через лучший узел забора, если склад выбирает решатель). Доставка отклоняется,
+    если даже так окно уже закрыто, если после неё нельзя вернуться ни в одно депо возврата до конца
+    горизонта или если для неё нет ни одного склада с нужными товарами.
+
+    Args:
+        sub_data (dict): Данные подзадачи из build_subproblem.
+        time_factor (float, optional): Наименьший множитель времени в пути (при профиле загруженности
+            с множителями меньше 1 оценки времени уменьшаются, чтобы остаться нижними).
+        max_lateness (int, optional): Допустимое опоздание к концу окна при мягких окнах, минуты.
+
+    Returns:
+        tuple: (sub_data, rejected) — подзадача без отклонённых доставок и список отклонённых.
+    """
+    time_m = sub_data["time_matrix"]
+    tw = sub_data["time_windows"]
+    svc = sub_data["service_times"]
+    n_wh = len(sub_data["wh_list"])
+    del_list = sub_data["del_list"]
+
+    pickups_by_node = {}
+    for p in sub_data["pickups"]:
+        pickups_by_node.setdefault(p["delivery_node"], []).append(p["node"])
+    assign = sub_data.get("assign_warehouses", False)
+
+    # Наименьшее время от депо выезда до узла и от узла до депо возврата
+    starts = sorted(set(sub_data.get("vehicle_starts", [0])))
+    ends = sorted(set(sub_data.get("vehicle_ends", [0])))
+    if is_sparse(time_m):
+        # Строки депо полные, а из каждого узла есть дуги во все депо
+        n = len(time_m)
+        from_start = [min(time_m[s][j] for s in starts) for j in range(n)]
+        to_end = [min(row[e] for e in ends) for row in time_m]
+    else:
+        time_arr = np.asarray(time_m, dtype=np.int64)
+        from_start = time_arr[starts].min(axis=0).tolist()
+        to_end = time_arr[:, ends].min(axis=1).tolist()
+
+    keep = []
+    rejected = []
+    for pos in range(len(del_list)):
+        node = 1 + n_wh + pos
+        start, end = tw[node]
+        if assign:
+            options = pickups_by_node.get(node)
+            if not options:
+                rejected.append({"id": del_list[pos].id, "reason": NO_WAREHOUSE_WITH_STOCK,
+                                 "detail": "Ни на одном складе нет всех товаров доставки"})
+                continue
+            earliest = min(int(from_start[p] * time_factor) + svc[p] + int(time_m[p][node] * time_factor)
+                           for p in options)
+        else:
+            earliest = int(from_start[node] * time_factor)
+
+        arrival = max(earliest, start)
+        if arrival > end + max_lateness:
+            rejected.append({"id": del_list[pos].id, "reason": TIME_WINDOW_UNREACHABLE,
+                             "detail": f"Раннее прибытие {earliest} после конца окна {end}"})
+        elif arrival + svc[node] + int(to_end[node] * time_factor) > HORIZON:
+            rejected.append({"id": del_list[pos].id, "reason": HORIZON_EXCEEDED,
+                             "detail": f"Возврат в депо после конца горизонта {HORIZON}"})
+        else:
+            keep.append(pos)
+
+    if not rejected:
+        return sub_data, rejected
+    logger.info(f"Проверка достижимости отклонила {len(rejected)} доставок")
+    return restrict_subproblem(sub_data, keep), rejected
+
+
+def restrict_subproblem(sub_data, keep):
+    """
+    Оставляет в подзадаче только доставки с заданными позициями.
+
+    Депо и склады сохраняются, узлы доставок, депо ТС и узлы забора перенумеровываются, матрицы
+    вырезаются по оставшимся узлам.
+
+    Args:
+        sub_data (dict): Данные подзадачи из build_subproblem.
+        keep (list): Возрастающие позиции оставляемых доставок в sub_data["del_list"].
+
+    Returns:
+        dict: Новые данные подзадачи той же структуры.
+    """
+    n_wh = len(sub_data["wh_list"])
+    depot_nodes = sub_data.get("depot_nodes", [0])
+    nodes = list(range(1 + n_wh)) + [1 + n_wh + pos for pos in keep] + list(depot_nodes[1:])
+    node_map = {old: new for new, old in enumerate(nodes)}
+    position_map = {old: new for new, old in enumerate(keep)}
+
+    pickups = []
+    for p in sub_data["pickups"]:
+        if p["delivery"] in position_map:
+            node_map[p["node"]] = len(nodes)
+            nodes.append(p["node"])
+            pickups.append({
+                "node": node_map[p["node"]],
+                "delivery_node": node_map[p["delivery_node"]],
+                "delivery": position_map[p["delivery"]],
+                "warehouse": p["warehouse"],
+            })
+
+    stock_limits = []
+    for limit in sub_data["stock_limits"]:
+        kept = [(node_map[node], count) for node, count in limit["pickups"] if node in node_map]
+        if sum(count for _, count in kept) > limit["available"]:
+            stock_limits.append({"pickups": kept, "available": limit["available"]})
+
+    if is_sparse(sub_data["time_matrix"]):
+        distance_matrix = restrict_rows(sub_data["distance_matrix"], nodes)
+        time_matrix = restrict_rows(sub_data["time_matrix"], nodes)
+    else:
+        sel = np.ix_(nodes, nodes)
+        distance_matrix = np.asarray(sub_data["distance_matrix"])[sel].tolist()
+        time_matrix = np.asarray(sub_data["time_matrix"])[sel].tolist()
+    return dict(
+        sub_data,
+        sub_points=[sub_data["sub_points"][i] for i in nodes],
+        del_list=take(sub_data["del_list"], keep),
+        distance_matrix=distance_matrix,
+        time_matrix=time_matrix,
+        time_windows=[sub_data["time_windows"][i] for i in nodes],
+        service_times=[sub_data["service_times"][i] for i in nodes],
+        demands=[sub_data["demands"][i] for i in nodes],
+        priorities=[sub_data["priorities"][pos] for pos in keep],
+        pickups=pickups,
+        stock_limits=stock_limits,
+        depot_nodes=[node_map[node] for node in depot_nodes],
+        vehicle_starts=[node_map[node] for node in sub_data.get("vehicle_starts", [0])],
+        vehicle_ends=[node_map[node] for node in sub_data.get("vehicle_ends", [0])],
+    )
@@ -0,0 +1,174 @@
+import json
+import math
+import os
+import logging
+from functools import lru_cache
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError, parse_obj_as
+from typing import List, Optional
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с профилями качества в формате JSON (список QosProfile); "[]" отключает деградацию
+QOS_PROFILES_ENV = "QOS_PROFILES"
+
+# Профиль без деградации: запрос решается как передан
+FULL = "full"
+
+# Профили по умолчанию от мягкого к самому дешёвому. Пороги: число ожидающих расчётов в очереди
+# (queue_depth) и средняя загрузка CPU за минуту на ядро (load)
+DEFAULT_PROFILES = [
+    {"name": "reduced", "queue_depth": 4, "load": 1.0, "time_limit_share": 0.5},
+    {"name": "decomposed", "queue_depth": 8, "load": 1.5, "time_limit_share": 0.25, "decompose": True},
+    {"name": "first_solution", "queue_depth": 16, "load": 2.0, "first_solution": True},
+    {"name": "estimated", "queue_depth": 32, "load": 3.0, "first_solution": True, "haversine": True},
+]
+
+# Оценка дорожной матрицы по прямой: извилистость дорог и средняя скорость в городе
+ROAD_FACTOR = 1.3
+AVERAGE_SPEED_KMH = 30
+
+# Радиус Земли в метрах
+EARTH_RADIUS_M = 6371000
+
+
+class QosProfile(BaseModel):
+    """
+    Профиль качества расчёта: когда он включается и как удешевляет расчёт.
+
+    Attributes:
+        name (str): Имя профиля, возвращается в ответе в поле qos_profile.
+        queue_depth (Optional[int]): Включается, когда в очереди расчётов не меньше стольких запросов.
+        load (Optional[float]): Включается, когда средняя загрузка CPU на ядро не меньше этого значения.
+        time_limit_share (float): Доля time_limit запроса, которая остаётся на поиск. По умолчанию 1.
+        decompose (bool): Решать по уровням приоритета (solve_by_priority), если запрос это допускает.
+        first_solution (bool): Только начальное решение: эвристика (solver "heuristic"), если запрос её
+            допускает, иначе начальное решение OR-Tools без локального поиска (run_optimization) с наименьшим
+            time_limit.
+        haversine (bool): Матрицы по расстоянию по прямой вместо OSRM.
+    """
+    name: str = Field(..., description="Имя профиля")
+    queue_depth: Optional[int] = Field(None, ge=0, description="Порог числа ожидающих расчётов")
+    load: Optional[float] = Field(None, ge=0, description="Порог загрузки CPU на ядро")
+    time_limit_share: float = Field(1.0, gt=0, le=1, description="Доля time_limit на поиск")
+    decompose: bool = Field(False, description="Решать по уровням приоритета")
+    first_solution: bool = Field(False, description="Только начальное решение")
+    haversine: bool = Field(False, description="Матрицы по прямой вместо OSRM")
+
+    def matches(self, queue_depth, load):
+        """
+        Достигнут ли порог профиля; load=None - загрузка CPU не учитывается.
+        """
+        return ((self.queue_depth is not None and queue_depth >= self.queue_depth)
+                or (self.load is not None and load is not None and load >= self.load))
+
+    def changes(self, data):
+        """
+        Поля запроса, которые меняет профиль; опции, которые запрос не допускает, пропускаются.
+
+        Args:
+            data (DeliveryRequest): Проверенный запрос.
+
+        Returns:
+            dict: Новые значения полей time_limit, solver и solve_by_priority.
+        """
+        update = {"time_limit": max(1, math.floor(data.time_limit * self.time_limit_share))}
+        if self.decompose and not (data.driver_rules or data.assign_warehouses or data.nearest_neighbors):
+            update["solve_by_priority"] = True
+        if self.first_solution:
+            if data.driver_rules or data.soft_time_windows or data.assign_warehouses or data.nearest_neighbors:
+                update["time_limit"] = 1
+            else:
+                update["solver"] = "heuristic"
+        return update
+
+    def apply(self, data):
+        """
+        Удешевлённая копия запроса (см. changes).
+
+        Args:
+            data (DeliveryRequest): Проверенный запрос.
+
+        Returns:
+            DeliveryRequest: Запрос с уменьшенным time_limit, эвристикой или решением по уровням.
+        """
+        return data.copy(update=self.changes(data))
+
+
+FULL_PROFILE = QosProfile(name=FULL)
+
+
+def load_profiles():
+    """
+    Профили качества из переменной окружения QOS_PROFILES или DEFAULT_PROFILES.
+
+    Returns:
+        list: Объекты QosProfile от мягкого к самому дешёвому.
+    """
+    return _parse_profiles(os.getenv(QOS_PROFILES_ENV))
+
+
+@lru_cache(maxsize=8)
+def _parse_profiles(raw):
+    if raw:
+        try:
+            return parse_obj_as(List[QosProfile], json.loads(raw))
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Некорректное значение {QOS_PROFILES_ENV}, используются профили по умолчанию: {e}")
+    return parse_obj_as(List[QosProfile], DEFAULT_PROFILES)
+
+
+def cpu_load():
+    """
+    Средняя загрузка CPU за минуту на ядро; 0, если система её не сообщает.
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 0.0
+
+
+def choose_profile(profiles, queue_depth, load):
+    """
+    Выбирает самый дешёвый профиль, порог которого достигнут.
+
+    Загрузка CPU учитывается, только когда есть ожидающие расчёты: без очереди расчёт начинается
+    сразу, и удешевление не сократило бы ничьё ожидание.
+
+    Args:
+        profiles (list): Профили QosProfile от мягкого к самому дешёвому.
+        queue_depth (int): Число ожидающих расчётов в очереди.
+        load (float): Средняя загрузка CPU на ядро.
+
+    Returns:
+        QosProfile: Выбранный профиль; FULL_PROFILE, если нагрузка ниже всех порогов.
+    """
+    chosen = FULL_PROFILE
+    for profile in profiles:
+        if profile.matches(queue_depth, load if queue_depth else None):
+            chosen = profile
+    if chosen is not FULL_PROFILE:
+        logger.info(f"Профиль качества {chosen.name}: в очереди {queue_depth}, загрузка CPU {load:.2f}")
+    return chosen
+
+
+def haversine_matrices(points):
+    """
+    Оценка матриц расстояний и продолжительности по расстоянию по прямой, без OSRM.
+
+    Расстояние по прямой умножается на ROAD_FACTOR, время - расстояние при AVERAGE_SPEED_KMH.
+
+    Args:
+        points (list): Координаты точек (широта, долгота).
+
+    Returns:
+        tuple: (distances, durations) - матрицы в метрах и секундах.
+    """
+    coords = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat, lon = coords[:, 0], coords[:, 1]
+    a = (np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+         + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2)
+    distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * ROAD_FACTOR
+    durations = distances / (AVERAGE_SPEED_KMH / 3.6)
+    return distances, durations
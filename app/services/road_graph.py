@@ -0,0 +1,460 @@
+import heapq
+import logging
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+from services.spatial_index import GeoKDTree
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с путём к графу дорог: выгрузка OSM (.osm) или подготовленный граф (.npz)
+ROAD_GRAPH_ENV = "ROAD_GRAPH_PATH"
+
+# Скорость по умолчанию для классов дорог OSM (тег highway), км/ч; дороги других классов не используются
+HIGHWAY_SPEEDS = {
+    "motorway": 90, "motorway_link": 45,
+    "trunk": 80, "trunk_link": 40,
+    "primary": 60, "primary_link": 30,
+    "secondary": 50, "secondary_link": 25,
+    "tertiary": 40, "tertiary_link": 20,
+    "unclassified": 30, "residential": 25,
+    "living_street": 10, "service": 15,
+}
+
+# Число узлов, просматриваемых при поиске обходного пути при сжатии узла:
+# если обход не найден в этих пределах, добавляется (возможно лишний) shortcut
+WITNESS_SETTLE_LIMIT = 64
+
+# Число назначений, корзины которых обрабатываются вместе при расчёте таблицы
+TABLE_BLOCK = 256
+
+# Радиус Земли в метрах
+EARTH_RADIUS_M = 6371000
+
+# Кэш открытых графов: путь -> (mtime файла, RoadGraph)
+_open_graphs = {}
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def parse_speed(tags):
+    """
+    Скорость движения по дороге, км/ч: из тега maxspeed, иначе по классу дороги.
+
+    Returns:
+        float | None: Скорость или None, если дорога не предназначена для автомобилей.
+    """
+    default = HIGHWAY_SPEEDS.get(tags.get("highway"))
+    if default is None or tags.get("access") in ("no", "private") or tags.get("motor_vehicle") == "no":
+        return None
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", tags.get("maxspeed", ""))
+    if match:
+        speed = float(match.group(1)) * (1.609 if match.group(2) else 1)
+        if speed > 0:
+            return speed
+    return default
+
+
+def parse_osm(path):
+    """
+    Читает выгрузку OSM в формате XML и строит рёбра дорожного графа.
+
+    Учитываются дороги классов HIGHWAY_SPEEDS, одностороннее движение (oneway, круговое движение)
+    и ограничения скорости. Рёбра соединяют соседние точки линии дороги.
+
+    Args:
+        path (str): Путь к файлу .osm.
+
+    Returns:
+        tuple: (coords, tails, heads, distances, durations) - координаты узлов графа (широта, долгота)
+            и массивы рёбер: начало, конец, длина в метрах, время в секундах.
+    """
+    node_coords = {}
+    ways = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            node_coords[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+        elif elem.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            speed = parse_speed(tags)
+            if speed is not None:
+                refs = [nd.get("ref") for nd in elem.iter("nd")]
+                oneway = tags.get("oneway", "no")
+                if oneway == "no" and tags.get("junction") in ("roundabout", "circular"):
+                    oneway = "yes"
+                ways.append((refs, speed, oneway))
+            elem.clear()
+        elif elem.tag == "relation":
+            elem.clear()
+
+    index = {}
+    coords = []
+    tails, heads, distances, durations = [], [], [], []
+    for refs, speed, oneway in ways:
+        refs = [ref for ref in refs if ref in node_coords]
+        if oneway == "-1":
+            refs.reverse()
+        for a, b in zip(refs, refs[1:]):
+            for ref in (a, b):
+                if ref not in index:
+                    index[ref] = len(coords)
+                    coords.append(node_coords[ref])
+            length = _haversine_m(*node_coords[a], *node_coords[b])
+            duration = length / (speed / 3.6)
+            pairs = [(index[a], index[b])]
+            if oneway not in ("yes", "true", "1", "-1"):
+                pairs.append((index[b], index[a]))
+            for u, v in pairs:
+                tails.append(u)
+                heads.append(v)
+                distances.append(length)
+                durations.append(duration)
+    return (coords, np.asarray(tails, dtype=np.int64), np.asarray(heads, dtype=np.int64),
+            np.asarray(distances, dtype=np.float64), np.asarray(durations, dtype=np.float64))
+
+
+def largest_component(n, tails, heads):
+    """
+    Узлы наибольшей сильно связной компоненты (алгоритм Косарайю): между любыми двумя
+    узлами компоненты есть путь в обе стороны, поэтому матрица по ним не содержит пропусков.
+    """
+    forward = [[] for _ in range(n)]
+    backward = [[] for _ in range(n)]
+    for u, v in zip(tails.tolist(), heads.tolist()):
+        forward[u].append(v)
+        backward[v].append(u)
+
+    # Порядок выхода обхода в глубину по прямым рёбрам
+    visited = [False] * n
+    order = []
+    for root in range(n):
+        if visited[root]:
+            continue
+        visited[root] = True
+        stack = [(root, iter(forward[root]))]
+        while stack:
+            node, it = stack[-1]
+            for nxt in it:
+                if not visited[nxt]:
+                    visited[nxt] = True
+                    stack.append((nxt, iter(forward[nxt])))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+
+    # Компоненты - обходы по обратным рёбрам в обратном порядке выхода
+    component = [-1] * n
+    sizes = []
+    for root in reversed(order):
+        if component[root] >= 0:
+            continue
+        label = len(sizes)
+        component[root] = label
+        stack = [root]
+        size = 0
+        while stack:
+            node = stack.pop()
+            size += 1
+            for prev in backward[node]:
+                if component[prev] < 0:
+                    component[prev] = label
+                    stack.append(prev)
+        sizes.append(size)
+    if not sizes:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.asarray(component) == int(np.argmax(sizes)))
+
+
+def _to_csr(n, tails, heads, durations, distances):
+    order = np.argsort(tails, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(indptr, np.asarray(tails, dtype=np.int64) + 1, 1)
+    return (np.cumsum(indptr), np.asarray(heads, dtype=np.int64)[order],
+            np.asarray(durations, dtype=np.float64)[order], np.asarray(distances, dtype=np.float64)[order])
+
+
+def _witness_search(out, source, excluded, bound):
+    """
+    Поиск кратчайших путей от source без узла excluded, не дальше bound и не более WITNESS_SETTLE_LIMIT узлов.
+    """
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap and settled < WITNESS_SETTLE_LIMIT:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        if d > bound:
+            break
+        settled += 1
+        for nxt, (w, _) in out[node].items():
+            if nxt == excluded:
+                continue
+            nd = d + w
+            if nd < dist.get(nxt, math.inf):
+                dist[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+    return dist
+
+
+def _shortcuts(out, inc, v):
+    """
+    Shortcut-рёбра, нужные при сжатии узла v: путь u -> v -> w, для которого нет обхода не длиннее.
+    """
+    result = []
+    for u, (du, mu) in inc[v].items():
+        targets = [(w, dw, mw) for w, (dw, mw) in out[v].items() if w != u]
+        if not targets:
+            continue
+        witness = _witness_search(out, u, v, du + max(dw for _, dw, _ in targets))
+        for w, dw, mw in targets:
+            if witness.get(w, math.inf) > du + dw:
+                result.append((u, w, du + dw, mu + mw))
+    return result
+
+
+def contract(n, tails, heads, durations, distances):
+    """
+    Строит иерархию сжатия (contraction hierarchies) по времени в пути.
+
+    Узлы сжимаются в порядке приоритета (разность числа добавляемых shortcut-рёбер и удаляемых рёбер
+    плюс число уже сжатых соседей, с ленивым пересчётом). Для каждого узла сохраняются рёбра к соседям,
+    сжатым позже: прямые - для поиска вверх от источника, обратные - для поиска вверх от назначения.
+
+    Returns:
+        tuple: (upward, downward) - графы CSR (indptr, indices, durations, distances) для прямого
+            и обратного поиска.
+    """
+    out = [dict() for _ in range(n)]
+    inc = [dict() for _ in range(n)]
+    for u, v, w, m in zip(tails.tolist(), heads.tolist(), durations.tolist(), distances.tolist()):
+        if u != v and w < out[u].get(v, (math.inf, 0))[0]:
+            out[u][v] = (w, m)
+            inc[v][u] = (w, m)
+
+    deleted = [0] * n
+    heap = []
+    for v in range(n):
+        heap.append((len(_shortcuts(out, inc, v)) - len(out[v]) - len(inc[v]), v))
+    heapq.heapify(heap)
+
+    up = ([], [], [], [])
+    down = ([], [], [], [])
+    n_shortcuts = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        shortcuts = _shortcuts(out, inc, v)
+        priority = len(shortcuts) - len(out[v]) - len(inc[v]) + deleted[v]
+        if heap and priority > heap[0][0]:
+            heapq.heappush(heap, (priority, v))
+            continue
+
+        # Все оставшиеся соседи будут сжаты позже v, т.е. лежат выше в иерархии
+        for w, (dw, mw) in out[v].items():
+            for column, value in zip(up, (v, w, dw, mw)):
+                column.append(value)
+            del inc[w][v]
+            deleted[w] += 1
+        for u, (du, mu) in inc[v].items():
+            for column, value in zip(down, (v, u, du, mu)):
+                column.append(value)
+            del out[u][v]
+            deleted[u] += 1
+        for u, w, dw, mw in shortcuts:
+            if dw < out[u].get(w, (math.inf, 0))[0]:
+                out[u][w] = (dw, mw)
+                inc[w][u] = (dw, mw)
+                n_shortcuts += 1
+        out[v], inc[v] = {}, {}
+
+    logger.info(f"Иерархия сжатия: {n} узлов, {len(tails)} рёбер, {n_shortcuts} shortcut-рёбер")
+    return _to_csr(n, up[0], up[1], up[2], up[3]), _to_csr(n, down[0], down[1], down[2], down[3])
+
+
+class RoadGraph:
+    """
+    Встроенный маршрутизатор по локальной выгрузке OSM: замена запросов к OSRM.
+
+    Граф - наибольшая сильно связная компонента дорог выгрузки. Точки запроса привязываются
+    к ближайшему узлу графа (GeoKDTree). Матрицы "многие ко многим" считаются по иерархии сжатия
+    поиском с корзинами: от каждого назначения - поиск вверх по обратным рёбрам, достигнутые узлы
+    записываются в корзины (плотная матрица узел x назначение для блока назначений); от каждого
+    источника - поиск вверх по прямым рёбрам, кратчайшее время до назначений - минимум по строкам
+    корзин встреченных узлов, одной операцией numpy на блок. Пространство поиска вверх - сотни узлов,
+    поэтому таблица 1000 x 1000 считается за секунды. Расстояние - длина самого быстрого пути.
+
+    Attributes:
+        coords (np.ndarray): Координаты узлов графа (широта, долгота).
+    """
+
+    def __init__(self, coords, upward, downward):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.upward = upward
+        self.downward = downward
+        # Для поиска в Python списки быстрее обращений к элементам массивов numpy
+        self._up = tuple(a.tolist() for a in upward)
+        self._down = tuple(a.tolist() for a in downward)
+        self._tree = GeoKDTree([tuple(c) for c in self.coords.tolist()])
+
+    def __len__(self):
+        return len(self.coords)
+
+    @classmethod
+    def from_edges(cls, coords, tails, heads, distances, durations):
+        """
+        Строит граф по рёбрам: оставляет наибольшую сильно связную компоненту и строит иерархию сжатия.
+        """
+        keep = largest_component(len(coords), tails, heads)
+        remap = np.full(len(coords), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        mask = (remap[tails] >= 0) & (remap[heads] >= 0)
+        upward, downward = contract(len(keep), remap[tails[mask]], remap[heads[mask]], durations[mask],
+                                    distances[mask])
+        return cls(np.asarray(coords, dtype=np.float64).reshape(-1, 2)[keep], upward, downward)
+
+    @classmethod
+    def from_osm(cls, path):
+        """
+        Строит граф по выгрузке OSM (.osm).
+        """
+        return cls.from_edges(*parse_osm(path))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Загружает граф, подготовленный методом save.
+        """
+        with np.load(path) as data:
+            upward = tuple(data[f"up_{name}"] for name in ("indptr", "indices", "durations", "distances"))
+            downward = tuple(data[f"down_{name}"] for name in ("indptr", "indices", "durations", "distances"))
+            return cls(data["coords"], upward, downward)
+
+    def save(self, path):
+        """
+        Сохраняет граф с иерархией сжатия в файл .npz.
+        """
+        arrays = {"coords": self.coords}
+        for prefix, graph in (("up", self.upward), ("down", self.downward)):
+            for name, array in zip(("indptr", "indices", "durations", "distances"), graph):
+                arrays[f"{prefix}_{name}"] = array
+        np.savez(path, **arrays)
+
+    def snap(self, points):
+        """
+        Узлы графа, ближайшие к точкам (широта, долгота).
+        """
+        return [self._tree.nearest(tuple(p))[0] for p in points]
+
+    def _search(self, graph, source):
+        """
+        Поиск вверх по иерархии: все достижимые узлы с временем и длиной пути.
+        """
+        indptr, indices, durations, distances = graph
+        best = {source: (0.0, 0.0)}
+        heap = [(0.0, source)]
+        nodes, times, lengths = [], [], []
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > best[node][0]:
+                continue
+            nodes.append(node)
+            times.append(d)
+            lengths.append(best[node][1])
+            for k in range(indptr[node], indptr[node + 1]):
+                nd = d + durations[k]
+                nxt = indices[k]
+                if nd < best.get(nxt, (math.inf,))[0]:
+                    best[nxt] = (nd, best[node][1] + distances[k])
+                    heapq.heappush(heap, (nd, nxt))
+        return np.asarray(nodes, dtype=np.int64), np.asarray(times), np.asarray(lengths)
+
+    def table(self, points, sources=None, destinations=None):
+        """
+        Матрицы расстояний и продолжительности между точками, как fetch_osrm_table.
+
+        Args:
+            points (list): Список координат точек (широта, долгота).
+            sources (list, optional): Индексы точек-источников. По умолчанию все точки.
+            destinations (list, optional): Индексы точек-назначений. По умолчанию все точки.
+
+        Returns:
+            tuple: (distances, durations) — матрицы (списки) размера len(sources) x len(destinations)
+                в метрах и секундах соответственно.
+        """
+        snapped = np.asarray(self.snap(points), dtype=np.int64)
+        src = snapped[list(range(len(points)) if sources is None else sources)]
+        dst = snapped[list(range(len(points)) if destinations is None else destinations)]
+        forward = [self._search(self._up, node) for node in src.tolist()]
+
+        durations = np.full((len(src), len(dst)), np.inf)
+        distances = np.full((len(src), len(dst)), np.inf)
+        position = np.full(len(self), -1, dtype=np.int64)
+        for start in range(0, len(dst), TABLE_BLOCK):
+            block = dst[start:start + TABLE_BLOCK]
+            columns = np.arange(len(block))
+            # Корзины блока назначений: плотные матрицы по узлам, достигнутым поиском вверх от назначений
+            searches = [self._search(self._down, node) for node in block.tolist()]
+            reached, rows = np.unique(np.concatenate([s[0] for s in searches]), return_inverse=True)
+            owners = np.repeat(columns, [len(s[0]) for s in searches])
+            bucket_time = np.full((len(reached), len(block)), np.inf)
+            bucket_length = np.zeros((len(reached), len(block)))
+            bucket_time[rows, owners] = np.concatenate([s[1] for s in searches])
+            bucket_length[rows, owners] = np.concatenate([s[2] for s in searches])
+            position[reached] = np.arange(len(reached))
+
+            for row, (nodes, times, lengths) in enumerate(forward):
+                meet = position[nodes]
+                common = meet >= 0
+                if not common.any():
+                    continue
+                meet, times, lengths = meet[common], times[common], lengths[common]
+                via = times[:, None] + bucket_time[meet]
+                best = np.argmin(via, axis=0)
+                durations[row, start:start + len(block)] = via[best, columns]
+                distances[row, start:start + len(block)] = lengths[best] + bucket_length[meet[best], columns]
+            position[reached] = -1
+        return distances.tolist(), durations.tolist()
+
+
+def load_road_graph(path):
+    """
+    Открывает граф дорог: подготовленный (.npz) загружается, выгрузка OSM обрабатывается на месте.
+    """
+    if path.endswith(".npz"):
+        return RoadGraph.load(path)
+    return RoadGraph.from_osm(path)
+
+
+def get_road_graph():
+    """
+    Возвращает граф дорог, указанный в переменной окружения ROAD_GRAPH_PATH.
+
+    Граф открывается один раз на процесс и переоткрывается, если файл был обновлён.
+
+    Returns:
+        RoadGraph | None: Граф или None, если встроенный маршрутизатор не настроен.
+    """
+    path = os.getenv(ROAD_GRAPH_ENV)
+    if not path:
+        return None
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        logger.warning(f"Граф дорог {path} не найден")
+        return None
+
+    cached = _open_graphs.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_road_graph(path))
+        _open_graphs[path] = cached
+        logger.info(f"Открыт граф дорог {path}: {len(cached[1])} узлов")
+    return cached[1]
@@ -0,0 +1,103 @@
+import logging
+from multiprocessing import shared_memory
+import numpy as np
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сегменты, открытые в текущем процессе по описателям: имя -> (SharedMemory, массив).
+# Сегмент держится открытым, пока процесс использует массив.
+_attached = {}
+
+
+class SharedMatrix:
+    """
+    Описатель матрицы в разделяемой памяти: имя сегмента, форма и тип элементов.
+
+    Передаётся в другие процессы вместо самой матрицы, поэтому стоимость сериализации
+    не зависит от её размера.
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    def attach(self):
+        """
+        Открывает сегмент в текущем процессе.
+
+        Returns:
+            np.ndarray: Матрица только для чтения поверх разделяемой памяти (без копирования).
+        """
+        cached = _attached.get(self.name)
+        if cached is None:
+            segment = shared_memory.SharedMemory(name=self.name)
+            array = np.ndarray(self.shape, dtype=self.dtype, buffer=segment.buf)
+            array.flags.writeable = False
+            cached = _attached[self.name] = (segment, array)
+        return cached[1]
+
+    def __repr__(self):
+        return f"SharedMatrix({self.name!r}, {self.shape}, {self.dtype!r})"
+
+
+class SharedMatrices:
+    """
+    Владелец сегментов разделяемой памяти на время одной задачи.
+
+    Используется как контекстный менеджер: при выходе все созданные сегменты закрываются
+    и удаляются, даже если задача завершилась исключением. Процессы-исполнители к этому
+    моменту должны быть остановлены.
+    """
+
+    def __init__(self):
+        self._segments = []
+
+    def share(self, matrix, dtype=None):
+        """
+        Копирует матрицу в новый сегмент разделяемой памяти.
+
+        Args:
+            matrix (list | np.ndarray): Матрица (вложенные списки или массив numpy).
+            dtype (np.dtype, optional): Тип элементов; по умолчанию тип массива numpy.
+
+        Returns:
+            SharedMatrix: Описатель для передачи в другие процессы.
+        """
+        array = np.asarray(matrix, dtype=dtype)
+        segment = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self._segments.append(segment)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        return SharedMatrix(segment.name, array.shape, array.dtype)
+
+    def close(self):
+        """
+        Закрывает и удаляет все сегменты задачи.
+        """
+        for segment in self._segments:
+            attached = _attached.pop(segment.name, (None, None))[0]
+            if attached is not None:
+                _close(attached)
+            _close(segment)
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        if self._segments:
+            logger.debug(f"Удалено сегментов разделяемой памяти: {len(self._segments)}")
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _close(segment):
+    try:
+        segment.close()
+    except BufferError:
+        # На сегмент ещё есть ссылки из массивов: память освободится вместе с ними, имя удаляется сразу
+        logger.warning(f"Сегмент {segment.name} ещё используется")
@@ -0,0 +1,144 @@
+import threading
+import logging
+import numpy as np
+from schemas.columnar import DeliveryTable
+from schemas.delivery import PRIORITY_RANKING
+from services.tiers import MIN_TIER_TIME
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Длина суток в минутах: окно на весь день не ограничивает доставку
+HORIZON = 1440
+
+# Ранг, начиная с которого приоритет считается высоким (high и выше)
+HIGH_PRIORITY_RANK = 3
+
+# Масштаб числа доставок в признаках, чтобы коэффициенты были одного порядка
+SCALE = 100.0
+
+# Начальные коэффициенты модели накладных расходов сверх ограничения поиска, секунды на признак
+# (FEATURES): оценка по замерам на типичных запросах, дальше уточняется по фактическим расчётам
+PRIOR_WEIGHTS = (0.05, 0.15, 0.25, 0.02, 0.02, 0.1, 0.05)
+FEATURES = ("bias", "deliveries", "deliveries_sq", "warehouses", "vehicles", "tight_deliveries",
+            "high_priority_deliveries")
+
+# Забывание старых замеров (рекурсивный МНК): чем меньше, тем быстрее модель следует за нагрузкой
+FORGETTING = 0.98
+
+# Начальная неуверенность в коэффициентах PRIOR_WEIGHTS
+PRIOR_VARIANCE = 1.0
+
+
+def delivery_profile(deliveries):
+    """
+    Ширина временных окон и ранги приоритетов доставок.
+
+    Args:
+        deliveries (list | DeliveryTable): Доставки запроса.
+
+    Returns:
+        tuple: (widths, ranks) - массивы ширины окна в минутах и рангов приоритета по PRIORITY_RANKING.
+    """
+    if isinstance(deliveries, DeliveryTable):
+        windows = np.asarray(deliveries.time_windows, dtype=float).reshape(-1, 2)
+        ranks = np.asarray(deliveries.priority_rank, dtype=float)
+    else:
+        windows = np.asarray([d.time_window for d in deliveries], dtype=float).reshape(-1, 2)
+        ranks = np.asarray([PRIORITY_RANKING.get(d.priority.lower(), 1) for d in deliveries], dtype=float)
+    widths = np.clip(windows[:, 1] - windows[:, 0], 0, HORIZON)
+    return widths, ranks
+
+
+def instance_features(data):
+    """
+    Признаки запроса для модели времени расчёта.
+
+    Узость окон (1 - доля суток, которую занимает окно) и доля высоких приоритетов взвешены числом
+    доставок: узкие окна и много уровней приоритета увеличивают работу первого решения и проверки окон.
+
+    Args:
+        data (DeliveryRequest): Проверенный запрос.
+
+    Returns:
+        np.ndarray: Значения признаков в порядке FEATURES.
+    """
+    n = len(data.deliveries)
+    tightness = high_share = 0.0
+    if n:
+        widths, ranks = delivery_profile(data.deliveries)
+        tightness = float(np.mean(1 - widths / HORIZON))
+        high_share = float(np.mean(ranks >= HIGH_PRIORITY_RANK))
+    scaled = n / SCALE
+    return np.array([
+        1.0,
+        scaled,
+        scaled * scaled,
+        len(data.warehouses) or len(data.warehouse_ids),
+        len(data.vehicles) or 1,
+        tightness * scaled,
+        high_share * scaled,
+    ])
+
+
+def search_bound(data):
+    """
+    Время, которое решатель заведомо тратит на поиск.
+
+    Поиск OR-Tools и LNS идёт до ограничения time_limit; при решении по уровням приоритета каждый
+    уровень получает не меньше MIN_TIER_TIME. Эвристика ограничения поиска не использует.
+
+    Returns:
+        float: Время поиска в секундах.
+    """
+    if data.solver == "heuristic":
+        return 0.0
+    if data.solve_by_priority and len(data.deliveries):
+        _, ranks = delivery_profile(data.deliveries)
+        return max(float(data.time_limit), MIN_TIER_TIME * len(np.unique(ranks)))
+    return float(data.time_limit)
+
+
+class SolveTimeModel:
+    """
+    Прогноз времени расчёта запроса по его признакам.
+
+    Время расчёта - ограничение поиска (search_bound) плюс накладные расходы: матрицы, модель,
+    первое решение. Накладные расходы линейны по признакам instance_features; коэффициенты
+    начинаются с PRIOR_WEIGHTS и уточняются рекурсивным МНК с забыванием по каждому завершённому
+    расчёту (observe), так что прогноз подстраивается под сервер OSRM и машину.
+
+    Attributes:
+        weights (np.ndarray): Текущие коэффициенты накладных расходов.
+    """
+
+    def __init__(self, weights=PRIOR_WEIGHTS, forgetting=FORGETTING):
+        self.weights = np.array(weights, dtype=float)
+        self.forgetting = forgetting
+        self._cov = np.eye(len(self.weights)) * PRIOR_VARIANCE
+        self._lock = threading.Lock()
+
+    def predict(self, data):
+        """
+        Returns:
+            float: Ожидаемое время расчёта запроса в секундах.
+        """
+        overhead = float(instance_features(data) @ self.weights)
+        return search_bound(data) + max(0.0, overhead)
+
+    def observe(self, data, seconds):
+        """
+        Уточняет коэффициенты по фактическому времени расчёта запроса.
+
+        Args:
+            data (DeliveryRequest): Рассчитанный запрос.
+            seconds (float): Фактическое время расчёта.
+        """
+        x = instance_features(data)
+        with self._lock:
+            residual = seconds - search_bound(data) - float(x @ self.weights)
+            px = self._cov @ x
+            gain = px / (self.forgetting + x @ px)
+            self.weights = self.weights + gain * residual
+            self._cov = (self._cov - np.outer(gain, px)) / self.forgetting
+        logger.debug(f"Время расчёта {seconds:.2f} с, ошибка прогноза {residual:+.2f} с")
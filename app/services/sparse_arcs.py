@@ -0,0 +1,253 @@
+import math
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from services.osrm import fetch_table
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Значения для дуг вне графа соседей: решатель их не использует (домены NextVar ограничены),
+# но OR-Tools может вычислить колбэк для любой пары узлов
+MISSING_TIME = 1440
+MISSING_DISTANCE = 10 ** 7
+
+# Размер блока строк при поиске ближайших соседей
+KNN_BLOCK = 512
+
+# Наибольшее число точек в одном запросе к поставщику матриц
+MAX_TABLE_POINTS = 200
+
+# Наибольшее число источников в одном запросе по графу соседей: запрос возвращает строки
+# "источники x (источники и их соседи)", поэтому число значений растёт как n·k, а не n²
+MAX_BATCH_SOURCES = 32
+
+# Число параллельных запросов к поставщику матриц
+MAX_WORKERS = 4
+
+
+class ArcRow(dict):
+    """
+    Строка разреженной матрицы: значения по дугам графа соседей (узел -> значение),
+    для остальных узлов возвращается missing. Индексация row[j] та же, что у строки плотной матрицы.
+    """
+    __slots__ = ("missing",)
+
+    def __init__(self, values, missing):
+        super().__init__(values)
+        self.missing = missing
+
+    def __missing__(self, key):
+        return self.missing
+
+
+def is_sparse(matrix):
+    """
+    Проверяет, что матрица задана строками ArcRow (словарями), а не списками или массивом.
+    """
+    return len(matrix) > 0 and isinstance(matrix[0], dict)
+
+
+def _unit_vectors(points):
+    coords = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    cos_lat = np.cos(coords[:, 0])
+    return np.stack([cos_lat * np.cos(coords[:, 1]), cos_lat * np.sin(coords[:, 1]), np.sin(coords[:, 0])], axis=1)
+
+
+def nearest_neighbors(points, k):
+    """
+    k ближайших по прямой точек для каждой точки (без неё самой).
+
+    Args:
+        points (list): Координаты (широта, долгота).
+        k (int): Число соседей.
+
+    Returns:
+        np.ndarray: Массив n x min(k, n - 1) индексов соседей.
+    """
+    n = len(points)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64)
+    vectors = _unit_vectors(points)
+    result = np.empty((n, k), dtype=np.int64)
+    for lo in range(0, n, KNN_BLOCK):
+        # Ближе по большому кругу - больше скалярное произведение единичных векторов
+        similarity = vectors[lo:lo + KNN_BLOCK] @ vectors.T
+        rows = np.arange(similarity.shape[0])
+        similarity[rows, rows + lo] = -np.inf
+        result[lo:lo + KNN_BLOCK] = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    return result
+
+
+def successor_lists(points, hubs, k):
+    """
+    Граф допустимых дуг: из депо и складов (hubs) — во все узлы, из остальных узлов — во все hubs
+    и в соседей: k ближайших неузловых точек и точки, для которых узел сам входит в k ближайших.
+
+    Args:
+        points (list): Координаты узлов подзадачи.
+        hubs (list): Узлы депо и складов.
+        k (int): Число соседей.
+
+    Returns:
+        list: Для каждого узла отсортированный список узлов, в которые из него есть дуга (включая сам узел).
+    """
+    n = len(points)
+    hub_set = set(hubs)
+    others = [i for i in range(n) if i not in hub_set]
+    neighbours = nearest_neighbors([points[i] for i in others], k)
+
+    # Граф симметризуется: узел достижим из своих соседей, иначе вставить его между двумя
+    # соседними по маршруту узлами часто нельзя
+    adjacent = [set(hub_set) | {node} for node in others]
+    for pos, row in enumerate(neighbours.tolist()):
+        for other in row:
+            adjacent[pos].add(others[other])
+            adjacent[other].add(others[pos])
+
+    successors = [None] * n
+    for h in hubs:
+        successors[h] = list(range(n))
+    for pos, node in enumerate(others):
+        successors[node] = sorted(adjacent[pos])
+    return successors
+
+
+def sparse_from_dense(distances, durations, successors):
+    """
+    Строки ArcRow по плотным матрицам (метры и секунды) для дуг графа соседей.
+
+    Returns:
+        tuple: (distance_rows, time_rows) — расстояния в метрах, время в минутах (с округлением вверх).
+    """
+    distances = np.asarray(distances)
+    durations = np.asarray(durations)
+    distance_rows = []
+    time_rows = []
+    for i, succ in enumerate(successors):
+        distance_rows.append(ArcRow(zip(succ, distances[i, succ].tolist()), MISSING_DISTANCE))
+        time_rows.append(ArcRow(zip(succ, np.ceil(durations[i, succ] / 60).astype(int).tolist()), MISSING_TIME))
+    return distance_rows, time_rows
+
+
+def _batches(points, successors, nodes):
+    """
+    Группирует узлы-источники в запросы не больше MAX_BATCH_SOURCES источников и MAX_TABLE_POINTS точек
+    (источники и их соседи).
+    Узлы упорядочиваются обходом в ширину по графу соседей, поэтому в один запрос попадают
+    близкие узлы с общими соседями.
+    """
+    pending = set(nodes)
+    order = []
+    for seed in sorted(nodes, key=lambda i: tuple(points[i])):
+        if seed not in pending:
+            continue
+        pending.discard(seed)
+        queue = deque([seed])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for j in successors[node]:
+                if j in pending:
+                    pending.discard(j)
+                    queue.append(j)
+
+    batch, union = [], set()
+    for node in order:
+        extended = union | set(successors[node])
+        if batch and (len(extended) > MAX_TABLE_POINTS or len(batch) >= MAX_BATCH_SOURCES):
+            yield batch, sorted(union)
+            batch, extended = [], set(successors[node])
+        batch.append(node)
+        union = extended
+    if batch:
+        yield batch, sorted(union)
+
+
+def _chunks(items, size):
+    for lo in range(0, len(items), size):
+        yield items[lo:lo + size]
+
+
+def fetch_arcs(points, successors):
+    """
+    Запрашивает у поставщика матриц (fetch_table) только дуги графа соседей.
+
+    Строки узлов с полным списком дуг (депо, склады) запрашиваются блоками "эти узлы x часть всех узлов",
+    остальные узлы — пакетами источников с общим набором соседей.
+
+    Args:
+        points (list): Координаты узлов подзадачи.
+        successors (list): Результат successor_lists.
+
+    Returns:
+        tuple: (distance_rows, time_rows) — строки ArcRow, расстояния в метрах, время в минутах.
+    """
+    n = len(points)
+    full = [i for i in range(n) if len(successors[i]) == n]
+    partial = [i for i in range(n) if len(successors[i]) < n]
+
+    requests = []
+    if full:
+        for sources in _chunks(full, MAX_TABLE_POINTS // 2):
+            for destinations in _chunks(list(range(n)), MAX_TABLE_POINTS - len(sources)):
+                requests.append((sources, sorted(set(destinations) | set(sources))))
+    requests.extend(_batches(points, successors, partial))
+
+    def fetch(request):
+        sources, block = request
+        pos = {node: i for i, node in enumerate(block)}
+        dist, dur = fetch_table([points[i] for i in block], sources=[pos[i] for i in sources])
+        return sources, block, dist, dur
+
+    distance_rows = [ArcRow({}, MISSING_DISTANCE) for _ in range(n)]
+    time_rows = [ArcRow({}, MISSING_TIME) for _ in range(n)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        for sources, block, dist, dur in pool.map(fetch, requests):
+            for node, dist_row, dur_row in zip(sources, dist, dur):
+                allowed = successors[node]
+                values = dict(zip(block, dist_row))
+                minutes = dict(zip(block, dur_row))
+                distance_rows[node].update((j, values[j]) for j in allowed if j in values)
+                time_rows[node].update((j, math.ceil(minutes[j] / 60)) for j in allowed if j in minutes)
+
+    arcs = sum(len(row) for row in time_rows)
+    logger.info(f"Разреженная матрица: {arcs} дуг из {n * n} ({len(requests)} запросов)")
+    return distance_rows, time_rows
+
+
+def restrict_rows(rows, nodes):
+    """
+    Строки ArcRow подматрицы по узлам nodes с перенумерацией узлов.
+    """
+    node_map = {old: new for new, old in enumerate(nodes)}
+    return [ArcRow({node_map[j]: v for j, v in rows[old].items() if j in node_map}, rows[old].missing)
+            for old in nodes]
+
+
+def restrict_successors(routing, manager, time_m, depot_nodes):
+    """
+    Ограничивает домены NextVar узлов дугами графа соседей.
+
+    Из узла можно перейти в соседей, в конец маршрута любого ТС (депо - узлы с полными строками)
+    или остаться неактивным (NextVar равен самому узлу).
+
+    Args:
+        routing (RoutingModel): Модель маршрутизации (до решения).
+        manager (RoutingIndexManager): Менеджер индексов.
+        time_m (list): Строки ArcRow матрицы времени.
+        depot_nodes (set): Узлы депо ТС.
+    """
+    n = len(time_m)
+    ends = [routing.End(v) for v in range(routing.vehicles())]
+    restricted = 0
+    for node, row in enumerate(time_m):
+        if node in depot_nodes or len(row) >= n:
+            continue
+        index = manager.NodeToIndex(node)
+        values = [manager.NodeToIndex(j) for j in row if j not in depot_nodes]
+        routing.NextVar(index).SetValues(sorted(set(values) | {index}) + ends)
+        restricted += 1
+    logger.info(f"Домены NextVar ограничены графом соседей для {restricted} узлов")
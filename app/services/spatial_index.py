@@ -0,0 +1,90 @@
+import math
+
+# Радиус Земли в километрах (как в haversine_distance)
+EARTH_RADIUS_KM = 6371
+
+
+def _to_unit_vector(coord):
+    """
+    Переводит координаты (широта, долгота) в единичный вектор на сфере.
+    """
+    lat, lon = math.radians(coord[0]), math.radians(coord[1])
+    cos_lat = math.cos(lat)
+    return cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat)
+
+
+def chord_to_km(chord):
+    """
+    Переводит длину хорды единичной сферы в расстояние по большому кругу в километрах.
+    """
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class GeoKDTree:
+    """
+    KD-дерево по точкам на поверхности Земли.
+
+    Точки хранятся как единичные 3D-векторы: евклидово расстояние между ними (хорда) монотонно
+    расстоянию по большому кругу, поэтому ближайшая по хорде точка совпадает с ближайшей по
+    формуле Хаверсайна, без искажений у полюсов и на антимеридиане.
+
+    Attributes:
+        size (int): Количество точек в индексе.
+    """
+
+    def __init__(self, coords):
+        self._vectors = [_to_unit_vector(c) for c in coords]
+        self.size = len(self._vectors)
+        # Узел дерева: (индекс точки, ось, левое поддерево, правое поддерево)
+        self._root = self._build(list(range(self.size)), 0)
+
+    def _build(self, ids, depth):
+        if not ids:
+            return None
+        axis = depth % 3
+        ids.sort(key=lambda i: self._vectors[i][axis])
+        mid = len(ids) // 2
+        return (ids[mid], axis,
+                self._build(ids[:mid], depth + 1),
+                self._build(ids[mid + 1:], depth + 1))
+
+    def nearest(self, coord, predicate=None):
+        """
+        Ищет ближайшую точку, удовлетворяющую условию.
+
+        Поддеревья, которые заведомо дальше уже найденного кандидата, отсекаются; точки,
+        не прошедшие predicate, пропускаются, но не мешают отсечению.
+
+        Args:
+            coord (tuple): Координаты запроса (широта, долгота).
+            predicate (callable, optional): Функция от индекса точки; точка подходит, если она вернула True.
+
+        Returns:
+            tuple: (индекс точки, расстояние в километрах) или (None, inf), если подходящих точек нет.
+        """
+        target = _to_unit_vector(coord)
+        # best = [квадрат хорды, индекс]; при равенстве расстояний выбирается меньший индекс
+        best = [float("inf"), None]
+
+        def visit(node):
+            if node is None:
+                return
+            idx, axis, left, right = node
+            vec = self._vectors[idx]
+            diff = target[axis] - vec[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+
+            visit(near)
+
+            d2 = ((target[0] - vec[0]) ** 2 + (target[1] - vec[1]) ** 2 + (target[2] - vec[2]) ** 2)
+            if (d2 < best[0] or (d2 == best[0] and best[1] is not None and idx < best[1])) \
+                    and (predicate is None or predicate(idx)):
+                best[0], best[1] = d2, idx
+
+            if diff * diff <= best[0]:
+                visit(far)
+
+        visit(self._root)
+        if best[1] is None:
+            return None, float("inf")
+        return best[1], chord_to_km(math.sqrt(best[0]))
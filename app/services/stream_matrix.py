@@ -0,0 +1,126 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from services.osrm import fetch_table
+from services.matrix_store import get_matrix_store, location_key
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Количество новых локаций, после которого запрашиваются их блоки матрицы
+BLOCK_SIZE = 100
+
+# Число параллельных запросов к OSRM
+MAX_WORKERS = 4
+
+
+class IncrementalMatrixBuilder:
+    """
+    Построение матриц расстояний и продолжительности по мере поступления точек.
+
+    Точки добавляются в порядке узлов подзадачи (депо, склады, доставки). Одинаковые
+    координаты (по location_key) запрашиваются один раз. Когда накапливается block_size
+    новых локаций, в пуле потоков запускаются запросы OSRM для блоков "новые x новые",
+    "новые x прежние" и "прежние x новые", так что загрузка матрицы идёт параллельно
+    с приёмом остальных точек.
+
+    Локации, которые есть в хранилище матриц (MATRIX_STORE_PATH), собираются в отдельные блоки:
+    дуги между такими блоками берутся из хранилища без запросов OSRM.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE, max_workers=MAX_WORKERS):
+        self.block_size = block_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._store = get_matrix_store()
+        self._location_ids = {}
+        self._locations = []
+        self._store_ids = []
+        self._point_ids = []
+        # Ожидающие блока локации: без ID в хранилище матриц и с ним
+        self._pending = {False: [], True: []}
+        self._blocks = []
+        self._futures = []
+
+    def add(self, points):
+        """
+        Добавляет точки и запускает запросы для заполненных блоков.
+
+        Args:
+            points (list): Координаты точек (широта, долгота).
+        """
+        for coord in points:
+            key = location_key(coord)
+            loc_id = self._location_ids.get(key)
+            if loc_id is None:
+                loc_id = len(self._locations)
+                self._location_ids[key] = loc_id
+                self._locations.append(tuple(coord))
+                store_ids = self._store.lookup([coord]) if self._store is not None else None
+                self._store_ids.append(store_ids[0] if store_ids else None)
+                stored = store_ids is not None
+                self._pending[stored].append(loc_id)
+                if len(self._pending[stored]) >= self.block_size:
+                    self._schedule(stored)
+            self._point_ids.append(loc_id)
+
+    def _schedule(self, stored):
+        block, self._pending[stored] = self._pending[stored], []
+        for previous, previous_stored in self._blocks:
+            self._futures.append(self._submit(block, previous, stored and previous_stored))
+            self._futures.append(self._submit(previous, block, stored and previous_stored))
+        self._futures.append(self._submit(block, block, stored))
+        self._blocks.append((block, stored))
+
+    def _submit(self, src_ids, dst_ids, from_store):
+        if from_store:
+            return self._executor.submit(self._read_store, src_ids, dst_ids)
+        return self._executor.submit(self._fetch, src_ids, dst_ids)
+
+    def _read_store(self, src_ids, dst_ids):
+        sel = np.ix_([self._store_ids[i] for i in src_ids], [self._store_ids[i] for i in dst_ids])
+        return (src_ids, dst_ids, np.asarray(self._store.distances[sel], dtype=np.float64),
+                np.asarray(self._store.durations[sel], dtype=np.float64))
+
+    def _fetch(self, src_ids, dst_ids):
+        block_ids = list(dict.fromkeys(src_ids + dst_ids))
+        pos = {loc_id: i for i, loc_id in enumerate(block_ids)}
+        dist, dur = fetch_table(
+            [self._locations[i] for i in block_ids],
+            sources=[pos[i] for i in src_ids],
+            destinations=[pos[i] for i in dst_ids],
+        )
+        return src_ids, dst_ids, np.array(dist, dtype=np.float64), np.array(dur, dtype=np.float64)
+
+    def result(self):
+        """
+        Дожидается всех запросов и собирает матрицы по добавленным точкам.
+
+        Returns:
+            tuple: (distances, durations) — массивы numpy размера n x n в метрах и секундах,
+                где n — число добавленных точек (с повторами) в порядке добавления.
+
+        Raises:
+            Exception: Ошибка первого неудавшегося запроса к OSRM.
+        """
+        for stored in (False, True):
+            if self._pending[stored]:
+                self._schedule(stored)
+
+        n = len(self._locations)
+        distances = np.zeros((n, n), dtype=np.float64)
+        durations = np.zeros((n, n), dtype=np.float64)
+        for future in self._futures:
+            src_ids, dst_ids, dist, dur = future.result()
+            sel = np.ix_(src_ids, dst_ids)
+            distances[sel] = dist
+            durations[sel] = dur
+        logger.info(f"Матрица {n}x{n} собрана из {len(self._futures)} блоков")
+
+        ids = np.asarray(self._point_ids, dtype=np.int64)
+        return distances[np.ix_(ids, ids)], durations[np.ix_(ids, ids)]
+
+    def close(self):
+        """
+        Останавливает пул потоков, отменяя ещё не начатые запросы.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
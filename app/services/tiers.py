@@ -0,0 +1,127 @@
+import logging
+import numpy as np
+from services.presolve import restrict_subproblem
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Наименьшее время поиска на один уровень приоритета, секунды: решателю нужно успеть построить
+# начальное решение даже для маленького уровня
+MIN_TIER_TIME = 0.5
+
+
+class VehicleState:
+    """
+    Положение ТС между уровнями приоритета.
+
+    Attributes:
+        node (int): Узел полной подзадачи, где ТС закончило предыдущий уровень (в начале - депо выезда).
+        ready (int): Время, с которого ТС может выехать из node, минуты.
+        capacity (int): Оставшаяся вместимость.
+        route (list): Узлы маршрута ТС по всем решённым уровням, начиная с депо выезда.
+        arrivals (list): Времена прибытия в узлы route.
+        end_arrival (int | None): Прибытие в депо возврата по последнему решённому уровню.
+    """
+
+    def __init__(self, node, ready, capacity):
+        self.node = node
+        self.ready = ready
+        self.capacity = capacity
+        self.route = [node]
+        self.arrivals = [ready]
+        self.end_arrival = None
+
+    def advance(self, tier_data, nodes, route, arrivals):
+        """
+        Продолжает маршрут ТС маршрутом уровня.
+
+        Args:
+            tier_data (dict): Данные подзадачи уровня (tier_subproblem).
+            nodes (list): Номер в полной подзадаче каждого узла подзадачи уровня.
+            route (list): Маршрут ТС в подзадаче уровня, от депо выезда до депо возврата.
+            arrivals (list): Времена прибытия в узлы route.
+        """
+        visits = route[1:-1]
+        if len(self.route) == 1:
+            # Пока ТС никуда не заезжало, выезд из депо сдвигается вместе с решением уровня
+            self.arrivals[0] = arrivals[0]
+        self.end_arrival = arrivals[-1]
+        if not visits:
+            return
+        self.route.extend(nodes[i] for i in visits)
+        self.arrivals.extend(arrivals[1:-1])
+        last = visits[-1]
+        self.node = nodes[last]
+        self.ready = arrivals[-2] + tier_data["service_times"][last]
+        self.capacity -= sum(tier_data["demands"][i] for i in visits)
+
+
+def priority_tiers(sub_data):
+    """
+    Позиции доставок подзадачи по уровням приоритета, от высшего к низшему.
+
+    Returns:
+        list: Пары (ранг приоритета, возрастающие позиции доставок в sub_data["del_list"]).
+    """
+    tiers = {}
+    for pos, priority in enumerate(sub_data["priorities"]):
+        tiers.setdefault(priority, []).append(pos)
+    return sorted(tiers.items(), reverse=True)
+
+
+def tier_subproblem(sub_data, keep, states):
+    """
+    Подзадача одного уровня приоритета: доставки keep и ТС, выезжающие из положения после
+    предыдущих уровней.
+
+    Узлы, где ТС закончили предыдущий уровень, добавляются в конец подзадачи копиями
+    с нулевым обслуживанием и спросом и считаются депо выезда; смена ТС начинается не раньше
+    времени готовности, вместимость уменьшена на уже доставленный спрос.
+
+    Args:
+        sub_data (dict): Данные полной подзадачи (build_subproblem) без узлов забора.
+        keep (list): Возрастающие позиции доставок уровня в sub_data["del_list"].
+        states (list): VehicleState для каждого ТС.
+
+    Returns:
+        tuple: (tier_data, nodes) — данные подзадачи уровня и номер в полной подзадаче каждого её узла.
+    """
+    n_wh = len(sub_data["wh_list"])
+    depot_nodes = sub_data.get("depot_nodes", [0])
+    nodes = list(range(1 + n_wh)) + [1 + n_wh + pos for pos in keep] + list(depot_nodes[1:])
+    node_map = {old: new for new, old in enumerate(nodes)}
+
+    # ТС, закончившие предыдущий уровень в доставке или на складе, выезжают из копии этого узла
+    first_copy = len(nodes)
+    copies = {}
+    starts = []
+    for state in states:
+        if state.node in depot_nodes:
+            starts.append(node_map[state.node])
+            continue
+        if state.node not in copies:
+            copies[state.node] = len(nodes)
+            nodes.append(state.node)
+        starts.append(copies[state.node])
+    n_copies = len(nodes) - first_copy
+
+    tier_data = restrict_subproblem(sub_data, keep)
+    shifts = sub_data.get("vehicle_shifts") or [(0, 1440)] * len(states)
+    if n_copies:
+        sel = np.ix_(nodes, nodes)
+        tier_data.update(
+            sub_points=[sub_data["sub_points"][i] for i in nodes],
+            distance_matrix=np.asarray(sub_data["distance_matrix"])[sel].tolist(),
+            time_matrix=np.asarray(sub_data["time_matrix"])[sel].tolist(),
+            time_windows=tier_data["time_windows"] + [(0, 1440)] * n_copies,
+            service_times=tier_data["service_times"] + [0] * n_copies,
+            demands=tier_data["demands"] + [0] * n_copies,
+            depot_nodes=tier_data["depot_nodes"] + list(range(first_copy, len(nodes))),
+        )
+    tier_data.update(
+        vehicle_starts=starts,
+        vehicle_shifts=[(min(max(shift_start, state.ready), shift_end), shift_end)
+                        for (shift_start, shift_end), state in zip(shifts, states)],
+        vehicle_capacities=[state.capacity for state in states],
+    )
+    return tier_data, nodes
@@ -0,0 +1,81 @@
+import numpy as np
+
+# Длина временного среза профиля загруженности, минуты
+SLICE_MINUTES = 60
+
+# Окно на весь день, минуты
+FULL_DAY = 1440
+
+
+class TrafficSlices:
+    """
+    Матрицы времени в пути по срезам суток.
+
+    Профиль задаёт множитель времени в пути для каждого часа. Хранится одна базовая матрица,
+    а время среза получается умножением на множитель при чтении; для решателя собирается одна
+    эффективная матрица, где строка узла масштабируется множителем среза, соответствующего
+    ожидаемому времени выезда из этого узла. Колбэк решателя читает обычную матрицу, как и без профиля.
+
+    Attributes:
+        levels (np.ndarray): Различные множители профиля по возрастанию.
+        hour_slice (np.ndarray): Номер среза (индекс в levels) для каждого часа.
+        base (np.ndarray): Матрица времени в минутах без учёта профиля (int32), размер n x n.
+    """
+
+    def __init__(self, time_matrix, profile):
+        self.levels, self.hour_slice = np.unique(np.asarray(profile, dtype=np.float64), return_inverse=True)
+        self.base = np.asarray(time_matrix, dtype=np.int32)
+
+    def slice_at(self, minutes):
+        """
+        Возвращает номера срезов для моментов времени (минуты от полуночи).
+        """
+        hours = np.clip(np.asarray(minutes, dtype=np.int64) // SLICE_MINUTES, 0, len(self.hour_slice) - 1)
+        return self.hour_slice[hours]
+
+    def matrix_for(self, departures):
+        """
+        Собирает эффективную матрицу времени по ожидаемому времени выезда из каждого узла.
+
+        Args:
+            departures (list): Ожидаемое время выезда из каждого узла, минуты от полуночи.
+
+        Returns:
+            list: Матрица времени в минутах (списки), строка i — из среза времени выезда из узла i.
+        """
+        factors = self.levels[self.slice_at(departures)]
+        return np.ceil(self.base * factors[:, None]).astype(np.int64).tolist()
+
+    def travel_time(self, from_node, to_node, departure):
+        """
+        Время переезда между узлами при выезде в заданный момент.
+        """
+        return int(np.ceil(self.base[from_node, to_node] * self.levels[self.slice_at(departure)]))
+
+
+def initial_departures(time_matrix, time_windows, service_times, starts=(0,)):
+    """
+    Начальная оценка времени выезда из узлов до решения.
+
+    Для узла берётся середина его окна, ограниченного снизу самым ранним прибытием из депо;
+    для депо — самый ранний полезный выезд, т.е. начало ближайшего ограниченного окна минус время в пути.
+
+    Args:
+        time_matrix (list): Матрица времени без учёта профиля.
+        time_windows (list): Временные окна узлов.
+        service_times (list): Время обслуживания узлов.
+        starts (list, optional): Узлы депо выезда транспортных средств. По умолчанию только узел 0.
+
+    Returns:
+        list: Ожидаемое время выезда из каждого узла.
+    """
+    base = np.asarray(time_matrix, dtype=np.int64)
+    tw = np.asarray(time_windows, dtype=np.int64).reshape(-1, 2)
+    starts = sorted(set(starts))
+    earliest = np.maximum(tw[:, 0], base[starts].min(axis=0))
+    departures = (earliest + np.maximum(tw[:, 1], earliest)) // 2 + np.asarray(service_times, dtype=np.int64)
+    # Узлы с окном на весь день (склады, забор товара, депо) не задают время выезда из депо
+    bounded = np.flatnonzero((tw[:, 0] > 0) | (tw[:, 1] < FULL_DAY))
+    for s in starts:
+        departures[s] = max(0, int(np.min(tw[bounded, 0] - base[s, bounded]))) if len(bounded) else 0
+    return departures.tolist()
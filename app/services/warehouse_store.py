@@ -0,0 +1,235 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+from services.inventory import InventoryLedger
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с путём к файлу снимка состояния складов (.npz)
+WAREHOUSE_STATE_ENV = "WAREHOUSE_STATE_PATH"
+
+# Минимальный интервал между снимками на диск, в секундах
+SNAPSHOT_INTERVAL = 5.0
+
+
+class WarehouseStateStore:
+    """
+    Состояние складов, хранимое в процессе между запросами.
+
+    Запасы, вместимость и использование складов живут в общем InventoryLedger; запросы
+    ссылаются на склады по ID и фиксируют изменения своих планов транзакциями журнала.
+    Состояние периодически сохраняется снимком на локальный диск и загружается при старте.
+
+    Attributes:
+        ledger (InventoryLedger): Журнал запасов всех складов.
+        path (str | None): Путь к файлу снимка или None, если сохранение отключено.
+    """
+
+    def __init__(self, path=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.ledger = InventoryLedger([], [], [])
+        self._coords = {}
+        # Счётчик изменений состояния и его значение в последнем записанном снимке
+        self._changes = 0
+        self._saved_changes = 0
+        self._last_snapshot = 0.0
+        # Захвачена, пока снимок записывается на диск (в том числе фоновым потоком)
+        self._snapshot_lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def upsert(self, warehouses):
+        """
+        Добавляет склады или заменяет их состояние целиком.
+
+        Args:
+            warehouses (list): Список объектов Warehouse.
+        """
+        with self.ledger.lock:
+            self.ledger.upsert_warehouses(warehouses)
+            for w in warehouses:
+                self._coords[w.id] = tuple(w.coord)
+            self._changes += 1
+        self.maybe_snapshot()
+
+    def missing(self, warehouse_ids):
+        """
+        Возвращает ID складов, которых нет в хранилище.
+        """
+        return [wh_id for wh_id in warehouse_ids if wh_id not in self._coords]
+
+    def get(self, wh_id):
+        """
+        Возвращает состояние склада.
+
+        Returns:
+            dict | None: Поля склада (id, coord, capacity, usage, stock) или None, если склада нет.
+        """
+        with self.ledger.lock:
+            if wh_id not in self._coords:
+                return None
+            i = self.ledger.warehouse_index(wh_id)
+            return {
+                "id": wh_id,
+                "coord": self._coords[wh_id],
+                "capacity": int(self.ledger.capacity[i]),
+                "usage": int(self.ledger.usage[i]),
+                "stock": self.ledger.warehouse_stock(wh_id),
+            }
+
+    def resolve(self, warehouse_ids):
+        """
+        Возвращает склады в формате, используемом при построении подзадачи.
+
+        Args:
+            warehouse_ids (list): Идентификаторы складов.
+
+        Returns:
+            list: Словари складов (id, coord, capacity, usage) на момент вызова.
+        """
+        with self.ledger.lock:
+            result = []
+            for wh_id in warehouse_ids:
+                i = self.ledger.warehouse_index(wh_id)
+                result.append({
+                    "id": wh_id,
+                    "coord": self._coords[wh_id],
+                    "capacity": int(self.ledger.capacity[i]),
+                    "usage": int(self.ledger.usage[i]),
+                })
+            return result
+
+    def begin(self):
+        """
+        Начинает транзакцию над общим журналом запасов.
+        """
+        return self.ledger.begin()
+
+    def commit(self, transaction):
+        """
+        Фиксирует транзакцию плана и при необходимости сохраняет снимок.
+
+        Изменения применяются как приращения к текущему состоянию, поэтому параллельные
+        запросы к одним и тем же складам не затирают друг друга.
+
+        Returns:
+            dict: Результат InventoryTransaction.commit().
+        """
+        result = transaction.commit()
+        with self.ledger.lock:
+            self._changes += 1
+        self.maybe_snapshot()
+        return result
+
+    def maybe_snapshot(self):
+        """
+        Сохраняет снимок в фоновом потоке, если с прошлого сохранения прошло не меньше snapshot_interval секунд.
+
+        В потоке запроса массивы только копируются под блокировкой журнала; запись на диск выполняется
+        в фоне. Пока предыдущий снимок пишется, новый не начинается.
+        """
+        if (not self.path or self._changes == self._saved_changes
+                or time.monotonic() - self._last_snapshot < self.snapshot_interval):
+            return
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+        try:
+            arrays, changes = self._capture()
+            self._last_snapshot = time.monotonic()
+            threading.Thread(target=self._write_in_background, args=(arrays, changes), daemon=True).start()
+        except BaseException:
+            self._snapshot_lock.release()
+            raise
+
+    def snapshot(self):
+        """
+        Атомарно сохраняет текущее состояние складов в файл снимка.
+
+        Дожидается окончания фоновой записи, если она идёт.
+        """
+        if not self.path:
+            return
+
+        with self._snapshot_lock:
+            if self._changes == self._saved_changes:
+                return
+            arrays, changes = self._capture()
+            self._write(arrays, changes)
+
+    def _capture(self):
+        """
+        Копирует состояние складов для записи снимка.
+
+        Returns:
+            tuple: Массивы снимка и номер последнего вошедшего в них изменения.
+        """
+        with self.ledger.lock:
+            ledger = self.ledger
+            ledger._grow_columns()
+            arrays = {
+                "warehouse_ids": np.array(ledger.warehouse_ids, dtype=str),
+                "sku_ids": np.array(ledger.sku_ids, dtype=str),
+                "coords": np.array([self._coords[w] for w in ledger.warehouse_ids],
+                                   dtype=np.float64).reshape(-1, 2),
+                "capacity": ledger.capacity.copy(),
+                "usage": ledger.usage.copy(),
+                "stock": ledger.stock.copy(),
+            }
+            return arrays, self._changes
+
+    def _write(self, arrays, changes):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+        # Состояние считается сохранённым только после успешной записи
+        self._saved_changes = changes
+        self._last_snapshot = time.monotonic()
+        logger.info(f"Снимок состояния складов сохранён: {self.path}")
+
+    def _write_in_background(self, arrays, changes):
+        try:
+            self._write(arrays, changes)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить снимок состояния складов: {e}")
+        finally:
+            self._snapshot_lock.release()
+
+    def load(self):
+        """
+        Загружает состояние складов из файла снимка.
+        """
+        with np.load(self.path) as snap:
+            warehouse_ids = snap["warehouse_ids"].tolist()
+            self.ledger = InventoryLedger(
+                warehouse_ids,
+                snap["capacity"],
+                snap["usage"],
+                snap["stock"],
+                snap["sku_ids"].tolist(),
+            )
+            self._coords = {wh_id: tuple(c) for wh_id, c in zip(warehouse_ids, snap["coords"].tolist())}
+        logger.info(f"Загружено состояние {len(self._coords)} складов из {self.path}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_warehouse_store():
+    """
+    Возвращает хранилище состояния складов процесса, создавая его при первом обращении.
+
+    Путь к снимку берётся из переменной окружения WAREHOUSE_STATE_PATH; если она не задана,
+    состояние живёт только в памяти процесса.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = WarehouseStateStore(os.getenv(WAREHOUSE_STATE_ENV))
+    return _store
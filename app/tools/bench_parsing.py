@@ -0,0 +1,81 @@
+"""
+Бенчмарк разбора запроса и сериализации ответа /calculate-route.
+
+Сравнивает стоимость на одну доставку:
+  - до: json + валидация DeliveryRequest в pydantic, DeliveryResponse(**result) и повторная
+    валидация response_model с сериализацией через jsonable_encoder + json;
+  - после: orjson + parse_delivery_request, ответ сериализуется orjson один раз;
+  - колоночный формат: тот же запрос с deliveries в виде столбцов (DeliveryTable).
+
+Запуск (из каталога app):
+    python -m tools.bench_parsing --deliveries 5000 --repeat 5
+"""
+import argparse
+import json
+import random
+import time
+import orjson
+from fastapi.encoders import jsonable_encoder
+from schemas.delivery import DeliveryRequest, DeliveryResponse
+from schemas.fast_parse import parse_delivery_request
+from tools.payloads import generate_request, to_columnar
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора запроса и сериализации ответа")
+    parser.add_argument("--deliveries", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = generate_request(args.deliveries, rng=random.Random(0))
+    body = json.dumps(payload).encode()
+    columnar_body = orjson.dumps(to_columnar(payload))
+    result = {
+        "route_order": [f"D{i}" for i in range(args.deliveries)],
+        "osm_url": "https://yandex.ru/maps/?rtext=55.75,37.61&mode=routes",
+        "message": "OK",
+    }
+
+    def parse_before():
+        return DeliveryRequest.parse_obj(json.loads(body))
+
+    def parse_after():
+        return parse_delivery_request(orjson.loads(body))
+
+    def parse_columnar():
+        return parse_delivery_request(orjson.loads(columnar_body))
+
+    def respond_before():
+        response = DeliveryResponse(**result)
+        validated = DeliveryResponse.validate(response.dict())
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def respond_after():
+        return orjson.dumps(result)
+
+    assert parse_before() == parse_after(), "Быстрый разбор даёт другой результат"
+
+    n = args.deliveries
+    rows = [
+        ("разбор запроса", best_time(parse_before, args.repeat), best_time(parse_after, args.repeat)),
+        ("колоночный", best_time(parse_before, args.repeat), best_time(parse_columnar, args.repeat)),
+        ("сборка ответа", best_time(respond_before, args.repeat), best_time(respond_after, args.repeat)),
+    ]
+    print(f"Доставок: {n}, тело запроса: {len(body) / 1024:.0f} КБ, "
+          f"в колоночном формате: {len(columnar_body) / 1024:.0f} КБ")
+    print(f"{'этап':<16}{'до, мкс/дост.':>16}{'после, мкс/дост.':>20}{'ускорение':>12}")
+    for name, before, after in rows:
+        print(f"{name:<16}{before / n * 1e6:>16.2f}{after / n * 1e6:>20.2f}{before / after:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
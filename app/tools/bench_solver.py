@@ -0,0 +1,131 @@
+"""
+Бенчмарк решателя: значение целевой функции во времени для поиска OR-Tools, LNS и эвристики.
+
+Задача строится по сгенерированному запросу (tools.payloads) с матрицами по прямой
+(без OSRM), обоими методами решается одна и та же подзадача. Приоритеты доставок
+выравниваются: порядок приоритетов со случайными окнами делает задачу несовместной.
+Для поиска OR-Tools каждое найденное решение фиксируется через AddAtSolutionCallback,
+для LNS — начальное решение и каждое улучшение, для эвристики — её единственное решение
+(значение целевой функции считается по модели OR-Tools). Печатается лучшее значение целевой функции в контрольные моменты времени.
+
+Запуск (из каталога app):
+    python -m tools.bench_solver --deliveries 1000 --vehicles 10 --time-limit 60 --workers 4
+"""
+import argparse
+import random
+import time
+from functools import partial
+import numpy as np
+from schemas.delivery import DeliveryRequest
+from services.heuristic import solve_heuristic
+from services.lns import RuinAndRecreate, read_routes
+from services.optimization import (LNS_INITIAL_SHARE, build_routing_model, build_shared_routing_model,
+                                   build_subproblem, model_data, resolve_vehicles, search_parameters)
+from services.shared_matrix import SharedMatrices
+from tools.payloads import generate_request
+
+# Средняя скорость для матрицы продолжительности по прямой, м/с
+SPEED = 8.0
+
+# Коэффициент извилистости дорог относительно расстояния по прямой
+DETOUR = 1.3
+
+
+def synthetic_matrices(points):
+    """
+    Матрицы расстояний (м) и продолжительности (с) по расстоянию по прямой.
+    """
+    coords = np.radians(np.asarray(points, dtype=np.float64))
+    lat, lon = coords[:, 0], coords[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    distances = 2 * 6371000 * np.arcsin(np.sqrt(a)) * DETOUR
+    return distances, distances / SPEED
+
+
+def build_problem(n_deliveries, n_vehicles, seed):
+    payload = generate_request(n_deliveries, rng=random.Random(seed))
+    for delivery in payload["deliveries"]:
+        delivery["priority"] = "medium"
+    payload["vehicles"] = [
+        {"id": f"V{i}", "start_coord": payload["depot_coord"], "capacity": max(20, 3 * n_deliveries // n_vehicles)}
+        for i in range(1, n_vehicles + 1)
+    ]
+    data = DeliveryRequest.parse_obj(payload)
+    warehouses = [{"id": w.id, "coord": w.coord, "capacity": w.capacity, "usage": w.usage} for w in data.warehouses]
+    points = [data.depot_coord] + [w["coord"] for w in warehouses] + [d.coord for d in data.deliveries]
+    return build_subproblem(data.deliveries, data.depot_coord, warehouses, matrices=synthetic_matrices(points),
+                            vehicles=resolve_vehicles(data))
+
+
+def run_ortools(sub_data, time_limit):
+    manager, routing, _ = build_routing_model(sub_data, sub_data["time_matrix"], 20, 100000)
+    history = []
+    started = time.monotonic()
+    routing.AddAtSolutionCallback(lambda: history.append((time.monotonic() - started, routing.CostVar().Value())))
+    routing.SolveWithParameters(search_parameters(time_limit))
+    return history
+
+
+def run_lns(sub_data, time_limit, workers):
+    started = time.monotonic()
+    manager, routing, _ = build_routing_model(sub_data, sub_data["time_matrix"], 20, 100000)
+    history = []
+    routing.AddAtSolutionCallback(lambda: history.append((time.monotonic() - started, routing.CostVar().Value())))
+    sol = routing.SolveWithParameters(search_parameters(time_limit * LNS_INITIAL_SHARE))
+    if not sol:
+        return history
+
+    with SharedMatrices() as shared:
+        model_factory = partial(build_shared_routing_model, model_data(sub_data),
+                                shared.share(sub_data["time_matrix"], dtype=np.int32), 20, 100000)
+        lns = RuinAndRecreate(model_factory, sub_data, sub_data["time_matrix"], workers=workers)
+        offset = time.monotonic() - started
+        lns.improve(read_routes(manager, routing, sol), sol.ObjectiveValue(), time_limit - offset)
+    history.extend((offset + elapsed, objective) for elapsed, objective in lns.history[1:])
+    return history
+
+
+def run_heuristic(sub_data):
+    started = time.monotonic()
+    routes, _, _ = solve_heuristic(sub_data, sub_data["time_matrix"], 20)
+    elapsed = time.monotonic() - started
+    manager, routing, _ = build_routing_model(sub_data, sub_data["time_matrix"], 20, 100000)
+    sol = routing.ReadAssignmentFromRoutes([[manager.NodeToIndex(node) for node in route[1:-1]] for route in routes],
+                                           True)
+    return [(elapsed, sol.ObjectiveValue())] if sol else []
+
+
+def best_at(history, moment):
+    values = [objective for elapsed, objective in history if elapsed <= moment]
+    return min(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк решателя: целевая функция во времени")
+    parser.add_argument("--deliveries", type=int, default=1000)
+    parser.add_argument("--vehicles", type=int, default=10)
+    parser.add_argument("--time-limit", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--points", type=int, default=10, help="Число контрольных моментов времени")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sub_data = build_problem(args.deliveries, args.vehicles, args.seed)
+    curves = {
+        "ortools": run_ortools(sub_data, args.time_limit),
+        "lns": run_lns(sub_data, args.time_limit, args.workers),
+        "heuristic": run_heuristic(sub_data),
+    }
+
+    print(f"{args.deliveries} доставок, {args.vehicles} ТС, лимит {args.time_limit:g} с")
+    print(f"{'время, с':>10}" + "".join(f"{name:>16}" for name in curves))
+    for i in range(1, args.points + 1):
+        moment = args.time_limit * i / args.points
+        row = [best_at(history, moment) for history in curves.values()]
+        print(f"{moment:>10.1f}" + "".join(f"{'-' if v is None else v:>16}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Утилита построения и расширения хранилища матриц расстояний.
+
+Запуск (из каталога app):
+    python -m tools.build_matrix_store --store /data/matrix_store ../input.json locations.json
+
+Каждый входной файл — либо запрос в формате DeliveryRequest (берутся depot_coord,
+координаты складов и доставок), либо JSON-список координат [[широта, долгота], ...].
+"""
+import argparse
+import json
+from services.matrix_store import extend_store
+from utils.logger import setup_logging
+
+
+def collect_points(payload):
+    """
+    Извлекает координаты локаций из входного файла.
+
+    Args:
+        payload (dict | list): Содержимое JSON-файла.
+
+    Returns:
+        list: Список координат (широта, долгота).
+    """
+    if isinstance(payload, list):
+        return [tuple(c) for c in payload]
+
+    points = [tuple(payload["depot_coord"])]
+    points.extend(tuple(w["coord"]) for w in payload.get("warehouses", []))
+    points.extend(tuple(d["coord"]) for d in payload.get("deliveries", []))
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Построение хранилища матриц расстояний из OSRM")
+    parser.add_argument("--store", required=True, help="Каталог хранилища матриц")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Максимум точек в одном запросе к OSRM")
+    parser.add_argument("inputs", nargs="+", help="JSON-файлы с запросами или списками координат")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    points = []
+    for path in args.inputs:
+        with open(path, encoding="utf-8") as f:
+            points.extend(collect_points(json.load(f)))
+
+    added = extend_store(args.store, points, chunk_size=args.chunk_size)
+    print(f"Добавлено локаций: {added}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Утилита подготовки графа дорог для встроенного маршрутизатора.
+
+Запуск (из каталога app):
+    python -m tools.build_road_graph region.osm /data/road_graph.npz --bench 1000
+
+Выгрузка OSM (XML) разбирается, строится иерархия сжатия, результат сохраняется в .npz;
+путь к нему задаётся в переменной окружения ROAD_GRAPH_PATH. С --bench после построения
+считается таблица N x N по случайным узлам графа и печатается время расчёта.
+"""
+import argparse
+import time
+import numpy as np
+from services.road_graph import RoadGraph
+from utils.logger import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Подготовка графа дорог из выгрузки OSM")
+    parser.add_argument("osm", help="Выгрузка OSM в формате XML (.osm)")
+    parser.add_argument("output", help="Файл подготовленного графа (.npz)")
+    parser.add_argument("--bench", type=int, default=0, help="Размер таблицы для замера времени расчёта")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    started = time.monotonic()
+    graph = RoadGraph.from_osm(args.osm)
+    graph.save(args.output)
+    print(f"Граф: {len(graph)} узлов, подготовка {time.monotonic() - started:.1f} с")
+
+    if args.bench:
+        rng = np.random.default_rng(0)
+        ids = rng.choice(len(graph), min(args.bench, len(graph)), replace=False)
+        points = [tuple(c) for c in graph.coords[ids].tolist()]
+        started = time.monotonic()
+        graph.table(points)
+        print(f"Таблица {len(points)}x{len(points)}: {time.monotonic() - started:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
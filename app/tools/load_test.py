@@ -0,0 +1,293 @@
+"""
+Нагрузочный тест /api/v1/calculate-route с локальной заглушкой OSRM.
+
+Поднимает заглушку OSRM (HTTP-сервер в потоке, матрицы по расстоянию по прямой) с настраиваемой
+задержкой и долей ошибок, запускает приложение через uvicorn с OSRM_BASE_URL, указывающим на неё,
+и отправляет сгенерированные запросы (tools.payloads) с заданной параллельностью. По заголовку
+Server-Timing ответа печатаются пропускная способность, p50/p95/p99 общей задержки и каждого этапа
+и доля ошибок по кодам ответа и этапам, на которых они произошли.
+
+Запуск (из каталога app):
+    python -m tools.load_test --requests 200 --concurrency 8 --deliveries 50 --osrm-latency 0.05 --osrm-error-rate 0.02
+
+С --api-url запросы отправляются в уже запущенный сервис (он должен сам смотреть на нужный OSRM).
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import orjson
+import requests
+from tools.bench_solver import synthetic_matrices
+from tools.payloads import generate_request
+from utils.timing import parse_server_timing
+
+# Перцентили задержки в отчёте
+PERCENTILES = (50, 95, 99)
+
+# Время ожидания запуска приложения, с
+STARTUP_TIMEOUT = 60
+
+
+class FakeOSRM(ThreadingHTTPServer):
+    """
+    Заглушка сервиса OSRM /table/v1/driving с задержкой и случайными ошибками 503.
+
+    Attributes:
+        latency (float): Базовая задержка ответа, с.
+        jitter (float): Максимальная случайная добавка к задержке, с.
+        error_rate (float): Доля запросов, на которые возвращается 503.
+        stats (Counter): Число ответов по кодам.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__(address, FakeOSRMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """
+        Случайные задержка и признак ошибки для очередного запроса.
+        """
+        with self._lock:
+            return self.latency + self._rng.uniform(0, self.jitter), self._rng.random() < self.error_rate
+
+    def record(self, status):
+        with self._lock:
+            self.stats[status] += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeOSRMHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        delay, fail = self.server.draw()
+        time.sleep(delay)
+
+        url = urlsplit(self.path)
+        prefix = "/table/v1/driving/"
+        if fail or not url.path.startswith(prefix):
+            status = 503 if fail else 404
+            self._reply(status, {"code": "Error" if fail else "InvalidUrl"})
+            return
+
+        points = [tuple(map(float, c.split(",")))[::-1] for c in url.path[len(prefix):].split(";")]
+        query = parse_qs(url.query)
+        distances, durations = synthetic_matrices(points)
+        rows = self._indices(query, "sources", len(points))
+        cols = self._indices(query, "destinations", len(points))
+        sel = np.ix_(rows, cols)
+        self._reply(200, {"code": "Ok", "distances": distances[sel].tolist(), "durations": durations[sel].tolist()})
+
+    @staticmethod
+    def _indices(query, name, n):
+        if name not in query:
+            return list(range(n))
+        return [int(i) for i in query[name][0].split(";")]
+
+    def _reply(self, status, payload):
+        body = orjson.dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(status)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_osrm(port, latency, jitter, error_rate, seed=None):
+    """
+    Запускает заглушку OSRM в фоновом потоке.
+
+    Returns:
+        FakeOSRM: Запущенный сервер; остановка через shutdown().
+    """
+    server = FakeOSRM(("127.0.0.1", port), latency, jitter, error_rate, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_api(port, workers, osrm_url):
+    """
+    Запускает приложение через uvicorn и дожидается ответа /healthcheck.
+
+    Returns:
+        subprocess.Popen: Процесс сервера.
+
+    Raises:
+        RuntimeError: Если приложение не ответило за STARTUP_TIMEOUT секунд.
+    """
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, OSRM_BASE_URL=osrm_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=app_dir, env=env,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Приложение завершилось с кодом {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/healthcheck", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Приложение не запустилось")
+
+
+def send_request(session, url, payload):
+    """
+    Отправляет один запрос.
+
+    Returns:
+        dict: status (код ответа или "connection"), latency (мс), stages и failed из Server-Timing.
+    """
+    start = time.perf_counter()
+    try:
+        resp = session.post(url, data=orjson.dumps(payload), headers={"Content-Type": "application/json"})
+        status = resp.status_code
+        stages, failed = parse_server_timing(resp.headers.get("Server-Timing"))
+    except requests.RequestException:
+        status, stages, failed = "connection", {}, None
+    return {"status": status, "latency": (time.perf_counter() - start) * 1000, "stages": stages, "failed": failed}
+
+
+def run_load(url, payloads, concurrency):
+    """
+    Отправляет запросы с заданной параллельностью.
+
+    Returns:
+        tuple: (results, elapsed) — результаты send_request в порядке payloads и общее время, с.
+    """
+    local = threading.local()
+
+    def worker(payload):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return send_request(local.session, url, payload)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, payloads))
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    """
+    Сводка по результатам нагрузки.
+
+    Returns:
+        dict: throughput (запросов/с), latency (перцентили общей задержки), stages (перцентили по этапам),
+            statuses (число ответов по кодам), failed_stages (число ошибок по этапам).
+    """
+    def percentiles(values):
+        return {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES} if values else {}
+
+    stage_values = defaultdict(list)
+    for r in results:
+        for name, duration in r["stages"].items():
+            stage_values[name].append(duration)
+
+    return {
+        "throughput": len(results) / elapsed if elapsed > 0 else 0.0,
+        "latency": percentiles([r["latency"] for r in results]),
+        "stages": {name: percentiles(values) for name, values in stage_values.items()},
+        "statuses": Counter(r["status"] for r in results),
+        "failed_stages": Counter(r["failed"] for r in results if r["failed"]),
+    }
+
+
+def print_report(summary, total, osrm_stats=None):
+    def row(name, values):
+        cells = "".join(f"{values.get(f'p{p}', float('nan')):>12.1f}" for p in PERCENTILES)
+        print(f"{name:<12}{cells}")
+
+    print(f"Запросов: {total}, пропускная способность: {summary['throughput']:.2f} запросов/с")
+    print(f"{'этап, мс':<12}" + "".join(f"{'p' + str(p):>12}" for p in PERCENTILES))
+    row("total", summary["latency"])
+    for name, values in summary["stages"].items():
+        row(name, values)
+
+    print("Ответы по кодам:")
+    for status, count in sorted(summary["statuses"].items(), key=lambda item: str(item[0])):
+        print(f"  {status}: {count} ({100 * count / total:.1f}%)")
+    if summary["failed_stages"]:
+        print("Ошибки по этапам:")
+        for stage, count in summary["failed_stages"].most_common():
+            print(f"  {stage}: {count} ({100 * count / total:.1f}%)")
+    if osrm_stats is not None:
+        print("Заглушка OSRM: " + ", ".join(f"{status}: {count}" for status, count in sorted(osrm_stats.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /api/v1/calculate-route")
+    parser.add_argument("--requests", type=int, default=100, help="Число запросов")
+    parser.add_argument("--concurrency", type=int, default=4, help="Число одновременных запросов")
+    parser.add_argument("--deliveries", type=int, default=30, help="Доставок в запросе")
+    parser.add_argument("--warehouses", type=int, default=3, help="Складов в запросе")
+    parser.add_argument("--time-limit", type=int, default=1, help="Лимит времени решателя, с")
+    parser.add_argument("--solver", default="ortools", choices=["ortools", "lns", "heuristic"], help="Решатель")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно генератора запросов")
+    parser.add_argument("--api-url", help="Адрес запущенного сервиса (без запуска своего)")
+    parser.add_argument("--port", type=int, default=8081, help="Порт запускаемого приложения")
+    parser.add_argument("--workers", type=int, default=1, help="Число процессов uvicorn")
+    parser.add_argument("--osrm-port", type=int, default=5055, help="Порт заглушки OSRM")
+    parser.add_argument("--osrm-latency", type=float, default=0.0, help="Задержка ответа заглушки OSRM, с")
+    parser.add_argument("--osrm-jitter", type=float, default=0.0, help="Случайная добавка к задержке OSRM, с")
+    parser.add_argument("--osrm-error-rate", type=float, default=0.0, help="Доля ответов OSRM с кодом 503")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = []
+    for _ in range(args.requests):
+        payload = generate_request(args.deliveries, n_warehouses=args.warehouses, rng=rng)
+        payload["time_limit"] = args.time_limit
+        payload["solver"] = args.solver
+        payloads.append(payload)
+
+    osrm = process = None
+    try:
+        if args.api_url:
+            base_url = args.api_url.rstrip("/")
+        else:
+            osrm = start_fake_osrm(args.osrm_port, args.osrm_latency, args.osrm_jitter, args.osrm_error_rate,
+                                   seed=args.seed)
+            process = start_api(args.port, args.workers, osrm.url)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        results, elapsed = run_load(f"{base_url}/api/v1/calculate-route", payloads, args.concurrency)
+        print_report(summarize(results, elapsed), len(results), osrm.stats if osrm else None)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if osrm is not None:
+            osrm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
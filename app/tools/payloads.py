@@ -0,0 +1,87 @@
+"""
+Генерация тестовых запросов на расчёт маршрута для бенчмарков и нагрузочных тестов.
+"""
+import random
+
+PRIORITIES = ["critical", "urgent", "high", "medium", "low"]
+
+
+def generate_request(n_deliveries, n_warehouses=3, center=(55.75, 37.62), spread=0.1, rng=None):
+    """
+    Генерирует запрос DeliveryRequest в виде словаря.
+
+    Args:
+        n_deliveries (int): Количество доставок.
+        n_warehouses (int, optional): Количество складов. По умолчанию 3.
+        center (tuple, optional): Центр района доставки (широта, долгота).
+        spread (float, optional): Разброс координат в градусах.
+        rng (random.Random, optional): Генератор случайных чисел.
+
+    Returns:
+        dict: Тело запроса для /calculate-route.
+    """
+    rng = rng or random.Random()
+    lat0, lon0 = center
+
+    def point():
+        return [round(lat0 + rng.uniform(-spread, spread), 6), round(lon0 + rng.uniform(-spread, spread), 6)]
+
+    warehouses = [
+        {
+            "id": f"W{i}",
+            "coord": point(),
+            "capacity": 10 * n_deliveries + 100,
+            "usage": 0,
+            "stock": {f"item{j}": 10 * n_deliveries for j in range(5)},
+        }
+        for i in range(1, n_warehouses + 1)
+    ]
+
+    deliveries = []
+    for i in range(1, n_deliveries + 1):
+        start = rng.randrange(480, 900, 30)
+        deliveries.append({
+            "id": f"D{i}",
+            "coord": point(),
+            "priority": rng.choice(PRIORITIES),
+            "demand": rng.randint(1, 3),
+            "items": [{"guid": f"item{rng.randrange(5)}", "count": rng.randint(1, 3)}],
+            "refused": False,
+            "origin_warehouse": rng.choice(warehouses)["id"],
+            "time_window": [start, start + rng.choice([120, 240, 480])],
+            "service_time": rng.choice([5, 10, 15]),
+        })
+
+    return {
+        "depot_coord": point(),
+        "vehicle_capacity": max(20, 3 * n_deliveries),
+        "deliveries": deliveries,
+        "warehouses": warehouses,
+    }
+
+
+def to_columnar(payload):
+    """
+    Переводит запрос с доставками-объектами в колоночный формат.
+
+    Args:
+        payload (dict): Тело запроса, как у generate_request.
+
+    Returns:
+        dict: Тот же запрос, где deliveries - объект столбцов.
+    """
+    deliveries = payload["deliveries"]
+    columns = {
+        "id": [d["id"] for d in deliveries],
+        "lat": [d["coord"][0] for d in deliveries],
+        "lon": [d["coord"][1] for d in deliveries],
+        "priority": [d.get("priority", "medium") for d in deliveries],
+        "demand": [d["demand"] for d in deliveries],
+        "tw_start": [d.get("time_window", [0, 1440])[0] for d in deliveries],
+        "tw_end": [d.get("time_window", [0, 1440])[1] for d in deliveries],
+        "service_time": [d["service_time"] for d in deliveries],
+        "origin_warehouse": [d["origin_warehouse"] for d in deliveries],
+        "refused": [d.get("refused", False) for d in deliveries],
+        "items": [[[it["guid"], it["count"]] for it in d.get("items", [])] for d in deliveries],
+    }
+    return dict(payload, deliveries=columns)
@@ -0,0 +1,165 @@
+"""
+Воспроизведение записанных запросов (services.capture) для поиска регрессий производительности.
+
+Каждая запись прогоняется через run_optimization с записанными матрицами (без OSRM), снимком
+складов и профилем качества (services.qos), по которому запрос решался при записи; печатается время
+этапа solve (решатель, без загрузки матриц) и показатели плана (objective) рядом с записанными
+в production или с результатами другого прогона. Генератор случайных чисел LNS инициализируется фиксированным
+значением, эвристика детерминирована; поиск OR-Tools ограничен временем, поэтому его результат
+может немного отличаться между прогонами, а время этапа solve близко к time_limit в любой версии кода.
+
+Для сравнения версий решателя используется детерминированный режим --solutions N: поиск OR-Tools
+останавливается после N найденных решений (time_limit только страхует от зависания), улучшение LNS,
+ограниченное временем, не выполняется. План и объём работы поиска тогда одинаковы между прогонами,
+и время этапа solve сравнимо; сравнение идёт только с прогонами в том же режиме (--baseline).
+
+Сравнение двух версий кода (из каталога app):
+    python -m tools.replay_captures /data/captures --solutions 200 --output before.json
+    git checkout <новая версия>
+    python -m tools.replay_captures /data/captures --solutions 200 --baseline before.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from schemas.fast_parse import parse_delivery_request
+from services.capture import CAPTURE_SUFFIX, load_capture
+from services.optimization import run_optimization
+from services.qos import QosProfile
+from utils.logger import setup_logging
+from utils.timing import StageTimer
+
+# Ограничение времени поиска в детерминированном режиме: наибольшее допустимое в запросе,
+# чтобы поиск останавливался по числу решений, а не по времени
+DETERMINISTIC_TIME_LIMIT = 300
+
+
+def capture_paths(inputs):
+    """
+    Файлы записей из списка файлов и каталогов, по имени (то есть по времени записи).
+    """
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith(CAPTURE_SUFFIX))
+        else:
+            paths.append(path)
+    return sorted(paths, key=os.path.basename)
+
+
+def replay(path, time_limit=None, solver=None, solution_limit=None):
+    """
+    Прогоняет одну запись через run_optimization.
+
+    Args:
+        path (str): Файл записи.
+        time_limit (int, optional): Заменить time_limit запроса.
+        solver (str, optional): Заменить решатель запроса.
+        solution_limit (int, optional): Детерминированный режим: число решений поиска OR-Tools;
+            без time_limit поиск ограничен DETERMINISTIC_TIME_LIMIT.
+
+    Returns:
+        tuple: (run, recorded) — результат прогона и записанный расчёт, оба с полями elapsed, stages,
+            objective и message; у прогона также solution_limit.
+    """
+    payload, matrices, meta = load_capture(path)
+    if solution_limit is not None:
+        payload["time_limit"] = DETERMINISTIC_TIME_LIMIT
+    if time_limit is not None:
+        payload["time_limit"] = time_limit
+    if solver is not None:
+        payload["solver"] = solver
+
+    timer = StageTimer()
+    started = time.perf_counter()
+    data = parse_delivery_request(payload)
+    qos = QosProfile.parse_obj(meta["qos"]) if meta.get("qos") else None
+    result = run_optimization(data, matrices, timer, qos=qos, solution_limit=solution_limit)
+    run = {
+        "elapsed": time.perf_counter() - started,
+        "stages": timer.stages,
+        "objective": result.get("objective"),
+        "message": result["message"],
+        "solution_limit": solution_limit,
+    }
+    return run, meta
+
+
+def solve_seconds(run):
+    """
+    Время этапа solve в секундах; у записей без замера этапов - общее время обработки.
+    """
+    stages = run.get("stages") or {}
+    return stages["solve"] / 1000 if "solve" in stages else run["elapsed"]
+
+
+def objective_key(objective):
+    """
+    Ключ сравнения планов: больше выполненных доставок, затем меньше времени в пути.
+    """
+    if not objective:
+        return 0, 0
+    return -objective["served"], objective["travel_time"]
+
+
+def describe(objective):
+    if not objective:
+        return "-"
+    return f"{objective['served']}/{objective['travel_time']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных запросов")
+    parser.add_argument("inputs", nargs="+", help="Файлы записей или каталоги CAPTURE_DIR")
+    parser.add_argument("--time-limit", type=int, help="Заменить time_limit запросов")
+    parser.add_argument("--solver", choices=["ortools", "lns", "heuristic"], help="Заменить решатель запросов")
+    parser.add_argument("--solutions", type=int,
+                        help="Детерминированный режим: остановить поиск OR-Tools после стольких решений")
+    parser.add_argument("--baseline", help="Результаты прошлого прогона (--output) вместо записанных значений")
+    parser.add_argument("--output", help="Сохранить результаты прогона в JSON")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    ratios = []
+    better = worse = 0
+    print(f"{'запись':<34}{'было, с':>10}{'стало, с':>10}{'изм.':>8}   план (выполнено/минут в пути)")
+    for path in capture_paths(args.inputs):
+        name = os.path.basename(path)
+        run, recorded = replay(path, args.time_limit, args.solver, args.solutions)
+        results[name] = run
+        reference = baseline.get(name) if baseline is not None else recorded
+        # Время сравнимо только с прогоном в том же режиме: записанный в production расчёт ограничен временем
+        if reference is not None and reference.get("solution_limit") != args.solutions:
+            reference = None
+        if reference is None:
+            print(f"{name:<34}{'-':>10}{solve_seconds(run):>10.2f}{'':>8}   {describe(run['objective'])}")
+            continue
+
+        was_seconds, now_seconds = solve_seconds(reference), solve_seconds(run)
+        ratio = now_seconds / was_seconds if was_seconds > 0 else float("nan")
+        ratios.append(ratio)
+        was, now = objective_key(reference["objective"]), objective_key(run["objective"])
+        better += now < was
+        worse += now > was
+        print(f"{name:<34}{was_seconds:>10.2f}{now_seconds:>10.2f}{(ratio - 1) * 100:>7.1f}%   "
+              f"{describe(reference['objective'])} -> {describe(run['objective'])}")
+
+    if ratios:
+        print(f"Записей: {len(ratios)}, медиана отношения времени решателя: {statistics.median(ratios):.3f}, "
+              f"план лучше: {better}, хуже: {worse}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+import threading
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Причины отмены расчёта
+DISCONNECT = "disconnect"  # клиент закрыл соединение
+CANCEL = "cancel"  # запрос отменён через эндпоинт отмены
+DEADLINE = "deadline"  # наступил срок из заголовка X-Request-Deadline
+
+# Период проверки соединения клиента во время расчёта, секунды
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# Активные расчёты по X-Request-ID для эндпоинта отмены (в пределах одного процесса)
+_active = {}
+_active_lock = threading.Lock()
+
+
+class RequestCancelled(Exception):
+    """
+    Расчёт остановлен до получения результата, который можно вернуть клиенту.
+
+    Attributes:
+        reason (str): Причина отмены (DISCONNECT, CANCEL или DEADLINE).
+    """
+
+    def __init__(self, reason):
+        super().__init__(f"Расчёт отменён: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Признак отмены расчёта, общий для обработчика запроса и решателя.
+
+    Обработчик запроса отменяет расчёт (cancel) при отключении клиента или по запросу отмены,
+    срок deadline проверяется при каждом обращении к cancelled. Решатель опрашивает cancelled
+    и останавливает поиск, сохраняя лучшее найденное решение.
+
+    Attributes:
+        deadline (float | None): Срок расчёта по часам time.monotonic().
+        reason (str | None): Причина отмены; None, пока расчёт не отменён.
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason):
+        """
+        Отменяет расчёт; повторная отмена не меняет первую причину.
+        """
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            logger.info(f"Расчёт отменён: {reason}")
+
+    @property
+    def cancelled(self):
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(DEADLINE)
+            return True
+        return False
+
+    def raise_if_cancelled(self):
+        """
+        Raises:
+            RequestCancelled: Если расчёт отменён.
+        """
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+
+def parse_deadline(value):
+    """
+    Срок расчёта из заголовка X-Request-Deadline.
+
+    Args:
+        value (str): Момент времени Unix в секундах (допускается дробная часть).
+
+    Returns:
+        float: Тот же момент по часам time.monotonic().
+
+    Raises:
+        ValueError: Если значение не число.
+    """
+    deadline = float(value)
+    if not math.isfinite(deadline):
+        raise ValueError(f"Некорректный срок: {value}")
+    return time.monotonic() + (deadline - time.time())
+
+
+def register(request_id, token):
+    """
+    Делает расчёт доступным для отмены по X-Request-ID.
+    """
+    with _active_lock:
+        _active[request_id] = token
+
+
+def unregister(request_id, token):
+    """
+    Убирает расчёт из доступных для отмены (если под этим ID не зарегистрирован более новый).
+    """
+    with _active_lock:
+        if _active.get(request_id) is token:
+            del _active[request_id]
+
+
+def cancel_request(request_id):
+    """
+    Отменяет расчёт по X-Request-ID.
+
+    Returns:
+        bool: True, если расчёт с таким ID выполняется в этом процессе.
+    """
+    with _active_lock:
+        token = _active.get(request_id)
+    if token is None:
+        return False
+    token.cancel(CANCEL)
+    return True
+
+
+async def watch_disconnect(request, cancel):
+    """
+    Отменяет расчёт, когда клиент закрывает соединение.
+
+    Args:
+        request (Request): HTTP-запрос, тело которого уже прочитано.
+        cancel (CancellationToken): Признак отмены расчёта этого запроса.
+    """
+    while not cancel.cancelled:
+        if await request.is_disconnected():
+            cancel.cancel(DISCONNECT)
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
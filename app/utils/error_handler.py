@@ -9,6 +9,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 async def generic_exception_handler(request: Request, exc: Exception):
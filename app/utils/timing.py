@@ -0,0 +1,61 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Замер длительности этапов обработки запроса для заголовка Server-Timing.
+
+    Этап, внутри которого возникло исключение, запоминается как незавершённый и попадает
+    в заголовок как failed;desc="<этап>", чтобы по ответу с ошибкой было видно, где она произошла.
+
+    Attributes:
+        stages (dict): Длительность этапов в миллисекундах в порядке их начала.
+        failed (str | None): Этап, завершившийся исключением.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.failed = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Контекст замера этапа name; повторные замеры одного этапа суммируются.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failed = self.failed or name
+            raise
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def header(self):
+        """
+        Значение заголовка Server-Timing, например: parse;dur=1.2, matrix;dur=35.0, solve;dur=980.4
+        """
+        parts = [f"{name};dur={duration:.1f}" for name, duration in self.stages.items()]
+        if self.failed is not None:
+            parts.append(f'failed;desc="{self.failed}"')
+        return ", ".join(parts)
+
+
+def parse_server_timing(value):
+    """
+    Разбирает заголовок Server-Timing.
+
+    Returns:
+        tuple: (stages, failed) - словарь этап -> длительность в миллисекундах и этап с ошибкой или None.
+    """
+    stages = {}
+    failed = None
+    for part in filter(None, (p.strip() for p in (value or "").split(","))):
+        name, *params = [p.strip() for p in part.split(";")]
+        attrs = dict(p.split("=", 1) for p in params if "=" in p)
+        if name == "failed":
+            failed = attrs.get("desc", "").strip('"') or None
+        elif "dur" in attrs:
+            stages[name] = float(attrs["dur"])
+    return stages, failed
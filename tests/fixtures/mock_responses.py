@@ -21,3 +21,29 @@ class MockResponseInvalid:
 
     def json(self):
         return {"invalid_key": []}
+
+
+def coordinate_mock_osrm(*args, **kwargs):
+    # Матрица зависит от самих координат, а не от их порядка в запросе,
+    # и учитывает параметры sources/destinations
+    url = args[0]
+    path, _, query = url.split('/driving/')[-1].partition('?')
+    points = [tuple(float(x) for x in c.split(',')) for c in path.split(';')]
+    params = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+    sources = [int(i) for i in params['sources'].split(';')] if 'sources' in params else range(len(points))
+    destinations = [int(i) for i in params['destinations'].split(';')] if 'destinations' in params else range(len(points))
+
+    def distance(a, b):
+        return round(abs(a[0] - b[0]) * 100000 + abs(a[1] - b[1]) * 60000, 1)
+
+    distances = [[distance(points[i], points[j]) for j in destinations] for i in sources]
+    durations = [[d / 10 for d in row] for row in distances]
+
+    class MockResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"distances": distances, "durations": durations}
+
+    return MockResponse()
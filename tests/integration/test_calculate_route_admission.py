@@ -0,0 +1,35 @@
+import threading
+import time
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from app.utils.timing import parse_server_timing
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+from tests.integration.test_calculate_route_cancellation import long_request
+
+client = TestClient(app)
+
+
+# Тест полос очереди: короткий расчёт не ждёт длинного, запущенного раньше него
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_small_request_not_blocked_by_large(mock_get, valid_delivery_request):
+    large = long_request(dict(valid_delivery_request, warehouses=[dict(valid_delivery_request["warehouses"][0])]))
+    responses = []
+    worker = threading.Thread(target=lambda: responses.append(client.post(
+        "/api/v1/calculate-route", json=large,
+        headers={"X-Tenant-ID": "bulk", "X-Request-Deadline": str(time.time() + 4)})))
+    worker.start()
+    time.sleep(0.5)
+
+    valid_delivery_request["time_limit"] = 1
+    started = time.monotonic()
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request, headers={"X-Tenant-ID": "shop"})
+    elapsed = time.monotonic() - started
+    worker.join(timeout=15)
+
+    assert response.status_code == 200
+    assert elapsed < 3
+    stages, _ = parse_server_timing(response.headers["Server-Timing"])
+    assert stages["queue"] < 500
+    assert responses[0].status_code == 200
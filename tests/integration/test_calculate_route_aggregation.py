@@ -0,0 +1,49 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+
+def colocated_request(request):
+    base = request["deliveries"][0]
+    request["warehouses"][0]["stock"] = {"itemA": 20}
+    request["deliveries"] = [
+        dict(base, id="D1", demand=3, items=[{"guid": "itemA", "count": 1}], priority="low"),
+        dict(base, id="D2", demand=3, items=[{"guid": "itemA", "count": 1}], coord=[55.770004, 37.610003]),
+        dict(base, id="D3", demand=3, items=[{"guid": "itemA", "count": 1}], coord=[55.74, 37.64]),
+        dict(base, id="D4", demand=3, items=[{"guid": "itemA", "count": 1}], time_window=[480, 600]),
+    ]
+    return request
+
+
+# Тест объединения доставок в одной точке: в матрицу OSRM попадает одна точка на здание,
+# а в ответе остаются все доставки
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_aggregate_colocated(mock_get, valid_delivery_request):
+    request = colocated_request(valid_delivery_request)
+    request["aggregate_colocated"] = True
+
+    response = client.post("/api/v1/calculate-route", json=request)
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(data["route_order"]) == ["D1", "D2", "D3", "D4"]
+    # Доставки одного здания идут подряд, первой - с более ранним окном
+    position = {d: i for i, d in enumerate(data["route_order"])}
+    assert sorted(position[d] for d in ("D1", "D2", "D4")) == [position["D4"], position["D4"] + 1,
+                                                              position["D4"] + 2]
+    assert data["objective"]["served"] == 4
+    assert data["inventory"]["W1"]["stock"] == {"itemA": 16}
+
+    # Депо, склад, две точки доставок
+    url = mock_get.call_args[0][0]
+    assert len(url.split('/driving/')[-1].split('?')[0].split(';')) == 4
+
+
+def test_calculate_route_aggregate_requires_fixed_warehouses(valid_delivery_request):
+    valid_delivery_request["aggregate_colocated"] = True
+    valid_delivery_request["assign_warehouses"] = True
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
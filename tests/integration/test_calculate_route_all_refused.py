@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 # Тест с полной отказной доставкой
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_all_refused(mock_get):
     all_refused_request = {
         "depot_coord": [55.751244, 37.618423],
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест выбора склада-источника решателем по наличию товара
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_assign_warehouses(mock_get):
+    request_data = {
+        "depot_coord": [55.751244, 37.618423],
+        "vehicle_capacity": 20,
+        "assign_warehouses": True,
+        "deliveries": [
+            {
+                "id": "D1",
+                "coord": [55.77, 37.61],
+                "demand": 4,
+                "items": [{"guid": "itemA", "count": 4}],
+                "origin_warehouse": "W1",
+                "service_time": 10
+            },
+            {
+                "id": "D2",
+                "coord": [55.78, 37.60],
+                "demand": 4,
+                "items": [{"guid": "itemA", "count": 4}],
+                "origin_warehouse": "W1",
+                "service_time": 10
+            },
+            {
+                "id": "D3",
+                "coord": [55.79, 37.59],
+                "demand": 1,
+                "items": [{"guid": "itemB", "count": 1}],
+                "origin_warehouse": "W1",
+                "service_time": 10
+            }
+        ],
+        "warehouses": [
+            {"id": "W1", "coord": [55.76, 37.615], "capacity": 100, "usage": 50, "stock": {"itemA": 5}},
+            {"id": "W2", "coord": [55.765, 37.62], "capacity": 100, "usage": 50, "stock": {"itemA": 10}}
+        ]
+    }
+
+    response = client.post("/api/v1/calculate-route", json=request_data)
+    assert response.status_code == 200
+    data = response.json()
+
+    # Товара itemB нет ни на одном складе, D3 выполнить нельзя
+    assert sorted(data["route_order"]) == ["D1", "D2"]
+    assignment = data["warehouse_assignment"]
+    assert set(assignment) == {"D1", "D2"}
+    # Запаса W1 не хватает на обе доставки
+    assert list(assignment.values()).count("W1") <= 1
+    assert data["stock_shortages"] == []
@@ -0,0 +1,75 @@
+import threading
+import time
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+
+def long_request(request, n=40):
+    base = request["deliveries"][0]
+    request["vehicle_capacity"] = 100
+    request["warehouses"][0]["stock"] = {"itemA": n}
+    request["deliveries"] = [
+        dict(base, id=f"D{i}", coord=[55.72 + 0.004 * (i // 8), 37.58 + 0.006 * (i % 8)], demand=1,
+             priority="medium", items=[{"guid": "itemA", "count": 1}], time_window=[300, 1400], service_time=2)
+        for i in range(n)
+    ]
+    # Управляемый локальный поиск сам не останавливается: без отмены расчёт занял бы всё время
+    request["time_limit"] = 30
+    return request
+
+
+# Тест срока X-Request-Deadline: поиск останавливается к сроку и возвращает лучший найденный план
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_deadline_stops_search(mock_get, valid_delivery_request):
+    request = long_request(valid_delivery_request)
+    started = time.monotonic()
+    response = client.post("/api/v1/calculate-route", json=request,
+                           headers={"X-Request-Deadline": str(time.time() + 1)})
+    assert time.monotonic() - started < 10
+    assert response.status_code == 200
+    data = response.json()
+    assert data["cancelled"] == "deadline"
+    assert data["objective"]["served"] == 40
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_expired_deadline(mock_get, valid_delivery_request):
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request,
+                           headers={"X-Request-Deadline": str(time.time() - 1)})
+    assert response.status_code == 504
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request,
+                           headers={"X-Request-Deadline": "soon"})
+    assert response.status_code == 400
+
+
+# Тест отмены по X-Request-ID: исходный запрос получает план, найденный до отмены
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_cancel_endpoint(mock_get, valid_delivery_request):
+    request = long_request(valid_delivery_request)
+    responses = []
+    worker = threading.Thread(target=lambda: responses.append(
+        client.post("/api/v1/calculate-route", json=request, headers={"X-Request-ID": "route-42"})))
+    started = time.monotonic()
+    worker.start()
+
+    # Отмена принимается, как только расчёт зарегистрирован
+    while (cancel := client.post("/api/v1/calculate-route/route-42/cancel")).status_code == 404:
+        assert time.monotonic() - started < 10
+        time.sleep(0.05)
+    assert cancel.status_code == 202
+    worker.join(timeout=15)
+
+    assert time.monotonic() - started < 15
+    response, = responses
+    assert response.status_code in (200, 499)
+    if response.status_code == 200:
+        assert response.json()["cancelled"] == "cancel"
+
+    # Завершённый расчёт больше нельзя отменить
+    assert client.post("/api/v1/calculate-route/route-42/cancel").status_code == 404
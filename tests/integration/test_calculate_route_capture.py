@@ -0,0 +1,88 @@
+import json
+import os
+from unittest.mock import patch
+from app.main import app
+from app.schemas.fast_parse import parse_delivery_request
+from app.services.capture import load_capture
+from app.services.optimization import run_optimization
+from app.tools.replay_captures import replay
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест записи запроса и его воспроизведения с записанными матрицами, без обращения к OSRM
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_capture_and_replay(mock_get, valid_delivery_request, monkeypatch, tmp_path):
+    monkeypatch.setenv("CAPTURE_DIR", str(tmp_path))
+    # D2 не помещается в ТС и отклоняется до построения подзадачи
+    valid_delivery_request["deliveries"].append(dict(valid_delivery_request["deliveries"][0], id="D2", demand=25))
+    valid_delivery_request["deliveries"].append(dict(valid_delivery_request["deliveries"][0], id="D3",
+                                                     demand=2, coord=[55.765, 37.62], items=[]))
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["id"] for r in data["rejected"]] == ["D2"]
+    assert data["objective"]["served"] == 2
+
+    captures = os.listdir(tmp_path)
+    assert len(captures) == 1
+    payload, matrices, meta = load_capture(os.path.join(tmp_path, captures[0]))
+    assert payload == valid_delivery_request
+    assert meta["objective"] == data["objective"]
+    assert matrices[0].shape == (5, 5)
+
+    mock_get.reset_mock()
+    mock_get.side_effect = AssertionError("OSRM не должен вызываться")
+    replayed = run_optimization(parse_delivery_request(payload), matrices)
+    assert replayed["route_order"] == data["route_order"]
+    assert replayed["objective"] == data["objective"]
+    mock_get.assert_not_called()
+
+
+# Без CAPTURE_DIR запросы не записываются
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_capture_disabled(mock_get, valid_delivery_request, monkeypatch, tmp_path):
+    monkeypatch.delenv("CAPTURE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert os.listdir(tmp_path) == []
+
+
+# Удешевлённый при перегрузке расчёт записывается с изменёнными профилем полями и самим профилем
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_capture_records_qos_profile(mock_get, valid_delivery_request, monkeypatch, tmp_path):
+    monkeypatch.setenv("CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setenv("QOS_PROFILES", json.dumps([
+        {"name": "reduced", "queue_depth": 0, "time_limit_share": 0.5, "decompose": True},
+    ]))
+    valid_delivery_request["time_limit"] = 2
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["qos_profile"] == "reduced"
+
+    payload, _, meta = load_capture(os.path.join(tmp_path, os.listdir(tmp_path)[0]))
+    assert payload["time_limit"] == 1 and payload["solve_by_priority"]
+    assert meta["qos_profile"] == "reduced"
+    assert meta["qos"]["decompose"]
+
+
+# Детерминированное воспроизведение: поиск ограничен числом решений, а не временем
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_replay_with_solution_limit_is_deterministic(mock_get, valid_delivery_request, monkeypatch, tmp_path):
+    monkeypatch.setenv("CAPTURE_DIR", str(tmp_path))
+    monkeypatch.delenv("QOS_PROFILES", raising=False)
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+
+    first, recorded = replay(path, solution_limit=20)
+    second, _ = replay(path, solution_limit=20)
+    assert first["solution_limit"] == 20
+    assert first["objective"] == second["objective"] == recorded["objective"]
+    assert first["stages"]["solve"] < 5000
@@ -0,0 +1,27 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from app.tools.payloads import to_columnar
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест расчёта маршрута по доставкам в колоночном формате
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_columnar(mock_get, valid_delivery_request):
+    response = client.post("/api/v1/calculate-route", json=to_columnar(valid_delivery_request))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "OK"
+    assert data["route_order"] == [d["id"] for d in valid_delivery_request["deliveries"]]
+    assert data["inventory"]["W1"] == {"usage": 40, "capacity": 100, "stock": {"itemA": 0}}
+
+
+def test_calculate_route_columnar_invalid(valid_delivery_request):
+    payload = to_columnar(valid_delivery_request)
+    payload["deliveries"]["demand"] = ["10"]
+    response = client.post("/api/v1/calculate-route", json=payload)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "deliveries", "demand"]
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест маршрута с перерывами водителя, укладывающегося в смену
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_with_breaks(mock_get, valid_delivery_request):
+    valid_delivery_request["driver_rules"] = {
+        "shift_window": [420, 1080],
+        "max_route_duration": 600,
+        "max_driving_time": 120,
+        "break_after": 240,
+        "break_duration": 30,
+    }
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["route_order"] == ["D1"]
+
+
+# Смена заканчивается до открытия окна доставки - доставку выполнить нельзя
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_shift_ends_before_window(mock_get, valid_delivery_request):
+    valid_delivery_request["vehicles"] = [{"id": "V1", "start_coord": [55.751244, 37.618423],
+                                           "shift_window": [0, 400]}]
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == []
+    assert data["routes"][0]["route_order"] == []
+
+
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_driving_time_limit(mock_get, valid_delivery_request):
+    valid_delivery_request["driver_rules"] = {"max_driving_time": 5}
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["route_order"] == []
+
+
+def test_calculate_route_invalid_shift_window(valid_delivery_request):
+    valid_delivery_request["driver_rules"] = {"shift_window": [900, 600]}
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
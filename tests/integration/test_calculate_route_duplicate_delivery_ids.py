@@ -6,7 +6,7 @@ from tests.fixtures.mock_responses import dynamic_mock_osrm
 client = TestClient(app)
 
 # Тест с дублирующимися ID доставок
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_duplicate_delivery_ids(mock_get):
     duplicate_ids_request = {
         "depot_coord": [55.751244, 37.618423],
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+def add_delivery(request, delivery_id, priority, demand=2):
+    request["deliveries"].append({
+        "id": delivery_id,
+        "coord": [55.77, 37.61],
+        "priority": priority,
+        "demand": demand,
+        "items": [{"guid": "itemA", "count": 1}],
+        "origin_warehouse": "W1",
+        "time_window": [0, 1440],
+        "service_time": 5
+    })
+
+
+# Тест эвристического решателя: маршрут в том же формате, доставки по убыванию приоритета
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_heuristic_solver(mock_get, valid_delivery_request):
+    valid_delivery_request["solver"] = "heuristic"
+    valid_delivery_request["warehouses"][0]["stock"]["itemA"] = 20
+    valid_delivery_request["deliveries"][0]["demand"] = 5
+    add_delivery(valid_delivery_request, "D2", "low")
+    add_delivery(valid_delivery_request, "D3", "critical")
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "OK"
+    assert data["route_order"] == ["D3", "D1", "D2"]
+    assert data["routes"][0]["route_order"] == ["D3", "D1", "D2"]
+    assert data["rejected"] == []
+
+
+# Тест эвристики: доставка сверх вместимости ТС пропускается
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_heuristic_capacity(mock_get, valid_delivery_request):
+    valid_delivery_request["solver"] = "heuristic"
+    valid_delivery_request["warehouses"][0]["stock"]["itemA"] = 20
+    add_delivery(valid_delivery_request, "D2", "low", demand=10)
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["route_order"] == ["D1"]
+
+
+def test_calculate_route_heuristic_unsupported_options(valid_delivery_request):
+    valid_delivery_request["solver"] = "heuristic"
+    valid_delivery_request["soft_time_windows"] = True
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
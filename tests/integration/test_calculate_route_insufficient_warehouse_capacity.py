@@ -6,7 +6,7 @@ from tests.fixtures.mock_responses import dynamic_mock_osrm
 client = TestClient(app)
 
 # Тест с недостаточной вместимостью склада для возврата отказанных товаров
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_insufficient_warehouse_capacity(mock_get):
     insufficient_capacity_request = {
         "depot_coord": [55.751244, 37.618423],
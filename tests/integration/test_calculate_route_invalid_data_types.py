@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 # Тест с некорректными типами данных в полях
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_invalid_data_types(mock_get):
     invalid_types_request = {
         "depot_coord": ["55.751244", "37.618423"],  # Координаты как строки
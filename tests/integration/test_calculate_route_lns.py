@@ -0,0 +1,34 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест LNS: маршрут строится тем же набором доставок, что и поиском OR-Tools
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_lns_solver(mock_get, valid_delivery_request):
+    valid_delivery_request["solver"] = "lns"
+    valid_delivery_request["time_limit"] = 2
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == ["D1"]
+    assert data["routes"][0]["route_order"] == ["D1"]
+
+
+def test_calculate_route_unknown_solver(valid_delivery_request):
+    valid_delivery_request["solver"] = "simplex"
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
+
+
+def test_calculate_route_time_limit_bounds(valid_delivery_request):
+    valid_delivery_request["time_limit"] = 0
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
@@ -8,7 +8,7 @@ client = TestClient(app)
 
 
 # Тест запроса с отсутствующими обязательными полями
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_missing_fields(mock_get, invalid_delivery_request_missing_fields):
     response = client.post(
         "/api/v1/calculate-route",
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест маршрутов нескольких ТС, каждое из которых выезжает из своего депо
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_vehicles_with_own_depots(mock_get, valid_delivery_request):
+    base = valid_delivery_request["deliveries"][0]
+    valid_delivery_request["warehouses"][0]["stock"] = {"itemA": 20}
+    valid_delivery_request["deliveries"] = [
+        dict(base, id="D-north", coord=[55.88, 37.61], demand=10),
+        dict(base, id="D-south", coord=[55.62, 37.61], demand=10),
+    ]
+    valid_delivery_request["vehicles"] = [
+        {"id": "north", "start_coord": [55.90, 37.61], "capacity": 10},
+        {"id": "south", "start_coord": [55.60, 37.61], "end_coord": [55.61, 37.62], "capacity": 10},
+    ]
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    routes = {r["vehicle_id"]: r["route_order"] for r in data["routes"]}
+    assert routes == {"north": ["D-north"], "south": ["D-south"]}
+    assert data["route_order"] == ["D-north", "D-south"]
+    assert all(r["osm_url"] for r in data["routes"])
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_default_vehicle(mock_get, valid_delivery_request):
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert [(r["vehicle_id"], r["route_order"]) for r in data["routes"]] == [("default", ["D1"])]
+
+
+def test_calculate_route_duplicate_vehicle_ids(valid_delivery_request):
+    valid_delivery_request["vehicles"] = [
+        {"id": "V1", "start_coord": [55.90, 37.61]},
+        {"id": "V1", "start_coord": [55.60, 37.61]},
+    ]
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
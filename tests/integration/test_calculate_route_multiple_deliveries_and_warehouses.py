@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 # # Тест с множеством доставок и складов
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_multiple_deliveries_and_warehouses(mock_get):
     complex_request = {
         "depot_coord": [55.751244, 37.618423],
@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_multiple_priorities_extended(mock_get):
     request_data = {
         "depot_coord": [55.751244, 37.618423],
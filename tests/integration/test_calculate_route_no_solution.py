@@ -9,7 +9,7 @@ client = TestClient(app)
 
 
 #Тест, когда нет решения для маршрута
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_no_solution(mock_get, valid_delivery_request):
     # Модифицируем данные так, чтобы невозможно найти маршрут
     # Например, установим слишком высокую потребность
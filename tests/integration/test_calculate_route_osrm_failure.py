@@ -8,7 +8,7 @@ client = TestClient(app)
 
 
 # Тест, когда OSRM сервис недоступен
-@patch('app.services.optimization.requests.get', side_effect=requests.RequestException("OSRM service is down"))
+@patch('app.services.osrm.requests.get', side_effect=requests.RequestException("OSRM service is down"))
 def test_calculate_route_osrm_failure(mock_get, valid_delivery_request):
     response = client.post(
         "/api/v1/calculate-route",
@@ -18,3 +18,4 @@ def test_calculate_route_osrm_failure(mock_get, valid_delivery_request):
     data = response.json()
     assert "message" in data
     assert data["message"] == "Внутренняя ошибка сервера"
+    assert 'failed;desc="matrix"' in response.headers["Server-Timing"]
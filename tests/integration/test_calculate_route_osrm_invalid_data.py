@@ -8,7 +8,7 @@ client = TestClient(app)
 
 
 # Тест, когда OSRM возвращает некорректные данные
-@patch('app.services.optimization.requests.get', side_effect=lambda *args, **kwargs: MockResponseInvalid())
+@patch('app.services.osrm.requests.get', side_effect=lambda *args, **kwargs: MockResponseInvalid())
 def test_calculate_route_osrm_invalid_data(mock_get, valid_delivery_request):
     class MockResponseInvalid:
         def raise_for_status(self):
@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 # Тест с перекрывающимися временными окнами
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_overlapping_time_windows(mock_get):
     overlapping_time_windows_request = {
         "depot_coord": [55.751244, 37.618423],
@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 # Тест с частичным отказом доставок
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_partial_refusals(mock_get):
     partial_refusal_request = {
         "depot_coord": [55.751244, 37.618423],
@@ -0,0 +1,38 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест отклонения заведомо невыполнимых доставок до запуска решателя
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_rejects_infeasible_deliveries(mock_get, valid_delivery_request):
+    base = valid_delivery_request["deliveries"][0]
+    valid_delivery_request["deliveries"] += [
+        dict(base, id="D-big", demand=100),
+        dict(base, id="D-nowhere", origin_warehouse="W9"),
+        dict(base, id="D-early", time_window=[0, 0]),
+    ]
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == ["D1"]
+    assert {r["id"]: r["reason"] for r in data["rejected"]} == {
+        "D-big": "DEMAND_EXCEEDS_CAPACITY",
+        "D-nowhere": "UNKNOWN_WAREHOUSE",
+        "D-early": "TIME_WINDOW_UNREACHABLE",
+    }
+
+
+def test_calculate_route_all_rejected(valid_delivery_request):
+    valid_delivery_request["deliveries"][0]["items"] = [{"guid": "itemA", "count": 11}]
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == []
+    assert data["message"] == "Решение не найдено (все доставки пропущены)"
+    assert data["rejected"][0]["reason"] == "INSUFFICIENT_STOCK"
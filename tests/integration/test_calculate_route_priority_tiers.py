@@ -0,0 +1,55 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+PRIORITIES = ["critical", "urgent", "high", "medium", "low"]
+RANK = {"critical": 5, "urgent": 4, "high": 3, "medium": 2, "low": 1}
+
+
+def tiered_request(request, n=30):
+    base = request["deliveries"][0]
+    request["warehouses"][0]["stock"] = {"itemA": n}
+    request["warehouses"][0]["usage"] = 0
+    request["deliveries"] = [
+        dict(base, id=f"D{i}", coord=[55.72 + 0.004 * (i // 6), 37.58 + 0.006 * (i % 6)], demand=1,
+             priority=PRIORITIES[(i * 3) % 5], items=[{"guid": "itemA", "count": 1}], time_window=[480, 1200],
+             service_time=5)
+        for i in range(n)
+    ]
+    request["vehicles"] = [
+        {"id": "V1", "capacity": 20, "start_coord": request["depot_coord"]},
+        {"id": "V2", "capacity": 20, "start_coord": [55.72, 37.58]},
+    ]
+    request["time_limit"] = 3
+    request["solve_by_priority"] = True
+    return request
+
+
+# Тест последовательного решения по уровням приоритета: все доставки выполнены, и в маршруте
+# каждого ТС доставки идут от высшего приоритета к низшему
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_solve_by_priority(mock_get, valid_delivery_request):
+    request = tiered_request(valid_delivery_request)
+    priority = {d["id"]: RANK[d["priority"]] for d in request["deliveries"]}
+
+    response = client.post("/api/v1/calculate-route", json=request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "OK"
+    assert sorted(data["route_order"]) == sorted(priority)
+    assert data["objective"]["served"] == 30
+    for route in data["routes"]:
+        ranks = [priority[d] for d in route["route_order"]]
+        assert ranks == sorted(ranks, reverse=True)
+    assert data["inventory"]["W1"]["stock"] == {"itemA": 0}
+
+
+def test_calculate_route_solve_by_priority_rejects_driver_rules(valid_delivery_request):
+    valid_delivery_request["solve_by_priority"] = True
+    valid_delivery_request["driver_rules"] = {"max_route_duration": 480}
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
@@ -0,0 +1,30 @@
+import json
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_full_profile(mock_get, valid_delivery_request, monkeypatch):
+    monkeypatch.delenv("QOS_PROFILES", raising=False)
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["qos_profile"] == "full"
+
+
+# Тест самого дешёвого профиля: начальное решение эвристикой по матрицам без OSRM
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_degraded_profile(mock_get, valid_delivery_request, monkeypatch):
+    monkeypatch.setenv("QOS_PROFILES", json.dumps([
+        {"name": "estimated", "queue_depth": 0, "first_solution": True, "haversine": True},
+    ]))
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["qos_profile"] == "estimated"
+    assert data["route_order"] == ["D1"]
+    mock_get.assert_not_called()
@@ -0,0 +1,23 @@
+import os
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+
+client = TestClient(app)
+
+OSM_PATH = os.path.join(os.path.dirname(__file__), "..", "fixtures", "road_graph.osm")
+
+
+# Тест встроенного маршрутизатора: матрицы считаются по локальному графу дорог, без запросов к OSRM
+@patch('app.services.osrm.requests.get', side_effect=AssertionError("OSRM не должен вызываться"))
+def test_calculate_route_local_road_graph(mock_get, valid_delivery_request, monkeypatch):
+    monkeypatch.setenv("ROAD_GRAPH_PATH", OSM_PATH)
+    valid_delivery_request["depot_coord"] = [55.7501, 37.6001]
+    valid_delivery_request["warehouses"][0]["coord"] = [55.752, 37.606]
+    valid_delivery_request["deliveries"][0]["coord"] = [55.756, 37.609]
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["route_order"] == ["D1"]
+    mock_get.assert_not_called()
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест мягких окон: доставка, к окну которой не успеть, выполняется с опозданием
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_serves_late_delivery(mock_get, valid_delivery_request):
+    valid_delivery_request["deliveries"][0]["time_window"] = [0, 5]
+    valid_delivery_request["soft_time_windows"] = True
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == ["D1"]
+    assert data["rejected"] == []
+    late = data["late_deliveries"]
+    assert [d["id"] for d in late] == ["D1"]
+    assert late[0]["lateness"] == late[0]["arrival"] - 5 > 0
+
+
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_lateness_limit(mock_get, valid_delivery_request):
+    valid_delivery_request["deliveries"][0]["time_window"] = [0, 5]
+    valid_delivery_request["soft_time_windows"] = True
+    valid_delivery_request["max_lateness"] = 1
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == []
+    assert data["rejected"][0]["reason"] == "TIME_WINDOW_UNREACHABLE"
+
+
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_on_time_not_reported(mock_get, valid_delivery_request):
+    valid_delivery_request["soft_time_windows"] = True
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == ["D1"]
+    assert data["late_deliveries"] == []
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+
+def grid_request(request, rows=12, cols=12):
+    base = request["deliveries"][0]
+    request["vehicle_capacity"] = 200
+    request["warehouses"][0]["stock"] = {"itemA": rows * cols}
+    request["warehouses"][0]["usage"] = 0
+    request["warehouses"][0]["capacity"] = 200
+    request["deliveries"] = [
+        dict(base, id=f"D{r * cols + c}", coord=[55.72 + 0.005 * r, 37.58 + 0.008 * c], demand=1,
+             priority="medium", items=[{"guid": "itemA", "count": 1}], time_window=[480, 1200], service_time=3)
+        for r in range(rows) for c in range(cols)
+    ]
+    request["time_limit"] = 2
+    return request
+
+
+def matrix_entries(mock_get):
+    total = 0
+    for call in mock_get.call_args_list:
+        path, _, query = call[0][0].split('/driving/')[-1].partition('?')
+        n = len(path.split(';'))
+        params = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+        sources = len(params['sources'].split(';')) if 'sources' in params else n
+        destinations = len(params['destinations'].split(';')) if 'destinations' in params else n
+        total += sources * destinations
+    return total
+
+
+# Тест разреженного режима: у OSRM запрашиваются только дуги к ближайшим соседям, складам и депо,
+# а все доставки выполняются
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_nearest_neighbors(mock_get, valid_delivery_request):
+    request = grid_request(valid_delivery_request)
+    request["nearest_neighbors"] = 5
+
+    response = client.post("/api/v1/calculate-route", json=request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "OK"
+    assert sorted(data["route_order"]) == sorted(d["id"] for d in request["deliveries"])
+    assert data["objective"]["served"] == 144
+
+    # Депо, склад и 144 доставки: полная матрица - 146 x 146 значений
+    assert matrix_entries(mock_get) < 146 * 146 / 2
+
+
+def test_calculate_route_nearest_neighbors_requires_ortools(valid_delivery_request):
+    valid_delivery_request["nearest_neighbors"] = 5
+    valid_delivery_request["solver"] = "lns"
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
+
+    valid_delivery_request["solver"] = "ortools"
+    valid_delivery_request["traffic_profile"] = [1.0] * 24
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
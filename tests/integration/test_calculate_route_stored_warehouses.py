@@ -0,0 +1,50 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест расчёта маршрута по складам, состояние которых хранится на сервере
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_stored_warehouses(mock_get, valid_delivery_request):
+    warehouses = valid_delivery_request.pop("warehouses")
+    warehouses[0]["id"] = "W-stored"
+    warehouses[0]["stock"] = {"itemA": 25}
+    valid_delivery_request["deliveries"][0]["origin_warehouse"] = "W-stored"
+    valid_delivery_request["warehouse_ids"] = ["W-stored"]
+
+    response = client.put("/api/v1/warehouses", json=warehouses)
+    assert response.status_code == 200
+
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    assert response.json()["inventory"]["W-stored"]["stock"] == {"itemA": 15}
+
+    # Изменения плана зафиксированы в хранилище
+    response = client.get("/api/v1/warehouses/W-stored")
+    assert response.status_code == 200
+    assert response.json()["stock"] == {"itemA": 15}
+    assert response.json()["usage"] == 40
+
+
+def test_calculate_route_unknown_stored_warehouse(valid_delivery_request):
+    valid_delivery_request.pop("warehouses")
+    valid_delivery_request["warehouse_ids"] = ["W-unknown"]
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 404
+
+
+def test_calculate_route_requires_warehouses(valid_delivery_request):
+    valid_delivery_request.pop("warehouses")
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
+
+
+def test_calculate_route_duplicate_stored_warehouses(valid_delivery_request):
+    valid_delivery_request.pop("warehouses")
+    valid_delivery_request["warehouse_ids"] = ["W-stored", "W-stored"]
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
@@ -0,0 +1,70 @@
+import json
+import sys
+from unittest.mock import patch
+import orjson
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+client = TestClient(app)
+
+
+def ndjson_body(payload):
+    header = {k: v for k, v in payload.items() if k != "deliveries"}
+    for line in [header] + payload["deliveries"]:
+        yield orjson.dumps(line) + b"\n"
+
+
+# Тест расчёта маршрута по доставкам, переданным потоком NDJSON
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_stream(mock_get, valid_delivery_request):
+    response = client.post("/api/v1/calculate-route/stream", content=ndjson_body(valid_delivery_request),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "OK"
+    assert data["route_order"] == ["D1"]
+    assert data["inventory"]["W1"] == {"usage": 40, "capacity": 100, "stock": {"itemA": 0}}
+
+
+def test_calculate_route_stream_invalid_delivery(valid_delivery_request):
+    valid_delivery_request["deliveries"][0]["demand"] = 0
+    response = client.post("/api/v1/calculate-route/stream", content=ndjson_body(valid_delivery_request),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][:2] == ["body", 2]
+
+
+def test_calculate_route_stream_unknown_stored_warehouse(valid_delivery_request):
+    valid_delivery_request.pop("warehouses")
+    valid_delivery_request["warehouse_ids"] = ["W-missing"]
+    response = client.post("/api/v1/calculate-route/stream", content=ndjson_body(valid_delivery_request),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 404
+
+
+# Профиль с матрицами по прямой выбирается по заголовку: матрицы у OSRM не запрашиваются
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_stream_degraded_profile(mock_get, valid_delivery_request, monkeypatch):
+    monkeypatch.setenv("QOS_PROFILES", json.dumps([
+        {"name": "estimated", "queue_depth": 0, "first_solution": True, "haversine": True},
+    ]))
+    response = client.post("/api/v1/calculate-route/stream", content=ndjson_body(valid_delivery_request),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["qos_profile"] == "estimated"
+    mock_get.assert_not_called()
+
+
+# Запрос, который не будет принят в очередь, отклоняется по заголовку до запросов матриц
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_calculate_route_stream_rejected_before_matrices(mock_get, valid_delivery_request, monkeypatch):
+    # Планировщик, которым пользуется приложение (модуль routes.logistics, импортированный app.main)
+    scheduler = sys.modules["routes.logistics"].get_scheduler()
+    monkeypatch.setattr(scheduler, "max_tenant_queued", 0)
+    response = client.post("/api/v1/calculate-route/stream", content=ndjson_body(valid_delivery_request),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    mock_get.assert_not_called()
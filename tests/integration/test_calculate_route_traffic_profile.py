@@ -0,0 +1,24 @@
+from unittest.mock import patch
+from app.main import app
+from fastapi.testclient import TestClient
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import dynamic_mock_osrm
+
+client = TestClient(app)
+
+
+# Тест, когда из-за загруженности дорог доставку нельзя выполнить в течение дня
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
+def test_calculate_route_congested_profile(mock_get, valid_delivery_request):
+    valid_delivery_request["traffic_profile"] = [200.0] * 24
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["route_order"] == []
+    assert data["message"] == "Решение не найдено (все доставки пропущены)"
+
+
+def test_calculate_route_invalid_traffic_profile(valid_delivery_request):
+    valid_delivery_request["traffic_profile"] = [1.0] * 23
+    response = client.post("/api/v1/calculate-route", json=valid_delivery_request)
+    assert response.status_code == 422
@@ -7,7 +7,7 @@ client = TestClient(app)
 
 
 # # Тест с отказами и возвратами
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 def test_calculate_route_with_refusals(mock_get):
     refusal_request = {
         "depot_coord": [55.751244, 37.618423],
@@ -48,7 +48,7 @@ async def perform_post_request_async(request_data):
     async with httpx.AsyncClient(base_url=BASE_URL) as client:
         return await client.post("/api/v1/calculate-route", json=request_data)
 
-@patch('app.services.optimization.requests.get', side_effect=dynamic_mock_osrm)
+@patch('app.services.osrm.requests.get', side_effect=dynamic_mock_osrm)
 @pytest.mark.asyncio
 async def test_calculate_route_performance(mock_get):
     performance_request = {
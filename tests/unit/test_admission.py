@@ -0,0 +1,149 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from app.services.admission import LARGE, SMALL, AdmissionRejected, AdmissionScheduler, RequestCancelled
+from app.utils.cancellation import CANCEL, CancellationToken
+
+
+async def grant_order(scheduler, jobs):
+    # Первый расчёт занимает единственный слот, остальные ждут в очереди
+    first = scheduler.submit("t0", 1)
+    tickets = [(name, scheduler.submit(tenant, cost)) for name, tenant, cost in jobs]
+    order = []
+    running = first
+    for _ in jobs:
+        scheduler.release(running)
+        await asyncio.sleep(0)
+        name, running = next((name, t) for name, t in tickets if t.granted.done() and name not in order)
+        order.append(name)
+    return order
+
+
+def test_shortest_job_first_within_tenant():
+    scheduler = AdmissionScheduler(small_slots=1, large_slots=1, small_job_seconds=100)
+    order = asyncio.run(grant_order(scheduler, [("long", "a", 30), ("short", "a", 2), ("mid", "a", 10)]))
+    assert order == ["short", "mid", "long"]
+
+
+def test_tenants_share_lane_fairly():
+    scheduler = AdmissionScheduler(small_slots=1, large_slots=1, small_job_seconds=100)
+    # Клиент a прислал пачку расчётов раньше клиента b
+    jobs = [(f"a{i}", "a", 5) for i in range(4)] + [("b0", "b", 5), ("b1", "b", 5)]
+    order = asyncio.run(grant_order(scheduler, jobs))
+    assert order[:4] == ["a0", "b0", "a1", "b1"]
+
+
+def test_large_jobs_do_not_block_small_lane():
+    async def run():
+        scheduler = AdmissionScheduler(small_slots=1, large_slots=1, small_job_seconds=10, max_queue_wait=600)
+        large = [scheduler.submit("a", 60) for _ in range(3)]
+        small = scheduler.submit("b", 1)
+        await asyncio.sleep(0)
+        return large, small
+
+    large, small = asyncio.run(run())
+    assert [t.lane for t in large] == [LARGE] * 3 and small.lane == SMALL
+    assert small.granted.done()
+    assert [t.granted.done() for t in large] == [True, False, False]
+
+
+def test_admission_rejects_overloaded_tenant_and_lane():
+    async def run():
+        scheduler = AdmissionScheduler(small_slots=1, large_slots=1, small_job_seconds=10, max_queue_wait=20,
+                                       max_tenant_queued=2)
+        scheduler.submit("a", 5)
+        scheduler.submit("a", 5)
+        scheduler.submit("a", 5)
+        with pytest.raises(AdmissionRejected) as tenant:
+            scheduler.submit("a", 5)
+
+        # Очередь полосы: 5 с выполняемого расчёта и 10 с ожидающих; ещё 10 с - и ожидание больше 20 с
+        scheduler.submit("b", 10)
+        with pytest.raises(AdmissionRejected) as lane:
+            scheduler.submit("c", 1)
+        return tenant.value, lane.value
+
+    tenant, lane = asyncio.run(run())
+    assert tenant.status_code == 429 and tenant.retry_after >= 1
+    assert lane.status_code == 503 and lane.retry_after >= 1
+
+
+def test_cancelled_request_leaves_queue():
+    async def run():
+        model = SimpleNamespace(predict=lambda data: 1, observe=lambda data, seconds: None)
+        scheduler = AdmissionScheduler(model, small_slots=1, large_slots=1, small_job_seconds=100)
+        running = scheduler.submit("a", 1)
+        token = CancellationToken()
+        asyncio.get_running_loop().call_later(0.1, token.cancel, CANCEL)
+        started = time.monotonic()
+        with pytest.raises(RequestCancelled):
+            async with scheduler.admission(None, "b", token):
+                pass
+        elapsed = time.monotonic() - started
+        scheduler.release(running)
+        return scheduler, elapsed
+
+    scheduler, elapsed = asyncio.run(run())
+    assert elapsed < 2
+    lane = scheduler.lanes[SMALL]
+    assert lane.running == [] and lane.queued == 0 and scheduler._tenant_queued == {}
+
+
+def test_cancelled_admission_task_frees_slot():
+    async def run():
+        model = SimpleNamespace(predict=lambda data: 1, observe=lambda data, seconds: None)
+        scheduler = AdmissionScheduler(model, small_slots=1, large_slots=1, small_job_seconds=100)
+        running = scheduler.submit("a", 1)
+
+        async def wait_for_slot():
+            async with scheduler.admission(None, "b"):
+                pass
+
+        # Задача ожидания отменена, пока расчёт в очереди (например, при остановке сервера)
+        waiting = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0.1)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        lane = scheduler.lanes[SMALL]
+        assert lane.queued == 0 and scheduler._tenant_queued == {}
+
+        # Слот выдан, но задача отменена раньше, чем начала расчёт: слот возвращается полосе
+        waiting = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0)
+        scheduler.release(running)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert lane.running == [] and lane.queued == 0
+
+        # Полоса не потеряла слот: следующий расчёт получает его сразу
+        ticket = scheduler.submit("c", 1)
+        assert lane.running == [ticket]
+
+    asyncio.run(run())
+
+
+def test_precheck_rejects_before_cost_is_known():
+    async def run():
+        scheduler = AdmissionScheduler(small_slots=1, large_slots=1, small_job_seconds=10, max_queue_wait=20,
+                                       max_tenant_queued=1)
+        scheduler.precheck("a")
+        scheduler.submit("a", 5)
+        scheduler.submit("a", 5)
+        with pytest.raises(AdmissionRejected) as tenant:
+            scheduler.precheck("a")
+
+        # Полоса коротких расчётов переполнена, но длинная свободна: запрос ещё может быть принят
+        scheduler.submit("b", 10)
+        scheduler.submit("c", 10)
+        scheduler.precheck("d")
+        scheduler.submit("e", 25)
+        with pytest.raises(AdmissionRejected) as lanes:
+            scheduler.precheck("d")
+        return tenant.value, lanes.value
+
+    tenant, lanes = asyncio.run(run())
+    assert tenant.status_code == 429
+    assert lanes.status_code == 503
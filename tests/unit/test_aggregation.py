@@ -0,0 +1,61 @@
+from app.schemas.delivery import DeliveryAddress
+from app.services.aggregation import ColocatedGroup, aggregate_colocated, expand_plan, expand_rejected
+
+
+def delivery(delivery_id, coord, window=(0, 1440), demand=1, priority="medium", service_time=10):
+    return DeliveryAddress(id=delivery_id, coord=coord, time_window=window, demand=demand, priority=priority,
+                           service_time=service_time, origin_warehouse="W1")
+
+
+def test_colocated_deliveries_are_merged():
+    deliveries = [
+        delivery("D1", (55.70001, 37.60001), window=(600, 700), demand=2, priority="low"),
+        delivery("D2", (55.71, 37.61)),
+        delivery("D3", (55.70002, 37.60002), window=(540, 660), demand=3, priority="urgent", service_time=15),
+    ]
+    aggregated, positions = aggregate_colocated(deliveries, max_demand=20)
+
+    assert positions == [2, 1]
+    group, single = aggregated
+    assert single is deliveries[1]
+    assert isinstance(group, ColocatedGroup)
+    # D3 раньше заканчивается и обслуживается первой, D1 - через 15 минут после прибытия
+    assert [d.id for d in group.members] == ["D3", "D1"]
+    assert group.offsets == [0, 15]
+    assert group.time_window == (585, 660)
+    assert (group.demand, group.service_time, group.priority) == (5, 25, "urgent")
+
+
+def test_incompatible_windows_and_capacity_split_groups():
+    deliveries = [
+        delivery("D1", (55.7, 37.6), window=(480, 540)),
+        delivery("D2", (55.7, 37.6), window=(900, 960)),
+        delivery("D3", (55.7, 37.6), window=(480, 600), demand=15),
+        delivery("D4", (55.7, 37.6), window=(480, 600), demand=10),
+    ]
+    aggregated, positions = aggregate_colocated(deliveries, max_demand=20)
+
+    groups = [[d.id for d in getattr(entry, "members", [entry])] for entry in aggregated]
+    assert groups == [["D1", "D3"], ["D2"], ["D4"]]
+    assert positions == [0, 1, 3]
+
+
+def test_nothing_to_merge_returns_input():
+    deliveries = [delivery("D1", (55.7, 37.6)), delivery("D2", (55.8, 37.6))]
+    assert aggregate_colocated(deliveries, max_demand=20) == (deliveries, None)
+
+
+def test_expand_plan_and_rejected():
+    group = ColocatedGroup([delivery("D1", (55.7, 37.6)), delivery("D2", (55.7, 37.6))])
+    group.members[1].refused = True
+    deliveries = [group, delivery("D3", (55.8, 37.6))]
+
+    plan = [{"node_index": 0, "type": "depot", "id": None, "refused": False},
+            {"node_index": 2, "type": "delivery", "id": "D1", "refused": False},
+            {"node_index": 3, "type": "delivery", "id": "D3", "refused": False}]
+    expanded = expand_plan(plan, deliveries, n_warehouses=1)
+    assert [(s["node_index"], s["id"], s["refused"]) for s in expanded] == [
+        (0, None, False), (2, "D1", False), (2, "D2", True), (3, "D3", False)]
+
+    rejected = [{"id": "D1", "reason": "time_window_unreachable", "detail": ""}]
+    assert [r["id"] for r in expand_rejected(rejected, deliveries)] == ["D1", "D2"]
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+import numpy as np
+import pytest
+from ortools.constraint_solver import pywrapcp
+from app.schemas.delivery import DeliveryAddress
+from app.services.optimization import build_subproblem, solve_by_priority_tiers, solve_vrp_multy_warehouse
+from app.services import optimization
+from app.utils.cancellation import (CANCEL, DEADLINE, DISCONNECT, CancellationToken, RequestCancelled,
+                                    cancel_request, parse_deadline, register, unregister, watch_disconnect)
+
+
+def test_token_reason_and_deadline():
+    token = CancellationToken()
+    assert not token.cancelled and token.reason is None
+    token.cancel(CANCEL)
+    token.cancel(DISCONNECT)
+    assert token.cancelled and token.reason == CANCEL
+    with pytest.raises(RequestCancelled) as e:
+        token.raise_if_cancelled()
+    assert e.value.reason == CANCEL
+
+    expired = CancellationToken(deadline=time.monotonic() - 1)
+    assert expired.cancelled and expired.reason == DEADLINE
+
+
+def test_parse_deadline():
+    assert abs(parse_deadline(str(time.time() + 5)) - (time.monotonic() + 5)) < 0.1
+    for value in ("soon", "nan", "inf"):
+        with pytest.raises(ValueError):
+            parse_deadline(value)
+
+
+def test_cancel_by_request_id():
+    token = CancellationToken()
+    register("req-1", token)
+    assert cancel_request("req-1")
+    assert token.reason == CANCEL
+
+    # Более новый расчёт с тем же ID не снимается завершением старого
+    newer = CancellationToken()
+    register("req-1", newer)
+    unregister("req-1", token)
+    assert cancel_request("req-1")
+    unregister("req-1", newer)
+    assert not cancel_request("req-1")
+
+
+def test_watch_disconnect_cancels_token():
+    class DisconnectingRequest:
+        calls = 0
+
+        async def is_disconnected(self):
+            self.calls += 1
+            return self.calls > 1
+
+    token = CancellationToken()
+    asyncio.run(asyncio.wait_for(watch_disconnect(DisconnectingRequest(), token), timeout=5))
+    assert token.reason == DISCONNECT
+
+
+def cancellation_sub_data():
+    depot = (55.75, 37.62)
+    warehouse = {"id": "W1", "coord": (55.76, 37.61), "capacity": 100, "usage": 0}
+    rng = np.random.default_rng(3)
+    deliveries = [DeliveryAddress(id=f"D{i}", coord=(55.7 + rng.random() * 0.1, 37.55 + rng.random() * 0.1),
+                                  demand=1, service_time=2, origin_warehouse="W1") for i in range(40)]
+    coords = np.asarray([depot, warehouse["coord"]] + [d.coord for d in deliveries])
+    distances = np.abs(coords[:, None, :] - coords[None, :, :]).sum(axis=2) * 100000
+    return build_subproblem(deliveries, depot, [warehouse], matrices=(distances, distances / 10))
+
+
+def test_cancelled_search_returns_best_solution():
+    sub_data = cancellation_sub_data()
+    deliveries = sub_data["del_list"]
+    token = CancellationToken()
+    threading.Timer(0.5, token.cancel, args=(CANCEL,)).start()
+    started = time.monotonic()
+    routes, skipped, _ = solve_vrp_multy_warehouse(sub_data, deliveries, vehicle_capacity=50, time_limit=30,
+                                                   cancel=token)
+
+    assert time.monotonic() - started < 5
+    assert routes is not None and skipped == []
+
+
+def test_cancellation_before_first_solution_is_not_infeasibility():
+    sub_data = cancellation_sub_data()
+    token = CancellationToken()
+    token.cancel(CANCEL)
+
+    # Поиск, остановленный до первого решения, возвращает None, как и невыполнимая задача;
+    # с отменой это не «решение не найдено», а прерванный расчёт с причиной отмены
+    with patch.object(pywrapcp.RoutingModel, "SolveWithParameters", return_value=None):
+        with pytest.raises(optimization.RequestCancelled) as e:
+            solve_vrp_multy_warehouse(sub_data, sub_data["del_list"], vehicle_capacity=50, time_limit=5,
+                                      cancel=token)
+        assert e.value.reason == CANCEL
+        with pytest.raises(optimization.RequestCancelled):
+            solve_by_priority_tiers(sub_data, sub_data["del_list"], vehicle_capacity=50, time_limit=5, cancel=token)
+
+        assert solve_vrp_multy_warehouse(sub_data, sub_data["del_list"], vehicle_capacity=50,
+                                         time_limit=5) == (None, None, None)
@@ -0,0 +1,46 @@
+import os
+import numpy as np
+from app.services.capture import RequestRecorder, load_capture, prune_captures
+
+SUB_DATA = {
+    "distance_matrix": [[0, 100, 200], [100, 0, 150], [200, 150, 0]],
+    "time_matrix": [[0, 2, 4], [2, 0, 3], [4, 3, 0]],
+}
+PAYLOAD = {"depot_coord": [55.75, 37.62], "deliveries": [{"id": "D1"}, {"id": "D2"}], "warehouses": []}
+RESULT = {"route_order": ["D2"], "message": "OK", "objective": {"served": 1, "distance": 400, "travel_time": 8}}
+
+
+def test_saved_capture_restores_full_matrices(tmp_path):
+    recorder = RequestRecorder(str(tmp_path), PAYLOAD)
+    # D1 (узел 1) отклонён: записаны узлы депо, D2 и депо ТС
+    recorder.record_matrices(SUB_DATA, [0, 2, 3], 4)
+    path = recorder.save(RESULT)
+
+    payload, (distances, durations), meta = load_capture(path)
+    assert payload == PAYLOAD
+    assert meta["objective"] == RESULT["objective"]
+    assert distances[np.ix_([0, 2, 3], [0, 2, 3])].tolist() == SUB_DATA["distance_matrix"]
+    assert durations[2, 3] == 180
+    assert not distances[1].any()
+
+
+def test_capture_size_limits(tmp_path):
+    recorder = RequestRecorder(str(tmp_path), PAYLOAD, max_file_bytes=10)
+    recorder.record_matrices(SUB_DATA, [0, 1, 2], 3)
+    assert recorder.save(RESULT) is None
+    assert os.listdir(tmp_path) == []
+
+    paths = []
+    for i in range(3):
+        recorder = RequestRecorder(str(tmp_path), PAYLOAD)
+        recorder.record_matrices(SUB_DATA, [0, 1, 2], 3)
+        paths.append(recorder.save(RESULT))
+        os.utime(paths[-1], ns=(i * 10 ** 9, i * 10 ** 9))
+    prune_captures(str(tmp_path), sum(os.path.getsize(p) for p in paths[1:]))
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in paths[1:])
+
+
+def test_fast_requests_are_not_saved(tmp_path):
+    recorder = RequestRecorder(str(tmp_path), PAYLOAD, min_seconds=60)
+    recorder.record_matrices(SUB_DATA, [0, 1, 2], 3)
+    assert recorder.save(RESULT) is None
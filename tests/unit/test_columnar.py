@@ -0,0 +1,53 @@
+import copy
+import random
+import pytest
+from fastapi.exceptions import RequestValidationError
+from app.schemas.fast_parse import parse_delivery_request
+from app.tools.payloads import generate_request, to_columnar
+
+
+def test_columnar_rows_match_objects():
+    payload = generate_request(50, rng=random.Random(2))
+    rows = parse_delivery_request(copy.deepcopy(payload))
+    table = parse_delivery_request(to_columnar(payload))
+
+    assert type(table.deliveries).__name__ == "DeliveryTable"
+    assert table.depot_coord == rows.depot_coord
+    assert len(table.deliveries) == len(rows.deliveries)
+    for row, d in zip(table.deliveries, rows.deliveries):
+        assert row.id == d.id
+        assert row.coord == tuple(d.coord)
+        assert row.priority == d.priority
+        assert row.demand == d.demand
+        assert [(it.guid, it.count) for it in row.items] == [(it.guid, it.count) for it in d.items]
+        assert row.time_window == tuple(d.time_window)
+        assert row.service_time == d.service_time
+        assert row.origin_warehouse == d.origin_warehouse
+
+
+def test_refused_writes_column():
+    table = parse_delivery_request(to_columnar(generate_request(3, rng=random.Random(3)))).deliveries
+    table[1].refused = True
+    assert table.refused.tolist() == [False, True, False]
+
+
+@pytest.mark.parametrize("column, value", [
+    ("lat", 95.0),
+    ("demand", 1.5),
+    ("service_time", 0),
+    ("priority", "someday"),
+    ("origin_warehouse", ""),
+    ("id", "D1"),
+])
+def test_invalid_column_is_rejected(column, value):
+    payload = to_columnar(generate_request(3, rng=random.Random(4)))
+    payload["deliveries"][column][2] = value
+    with pytest.raises(RequestValidationError):
+        parse_delivery_request(payload)
+
+
+def test_columns_of_different_length_are_rejected():
+    payload = to_columnar(generate_request(3, rng=random.Random(5)))
+    payload["deliveries"]["lon"].pop()
+    with pytest.raises(RequestValidationError):
+        parse_delivery_request(payload)
@@ -0,0 +1,38 @@
+import copy
+import random
+import pytest
+from fastapi.exceptions import RequestValidationError
+from app.schemas.delivery import DeliveryRequest
+from app.schemas.fast_parse import fast_parse_deliveries, parse_delivery_request
+from app.tools.payloads import generate_request
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+
+
+def test_fast_path_matches_pydantic():
+    payload = generate_request(200, rng=random.Random(1))
+    payload["deliveries"][0]["priority"] = "HIGH"
+    payload["deliveries"][1].pop("time_window")
+
+    assert fast_parse_deliveries(payload["deliveries"]) is not None
+    assert parse_delivery_request(copy.deepcopy(payload)) == DeliveryRequest.parse_obj(payload)
+
+
+def test_non_canonical_payload_falls_back(valid_delivery_request):
+    valid_delivery_request["deliveries"][0]["demand"] = "15"
+    assert fast_parse_deliveries(valid_delivery_request["deliveries"]) is None
+
+    data = parse_delivery_request(valid_delivery_request)
+    assert data.deliveries[0].demand == 15
+
+
+@pytest.mark.parametrize("field, value", [
+    ("coord", [95.0, 37.61]),
+    ("priority", "someday"),
+    ("origin_warehouse", ""),
+    ("demand", 0),
+])
+def test_invalid_delivery_is_rejected(valid_delivery_request, field, value):
+    valid_delivery_request["deliveries"][0][field] = value
+    assert fast_parse_deliveries(valid_delivery_request["deliveries"]) is None
+    with pytest.raises(RequestValidationError):
+        parse_delivery_request(valid_delivery_request)
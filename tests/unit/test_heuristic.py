@@ -0,0 +1,63 @@
+from app.services.heuristic import solve_heuristic
+
+
+def line_sub_data(windows, priorities, demands, vehicles=1):
+    # Узлы: 0 - депо, 1 - склад, далее доставки на прямой в 10 минутах друг от друга
+    n_del = len(windows)
+    positions = [0, 0] + list(range(1, n_del + 1))
+    n = len(positions)
+    time_matrix = [[abs(positions[a] - positions[b]) * 10 for b in range(n)] for a in range(n)]
+    return {
+        "wh_list": [{"id": "W1"}],
+        "del_list": list(range(n_del)),
+        "time_matrix": time_matrix,
+        "time_windows": [(0, 1440), (0, 1440)] + windows,
+        "service_times": [0, 5] + [5] * n_del,
+        "demands": [0, 0] + demands,
+        "priorities": priorities,
+        "vehicle_starts": [0] * vehicles,
+        "vehicle_ends": [0] * vehicles,
+        "vehicle_capacities": [10] * vehicles,
+    }
+
+
+def test_heuristic_respects_windows_and_priorities():
+    windows = [(0, 1440), (0, 1440), (100, 200), (0, 1440)]
+    sub_data = line_sub_data(windows, [1, 3, 1, 1], [1, 1, 1, 1])
+
+    routes, skipped, arrival_times = solve_heuristic(sub_data, sub_data["time_matrix"], 10)
+
+    assert skipped == []
+    route, times = routes[0], arrival_times[0]
+    assert route[0] == route[-1] == 0
+    # Склад - в начале маршрута, доставка высокого приоритета - первой из доставок
+    assert route[1] == 1
+    assert route[2] == 3
+    arrival = dict(zip(route, times))
+    assert 100 <= arrival[4] <= 200
+    assert all(arrival[3] <= arrival[node] for node in (2, 4, 5))
+    # Без ожидания: прибытие = выезд из предыдущего узла + переезд
+    for a, b, t_a, t_b in zip(route, route[1:], times, times[1:]):
+        assert t_b == t_a + sub_data["service_times"][a] + sub_data["time_matrix"][a][b]
+
+
+def test_heuristic_splits_load_between_vehicles():
+    sub_data = line_sub_data([(0, 1440)] * 3, [1, 1, 1], [6, 6, 6], vehicles=2)
+
+    routes, skipped, _ = solve_heuristic(sub_data, sub_data["time_matrix"], 10)
+
+    served = [[node for node in route if node > 1] for route in routes]
+    # Вместимость 10: в каждое ТС помещается одна доставка, третья пропускается
+    assert sorted(len(nodes) for nodes in served) == [1, 1]
+    assert len([node for node in skipped if node > 1]) == 1
+
+
+def test_heuristic_keeps_priority_order_between_vehicles():
+    # Доставка низкого приоритета рядом с депо не может быть раньше доставки высокого приоритета на другом ТС
+    sub_data = line_sub_data([(0, 1440), (0, 1440)], [3, 1], [6, 6], vehicles=2)
+
+    routes, skipped, arrival_times = solve_heuristic(sub_data, sub_data["time_matrix"], 10)
+
+    assert skipped == []
+    arrival = {node: t for route, times in zip(routes, arrival_times) for node, t in zip(route[1:-1], times[1:-1])}
+    assert arrival[2] <= arrival[3]
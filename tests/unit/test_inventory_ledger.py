@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+from app.schemas.delivery import Warehouse
+from app.services.inventory import InventoryLedger
+
+
+def items(**counts):
+    return [SimpleNamespace(guid=guid, count=count) for guid, count in counts.items()]
+
+
+def make_ledger():
+    return InventoryLedger.from_warehouses([
+        Warehouse(id="W1", coord=(55.76, 37.61), capacity=100, usage=50, stock={"itemA": 10, "itemB": 3}),
+        Warehouse(id="W2", coord=(55.77, 37.62), capacity=40, usage=10, stock={"itemB": 7}),
+    ])
+
+
+def test_commit_applies_batched_changes():
+    ledger = make_ledger()
+    txn = ledger.begin()
+    txn.ship("W1", items(itemA=4))
+    txn.ship("W1", items(itemA=5, itemB=1))
+    txn.receive("W2", items(itemC=2))
+    assert txn.free_capacity("W2") == 28
+
+    result = txn.commit()
+
+    assert result["shortages"] == []
+    assert result["inventory"] == {
+        "W1": {"usage": 40, "capacity": 100, "stock": {"itemA": 1, "itemB": 2}},
+        "W2": {"usage": 12, "capacity": 40, "stock": {"itemC": 2}},
+    }
+    assert ledger.stock_of("W2", "itemB") == 7
+    assert ledger.stock_of("W2", "itemC") == 2
+    assert ledger.stock_of("W1", "itemC") == 0
+
+
+def test_commit_skips_only_uncovered_shipment():
+    ledger = make_ledger()
+    txn = ledger.begin()
+    txn.ship("W1", items(itemA=6))
+    txn.ship("W1", items(itemA=6, itemB=3))
+
+    result = txn.commit()
+
+    # Первая отгрузка itemA выполняется, вторая пропускается: на складе осталось 4 из 10
+    assert result["shortages"] == [{"warehouse": "W1", "guid": "itemA", "required": 6, "available": 4}]
+    assert ledger.stock_of("W1", "itemA") == 4
+    assert ledger.stock_of("W1", "itemB") == 0
+    # Использование уменьшено только на выполненные отгрузки (6 + 3)
+    assert result["inventory"]["W1"]["usage"] == 41
+
+
+def test_commit_applies_changes_in_order():
+    ledger = make_ledger()
+    txn = ledger.begin()
+    # Отгрузка до приёма не покрыта, хотя итог по паре неотрицателен
+    txn.ship("W2", items(itemB=8))
+    txn.receive("W2", items(itemB=5))
+    txn.ship("W2", items(itemB=10))
+
+    result = txn.commit()
+
+    assert result["shortages"] == [{"warehouse": "W2", "guid": "itemB", "required": 8, "available": 7}]
+    assert ledger.stock_of("W2", "itemB") == 2
+    assert result["inventory"]["W2"]["usage"] == 5
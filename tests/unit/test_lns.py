@@ -0,0 +1,59 @@
+from functools import partial
+import numpy as np
+from app.services.lns import RuinAndRecreate, geographic_cluster, ruin_size, time_window_cluster
+from app.services.optimization import build_routing_model, model_data
+
+
+def test_ruin_size_bounds():
+    assert ruin_size(2) == 2
+    assert ruin_size(10) == 3
+    assert ruin_size(200) == 20
+    assert ruin_size(5000) == 40
+
+
+def test_clusters_start_with_seed():
+    time_m = np.array([[0, 1, 5, 9], [1, 0, 4, 8], [5, 4, 0, 2], [9, 8, 2, 0]])
+    candidates = np.array([1, 2, 3])
+    assert geographic_cluster(2, candidates, time_m, 2) == [2, 3]
+
+    time_windows = np.array([[0, 1440], [0, 100], [500, 600], [100, 200]])
+    assert time_window_cluster(1, candidates, time_windows, 2) == [1, 3]
+
+
+def line_sub_data(n_deliveries):
+    # Узлы: 0 - депо, 1 - склад, далее доставки на прямой; 1 ТС
+    n = 2 + n_deliveries
+    positions = [0, 0] + list(range(1, n_deliveries + 1))
+    time_matrix = [[abs(positions[a] - positions[b]) * 5 for b in range(n)] for a in range(n)]
+    return {
+        "sub_points": [(float(p), 0.0) for p in positions],
+        "wh_list": [{"id": "W1"}],
+        "del_list": list(range(n_deliveries)),
+        "distance_matrix": [[t * 100 for t in row] for row in time_matrix],
+        "time_matrix": time_matrix,
+        "time_windows": [(0, 1440)] * n,
+        "service_times": [0, 5] + [1] * n_deliveries,
+        "demands": [0, 0] + [1] * n_deliveries,
+        "priorities": [1] * n_deliveries,
+        "pickups": [],
+        "stock_limits": [],
+    }
+
+
+def test_ruin_and_recreate_improves_route():
+    sub_data = line_sub_data(8)
+    model_factory = partial(build_routing_model, model_data(sub_data), sub_data["time_matrix"], 20, 100000)
+    lns = RuinAndRecreate(model_factory, sub_data, sub_data["time_matrix"], workers=1)
+
+    # Начальный маршрут обходит точки прямой вразброс
+    manager, routing, _ = model_factory()
+    routes = [[2, 9, 3, 8, 4, 7, 5, 6]]
+    start = routing.ReadAssignmentFromRoutes([[manager.NodeToIndex(node) for node in routes[0]]], True)
+
+    best, objective = lns.improve(routes, start.ObjectiveValue(), 1.0)
+
+    assert objective < start.ObjectiveValue()
+    # Все доставки остаются в маршруте (склад решатель может посетить по пути)
+    assert sorted(node for node in best[0] if node >= 2) == list(range(2, 10))
+    assert lns.history[0] == (0.0, start.ObjectiveValue())
+    assert lns.history[-1][1] == objective
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+import numpy as np
+from app.services.matrix_store import MatrixStore, extend_store
+from app.services.osrm import fetch_osrm_table
+from app.services.optimization import build_subproblem
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+POINTS = [(55.75, 37.61), (55.76, 37.615), (55.77, 37.62), (55.78, 37.60), (55.74, 37.63)]
+EXTRA = [(55.79, 37.64), (55.73, 37.59)]
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_extend_store_matches_full_table(mock_get, tmp_path):
+    assert extend_store(str(tmp_path), POINTS, chunk_size=2) == 5
+    assert extend_store(str(tmp_path), POINTS + EXTRA, chunk_size=2) == 2
+
+    store = MatrixStore(str(tmp_path))
+    all_points = POINTS + EXTRA
+    assert store.lookup(all_points) == list(range(7))
+    assert store.lookup([(1.0, 1.0)]) is None
+
+    expected_dist, expected_dur = fetch_osrm_table(all_points)
+    dist, dur = store.submatrices(list(range(7)))
+    for i in range(7):
+        for j in range(7):
+            assert abs(dist[i][j] - expected_dist[i][j]) < 0.1
+            assert abs(dur[i][j] - expected_dur[i][j]) < 0.01
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_build_subproblem_uses_store(mock_get, tmp_path, monkeypatch):
+    extend_store(str(tmp_path), POINTS, chunk_size=10)
+    monkeypatch.setenv("MATRIX_STORE_PATH", str(tmp_path))
+    mock_get.reset_mock()
+
+    class Delivery:
+        def __init__(self, coord):
+            self.coord = coord
+            self.demand = 1
+
+    warehouses = [{"id": "W1", "coord": POINTS[1], "capacity": 100, "usage": 0}]
+    sub_data = build_subproblem([Delivery(POINTS[3]), Delivery(POINTS[2])], POINTS[0], warehouses)
+
+    assert mock_get.call_count == 0
+    expected_dist, expected_dur = fetch_osrm_table([POINTS[0], POINTS[1], POINTS[3], POINTS[2]])
+    assert sub_data["time_matrix"][2][3] == -(-expected_dur[2][3] // 60)
+    assert abs(sub_data["distance_matrix"][3][0] - expected_dist[3][0]) < 0.1
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_extend_store_keeps_previous_version(mock_get, tmp_path):
+    extend_store(str(tmp_path), POINTS[:3])
+    extend_store(str(tmp_path), POINTS)
+    # Читатель, прочитавший meta.json версии 1 до расширения, ещё находит её файлы
+    assert sorted(p.name for p in tmp_path.glob("*.f32")) == [
+        "distances.1.f32", "distances.2.f32", "durations.1.f32", "durations.2.f32"]
+
+    extend_store(str(tmp_path), POINTS + EXTRA)
+    assert sorted(p.name for p in tmp_path.glob("*.f32")) == [
+        "distances.2.f32", "distances.3.f32", "durations.2.f32", "durations.3.f32"]
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_store_reopens_when_version_removed(mock_get, tmp_path):
+    extend_store(str(tmp_path), POINTS)
+    memmap = np.memmap
+    calls = []
+
+    def removed_once(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 1:
+            raise FileNotFoundError(args[0])
+        return memmap(*args, **kwargs)
+
+    with patch("app.services.matrix_store.np.memmap", side_effect=removed_once):
+        store = MatrixStore(str(tmp_path))
+    assert len(calls) == 3
+    assert store.lookup(POINTS) == list(range(5))
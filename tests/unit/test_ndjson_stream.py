@@ -0,0 +1,94 @@
+import numpy as np
+import orjson
+import pytest
+from unittest.mock import patch
+from fastapi.exceptions import RequestValidationError
+from app.schemas.ndjson import NDJSONRequestReader
+from app.services.matrix_store import extend_store
+from app.services.osrm import fetch_osrm_table
+from app.services.stream_matrix import IncrementalMatrixBuilder
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+from tests.fixtures.mock_responses import coordinate_mock_osrm
+
+
+def to_ndjson(payload):
+    header = {k: v for k, v in payload.items() if k != "deliveries"}
+    return b"".join(orjson.dumps(line) + b"\n" for line in [header] + payload["deliveries"])
+
+
+def test_reader_handles_arbitrary_chunks(valid_delivery_request):
+    second = dict(valid_delivery_request["deliveries"][0], id="D2", priority="LOW")
+    valid_delivery_request["deliveries"].append(second)
+    body = to_ndjson(valid_delivery_request)
+
+    reader = NDJSONRequestReader()
+    received = []
+    for i in range(0, len(body), 7):
+        received += reader.feed(body[i:i + 7])
+    received += reader.close()
+
+    assert [d.id for d in received] == ["D1", "D2"]
+    data = reader.request()
+    assert data.deliveries[1].priority == "low"
+    assert data.warehouses[0].id == "W1"
+
+
+@pytest.mark.parametrize("line, loc", [
+    (b'{"id": "D1", "coord": [55.7, 37.6], "demand": 1, "origin_warehouse": "W1", "service_time": 5}', 3),
+    (b'{"id": "D2", "coord": [95.0, 37.6], "demand": 1, "origin_warehouse": "W1", "service_time": 5}', 3),
+    (b'{"id": "D2",', 3),
+])
+def test_reader_reports_line_number(valid_delivery_request, line, loc):
+    reader = NDJSONRequestReader()
+    with pytest.raises(RequestValidationError) as exc:
+        reader.feed(to_ndjson(valid_delivery_request) + line + b"\n")
+    assert exc.value.errors()[0]["loc"][:2] == ("body", loc)
+
+
+def test_reader_requires_deliveries(valid_delivery_request):
+    valid_delivery_request["deliveries"] = []
+    reader = NDJSONRequestReader()
+    reader.feed(to_ndjson(valid_delivery_request))
+    with pytest.raises(RequestValidationError):
+        reader.close()
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_incremental_matrix_matches_full_table(mock_get):
+    points = [(55.75 + i * 0.01, 37.6 + (i % 3) * 0.02) for i in range(7)]
+    points.append(points[2])
+
+    builder = IncrementalMatrixBuilder(block_size=3, max_workers=2)
+    try:
+        builder.add(points[:4])
+        builder.add(points[4:])
+        distances, durations = builder.result()
+    finally:
+        builder.close()
+
+    expected_dist, expected_dur = fetch_osrm_table(points)
+    assert distances.shape == (8, 8)
+    assert distances.tolist() == expected_dist
+    assert durations.tolist() == expected_dur
+
+
+@patch('app.services.osrm.requests.get', side_effect=coordinate_mock_osrm)
+def test_incremental_matrix_reads_stored_locations(mock_get, tmp_path, monkeypatch):
+    stored = [(55.75 + i * 0.01, 37.6) for i in range(4)]
+    extend_store(str(tmp_path), stored, chunk_size=10)
+    monkeypatch.setenv("MATRIX_STORE_PATH", str(tmp_path))
+    points = [stored[0], (55.70, 37.65), stored[1], stored[2], stored[3]]
+
+    mock_get.reset_mock()
+    builder = IncrementalMatrixBuilder(block_size=2, max_workers=1)
+    try:
+        builder.add(points)
+        distances, durations = builder.result()
+    finally:
+        builder.close()
+
+    # Дуги между хранимыми локациями читаются из хранилища; к OSRM - только блоки с новой точкой
+    assert mock_get.call_count == 5
+    expected_dist, expected_dur = fetch_osrm_table(points)
+    assert np.allclose(distances, expected_dist, atol=0.1)
+    assert np.allclose(durations, expected_dur, atol=0.01)
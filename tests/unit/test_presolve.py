@@ -0,0 +1,106 @@
+from app.schemas.delivery import DeliveryAddress, ItemInfo, Warehouse
+from app.services.inventory import InventoryLedger
+from app.services.presolve import restrict_subproblem, screen_deliveries, screen_subproblem
+
+
+def delivery(delivery_id, **kwargs):
+    fields = dict(id=delivery_id, coord=(55.77, 37.61), demand=5, origin_warehouse="W1",
+                  service_time=10, items=[ItemInfo(guid="itemA", count=2)])
+    fields.update(kwargs)
+    return DeliveryAddress(**fields)
+
+
+def test_screen_deliveries_reason_codes():
+    ledger = InventoryLedger.from_warehouses([Warehouse(id="W1", coord=(55.76, 37.615), stock={"itemA": 3})])
+    deliveries = [
+        delivery("ok"),
+        delivery("big", demand=50),
+        delivery("window", time_window=(600, 500)),
+        delivery("late", time_window=(1500, 1600)),
+        delivery("nowhere", origin_warehouse="W9"),
+        delivery("stock", items=[ItemInfo(guid="itemA", count=4)]),
+        delivery("returned", items=[ItemInfo(guid="itemA", count=4)], refused=True),
+    ]
+
+    keep, rejected = screen_deliveries(deliveries, 20, ledger.begin())
+
+    assert keep == [0, 6]
+    assert [(r["id"], r["reason"]) for r in rejected] == [
+        ("big", "DEMAND_EXCEEDS_CAPACITY"),
+        ("window", "INVALID_TIME_WINDOW"),
+        ("late", "HORIZON_EXCEEDED"),
+        ("nowhere", "UNKNOWN_WAREHOUSE"),
+        ("stock", "INSUFFICIENT_STOCK"),
+    ]
+
+
+def sub_data_with_pickups():
+    # Узлы: 0 - депо, 1 - склад, 2..4 - доставки, 5..7 - узлы забора доставок 2..4
+    n = 8
+    time_matrix = [[0 if a == b else 10 for b in range(n)] for a in range(n)]
+    time_matrix[0][6] = time_matrix[0][3] = 1000
+    return {
+        "sub_points": [(float(i), 0.0) for i in range(n)],
+        "wh_list": [{"id": "W1"}],
+        "del_list": [delivery("D1"), delivery("D2", time_window=(0, 600)), delivery("D3")],
+        "distance_matrix": [[a * 100 + b for b in range(n)] for a in range(n)],
+        "time_matrix": time_matrix,
+        "time_windows": [(0, 1440)] * 2 + [(0, 1440), (0, 600), (0, 1440)] + [(0, 1440)] * 3,
+        "service_times": [0, 5, 10, 10, 10, 5, 5, 5],
+        "demands": [0, 0, -1, -2, -3, 1, 2, 3],
+        "priorities": [2, 3, 4],
+        "pickups": [{"node": 5 + i, "delivery_node": 2 + i, "delivery": i, "warehouse": 0} for i in range(3)],
+        "stock_limits": [{"pickups": [(5, 1), (6, 2), (7, 3)], "available": 4}],
+        "assign_warehouses": True,
+    }
+
+
+def test_screen_subproblem_removes_unreachable_delivery():
+    sub_data, rejected = screen_subproblem(sub_data_with_pickups())
+
+    assert [(r["id"], r["reason"]) for r in rejected] == [("D2", "TIME_WINDOW_UNREACHABLE")]
+    assert [d.id for d in sub_data["del_list"]] == ["D1", "D3"]
+    assert sub_data["demands"] == [0, 0, -1, -3, 1, 3]
+    assert sub_data["priorities"] == [2, 4]
+    assert sub_data["pickups"] == [
+        {"node": 4, "delivery_node": 2, "delivery": 0, "warehouse": 0},
+        {"node": 5, "delivery_node": 3, "delivery": 1, "warehouse": 0},
+    ]
+    # Запас 4 покрывает оставшиеся заборы 1 + 3, ограничение больше не нужно
+    assert sub_data["stock_limits"] == []
+    assert sub_data["distance_matrix"][3][5] == 4 * 100 + 7
+
+
+def test_restrict_subproblem_keeps_needed_stock_limits():
+    sub_data = restrict_subproblem(sub_data_with_pickups(), [1, 2])
+    assert sub_data["stock_limits"] == [{"pickups": [(4, 2), (5, 3)], "available": 4}]
+
+
+def test_screen_subproblem_uses_vehicle_depots():
+    # Узлы: 0 - депо, 1 - склад, 2..3 - доставки, 4 - депо второго ТС рядом с доставкой 2
+    n = 5
+    time_matrix = [[0 if a == b else 1000 for b in range(n)] for a in range(n)]
+    time_matrix[4][2] = time_matrix[2][4] = 10
+    sub_data = {
+        "sub_points": [(float(i), 0.0) for i in range(n)],
+        "wh_list": [{"id": "W1"}],
+        "del_list": [delivery("D1", time_window=(0, 600)), delivery("D2", time_window=(0, 600))],
+        "distance_matrix": time_matrix,
+        "time_matrix": time_matrix,
+        "time_windows": [(0, 1440), (0, 1440), (0, 600), (0, 600), (0, 1440)],
+        "service_times": [0, 0, 10, 10, 0],
+        "demands": [0, 0, 5, 5, 0],
+        "priorities": [1, 1],
+        "pickups": [],
+        "stock_limits": [],
+        "depot_nodes": [0, 4],
+        "vehicle_starts": [0, 4],
+        "vehicle_ends": [0, 4],
+    }
+
+    sub_data, rejected = screen_subproblem(sub_data)
+
+    assert [(r["id"], r["reason"]) for r in rejected] == [("D2", "TIME_WINDOW_UNREACHABLE")]
+    assert sub_data["depot_nodes"] == [0, 3]
+    assert sub_data["vehicle_starts"] == [0, 3]
+    assert sub_data["time_matrix"][3][2] == 10
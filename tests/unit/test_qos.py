@@ -0,0 +1,75 @@
+import json
+import numpy as np
+from app.schemas.delivery import DeliveryRequest, DriverRules
+from app.services import optimization
+from app.services.qos import FULL_PROFILE, QosProfile, choose_profile, haversine_matrices, load_profiles
+from tests.fixtures.delivery_fixtures import valid_delivery_request
+
+
+def test_choose_profile_by_queue_depth_and_load():
+    profiles = load_profiles()
+    assert choose_profile(profiles, 0, 0.1) is FULL_PROFILE
+    assert choose_profile(profiles, 5, 0.1).name == "reduced"
+    assert choose_profile(profiles, 40, 0.1).name == "estimated"
+    # Загрузка CPU без очереди не удешевляет расчёт, с очередью - выбирает профиль по порогу
+    assert choose_profile(profiles, 0, 5.0) is FULL_PROFILE
+    assert choose_profile(profiles, 1, 2.2).name == "first_solution"
+
+
+def test_profiles_from_environment(monkeypatch):
+    monkeypatch.setenv("QOS_PROFILES", json.dumps([{"name": "busy", "queue_depth": 2, "time_limit_share": 0.1}]))
+    profiles = load_profiles()
+    assert [p.name for p in profiles] == ["busy"]
+    assert choose_profile(profiles, 2, 0).name == "busy"
+
+    monkeypatch.setenv("QOS_PROFILES", "[]")
+    assert choose_profile(load_profiles(), 100, 10) is FULL_PROFILE
+
+    monkeypatch.setenv("QOS_PROFILES", '[{"time_limit_share": 2}]')
+    assert [p.name for p in load_profiles()] == ["reduced", "decomposed", "first_solution", "estimated"]
+
+
+def test_apply_profile(valid_delivery_request):
+    data = DeliveryRequest.parse_obj(dict(valid_delivery_request, time_limit=10))
+    by_name = {p.name: p for p in load_profiles()}
+
+    reduced = by_name["reduced"].apply(data)
+    assert reduced.time_limit == 5 and data.time_limit == 10
+
+    decomposed = by_name["decomposed"].apply(data)
+    assert decomposed.solve_by_priority and decomposed.time_limit == 2
+
+    assert by_name["first_solution"].apply(data).solver == "heuristic"
+    # Эвристика не поддерживает правила водителей: остаётся поиск OR-Tools с наименьшим ограничением
+    with_rules = data.copy(update={"driver_rules": DriverRules(max_route_duration=480)})
+    fallback = by_name["first_solution"].apply(with_rules)
+    assert fallback.solver == "ortools" and fallback.time_limit == 1
+    assert not by_name["decomposed"].apply(with_rules).solve_by_priority
+
+
+def test_haversine_matrices():
+    distances, durations = haversine_matrices([(55.0, 37.0), (56.0, 37.0)])
+    assert np.allclose(np.diag(distances), 0)
+    assert abs(distances[0, 1] / 1.3 - 111195) < 100
+    assert np.allclose(durations, distances / (30 / 3.6))
+
+
+# Профиль first_solution без эвристики: поиск OR-Tools останавливается на начальном решении
+def test_first_solution_profile_stops_at_initial_solution(valid_delivery_request, monkeypatch):
+    limits = []
+    search_parameters = optimization.search_parameters
+
+    def recording_parameters(time_limit, solution_limit=None):
+        limits.append(solution_limit)
+        return search_parameters(time_limit, solution_limit)
+
+    monkeypatch.setattr(optimization, "search_parameters", recording_parameters)
+    profile = QosProfile(name="estimated", first_solution=True, haversine=True)
+    request = dict(valid_delivery_request, driver_rules={"max_route_duration": 480})
+    data = profile.apply(DeliveryRequest.parse_obj(request))
+    assert data.solver == "ortools" and data.time_limit == 1
+
+    result = optimization.run_optimization(data, qos=profile)
+    assert result["route_order"] == ["D1"]
+    assert limits == [1]
+    assert search_parameters(1, 1).solution_limit == 1
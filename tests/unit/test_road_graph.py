@@ -0,0 +1,98 @@
+import heapq
+import math
+import os
+import numpy as np
+import pytest
+from app.services.road_graph import RoadGraph, largest_component, parse_osm, parse_speed
+
+OSM_PATH = os.path.join(os.path.dirname(__file__), "..", "fixtures", "road_graph.osm")
+
+
+def dijkstra(n, tails, heads, weights, source):
+    adjacency = [[] for _ in range(n)]
+    for u, v, w in zip(tails, heads, weights):
+        adjacency[u].append((v, w))
+    dist = [math.inf] * n
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, w in adjacency[u]:
+            if d + w < dist[v]:
+                dist[v] = d + w
+                heapq.heappush(heap, (d + w, v))
+    return dist
+
+
+def test_parse_speed():
+    assert parse_speed({"highway": "residential"}) == 25
+    assert parse_speed({"highway": "primary", "maxspeed": "70"}) == 70
+    assert parse_speed({"highway": "residential", "maxspeed": "30 mph"}) == pytest.approx(48.27)
+    assert parse_speed({"highway": "footway"}) is None
+    assert parse_speed({"highway": "service", "access": "private"}) is None
+
+
+def test_parse_osm_roads():
+    coords, tails, heads, distances, durations = parse_osm(OSM_PATH)
+    index = {c: i for i, c in enumerate(coords)}
+    # Пешеходная дорожка не входит в граф, изолированный проезд входит
+    assert len(coords) == 18
+    edges = set(zip(tails.tolist(), heads.tolist()))
+    west, east = index[(55.752, 37.6)], index[(55.752, 37.603)]
+    assert (west, east) in edges and (east, west) not in edges
+    # Длина ребра ~ 190 м по долготе, время по скорости проспекта 60 км/ч
+    a, b = index[(55.75, 37.6)], index[(55.75, 37.603)]
+    k = list(zip(tails.tolist(), heads.tolist())).index((a, b))
+    assert distances[k] == pytest.approx(188, abs=2)
+    assert durations[k] == pytest.approx(distances[k] / (60 / 3.6))
+
+
+def test_largest_component_drops_isolated_roads():
+    coords, tails, heads, _, _ = parse_osm(OSM_PATH)
+    assert len(largest_component(len(coords), tails, heads)) == 16
+
+
+def test_table_matches_dijkstra(tmp_path):
+    coords, tails, heads, distances, durations = parse_osm(OSM_PATH)
+    graph = RoadGraph.from_osm(OSM_PATH)
+    assert len(graph) == 16
+
+    points = [tuple(c) for c in graph.coords.tolist()]
+    index = {c: i for i, c in enumerate(coords)}
+    table_dist, table_dur = graph.table(points)
+    for row, point in enumerate(points):
+        expected = dijkstra(len(coords), tails, heads, durations, index[point])
+        assert table_dur[row] == pytest.approx([expected[index[p]] for p in points])
+    # Одностороннее движение делает матрицу несимметричной
+    assert not np.allclose(table_dur, np.transpose(table_dur))
+
+    path = str(tmp_path / "graph.npz")
+    graph.save(path)
+    assert RoadGraph.load(path).table(points, sources=[0, 3], destinations=[5]) == (
+        [[table_dist[0][5]], [table_dist[3][5]]], [[table_dur[0][5]], [table_dur[3][5]]])
+
+
+def test_contraction_on_random_network():
+    rng = np.random.default_rng(7)
+    k = 12
+    coords = [(55.7 + 0.002 * (n // k), 37.6 + 0.003 * (n % k)) for n in range(k * k)]
+    tails, heads = [], []
+    for n in range(k * k):
+        for m in ([n + 1] if n % k < k - 1 else []) + ([n + k] if n + k < k * k else []):
+            tails.append(n)
+            heads.append(m)
+            if rng.random() > 0.2:
+                tails.append(m)
+                heads.append(n)
+    tails, heads = np.asarray(tails), np.asarray(heads)
+    durations = rng.uniform(10, 60, len(tails))
+    keep = largest_component(len(coords), tails, heads)
+    graph = RoadGraph.from_edges(coords, tails, heads, durations * 10, durations)
+
+    points = [coords[i] for i in keep[::5]]
+    _, table_dur = graph.table(points)
+    for row, point in enumerate(points):
+        expected = dijkstra(len(coords), tails, heads, durations, coords.index(point))
+        assert table_dur[row] == pytest.approx([expected[coords.index(p)] for p in points])
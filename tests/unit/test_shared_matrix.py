@@ -0,0 +1,48 @@
+import pickle
+from functools import partial
+import numpy as np
+import pytest
+from app.services.lns import RuinAndRecreate
+from app.services.optimization import build_routing_model, build_shared_routing_model, model_data
+from app.services.shared_matrix import SharedMatrices
+from tests.unit.test_lns import line_sub_data
+
+
+def test_shared_matrix_round_trip_and_cleanup():
+    matrix = np.arange(12, dtype=np.int32).reshape(3, 4)
+    with SharedMatrices() as shared:
+        descriptor = shared.share(matrix)
+        attached = descriptor.attach()
+        assert attached.tolist() == matrix.tolist()
+        assert not attached.flags.writeable
+        del attached
+
+    with pytest.raises(FileNotFoundError):
+        descriptor.attach()
+
+
+def test_descriptor_size_does_not_depend_on_matrix_size():
+    with SharedMatrices() as shared:
+        large = shared.share(np.zeros((2000, 2000), dtype=np.int32))
+        assert large.attach().nbytes == 16_000_000
+        assert len(pickle.dumps(large)) < 200
+
+        # В данных модели для процессов нет матриц
+        sub_data = model_data(line_sub_data(8))
+        assert sub_data["distance_matrix"] is None and sub_data["time_matrix"] is None
+
+
+def test_ruin_and_recreate_with_shared_matrix_in_workers():
+    sub_data = line_sub_data(8)
+    routes = [[2, 9, 3, 8, 4, 7, 5, 6]]
+    manager, routing, _ = build_routing_model(sub_data, sub_data["time_matrix"], 20, 100000)
+    start = routing.ReadAssignmentFromRoutes([[manager.NodeToIndex(node) for node in routes[0]]], True)
+
+    with SharedMatrices() as shared:
+        model_factory = partial(build_shared_routing_model, model_data(sub_data),
+                                shared.share(sub_data["time_matrix"], dtype=np.int32), 20, 100000)
+        lns = RuinAndRecreate(model_factory, sub_data, sub_data["time_matrix"], workers=2)
+        best, objective = lns.improve(routes, start.ObjectiveValue(), 6.0)
+
+    assert objective < start.ObjectiveValue()
+    assert sorted(node for node in best[0] if node >= 2) == list(range(2, 10))
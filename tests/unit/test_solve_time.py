@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import numpy as np
+from app.schemas.delivery import DeliveryAddress
+from app.services.solve_time import SolveTimeModel, instance_features, search_bound
+
+
+def request(n, time_window=(0, 1440), priority="medium", time_limit=10, solver="ortools", solve_by_priority=False):
+    deliveries = [DeliveryAddress(id=f"D{i}", coord=(55.7, 37.6), priority=priority, time_window=time_window,
+                                  demand=1, service_time=5, origin_warehouse="W1")
+                  for i in range(n)]
+    return SimpleNamespace(deliveries=deliveries, warehouses=[], warehouse_ids=["W1"], vehicles=[],
+                           time_limit=time_limit, solver=solver, solve_by_priority=solve_by_priority)
+
+
+def test_features_grow_with_size_tight_windows_and_priorities():
+    wide = instance_features(request(200))
+    tight = instance_features(request(200, time_window=(600, 720), priority="critical"))
+    assert wide[1] == tight[1] == 2.0
+    assert wide[5] == 0 and tight[5] > 1.8
+    assert wide[6] == 0 and tight[6] == 2.0
+
+
+def test_search_bound():
+    assert search_bound(request(5, time_limit=3)) == 3
+    assert search_bound(request(5, solver="heuristic")) == 0
+    assert search_bound(request(5, time_limit=1, solve_by_priority=True)) == 1
+
+
+def test_prediction_follows_observed_times():
+    model = SolveTimeModel()
+    small, large = request(5, time_limit=1), request(800, time_limit=1)
+    assert 1 < model.predict(small) < model.predict(large)
+
+    # Сервер медленнее начальной оценки: накладные расходы растут с числом доставок
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        data = request(int(rng.integers(5, 1000)), time_limit=1)
+        model.observe(data, 1 + 2.0 * len(data.deliveries) / 100)
+    assert abs(model.predict(small) - 1.1) < 0.2
+    assert abs(model.predict(large) - 17) < 1
@@ -0,0 +1,100 @@
+from unittest.mock import patch
+import numpy as np
+from app.schemas.delivery import DeliveryAddress
+from app.services.optimization import build_subproblem, solve_vrp_multy_warehouse
+from app.services.presolve import restrict_subproblem
+from app.services.sparse_arcs import (MISSING_TIME, ArcRow, fetch_arcs, is_sparse, nearest_neighbors,
+                                      restrict_rows, successor_lists)
+
+
+def grid_points(rows, cols, step=0.01):
+    return [(55.7 + step * r, 37.6 + step * c) for r in range(rows) for c in range(cols)]
+
+
+def road_matrices(points):
+    coords = np.asarray(points)
+    distances = np.abs(coords[:, None, :] - coords[None, :, :]) @ np.array([100000.0, 60000.0])
+    return distances, distances / 10
+
+
+def test_nearest_neighbors_match_brute_force():
+    rng = np.random.default_rng(7)
+    points = np.column_stack([55.5 + rng.random(300) * 0.5, 37.3 + rng.random(300) * 0.6]).tolist()
+    neighbours = nearest_neighbors(points, 5)
+
+    coords = np.radians(np.asarray(points))
+    for i in (0, 123, 299):
+        dlat = coords[:, 0] - coords[i, 0]
+        dlon = coords[:, 1] - coords[i, 1]
+        hav = np.sin(dlat / 2) ** 2 + np.cos(coords[i, 0]) * np.cos(coords[:, 0]) * np.sin(dlon / 2) ** 2
+        hav[i] = np.inf
+        assert set(neighbours[i].tolist()) == set(np.argsort(hav)[:5].tolist())
+
+
+def test_successors_keep_hub_arcs():
+    points = [(55.75, 37.62), (55.76, 37.61)] + grid_points(4, 4)
+    successors = successor_lists(points, [0, 1], 3)
+
+    assert successors[0] == successors[1] == list(range(len(points)))
+    for node in range(2, len(points)):
+        assert {0, 1, node} <= set(successors[node])
+        assert len(successors[node]) >= 3 + 3
+        # Граф соседей симметричен
+        for other in successors[node]:
+            assert node in successors[other]
+
+
+def test_arc_row_returns_missing_value():
+    row = ArcRow({2: 7}, MISSING_TIME)
+    assert row[2] == 7
+    assert row[5] == MISSING_TIME
+    assert len(row) == 1
+    assert is_sparse([row]) and not is_sparse([[0, 7]])
+
+    restricted = restrict_rows([ArcRow({0: 1, 2: 3}, 99), ArcRow({}, 99), ArcRow({0: 5}, 99)], [0, 2])
+    assert restricted == [{0: 1, 1: 3}, {0: 5}]
+    assert restricted[1][1] == 99
+
+
+def test_fetch_arcs_requests_only_neighbour_rows():
+    points = [(55.75, 37.62)] + grid_points(10, 10)
+    distances, durations = road_matrices(points)
+    successors = successor_lists(points, [0], 4)
+    requested = []
+
+    def fake_table(block, sources=None, destinations=None):
+        index = [points.index(p) for p in block]
+        rows = [index[s] for s in sources]
+        requested.append(len(rows) * len(index))
+        return distances[np.ix_(rows, index)].tolist(), durations[np.ix_(rows, index)].tolist()
+
+    with patch("app.services.sparse_arcs.fetch_table", side_effect=fake_table):
+        distance_rows, time_rows = fetch_arcs(points, successors)
+
+    assert sum(requested) < len(points) ** 2
+    for node, succ in enumerate(successors):
+        assert sorted(time_rows[node]) == succ
+        for j in succ:
+            assert distance_rows[node][j] == distances[node][j]
+            assert time_rows[node][j] == int(np.ceil(durations[node][j] / 60))
+
+
+def test_sparse_solution_uses_only_neighbour_arcs():
+    depot = (55.75, 37.62)
+    warehouse = {"id": "W1", "coord": (55.76, 37.61), "capacity": 100, "usage": 0}
+    deliveries = [DeliveryAddress(id=f"D{i}", coord=coord, demand=1, service_time=5, origin_warehouse="W1")
+                  for i, coord in enumerate(grid_points(5, 5))]
+    points = [depot, warehouse["coord"]] + [d.coord for d in deliveries]
+
+    sub_data = build_subproblem(deliveries, depot, [warehouse], matrices=road_matrices(points), neighbors=4)
+    assert is_sparse(sub_data["time_matrix"])
+    # Отбрасывание доставок сохраняет разреженные строки
+    sub_data = restrict_subproblem(sub_data, list(range(1, len(deliveries))))
+    assert is_sparse(sub_data["time_matrix"])
+
+    routes, skipped, _ = solve_vrp_multy_warehouse(sub_data, sub_data["del_list"], vehicle_capacity=50,
+                                                   time_limit=2)
+    assert skipped == []
+    for route in routes:
+        for a, b in zip(route, route[1:]):
+            assert b in sub_data["time_matrix"][a]
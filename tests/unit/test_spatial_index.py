@@ -0,0 +1,51 @@
+import random
+from types import SimpleNamespace
+from app.services.optimization import haversine_distance, handle_refusal
+from app.services.spatial_index import GeoKDTree
+from app.services.inventory import InventoryLedger
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(42)
+    coords = [(rng.uniform(55.5, 56.0), rng.uniform(37.3, 37.9)) for _ in range(200)]
+    capacity = [rng.randint(0, 3) for _ in coords]
+    tree = GeoKDTree(coords)
+
+    for _ in range(100):
+        query = (rng.uniform(55.5, 56.0), rng.uniform(37.3, 37.9))
+        need = rng.randint(1, 3)
+        idx, dist = tree.nearest(query, predicate=lambda i: capacity[i] >= need)
+
+        candidates = [i for i in range(len(coords)) if capacity[i] >= need]
+        expected = min(candidates, key=lambda i: haversine_distance(query, coords[i]))
+        assert abs(dist - haversine_distance(query, coords[expected])) < 1e-6
+        assert abs(haversine_distance(query, coords[idx]) - dist) < 1e-6
+
+
+def test_nearest_without_candidates():
+    tree = GeoKDTree([(55.0, 37.0)])
+    assert tree.nearest((55.0, 37.0), predicate=lambda i: False) == (None, float("inf"))
+
+
+def test_handle_refusal_road_ranking():
+    # По прямой ближе W1, по дорожной матрице - W2
+    delivery = SimpleNamespace(id="D1", coord=(55.70, 37.60),
+                               items=[SimpleNamespace(guid="itemA", count=2)])
+    warehouses = [
+        {"id": "W1", "coord": (55.701, 37.601), "capacity": 10, "usage": 0},
+        {"id": "W2", "coord": (55.80, 37.70), "capacity": 10, "usage": 0},
+    ]
+    distance_matrix = [
+        [0, 100, 100, 100],
+        [100, 0, 100, 5000],
+        [100, 100, 0, 300],
+        [100, 5000, 300, 0],
+    ]
+
+    for matrix, expected in ((None, "W1"), (distance_matrix, "W2")):
+        route = [{"node_index": 3, "type": "delivery", "id": "D1", "refused": True}]
+        inventory = InventoryLedger(["W1", "W2"], [10, 10], [0, 0]).begin()
+        handle_refusal(route, [delivery], warehouses, inventory, matrix)
+        assert route[-1]["type"] == "warehouse_return"
+        assert route[-1]["id"] == expected
+        assert inventory.commit()["inventory"][expected]["stock"] == {"itemA": 2}
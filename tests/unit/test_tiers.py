@@ -0,0 +1,78 @@
+import numpy as np
+from app.schemas.delivery import DeliveryAddress
+from app.services import optimization
+from app.services.optimization import build_subproblem, solve_by_priority_tiers
+from app.services.tiers import MIN_TIER_TIME, VehicleState, priority_tiers, tier_subproblem
+
+PRIORITIES = ["low", "critical", "medium", "critical", "low", "medium"]
+
+
+def tiered_sub_data():
+    # Узлы: 0 - депо, 1 - склад, 2..7 - доставки
+    depot = (55.75, 37.62)
+    warehouse = {"id": "W1", "coord": (55.76, 37.61), "capacity": 100, "usage": 0}
+    deliveries = [DeliveryAddress(id=f"D{i}", coord=(55.70 + 0.01 * i, 37.60), priority=priority, demand=2,
+                                  service_time=10, origin_warehouse="W1")
+                  for i, priority in enumerate(PRIORITIES)]
+    coords = np.asarray([depot, warehouse["coord"]] + [d.coord for d in deliveries])
+    distances = np.abs(coords[:, None, :] - coords[None, :, :]).sum(axis=2) * 100000
+    return build_subproblem(deliveries, depot, [warehouse], matrices=(distances, distances / 10))
+
+
+def test_priority_tiers_from_highest():
+    sub_data = tiered_sub_data()
+    assert priority_tiers(sub_data) == [(5, [1, 3]), (2, [2, 5]), (1, [0, 4])]
+
+
+def test_tier_subproblem_starts_where_previous_tier_ended():
+    sub_data = tiered_sub_data()
+    state = VehicleState(0, 480, 10)
+    state.advance(sub_data, list(range(8)), [0, 3, 5, 0], [470, 500, 530, 560])
+    assert (state.node, state.ready, state.capacity) == (5, 540, 6)
+    assert state.route == [0, 3, 5] and state.arrivals == [470, 500, 530]
+
+    tier_data, nodes = tier_subproblem(sub_data, [2, 5], [state])
+
+    # Депо, склад, доставки уровня и копия узла, где ТС закончило предыдущий уровень
+    assert nodes == [0, 1, 4, 7, 5]
+    assert [d.id for d in tier_data["del_list"]] == ["D2", "D5"]
+    assert tier_data["vehicle_starts"] == [4]
+    assert 4 in tier_data["depot_nodes"]
+    assert tier_data["vehicle_shifts"] == [(540, 1440)]
+    assert tier_data["vehicle_capacities"] == [6]
+    assert (tier_data["service_times"][4], tier_data["demands"][4]) == (0, 0)
+    assert tier_data["time_matrix"][4] == [sub_data["time_matrix"][5][j] for j in nodes]
+
+
+def test_solve_by_priority_tiers_orders_routes_by_priority():
+    sub_data = tiered_sub_data()
+    routes, skipped, arrival_times = solve_by_priority_tiers(sub_data, sub_data["del_list"], vehicle_capacity=20,
+                                                             time_limit=3)
+
+    assert skipped == []
+    route = routes[0]
+    assert route[0] == 0 and route[-1] == 0
+    ranks = [sub_data["priorities"][node - 2] for node in route if node >= 2]
+    assert sorted(ranks) == sorted(sub_data["priorities"])
+    assert ranks == sorted(ranks, reverse=True)
+    # Времена прибытия не убывают вдоль маршрута через все уровни
+    assert len(arrival_times[0]) == len(route)
+    assert arrival_times[0] == sorted(arrival_times[0])
+
+
+def test_solve_by_priority_tiers_attempts_every_tier(monkeypatch):
+    limits = []
+    solve = optimization.solve_vrp_multy_warehouse
+
+    def recording_solve(*args, time_limit, **kwargs):
+        limits.append(time_limit)
+        return solve(*args, time_limit=time_limit, **kwargs)
+
+    monkeypatch.setattr(optimization, "solve_vrp_multy_warehouse", recording_solve)
+    sub_data = tiered_sub_data()
+    # Три уровня по MIN_TIER_TIME не помещаются в общее ограничение: уровни не пропускаются,
+    # а поиск длится не дольше суммы минимумов
+    _, skipped, _ = solve_by_priority_tiers(sub_data, sub_data["del_list"], vehicle_capacity=20, time_limit=1)
+
+    assert skipped == []
+    assert limits == [MIN_TIER_TIME] * 3
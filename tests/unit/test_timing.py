@@ -0,0 +1,34 @@
+import pytest
+from app.utils.timing import StageTimer, parse_server_timing
+
+
+def test_header_lists_stages_in_order():
+    timer = StageTimer()
+    with timer.stage("parse"):
+        pass
+    with timer.stage("solve"):
+        pass
+
+    stages, failed = parse_server_timing(timer.header())
+    assert list(stages) == ["parse", "solve"]
+    assert all(duration >= 0 for duration in stages.values())
+    assert failed is None
+
+
+def test_failed_stage_is_reported_and_exception_propagates():
+    timer = StageTimer()
+    with timer.stage("parse"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.stage("matrix"):
+            raise RuntimeError("OSRM недоступен")
+
+    assert 'failed;desc="matrix"' in timer.header()
+    stages, failed = parse_server_timing(timer.header())
+    assert set(stages) == {"parse", "matrix"}
+    assert failed == "matrix"
+
+
+def test_parse_server_timing_handles_missing_header():
+    assert parse_server_timing(None) == ({}, None)
+    assert parse_server_timing("cache, db;dur=2.5") == ({"db": 2.5}, None)
@@ -0,0 +1,32 @@
+from app.services.traffic import TrafficSlices, initial_departures
+
+TIME_MATRIX = [
+    [0, 10, 20],
+    [10, 0, 15],
+    [20, 15, 0],
+]
+
+
+def test_slices_are_deduplicated_by_multiplier():
+    profile = [1.0] * 7 + [2.0] * 3 + [1.0] * 6 + [1.5] * 3 + [1.0] * 5
+    traffic = TrafficSlices(TIME_MATRIX, profile)
+
+    assert traffic.levels.tolist() == [1.0, 1.5, 2.0]
+    assert traffic.base.shape == (3, 3)
+    assert traffic.travel_time(1, 2, 8 * 60 + 30) == 30
+    assert traffic.travel_time(1, 2, 17 * 60) == 23
+    assert traffic.travel_time(1, 2, 2000) == 15
+
+
+def test_matrix_rows_follow_departure_time():
+    profile = [1.0] * 8 + [2.0] + [1.0] * 15
+    traffic = TrafficSlices(TIME_MATRIX, profile)
+
+    matrix = traffic.matrix_for([0, 8 * 60, 12 * 60])
+    assert matrix == [[0, 10, 20], [20, 0, 30], [20, 15, 0]]
+
+
+def test_initial_departures():
+    windows = [(0, 1440), (600, 700), (0, 1440)]
+    departures = initial_departures(TIME_MATRIX, windows, [0, 10, 5])
+    assert departures == [590, 660, 735]
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+from app.schemas.delivery import Warehouse
+from app.services.warehouse_store import WarehouseStateStore
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "warehouses.npz")
+    store = WarehouseStateStore(path, snapshot_interval=3600)
+    store.upsert([
+        Warehouse(id="W1", coord=(55.76, 37.61), capacity=100, usage=50, stock={"itemA": 10}),
+        Warehouse(id="W2", coord=(55.77, 37.62), capacity=40, usage=0, stock={"itemB": 7}),
+    ])
+
+    txn = store.begin()
+    txn.ship("W1", [SimpleNamespace(guid="itemA", count=4)])
+    txn.receive("W2", [SimpleNamespace(guid="itemC", count=1)])
+    store.commit(txn)
+    store.snapshot()
+
+    restored = WarehouseStateStore(path)
+    assert restored.get("W1") == {"id": "W1", "coord": (55.76, 37.61), "capacity": 100, "usage": 46,
+                                  "stock": {"itemA": 6}}
+    assert restored.get("W2")["stock"] == {"itemB": 7, "itemC": 1}
+    assert restored.missing(["W1", "W3"]) == ["W3"]
+
+
+def test_upsert_batch_replaces_and_appends():
+    store = WarehouseStateStore()
+    store.upsert([Warehouse(id="W1", coord=(55.76, 37.61), capacity=100, usage=50, stock={"itemA": 10})])
+    store.upsert([
+        Warehouse(id="W2", coord=(55.77, 37.62), capacity=40, usage=0, stock={"itemB": 7}),
+        Warehouse(id="W1", coord=(55.76, 37.61), capacity=90, usage=10, stock={"itemC": 3}),
+        Warehouse(id="W3", coord=(55.78, 37.63), capacity=20, usage=5, stock={"itemA": 1, "itemB": 2}),
+    ])
+
+    ledger = store.ledger
+    assert ledger.stock.shape == (3, 3)
+    assert store.get("W1") == {"id": "W1", "coord": (55.76, 37.61), "capacity": 90, "usage": 10,
+                               "stock": {"itemC": 3}}
+    assert store.get("W2")["stock"] == {"itemB": 7}
+    assert store.get("W3")["stock"] == {"itemA": 1, "itemB": 2}
+    assert ledger.usage.tolist() == [10, 0, 5]
+
+
+def test_failed_background_snapshot_keeps_state_unsaved(tmp_path):
+    path = str(tmp_path / "state" / "warehouses.npz")
+    store = WarehouseStateStore(path, snapshot_interval=0)
+    store.upsert([Warehouse(id="W1", coord=(55.76, 37.61), capacity=100, usage=50, stock={"itemA": 10})])
+    # Фоновая запись не удалась: каталога снимка ещё нет
+    with store._snapshot_lock:
+        pass
+
+    (tmp_path / "state").mkdir()
+    store.snapshot()
+    assert WarehouseStateStore(path).get("W1")["stock"] == {"itemA": 10}